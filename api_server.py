@@ -19,8 +19,14 @@ import time
 project_root = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, project_root)
 
-from router.router import LLMRouter
-from critic.critic import Critic
+from router.async_router import AsyncLLMRouter
+from router.singleflight import SingleFlight
+from critic.critic import AsyncCritic
+from critic.critic_queue import CriticWorkers, open_queue
+from config.settings import load_settings
+from models.base import is_error_response
+from models.http_pool import get_http_pool
+from models.provider_pool import get_pool_stats
 from db.db import DatabaseManager
 
 # Initialize FastAPI app
@@ -36,15 +42,43 @@ app.add_middleware(
 )
 
 # Initialize components
-router = LLMRouter()
-critic = Critic()
+router = AsyncLLMRouter()
 db = DatabaseManager()
+critic = AsyncCritic(db)
+# Identical requests in flight at the same time share one generation and critic evaluation
+flights = SingleFlight()
+calls_saved = {"generations": 0, "critic_evaluations": 0}
+# With critic.queue set, answers are returned before their evaluation, which background workers do
+critic_config = load_settings()['critic']
+critic_queue = open_queue(db)
+critic_workers = CriticWorkers(critic_queue, critic, router, critic_config['queue_workers'],
+                               critic_config['poll_interval_s']) if critic_config['queue'] else None
+
+@app.on_event("startup")
+async def start_critic_workers():
+    if critic_workers is not None:
+        critic_workers.start()
+
+@app.on_event("shutdown")
+async def stop_critic_workers():
+    if critic_workers is not None:
+        await critic_workers.stop()
 
 # Pydantic models
 class PromptRequest(BaseModel):
     prompt_text: str
     model: Optional[str] = None
     skip_critic: bool = False
+    hedge: Optional[bool] = None
+    deadline_ms: Optional[float] = None
+    max_cost: Optional[float] = None
+    use_cache: Optional[bool] = None
+
+class StreamRequest(PromptRequest):
+    # A stored prompt to answer instead of prompt_text: the critic gets its reference
+    # answer and the run is stored, as by /api/route-prompt
+    prompt_text: str = ""
+    prompt_id: Optional[int] = None
 
 class RoutingResponse(BaseModel):
     model: str
@@ -54,6 +88,11 @@ class RoutingResponse(BaseModel):
     estimated_cost: float
     critic_score: Optional[float] = None
     critic_rationale: Optional[str] = None
+    critic_job_id: Optional[int] = None
+    deadline_met: Optional[bool] = None
+    forecast_cost: Optional[float] = None
+    cache_hit: bool = False
+    cache_match: Optional[dict] = None
 
 class Prompt(BaseModel):
     id: int
@@ -106,87 +145,305 @@ async def get_prompt(prompt_id: int):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _normalise_prompt(prompt_text: str) -> str:
+    return " ".join(prompt_text.split())
+
+async def _coalesce(key: tuple, skip_critic: bool, work) -> RoutingResponse:
+    result, shared = await flights.do(key, work)
+    if shared:
+        calls_saved["generations"] += 1
+        if not skip_critic:
+            calls_saved["critic_evaluations"] += 1
+    return result
+
 @app.post("/api/route", response_model=RoutingResponse)
 async def route_prompt(request: PromptRequest):
     """Route a prompt to the best model and generate response"""
     try:
-        # Generate response using the router
-        response = router.generate_response(request.prompt_text, request.model)
-        
-        # Evaluate with critic if not skipped
-        critic_score = None
-        critic_rationale = None
-        
-        if not request.skip_critic:
-            evaluation = critic.evaluate_response(
-                response['answer_text'],
-                "",  # No reference answer for custom prompts
-                request.prompt_text
-            )
-            critic_score = evaluation['score']
-            critic_rationale = evaluation['rationale']
-        
-        return RoutingResponse(
-            model=response['model'],
-            answer=response['answer_text'],
-            latency_ms=response['latency_ms'],
-            tokens=response['tokens'],
-            estimated_cost=response['estimated_cost'],
-            critic_score=critic_score,
-            critic_rationale=critic_rationale
-        )
+        key = ("route", _normalise_prompt(request.prompt_text), request.model, request.skip_critic,
+               request.hedge, request.deadline_ms, request.max_cost, request.use_cache)
+        return await _coalesce(key, request.skip_critic, lambda: _route_prompt(request))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/api/route-prompt/{prompt_id}", response_model=RoutingResponse)
-async def route_specific_prompt(prompt_id: int, model: Optional[str] = None, skip_critic: bool = False):
-    """Route a specific prompt by ID"""
-    try:
-        # Get the prompt
-        prompts = db.get_prompts()
-        prompt_data = next((p for p in prompts if p['id'] == prompt_id), None)
+async def _route_prompt(request: PromptRequest) -> RoutingResponse:
+    # Generate response using the router
+    response = await router.generate_response(request.prompt_text, request.model, hedge=request.hedge,
+                                              deadline_ms=request.deadline_ms, max_cost=request.max_cost,
+                                              use_cache=request.use_cache)
+    
+    # Evaluate with critic if not skipped
+    critic_score = None
+    critic_rationale = None
+    critic_job_id = None
+    
+    if not request.skip_critic and critic_workers is not None:
+        # No runs row for custom prompts: the score only feeds the router
+        critic_job_id = await asyncio.to_thread(critic_queue.enqueue, request.prompt_text,
+                                                response['answer_text'], response=response)
+    elif not request.skip_critic:
+        evaluation = await critic.evaluate_response(
+            response['answer_text'],
+            "",  # No reference answer for custom prompts
+            request.prompt_text,
+            use_cache=request.use_cache
+        )
+        critic_score = evaluation['score']
+        critic_rationale = evaluation['rationale']
+        router.record_feedback(request.prompt_text, response, critic_score)
+    
+    return RoutingResponse(
+        model=response['model'],
+        answer=response['answer_text'],
+        latency_ms=response['latency_ms'],
+        tokens=response['tokens'],
+        estimated_cost=response['estimated_cost'],
+        critic_score=critic_score,
+        critic_rationale=critic_rationale,
+        critic_job_id=critic_job_id,
+        deadline_met=response.get('deadline_met'),
+        forecast_cost=response.get('forecast_cost'),
+        cache_hit=response.get('cache_hit', False),
+        cache_match=response.get('cache_match')
+    )
+
+@app.post("/api/route/stream")
+async def route_prompt_stream(request: StreamRequest):
+    """
+    Route a prompt and stream the answer as server-sent events: token events as the model
+    generates, then a done event with the RoutingResponse fields, ttft_ms and tokens_per_second
+    (after the critic evaluation unless skipped or deferred). With prompt_id, the stored prompt
+    is answered and the run is stored with its streaming metrics, like /api/route-prompt does;
+    a custom prompt_text is only fed back to the router, like /api/route. Error answers are
+    not evaluated. Hedging and deadlines do not apply.
+    """
+    if request.model is not None and request.model not in router.get_available_models():
+        raise HTTPException(status_code=400, detail=f"Unknown model: {request.model}")
+    prompt_data = None
+    if request.prompt_id is not None:
+        prompts = await asyncio.to_thread(db.get_prompts)
+        prompt_data = next((p for p in prompts if p['id'] == request.prompt_id), None)
         if not prompt_data:
             raise HTTPException(status_code=404, detail="Prompt not found")
-        
-        # Generate response
-        response = router.generate_response(prompt_data['prompt'], model)
-        
-        # Evaluate with critic if not skipped
-        critic_score = None
-        critic_rationale = None
-        
-        if not skip_critic:
-            evaluation = critic.evaluate_response(
-                response['answer_text'],
-                prompt_data['reference'],
-                prompt_data['prompt']
+    elif not request.prompt_text:
+        raise HTTPException(status_code=400, detail="Either prompt_text or prompt_id is required")
+    prompt_text = prompt_data['prompt'] if prompt_data else request.prompt_text
+    reference = prompt_data['reference'] if prompt_data else ""  # No reference answer for custom prompts
+    
+    async def generate():
+        try:
+            response = None
+            async for event in router.generate_stream(prompt_text, request.model,
+                                                      use_cache=request.use_cache, max_cost=request.max_cost):
+                if event['type'] == 'done':
+                    response = event['response']
+                else:
+                    yield f"data: {json.dumps(event)}\n\n"
+            
+            evaluate = not request.skip_critic and not is_error_response(response)
+            defer_critic = evaluate and critic_workers is not None
+            critic_score = None
+            critic_rationale = None
+            if evaluate and not defer_critic:
+                evaluation = await critic.evaluate_response(response['answer_text'], reference, prompt_text,
+                                                            use_cache=request.use_cache)
+                critic_score = evaluation['score']
+                critic_rationale = evaluation['rationale']
+                router.record_feedback(prompt_text, response, critic_score)
+            
+            rowid = None
+            if prompt_data is not None:
+                rowid = await _store_run(request.prompt_id, response, critic_score, critic_rationale)
+            
+            # The background workers write the score to the stored row, if there is one
+            critic_job_id = None
+            if defer_critic:
+                critic_job_id = await asyncio.to_thread(critic_queue.enqueue, prompt_text, response['answer_text'],
+                                                        reference, rowid, response)
+            
+            result = RoutingResponse(
+                model=response['model'],
+                answer=response['answer_text'],
+                latency_ms=response['latency_ms'],
+                tokens=response['tokens'],
+                estimated_cost=response['estimated_cost'],
+                critic_score=critic_score,
+                critic_rationale=critic_rationale,
+                critic_job_id=critic_job_id,
+                forecast_cost=response.get('forecast_cost'),
+                cache_hit=response.get('cache_hit', False),
+                cache_match=response.get('cache_match')
             )
-            critic_score = evaluation['score']
-            critic_rationale = evaluation['rationale']
-        
-        # Store the result in database
-        run_id = f"api_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
-        db.store_run_result(
-            run_id=run_id,
-            prompt_id=prompt_id,
-            model=response['model'],
-            answer=response['answer_text'],
-            latency_ms=response['latency_ms'],
-            tokens=response['tokens'],
-            estimated_cost=response['estimated_cost'],
-            critic_score=critic_score,
-            critic_rationale=critic_rationale
-        )
+            done = {'type': 'done', **result.model_dump(), 'ttft_ms': response.get('ttft_ms'),
+                    'tokens_per_second': response.get('tokens_per_second')}
+            yield f"data: {json.dumps(done)}\n\n"
         
-        return RoutingResponse(
-            model=response['model'],
-            answer=response['answer_text'],
-            latency_ms=response['latency_ms'],
-            tokens=response['tokens'],
-            estimated_cost=response['estimated_cost'],
-            critic_score=critic_score,
-            critic_rationale=critic_rationale
+        except Exception as e:
+            yield f"data: {json.dumps({'type': 'error', 'message': str(e)})}\n\n"
+    
+    return StreamingResponse(generate(), media_type="text/event-stream")
+
+async def _store_run(prompt_id: int, response: Dict, critic_score: Optional[float],
+                     critic_rationale: Optional[str]) -> int:
+    """Store a routed answer to a stored prompt as an api_ run, with its hedge attempts; returns its rowid"""
+    # Off the event loop, like every SQLite write here
+    run_id = f"api_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+    rowid = await asyncio.to_thread(
+        db.store_run_result,
+        run_id=run_id,
+        prompt_id=prompt_id,
+        model=response['model'],
+        answer=response['answer_text'],
+        latency_ms=response['latency_ms'],
+        tokens=response['tokens'],
+        estimated_cost=response['estimated_cost'],
+        critic_score=critic_score,
+        critic_rationale=critic_rationale,
+        hedge_role=response.get('hedge_role'),
+        hedge_outcome=response.get('hedge_outcome'),
+        deadline_ms=response.get('deadline_ms'),
+        deadline_met=response.get('deadline_met'),
+        input_tokens=response.get('input_tokens'),
+        output_tokens=response.get('output_tokens'),
+        forecast_output_tokens=response.get('forecast_output_tokens'),
+        forecast_cost=response.get('forecast_cost'),
+        cache_hit=response.get('cache_hit'),
+        cache_similarity=response.get('cache_similarity'),
+        ttft_ms=response.get('ttft_ms'),
+        tokens_per_second=response.get('tokens_per_second')
+    )
+    await asyncio.to_thread(db.store_hedge_attempts, run_id, prompt_id, response)
+    return rowid
+
+@app.post("/api/route-prompt/{prompt_id}", response_model=RoutingResponse)
+async def route_specific_prompt(prompt_id: int, model: Optional[str] = None, skip_critic: bool = False,
+                                hedge: Optional[bool] = None, deadline_ms: Optional[float] = None,
+                                max_cost: Optional[float] = None, use_cache: Optional[bool] = None):
+    """Route a specific prompt by ID"""
+    try:
+        key = ("route-prompt", prompt_id, model, skip_critic, hedge, deadline_ms, max_cost, use_cache)
+        return await _coalesce(key, skip_critic, lambda: _route_specific_prompt(
+            prompt_id, model, skip_critic, hedge, deadline_ms, max_cost, use_cache))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def _route_specific_prompt(prompt_id: int, model: Optional[str], skip_critic: bool,
+                                 hedge: Optional[bool], deadline_ms: Optional[float],
+                                 max_cost: Optional[float], use_cache: Optional[bool]) -> RoutingResponse:
+    # Get the prompt
+    prompts = db.get_prompts()
+    prompt_data = next((p for p in prompts if p['id'] == prompt_id), None)
+    if not prompt_data:
+        raise HTTPException(status_code=404, detail="Prompt not found")
+    
+    # Generate response
+    response = await router.generate_response(prompt_data['prompt'], model, hedge=hedge,
+                                              deadline_ms=deadline_ms, max_cost=max_cost, use_cache=use_cache)
+    
+    # Evaluate with critic if not skipped
+    critic_score = None
+    critic_rationale = None
+    defer_critic = not skip_critic and critic_workers is not None
+    
+    if not skip_critic and not defer_critic:
+        evaluation = await critic.evaluate_response(
+            response['answer_text'],
+            prompt_data['reference'],
+            prompt_data['prompt'],
+            use_cache=use_cache
         )
+        critic_score = evaluation['score']
+        critic_rationale = evaluation['rationale']
+        router.record_feedback(prompt_data['prompt'], response, critic_score)
+    
+    # Store the result in database
+    rowid = await _store_run(prompt_id, response, critic_score, critic_rationale)
+    
+    # The background workers write the score to the stored row
+    critic_job_id = None
+    if defer_critic:
+        critic_job_id = await asyncio.to_thread(critic_queue.enqueue, prompt_data['prompt'], response['answer_text'],
+                                                prompt_data['reference'], rowid, response)
+    
+    return RoutingResponse(
+        model=response['model'],
+        answer=response['answer_text'],
+        latency_ms=response['latency_ms'],
+        tokens=response['tokens'],
+        estimated_cost=response['estimated_cost'],
+        critic_score=critic_score,
+        critic_rationale=critic_rationale,
+        critic_job_id=critic_job_id,
+        deadline_met=response.get('deadline_met'),
+        forecast_cost=response.get('forecast_cost'),
+        cache_hit=response.get('cache_hit', False),
+        cache_match=response.get('cache_match')
+    )
+
+class ComparisonResponse(BaseModel):
+    prompt_id: int
+    run_id: str
+    answers: List[RoutingResponse]
+
+@app.post("/api/compare-prompt/{prompt_id}", response_model=ComparisonResponse)
+async def compare_prompt(prompt_id: int, use_cache: Optional[bool] = None):
+    """
+    Answer a specific prompt with every available model and score all the answers in one
+    listwise critic call; each answer is stored as its own run
+    """
+    prompts = db.get_prompts()
+    prompt_data = next((p for p in prompts if p['id'] == prompt_id), None)
+    if not prompt_data:
+        raise HTTPException(status_code=404, detail="Prompt not found")
+    try:
+        responses = await asyncio.gather(*(
+            router.generate_response(prompt_data['prompt'], model, use_cache=use_cache)
+            for model in router.get_available_models()
+        ))
+        responses = [response for response in responses if not is_error_response(response)]
+        evaluations = await critic.evaluate_listwise([response['answer_text'] for response in responses],
+                                                     prompt_data['reference'], prompt_data['prompt'],
+                                                     use_cache=use_cache)
+        
+        run_id = f"compare_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+        answers = []
+        for response, evaluation in zip(responses, evaluations):
+            router.record_feedback(prompt_data['prompt'], response, evaluation['score'])
+            await asyncio.to_thread(
+                db.store_run_result,
+                run_id=run_id,
+                prompt_id=prompt_id,
+                model=response['model'],
+                answer=response['answer_text'],
+                latency_ms=response['latency_ms'],
+                tokens=response['tokens'],
+                estimated_cost=response['estimated_cost'],
+                critic_score=evaluation['score'],
+                critic_rationale=evaluation['rationale'],
+                input_tokens=response.get('input_tokens'),
+                output_tokens=response.get('output_tokens'),
+                forecast_output_tokens=response.get('forecast_output_tokens'),
+                forecast_cost=response.get('forecast_cost'),
+                cache_hit=response.get('cache_hit'),
+                cache_similarity=response.get('cache_similarity')
+            )
+            answers.append(RoutingResponse(
+                model=response['model'],
+                answer=response['answer_text'],
+                latency_ms=response['latency_ms'],
+                tokens=response['tokens'],
+                estimated_cost=response['estimated_cost'],
+                critic_score=evaluation['score'],
+                critic_rationale=evaluation['rationale'],
+                forecast_cost=response.get('forecast_cost'),
+                cache_hit=response.get('cache_hit', False),
+                cache_match=response.get('cache_match')
+            ))
+        return ComparisonResponse(prompt_id=prompt_id, run_id=run_id, answers=answers)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -455,8 +712,66 @@ async def update_learning_weights():
 
 @app.get("/api/health")
 async def health_check():
-    """Health check endpoint"""
-    return {"status": "healthy", "timestamp": datetime.now().isoformat()}
+    """Health check endpoint, including circuit breakers, connection pools and provider pool members"""
+    providers = router.get_health()
+    all_closed = all(p['state'] == 'closed' for p in providers.values())
+    return {
+        "status": "healthy" if all_closed else "degraded",
+        "timestamp": datetime.now().isoformat(),
+        "providers": providers,
+        "http_pool": get_http_pool().get_stats(),
+        "provider_pools": get_pool_stats()
+    }
+
+@app.get("/api/routing-policy")
+async def routing_policy():
+    """Learned state of the routing policy (reward statistics per model and prompt context)"""
+    return router.policy.get_state()
+
+@app.get("/api/response-cache")
+async def response_cache():
+    """Size and hit ratio of the exact-match and near-duplicate response caches and the critic cache"""
+    return {
+        "exact": router.response_cache.get_stats(),
+        "similar": router.similarity_cache.get_stats() if router.similarity_cache is not None else None,
+        "critic": critic.cache.get_stats() if critic.cache is not None else None
+    }
+
+@app.get("/api/coalescing")
+async def coalescing():
+    """Identical concurrent route requests merged into one, and the model and critic calls saved"""
+    return {**flights.get_stats(), "calls_saved": dict(calls_saved)}
+
+@app.get("/api/precritic")
+async def precritic_stats():
+    """Calibrated thresholds of the local pre-critic and the critic calls it avoided"""
+    if critic.precritic is None:
+        return {"enabled": False}
+    return {"enabled": True, **critic.precritic.get_stats()}
+
+@app.get("/api/critic-queue")
+async def critic_queue_stats():
+    """Depth and lag of the background critic queue, and this server's workers"""
+    if critic_workers is not None:
+        return {"enabled": True, **critic_workers.get_stats()}
+    return {"enabled": False, **critic_queue.get_stats()}
+
+@app.get("/api/critic-queue/{job_id}")
+async def critic_queue_job(job_id: int):
+    """A queued critic evaluation: its status and, once done, the score and rationale"""
+    job = critic_queue.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Critic job not found")
+    return {key: value for key, value in job.items() if key not in ("prompt", "answer", "reference", "response")}
+
+@app.get("/api/forecasts")
+async def forecasts():
+    """Cost forecaster state and the accuracy of stored forecasts, per model"""
+    accuracy = db.get_forecast_accuracy()
+    return {
+        model: {"forecaster": router.forecaster.get_state(model), "accuracy": accuracy.get(model)}
+        for model in router.get_available_models()
+    }
 
 @app.post("/api/run-system")
 async def run_system(request: RunCommand):
@@ -0,0 +1,157 @@
+import os
+import copy
+import yaml
+from typing import Dict
+
+SETTINGS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'settings.yaml')
+
+DEFAULT_SETTINGS = {
+    'scoring': {
+        'latency_percentile': None
+    },
+    'routing': {
+        'policy': 'scorer',
+        'prior_strength': 5.0,
+        'exploration': 1.0
+    },
+    'prompt_index': {
+        'enabled': True,
+        'k': 10,
+        'min_similarity': 0.1,
+        'shrinkage': 1.0
+    },
+    'forecasting': {
+        'enabled': True,
+        'min_runs': 3,
+        'default_output_tokens': 500
+    },
+    'response_cache': {
+        'enabled': True,
+        'memory_entries': 256,
+        'max_disk_mb': 50,
+        'ttl_s': 604800
+    },
+    'similarity_cache': {
+        'enabled': True,
+        'threshold': 0.9,
+        'num_perm': 128,
+        'bands': 16,
+        'max_entries': 10000
+    },
+    'http_pool': {
+        'http2': True,
+        'max_connections': 20,
+        'max_keepalive_connections': 10,
+        'keepalive_expiry_s': 60,
+        'connect_retries': 1,
+        'hosts': {}
+    },
+    'rate_limits': {
+        'enabled': True,
+        'max_concurrency': 8,
+        'min_concurrency': 1,
+        'backoff': 0.5,
+        'latency_tolerance': 2.0,
+        'default_retry_after_s': 1.0,
+        'hosts': {}
+    },
+    'provider_pools': {
+        'strategy': 'least_loaded',
+        'failure_threshold': 3,
+        'cooldown_s': 30,
+        'providers': {}
+    },
+    'hedging': {
+        'enabled': False,
+        'delay': 'p90',
+        'default_delay_ms': 5000,
+        'min_delay_ms': 250
+    },
+    'circuit_breaker': {
+        'enabled': True,
+        'failure_threshold': 5,
+        'error_rate_threshold': 0.5,
+        'window_size': 20,
+        'min_calls': 10,
+        'cooldown_s': 30,
+        'half_open_max_calls': 1,
+        'skip_open': False
+    },
+    'deadlines': {
+        'request_timeout_s': 60,
+        'percentile': 95,
+        'attempt_fraction': 0.6
+    },
+    'batch': {
+        'poll_interval_s': 30,
+        'max_wait_s': 86400,
+        'discount': 0.5,
+        'completion_window': '24h'
+    },
+    'mock_provider': {
+        'enabled': False,
+        'seed': 0,
+        'time_scale': 1.0,
+        'default': {
+            'latency_ms': 1500,
+            'latency_sigma': 0.5,
+            'ttft_ms': 300,
+            'output_tokens': 350,
+            'tokens_sigma': 0.3,
+            'error_rate': 0.0,
+            'rate_limit_rate': 0.0,
+            'retry_after_s': 1,
+            'error_latency_ms': 50,
+            'score': [7.0, 1.5]
+        },
+        'models': {}
+    },
+    'critic': {
+        'concurrency': 8,
+        'timeout_s': 30,
+        'retries': 2,
+        'retry_backoff_s': 0.5,
+        'queue': False,
+        'queue_workers': 4,
+        'lease_s': 300,
+        'max_attempts': 3,
+        'poll_interval_s': 1.0
+    },
+    'critic_cache': {
+        'enabled': True,
+        'max_entries': 50000
+    },
+    'precritic': {
+        'enabled': False,
+        'fine_score': 8,
+        'broken_score': 4,
+        'precision': 0.9,
+        'min_samples': 30,
+        'min_length_ratio': 0.2,
+        'max_length_ratio': 4.0
+    },
+    'fixtures': {
+        'mode': 'live',
+        'path': 'fixtures/traffic.jsonl.gz',
+        'speed': 1.0
+    }
+}
+
+def _merge(base: Dict, override: Dict) -> Dict:
+    """Recursively merge override into a copy of base"""
+    merged = copy.deepcopy(base)
+    for key, value in (override or {}).items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = _merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+def load_settings(path: str = SETTINGS_PATH) -> Dict:
+    """Load runtime settings from YAML, falling back to defaults for missing keys"""
+    try:
+        with open(path, 'r') as file:
+            return _merge(DEFAULT_SETTINGS, yaml.safe_load(file) or {})
+    except Exception as e:
+        print(f"Error loading settings: {e}. Using defaults.")
+        return copy.deepcopy(DEFAULT_SETTINGS)
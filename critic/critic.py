@@ -1,25 +1,26 @@
-import os
 import time
-from openai import OpenAI
+import json
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from openai import OpenAI, AsyncOpenAI
 from dotenv import load_dotenv
-from typing import Dict, Tuple
+from typing import Dict, List, Optional, Tuple
+from config.settings import load_settings
+from models.http_pool import get_http_pool
+from models.base import retry_after
+from models.provider_pool import get_provider_pool
+from critic.critic_cache import CriticCache, cache_key, template_version
+from critic.precritic import open_precritic
+from db.db import DatabaseManager
 import re
 
 # Load environment variables
 load_dotenv()
 
-class Critic:
-    def __init__(self):
-        self.client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
-        self.model_name = "gpt-3.5-turbo"
-    
-    def evaluate_response(self, model_answer: str, reference_answer: str, prompt: str) -> Dict:
-        """
-        Evaluate a model's answer against a reference answer
-        Returns score (1-10) and rationale
-        """
-        
-        evaluation_prompt = f"""
+SYSTEM_PROMPT = "You are a professional evaluator who provides consistent, objective assessments of business strategy content."
+
+# Changing any of these texts changes the template version, which invalidates cached evaluations
+EVALUATION_TEMPLATE = """
 You are an expert evaluator of go-to-market strategy responses. Your task is to compare a model's answer to a reference answer and provide a score from 1 to 10.
 
 ORIGINAL QUESTION:
@@ -49,41 +50,357 @@ Score Guide:
 - 3-4: Below Average - Partial coverage with significant gaps
 - 1-2: Poor - Major inaccuracies or severely incomplete
 """
+
+# Several answers to one question in one request, scored independently and returned as JSON
+LISTWISE_TEMPLATE = """
+You are an expert evaluator of go-to-market strategy responses. Your task is to compare each of {count} model answers to a reference answer and score each one from 1 to 10 on its own merits.
+
+ORIGINAL QUESTION:
+{prompt}
+
+REFERENCE ANSWER (Gold Standard):
+{reference_answer}
+
+{answers}
+Please evaluate each model's answer based on:
+1. Accuracy - How well does it align with the reference answer?
+2. Completeness - Does it cover the key points from the reference?
+3. Clarity - Is it well-structured and easy to understand?
+4. Practical Value - Does it provide actionable insights?
+5. Business Relevance - Is it relevant to real GTM scenarios?
+
+Score Guide:
+- 9-10: Excellent - Matches or exceeds reference quality, comprehensive and actionable
+- 7-8: Good - Covers most key points with good practical value
+- 5-6: Average - Basic coverage but missing some important elements
+- 3-4: Below Average - Partial coverage with significant gaps
+- 1-2: Poor - Major inaccuracies or severely incomplete
+
+Reply with JSON only, with one entry per answer in answer order, in this exact format:
+{{"evaluations": [{{"answer": 1, "score": <number from 1-10>, "rationale": "<2-3 sentence explanation of why you gave this score, highlighting strengths and weaknesses>"}}]}}
+"""
+
+class Critic:
+    # Attempts after the first for rate-limited evaluations
+    rate_limit_retries = 3
+    max_tokens = 500
+    temperature = 0.3  # Lower temperature for more consistent evaluation
+    # Extra reply budget for every answer after the first in a listwise evaluation
+    listwise_tokens_per_answer = 150
+    system_prompt = SYSTEM_PROMPT
+    evaluation_template = EVALUATION_TEMPLATE
+    listwise_template = LISTWISE_TEMPLATE
+    
+    def __init__(self, db: Optional[DatabaseManager] = None):
+        """db is the run database holding the critic cache and the history the pre-critic is
+        calibrated on; without one, every answer goes to the critic"""
+        # Shares the OpenAI provider pool (keys, rate governors, connections) with the GPT-4o wrapper
+        self.pool = get_provider_pool("openai")
+        self.clients = {member.name: self._build_client(member) for member in self.pool.members}
+        self.model_name = "gpt-3.5-turbo"
+        settings = load_settings()
+        self.config = settings['critic']
+        cache_config = settings['critic_cache']
+        self.cache = CriticCache(db.db_path, template_version(self), cache_config['max_entries']) \
+            if db is not None and cache_config['enabled'] else None
+        # Decides locally, without a call, for answers plainly fine or broken by their overlap with the reference
+        self.precritic = open_precritic(db) if db is not None and settings['precritic']['enabled'] else None
+    
+    def _build_client(self, member):
+        # A member's rate governor retries 429s itself, after the provider's Retry-After
+        return OpenAI(api_key=member.api_key, base_url=member.base_url,
+                      max_retries=0 if member.governor else 2,
+                      http_client=get_http_pool().client(member.host))
+    
+    def _reserved_tokens(self, messages: list, max_tokens: Optional[int] = None) -> int:
+        return sum(len(message['content']) for message in messages) // 4 + (max_tokens or self.max_tokens)
+    
+    def _outcome(self, start_time: float, response=None, error: Exception = None) -> Dict:
+        """A finished call in the response-dict form ProviderPool.release records"""
+        if error is None:
+            return {"tokens": response.usage.total_tokens, "latency_ms": (time.time() - start_time) * 1000}
+        http_response = getattr(error, 'response', None)
+        rate_limited = getattr(http_response, 'status_code', None) == 429
+        return {"error_type": "rate_limit" if rate_limited else "critic_error",
+                "retry_after_s": retry_after(getattr(http_response, 'headers', None))}
+    
+    def _build_request(self, messages: list, max_tokens: Optional[int] = None,
+                       response_format: Optional[Dict] = None, timeout: Optional[float] = None) -> Dict:
+        request = dict(model=self.model_name, messages=messages,
+                       temperature=self.temperature, max_tokens=max_tokens or self.max_tokens)
+        if response_format is not None:
+            request['response_format'] = response_format
+        if timeout is not None:
+            request['timeout'] = timeout
+        return request
+    
+    @staticmethod
+    def _is_transient(e: Exception) -> bool:
+        """Timeouts, connection errors and 5xx are worth another attempt; other errors are not"""
+        status_code = getattr(getattr(e, 'response', None), 'status_code', None)
+        return status_code is None or status_code >= 500
+    
+    def _retry_delay(self, e: Exception, attempt: int, retries: int) -> Optional[float]:
+        """Seconds to back off before retrying a failed attempt, None to give up"""
+        if attempt == retries or not self._is_transient(e):
+            return None
+        return self.config['retry_backoff_s'] * 2 ** attempt
+    
+    def _retry_rate_limited(self, member, permit, start_time: float, e: Exception, attempt: int) -> bool:
+        """Release a failed call's permit with its outcome; True to retry it on another member"""
+        outcome = self._outcome(start_time, error=e)
+        self.pool.release(member, permit, outcome)
+        return outcome['error_type'] == 'rate_limit' and attempt < self.rate_limit_retries
+    
+    def _create(self, messages: list, timeout: Optional[float] = None, max_tokens: Optional[int] = None,
+                response_format: Optional[Dict] = None):
+        """Chat completion on a member of the OpenAI pool, retrying rate-limited attempts"""
+        request = self._build_request(messages, max_tokens, response_format, timeout)
+        for attempt in range(self.rate_limit_retries + 1):
+            member = self.pool.select()
+            permit = member.acquire(self._reserved_tokens(messages, max_tokens))
+            start_time = time.time()
+            try:
+                response = self.clients[member.name].chat.completions.create(**request)
+            except Exception as e:
+                if self._retry_rate_limited(member, permit, start_time, e, attempt):
+                    continue
+                raise
+            except BaseException:
+                self.pool.release(member, permit, None)
+                raise
+            self.pool.release(member, permit, self._outcome(start_time, response))
+            return response
+    
+    def _build_messages(self, model_answer: str, reference_answer: str, prompt: str) -> list:
+        """Build the chat messages for evaluating one answer"""
         
+        evaluation_prompt = self.evaluation_template.format(
+            prompt=prompt, reference_answer=reference_answer, model_answer=model_answer
+        )
+        return [
+            {"role": "system", "content": self.system_prompt},
+            {"role": "user", "content": evaluation_prompt}
+        ]
+    
+    def _build_listwise_messages(self, model_answers: List[str], reference_answer: str, prompt: str) -> list:
+        """Build the chat messages for evaluating several answers to one prompt at once"""
+        answers = "".join(f"MODEL ANSWER {number}:\n{answer}\n\n"
+                          for number, answer in enumerate(model_answers, start=1))
+        evaluation_prompt = self.listwise_template.format(
+            count=len(model_answers), prompt=prompt, reference_answer=reference_answer, answers=answers
+        )
+        return [
+            {"role": "system", "content": self.system_prompt},
+            {"role": "user", "content": evaluation_prompt}
+        ]
+    
+    def _build_result(self, evaluation_text: str, evaluation_time_ms: float) -> Dict:
+        """Parse the critic's reply into a result dict"""
+        score, rationale = self._parse_evaluation(evaluation_text)
+        return {
+            "score": score,
+            "rationale": rationale,
+            "evaluation_time_ms": evaluation_time_ms,
+            "raw_evaluation": evaluation_text
+        }
+    
+    def _error_result(self, e: Exception) -> Dict:
+        print(f"Error in critic evaluation: {e}")
+        return {
+            "score": 5,  # Default neutral score on error
+            "rationale": f"Evaluation failed due to error: {str(e)}",
+            "evaluation_time_ms": 0,
+            "raw_evaluation": "",
+            "error": str(e)
+        }
+    
+    def cached_evaluation(self, model_answer: str, reference_answer: str, prompt: str,
+                          use_cache: Optional[bool] = None) -> Tuple[Optional[str], Optional[Dict]]:
+        """Cache key of an evaluation (None when not cached) and its earlier result, if any"""
+        if self.cache is None or use_cache is False:
+            return None, None
+        key = cache_key(self, model_answer, reference_answer, prompt)
+        cached = self.cache.get(key)
+        if cached is None:
+            return key, None
+        return key, {**cached, "evaluation_time_ms": 0, "attempts": 0, "cache_hit": True}
+    
+    def precritic_evaluation(self, model_answer: str, reference_answer: str) -> Optional[Dict]:
+        """The pre-critic's result for an answer it can decide without the critic, else None"""
+        verdict = self.precritic.judge(model_answer, reference_answer) if self.precritic is not None else None
+        if verdict is None:
+            return None
+        score, rationale = verdict
+        return {"score": score, "rationale": rationale, "evaluation_time_ms": 0, "raw_evaluation": "",
+                "attempts": 0, "precritic": True}
+    
+    def cache_evaluation(self, key: Optional[str], evaluation: Dict):
+        if key is not None and not evaluation.get('error'):
+            self.cache.put(key, self.model_name, evaluation)
+    
+    def evaluate_response(self, model_answer: str, reference_answer: str, prompt: str,
+                          timeout: Optional[float] = None, retries: int = 0,
+                          use_cache: Optional[bool] = None) -> Dict:
+        """
+        Evaluate a model's answer against a reference answer
+        Returns score (1-10) and rationale; timeout bounds each attempt, and transient
+        failures are retried up to retries more times (rate limits are retried regardless).
+        An answer evaluated before is answered from the critic cache unless use_cache is False,
+        and one the pre-critic can decide gets its local score
+        """
+        key, settled = self._settle_one(model_answer, reference_answer, prompt, use_cache)
+        if settled is not None:
+            return settled
+        return self._evaluate_uncached(key, model_answer, reference_answer, prompt, timeout, retries)
+    
+    def _settle_one(self, model_answer: str, reference_answer: str, prompt: str,
+                    use_cache: Optional[bool]) -> Tuple[Optional[str], Optional[Dict]]:
+        """Cache key of an evaluation and its result from the critic cache or the pre-critic, if either has one"""
+        key, cached = self.cached_evaluation(model_answer, reference_answer, prompt, use_cache)
+        if cached is not None:
+            return key, cached
+        return key, self.precritic_evaluation(model_answer, reference_answer)
+    
+    def _evaluate_uncached(self, key: Optional[str], model_answer: str, reference_answer: str, prompt: str,
+                           timeout: Optional[float], retries: int) -> Dict:
+        """One critic call for an answer already looked up, caching its result under key"""
+        start_time = time.time()
+        reply = self._complete(self._build_messages(model_answer, reference_answer, prompt), timeout, retries)
+        return self._finish_evaluation(key, start_time, *reply)
+    
+    def _finish_evaluation(self, key: Optional[str], start_time: float, evaluation_text: Optional[str],
+                           attempts: int, error: Optional[Exception]) -> Dict:
+        """Result of one critic call started at start_time, cached under key unless it failed"""
+        if error is not None:
+            return {**self._error_result(error), "attempts": attempts}
+        result = {**self._build_result(evaluation_text, (time.time() - start_time) * 1000), "attempts": attempts}
+        self.cache_evaluation(key, result)
+        return result
+    
+    def _complete(self, messages: list, timeout: Optional[float], retries: int, max_tokens: Optional[int] = None,
+                  response_format: Optional[Dict] = None) -> Tuple[Optional[str], int, Optional[Exception]]:
+        """The critic's reply and the attempts it took, or the error that ended the last attempt"""
+        for attempt in range(retries + 1):
+            try:
+                response = self._create(messages, timeout, max_tokens, response_format)
+                return response.choices[0].message.content, attempt + 1, None
+            except Exception as e:
+                delay = self._retry_delay(e, attempt, retries)
+                if delay is None:
+                    return None, attempt + 1, e
+                time.sleep(delay)
+    
+    def _listwise_budget(self, count: int) -> int:
+        return self.max_tokens + self.listwise_tokens_per_answer * (count - 1)
+    
+    def _parse_listwise(self, evaluation_text: str, count: int) -> Dict[int, Tuple[int, str]]:
+        """Score and rationale by answer index from a listwise reply; answers it does not cover are left out"""
         try:
+            data = json.loads(evaluation_text[evaluation_text.index('{'):evaluation_text.rindex('}') + 1])
+        except ValueError:
+            return {}
+        entries = data.get('evaluations') if isinstance(data, dict) else None
+        if not isinstance(entries, list):
+            return {}
+        parsed = {}
+        for position, entry in enumerate(entries):
+            try:
+                index = int(entry.get('answer', position + 1)) - 1
+                score = max(1, min(10, round(float(entry['score']))))  # Clamp to 1-10 range
+                rationale = str(entry.get('rationale') or '').strip()
+            except (AttributeError, KeyError, TypeError, ValueError):
+                continue
+            if 0 <= index < count and index not in parsed:
+                parsed[index] = (score, rationale)
+        return parsed
+    
+    def _listwise_results(self, evaluation_text: Optional[str], count: int, evaluation_time_ms: float,
+                          attempts: int, error: Optional[Exception]) -> List[Optional[Dict]]:
+        """One result per answer, None where the reply has no usable score for it"""
+        if error is not None:
+            return [{**self._error_result(error), "attempts": attempts, "listwise": True}] * count
+        parsed = self._parse_listwise(evaluation_text, count)
+        return [
+            {
+                "score": parsed[index][0],
+                "rationale": parsed[index][1],
+                "evaluation_time_ms": evaluation_time_ms,
+                "raw_evaluation": evaluation_text,
+                "attempts": attempts,
+                "listwise": True
+            } if index in parsed else None
+            for index in range(count)
+        ]
+    
+    def _settle_locally(self, answers: List[str], reference_answer: str, prompt: str,
+                        use_cache: Optional[bool]) -> Tuple[Dict[str, Dict], Dict[str, Optional[str]]]:
+        """
+        Results of the answers the critic cache holds or the pre-critic can decide, as
+        evaluate_response would give them, and the cache keys of the rest
+        """
+        settled, keys = {}, {}
+        for answer in answers:
+            key, result = self._settle_one(answer, reference_answer, prompt, use_cache)
+            if result is not None:
+                settled[answer] = result
+            else:
+                keys[answer] = key
+        return settled, keys
+    
+    def _listwise_plan(self, model_answers: List[str], reference_answer: str, prompt: str,
+                       use_cache: Optional[bool]) -> Tuple[Dict[str, Dict], Dict[str, Optional[str]], List[str]]:
+        """Settled results and cache keys as from _settle_locally, and the distinct answers still to score"""
+        unique = list(dict.fromkeys(model_answers))
+        results, keys = self._settle_locally(unique, reference_answer, prompt, use_cache)
+        return results, keys, [answer for answer in unique if answer not in results]
+    
+    def _listwise_request(self, pending: List[str], reference_answer: str, prompt: str) -> Tuple[list, int, Dict]:
+        """Messages, reply budget and response format of one listwise call"""
+        return (self._build_listwise_messages(pending, reference_answer, prompt),
+                self._listwise_budget(len(pending)), {"type": "json_object"})
+    
+    def _listwise_by_answer(self, pending: List[str], keys: Dict[str, Optional[str]], start_time: float,
+                            evaluation_text: Optional[str], attempts: int,
+                            error: Optional[Exception]) -> Dict[str, Optional[Dict]]:
+        """Results of a listwise reply by answer, caching each usable score; None where there is none"""
+        results = self._listwise_results(evaluation_text, len(pending), (time.time() - start_time) * 1000,
+                                         attempts, error)
+        for answer, result in zip(pending, results):
+            if result is not None:
+                self.cache_evaluation(keys[answer], result)
+        return dict(zip(pending, results))
+    
+    @staticmethod
+    def _listwise_answers(model_answers: List[str], pending: List[str], results: Dict[str, Optional[Dict]],
+                          fallbacks: Dict[str, Dict]) -> List[Dict]:
+        """One result per answer, in order, with the single-answer fallbacks marked listwise False"""
+        for answer, result in fallbacks.items():
+            results[answer] = {**result, "listwise": False} if len(pending) > 1 else result
+        return [dict(results[answer]) for answer in model_answers]
+    
+    def evaluate_listwise(self, model_answers: List[str], reference_answer: str, prompt: str,
+                          timeout: Optional[float] = None, retries: int = 0,
+                          use_cache: Optional[bool] = None) -> List[Dict]:
+        """
+        Evaluate several answers to one prompt in a single critic call, so the question and
+        reference are sent once. Returns one result per answer, in order. Identical answers
+        are scored once, answers in the critic cache or decided by the pre-critic are not
+        sent, and the scores of the others are cached under the same keys as
+        evaluate_response's. An answer the reply has no usable score for is evaluated on
+        its own (listwise False in its result)
+        """
+        results, keys, pending = self._listwise_plan(model_answers, reference_answer, prompt, use_cache)
+        if len(pending) > 1:
+            messages, max_tokens, response_format = self._listwise_request(pending, reference_answer, prompt)
             start_time = time.time()
-            
-            response = self.client.chat.completions.create(
-                model=self.model_name,
-                messages=[
-                    {"role": "system", "content": "You are a professional evaluator who provides consistent, objective assessments of business strategy content."},
-                    {"role": "user", "content": evaluation_prompt}
-                ],
-                temperature=0.3,  # Lower temperature for more consistent evaluation
-                max_tokens=500
-            )
-            
-            end_time = time.time()
-            evaluation_text = response.choices[0].message.content
-            
-            # Parse the response to extract score and rationale
-            score, rationale = self._parse_evaluation(evaluation_text)
-            
-            return {
-                "score": score,
-                "rationale": rationale,
-                "evaluation_time_ms": (end_time - start_time) * 1000,
-                "raw_evaluation": evaluation_text
-            }
-            
-        except Exception as e:
-            print(f"Error in critic evaluation: {e}")
-            return {
-                "score": 5,  # Default neutral score on error
-                "rationale": f"Evaluation failed due to error: {str(e)}",
-                "evaluation_time_ms": 0,
-                "raw_evaluation": ""
-            }
+            reply = self._complete(messages, timeout, retries, max_tokens, response_format)
+            results.update(self._listwise_by_answer(pending, keys, start_time, *reply))
+        fallbacks = {
+            answer: self._evaluate_uncached(keys[answer], answer, reference_answer, prompt, timeout, retries)
+            for answer in pending if results.get(answer) is None
+        }
+        return self._listwise_answers(model_answers, pending, results, fallbacks)
     
     def _parse_evaluation(self, evaluation_text: str) -> Tuple[int, str]:
         """Parse the evaluation text to extract score and rationale"""
@@ -117,23 +434,130 @@ Score Guide:
             print(f"Error parsing evaluation: {e}")
             return 5, "Could not parse evaluation properly"
     
-    def batch_evaluate(self, evaluations: list) -> list:
+    def _batch_settings(self, concurrency: Optional[int]) -> Tuple[int, float, int]:
+        return (concurrency or self.config['concurrency'], self.config['timeout_s'], self.config['retries'])
+    
+    @staticmethod
+    def _batch_item(eval_data: Dict) -> Tuple[str, str, str]:
+        return eval_data['model_answer'], eval_data['reference_answer'], eval_data['prompt']
+    
+    def _report_batch(self, results: list, concurrency: int, start_time: float):
+        failed = sum(1 for result in results if result.get('error'))
+        retried = sum(1 for result in results if result.get('attempts', 1) > 1)
+        cached = sum(1 for result in results if result.get('cache_hit'))
+        print(f"Evaluated {len(results)} responses in {time.time() - start_time:.1f}s "
+              f"(concurrency {concurrency}, {cached} cached, {retried} retried, {failed} failed)")
+    
+    def batch_evaluate(self, evaluations: list, concurrency: Optional[int] = None) -> list:
         """
-        Evaluate multiple responses in batch
+        Evaluate multiple responses concurrently, at most concurrency at a time, with the
+        OpenAI pool's rate governors pacing the calls. Results are in input order; each
+        carries its own attempt count, and an error message if it failed
         evaluations: list of dicts with 'model_answer', 'reference_answer', 'prompt'
         """
-        results = []
+        concurrency, timeout, retries = self._batch_settings(concurrency)
+        start_time = time.time()
+        if not evaluations:
+            return []
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(evaluations))) as executor:
+            results = list(executor.map(
+                lambda eval_data: self.evaluate_response(*self._batch_item(eval_data), timeout, retries),
+                evaluations
+            ))
+        self._report_batch(results, concurrency, start_time)
+        return results
+
+class AsyncCritic(Critic):
+    """
+    Asyncio-native critic with the same evaluation contract. Critic cache reads and
+    writes (SQLite) run in the default thread pool, off the event loop.
+    """
+    
+    def _build_client(self, member):
+        return AsyncOpenAI(api_key=member.api_key, base_url=member.base_url,
+                           max_retries=0 if member.governor else 2,
+                           http_client=get_http_pool().async_client(member.host))
+    
+    async def _create(self, messages: list, timeout: Optional[float] = None, max_tokens: Optional[int] = None,
+                      response_format: Optional[Dict] = None):
+        """Critic._create without blocking the event loop"""
+        request = self._build_request(messages, max_tokens, response_format, timeout)
+        for attempt in range(self.rate_limit_retries + 1):
+            member = self.pool.select()
+            permit = await member.acquire_async(self._reserved_tokens(messages, max_tokens))
+            start_time = time.time()
+            try:
+                response = await self.clients[member.name].chat.completions.create(**request)
+            except Exception as e:
+                if self._retry_rate_limited(member, permit, start_time, e, attempt):
+                    continue
+                raise
+            except BaseException:
+                self.pool.release(member, permit, None)
+                raise
+            self.pool.release(member, permit, self._outcome(start_time, response))
+            return response
+    
+    async def evaluate_response(self, model_answer: str, reference_answer: str, prompt: str,
+                                timeout: Optional[float] = None, retries: int = 0,
+                                use_cache: Optional[bool] = None) -> Dict:
+        """Evaluate a model's answer against a reference answer without blocking the event loop"""
+        key, settled = await asyncio.to_thread(self._settle_one, model_answer, reference_answer, prompt, use_cache)
+        if settled is not None:
+            return settled
+        return await self._evaluate_uncached(key, model_answer, reference_answer, prompt, timeout, retries)
+    
+    async def _evaluate_uncached(self, key: Optional[str], model_answer: str, reference_answer: str, prompt: str,
+                                 timeout: Optional[float], retries: int) -> Dict:
+        """Critic._evaluate_uncached without blocking the event loop"""
+        start_time = time.time()
+        reply = await self._complete(self._build_messages(model_answer, reference_answer, prompt), timeout, retries)
+        return await asyncio.to_thread(self._finish_evaluation, key, start_time, *reply)
+    
+    async def _complete(self, messages: list, timeout: Optional[float], retries: int,
+                        max_tokens: Optional[int] = None,
+                        response_format: Optional[Dict] = None) -> Tuple[Optional[str], int, Optional[Exception]]:
+        """Critic._complete without blocking the event loop"""
+        for attempt in range(retries + 1):
+            try:
+                response = await self._create(messages, timeout, max_tokens, response_format)
+                return response.choices[0].message.content, attempt + 1, None
+            except Exception as e:
+                delay = self._retry_delay(e, attempt, retries)
+                if delay is None:
+                    return None, attempt + 1, e
+                await asyncio.sleep(delay)
+    
+    async def evaluate_listwise(self, model_answers: List[str], reference_answer: str, prompt: str,
+                                timeout: Optional[float] = None, retries: int = 0,
+                                use_cache: Optional[bool] = None) -> List[Dict]:
+        """Critic.evaluate_listwise without blocking the event loop; fallback evaluations run concurrently"""
+        results, keys, pending = await asyncio.to_thread(self._listwise_plan, model_answers, reference_answer,
+                                                         prompt, use_cache)
+        if len(pending) > 1:
+            messages, max_tokens, response_format = self._listwise_request(pending, reference_answer, prompt)
+            start_time = time.time()
+            reply = await self._complete(messages, timeout, retries, max_tokens, response_format)
+            results.update(await asyncio.to_thread(self._listwise_by_answer, pending, keys, start_time, *reply))
+        missing = [answer for answer in pending if results.get(answer) is None]
+        fallbacks = await asyncio.gather(*(
+            self._evaluate_uncached(keys[answer], answer, reference_answer, prompt, timeout, retries)
+            for answer in missing
+        ))
+        return self._listwise_answers(model_answers, pending, results, dict(zip(missing, fallbacks)))
+    
+    async def batch_evaluate(self, evaluations: list, concurrency: Optional[int] = None) -> list:
+        """Evaluate multiple responses concurrently, at most concurrency at a time, in input order"""
+        concurrency, timeout, retries = self._batch_settings(concurrency)
+        start_time = time.time()
+        if not evaluations:
+            return []
+        semaphore = asyncio.Semaphore(concurrency)
         
-        for i, eval_data in enumerate(evaluations):
-            print(f"Evaluating response {i+1}/{len(evaluations)}...")
-            result = self.evaluate_response(
-                eval_data['model_answer'],
-                eval_data['reference_answer'], 
-                eval_data['prompt']
-            )
-            results.append(result)
-            
-            # Small delay to avoid rate limiting
-            time.sleep(0.5)
+        async def evaluate(eval_data: Dict) -> Dict:
+            async with semaphore:
+                return await self.evaluate_response(*self._batch_item(eval_data), timeout, retries)
         
-        return results 
\ No newline at end of file
+        results = list(await asyncio.gather(*[evaluate(eval_data) for eval_data in evaluations]))
+        self._report_batch(results, concurrency, start_time)
+        return results
@@ -0,0 +1,120 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+# Fields of an evaluation worth replaying; timing and attempts are per call
+CACHED_FIELDS = ("score", "rationale", "raw_evaluation")
+
+
+def template_version(critic) -> str:
+    """
+    Hash of the critic's instructions: editing either template in critic.py starts a new
+    version. Listwise scores are cached under the same keys as single evaluations, so
+    the listwise template is part of it too
+    """
+    material = json.dumps([critic.system_prompt, critic.evaluation_template, critic.listwise_template],
+                          separators=(",", ":"))
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()[:16]
+
+
+def cache_key(critic, model_answer: str, reference_answer: str, prompt: str) -> str:
+    """Content address of an evaluation: everything that changes what the critic would return"""
+    material = json.dumps([
+        critic.model_name,
+        template_version(critic),
+        critic.temperature,
+        critic.max_tokens,
+        prompt,
+        reference_answer,
+        model_answer
+    ], separators=(",", ":"))
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class CriticCache:
+    """
+    Persistent memo of critic evaluations in the critic_cache table of the runs database,
+    shared by every process and kept across runs. Identical (prompt, reference, answer)
+    triples are scored once per critic model and template version; entries of other
+    template versions are dropped when the cache is opened, and the least recently used
+    entries once there are more than max_entries.
+    """
+
+    def __init__(self, db_path: str, version: str, max_entries: int = 50000):
+        self.db_path = db_path
+        self.version = version
+        self.max_entries = max_entries
+
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        with sqlite3.connect(self.db_path) as conn:
+            self.invalidated = conn.execute(
+                "DELETE FROM critic_cache WHERE template_version != ?", (version,)
+            ).rowcount
+            conn.commit()
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Cached evaluation for a key, or None"""
+        with sqlite3.connect(self.db_path) as conn:
+            row = conn.execute("SELECT result FROM critic_cache WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                conn.execute("UPDATE critic_cache SET last_access = ?, hits = hits + 1 WHERE key = ?",
+                             (time.time(), key))
+                conn.commit()
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, model: str, evaluation: Dict):
+        """Store a successful evaluation under key"""
+        entry = {field: evaluation.get(field) for field in CACHED_FIELDS}
+        now = time.time()
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("""
+                INSERT OR REPLACE INTO critic_cache (key, model, template_version, result, created_at, last_access)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (key, model, self.version, json.dumps(entry), now, now))
+            self._evict(conn)
+            conn.commit()
+
+    def _evict(self, conn: sqlite3.Connection):
+        """Drop least recently used entries beyond max_entries"""
+        evicted = conn.execute("""
+            DELETE FROM critic_cache WHERE key IN (
+                SELECT key FROM critic_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?
+            )
+        """, (self.max_entries,)).rowcount
+        if evicted:
+            with self._lock:
+                self.evictions += evicted
+
+    def clear(self):
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("DELETE FROM critic_cache")
+            conn.commit()
+
+    def get_stats(self) -> Dict:
+        with sqlite3.connect(self.db_path) as conn:
+            entries, reused = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(hits), 0) FROM critic_cache"
+            ).fetchone()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "template_version": self.version,
+                "entries": entries,
+                "lifetime_hits": reused,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+                "evictions": self.evictions,
+                "invalidated": self.invalidated
+            }
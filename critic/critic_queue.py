@@ -0,0 +1,293 @@
+"""
+Durable critic work queue, so answers are returned (or the run moves on) without
+waiting for their evaluation.
+
+The answer path enqueues the prompt, answer and reference together with the runs row
+that should receive the score. Worker tasks claim jobs one at a time under a lease,
+evaluate them with AsyncCritic and write the score to the row through
+DatabaseManager.update_run_critic, where the in-memory model stats pick it up, and
+feed it back to the router when one is attached. Jobs live in the critic_queue table
+of the run database, so they survive restarts: a job whose worker died is handed out
+again once its lease expires, up to max_attempts times.
+
+    python -m critic.critic_queue status --watch 2  # queue depth and lag every 2s
+    python -m critic.critic_queue work --workers 4  # drain the queue from another process
+"""
+
+import argparse
+import asyncio
+import json
+import sqlite3
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+from config.settings import load_settings
+from critic.critic import AsyncCritic
+from db.db import DatabaseManager
+
+# Response fields router.record_feedback reads, kept with each job
+FEEDBACK_FIELDS = ("model", "answer_text", "latency_ms", "tokens", "estimated_cost", "cache_hit", "batch_id")
+
+JOB_COLUMNS = ("id", "run_rowid", "prompt", "answer", "reference", "response", "status", "attempts",
+               "enqueued_at", "started_at", "finished_at", "critic_score", "critic_rationale", "error")
+
+
+def _job(row) -> Dict:
+    job = dict(zip(JOB_COLUMNS, row))
+    job["response"] = json.loads(job["response"]) if job["response"] else None
+    return job
+
+
+class CriticQueue:
+    """The critic_queue table of a run database"""
+
+    def __init__(self, db: DatabaseManager, lease_s: float = 300, max_attempts: int = 3):
+        self.db = db
+        self.lease_s = lease_s
+        self.max_attempts = max_attempts
+        self._listeners: List[Callable[[], None]] = []
+
+    def on_enqueue(self, listener: Callable[[], None]):
+        """Call listener after every enqueue in this process (workers elsewhere poll)"""
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[], None]):
+        self._listeners.remove(listener)
+
+    def enqueue(self, prompt: str, answer: str, reference: str = "", run_rowid: Optional[int] = None,
+                response: Optional[Dict] = None) -> int:
+        """Queue an evaluation and return its job id"""
+        feedback = {field: response.get(field) for field in FEEDBACK_FIELDS} if response else None
+        with sqlite3.connect(self.db.db_path) as conn:
+            cursor = conn.execute("""
+                INSERT INTO critic_queue (run_rowid, prompt, answer, reference, response, enqueued_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (run_rowid, prompt, answer, reference, json.dumps(feedback) if feedback else None, time.time()))
+            conn.commit()
+            job_id = cursor.lastrowid
+        for listener in self._listeners:
+            listener()
+        return job_id
+
+    def claim(self) -> Optional[Dict]:
+        """Lease the oldest pending job (or one whose lease expired) to the caller"""
+        now = time.time()
+        with sqlite3.connect(self.db.db_path) as conn:
+            row = conn.execute(f"""
+                UPDATE critic_queue
+                SET status = 'running', attempts = attempts + 1, started_at = ?, lease_until = ?
+                WHERE id = (SELECT id FROM critic_queue
+                            WHERE status = 'pending' OR (status = 'running' AND lease_until < ?)
+                            ORDER BY id LIMIT 1)
+                RETURNING {', '.join(JOB_COLUMNS)}
+            """, (now, now + self.lease_s, now)).fetchone()
+            conn.commit()
+        return _job(row) if row else None
+
+    def _finish(self, job_id: int, status: str, **fields):
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with sqlite3.connect(self.db.db_path) as conn:
+            conn.execute(f"""
+                UPDATE critic_queue SET status = ?, lease_until = NULL{', ' if fields else ''}{assignments}
+                WHERE id = ? AND status = 'running'
+            """, (status, *fields.values(), job_id))
+            conn.commit()
+
+    def complete(self, job: Dict, evaluation: Dict):
+        """Record a job's evaluation, on its runs row first so a retry after a crash is harmless"""
+        if job["run_rowid"] is not None:
+            self.db.update_run_critic(job["run_rowid"], evaluation["score"], evaluation["rationale"])
+        self._finish(job["id"], "done", finished_at=time.time(), critic_score=evaluation["score"],
+                     critic_rationale=evaluation["rationale"], error=None)
+
+    def fail(self, job: Dict, error: str):
+        """Give a failed job back to the queue, or give up on it after max_attempts"""
+        if job["attempts"] < self.max_attempts:
+            self._finish(job["id"], "pending", error=error)
+        else:
+            self._finish(job["id"], "failed", finished_at=time.time(), error=error)
+
+    def release(self, job: Dict):
+        """Hand back a job its worker stopped before finishing, without counting the attempt"""
+        self._finish(job["id"], "pending", attempts=job["attempts"] - 1)
+
+    def get_job(self, job_id: int) -> Optional[Dict]:
+        with sqlite3.connect(self.db.db_path) as conn:
+            row = conn.execute(f"SELECT {', '.join(JOB_COLUMNS)} FROM critic_queue WHERE id = ?",
+                               (job_id,)).fetchone()
+        return _job(row) if row else None
+
+    def unfinished(self, job_ids: Iterable[int]) -> int:
+        """How many of these jobs are still pending or running"""
+        job_ids = list(job_ids)
+        if not job_ids:
+            return 0
+        with sqlite3.connect(self.db.db_path) as conn:
+            return conn.execute(f"""
+                SELECT COUNT(*) FROM critic_queue
+                WHERE id IN ({', '.join('?' * len(job_ids))}) AND status IN ('pending', 'running')
+            """, job_ids).fetchone()[0]
+
+    def get_stats(self, window: int = 100) -> Dict:
+        """Queue depth per status, age of the oldest waiting job and lag of the last window jobs"""
+        now = time.time()
+        with sqlite3.connect(self.db.db_path) as conn:
+            counts = dict(conn.execute("SELECT status, COUNT(*) FROM critic_queue GROUP BY status").fetchall())
+            oldest = conn.execute(
+                "SELECT MIN(enqueued_at) FROM critic_queue WHERE status IN ('pending', 'running')"
+            ).fetchone()[0]
+            lags = [row[0] for row in conn.execute("""
+                SELECT finished_at - enqueued_at FROM critic_queue
+                WHERE status = 'done' ORDER BY finished_at DESC LIMIT ?
+            """, (window,))]
+        return {
+            "pending": counts.get("pending", 0),
+            "running": counts.get("running", 0),
+            "done": counts.get("done", 0),
+            "failed": counts.get("failed", 0),
+            "oldest_waiting_s": round(now - oldest, 1) if oldest is not None else None,
+            "avg_lag_s": round(sum(lags) / len(lags), 2) if lags else None,
+            "max_lag_s": round(max(lags), 2) if lags else None
+        }
+
+
+class CriticWorkers:
+    """
+    Asyncio tasks draining a CriticQueue with an AsyncCritic. With a router, each score
+    is also fed back to its routing policy and prompt index as it lands. Queue updates
+    run in the default thread pool, off the event loop.
+    """
+
+    def __init__(self, queue: CriticQueue, critic: AsyncCritic, router=None, workers: int = 4,
+                 poll_interval_s: float = 1.0):
+        self.queue = queue
+        self.critic = critic
+        self.router = router
+        self.workers = workers
+        self.poll_interval_s = poll_interval_s
+        self.evaluated = 0
+        self.failed = 0
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._listener: Optional[Callable[[], None]] = None
+
+    def start(self):
+        """Start the worker tasks on the running event loop"""
+        loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._listener = lambda: loop.call_soon_threadsafe(self._wakeup.set)
+        self.queue.on_enqueue(self._listener)
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self):
+        if self._listener is not None:
+            self.queue.remove_listener(self._listener)
+            self._listener = None
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def wait_for(self, job_ids: Iterable[int], timeout: Optional[float] = None) -> bool:
+        """Wait until these jobs are done or failed; False if timeout passed first"""
+        job_ids = list(job_ids)
+        deadline = None if timeout is None else time.time() + timeout
+        while await asyncio.to_thread(self.queue.unfinished, job_ids):
+            if deadline is not None and time.time() >= deadline:
+                return False
+            await asyncio.sleep(min(self.poll_interval_s, 0.2))
+        return True
+
+    async def _work(self):
+        while True:
+            job = await asyncio.to_thread(self.queue.claim)
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval_s)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            try:
+                await self._process(job)
+            except asyncio.CancelledError:
+                # Synchronously: the task is being torn down
+                self.queue.release(job)
+                raise
+            except Exception as e:
+                self.failed += 1
+                await asyncio.to_thread(self.queue.fail, job, str(e))
+
+    async def _process(self, job: Dict):
+        if job["attempts"] > self.queue.max_attempts:
+            # Its earlier workers died holding it
+            self.failed += 1
+            await asyncio.to_thread(self.queue.fail, job, job["error"] or "Lease expired")
+            return
+        config = self.critic.config
+        evaluation = await self.critic.evaluate_response(job["answer"], job["reference"], job["prompt"],
+                                                         config['timeout_s'], config['retries'])
+        if evaluation.get("error"):
+            self.failed += 1
+            await asyncio.to_thread(self.queue.fail, job, evaluation["error"])
+            return
+        await asyncio.to_thread(self.queue.complete, job, evaluation)
+        self.evaluated += 1
+        if self.router is not None and job["response"]:
+            self.router.record_feedback(job["prompt"], job["response"], evaluation["score"])
+
+    def get_stats(self) -> Dict:
+        return {"workers": len(self._tasks), "evaluated": self.evaluated, "failed": self.failed,
+                **self.queue.get_stats()}
+
+
+def open_queue(db: DatabaseManager) -> CriticQueue:
+    """A CriticQueue on db configured from the critic section of config/settings.yaml"""
+    config = load_settings()['critic']
+    return CriticQueue(db, config['lease_s'], config['max_attempts'])
+
+
+def _print_stats(stats: Dict):
+    lag = f"avg lag {stats['avg_lag_s']}s, max {stats['max_lag_s']}s" if stats['avg_lag_s'] is not None else "no lag yet"
+    waiting = f", oldest waiting {stats['oldest_waiting_s']}s" if stats['oldest_waiting_s'] is not None else ""
+    print(f"🎯 Critic queue: {stats['pending']} pending, {stats['running']} running, {stats['done']} done, "
+          f"{stats['failed']} failed ({lag}{waiting})")
+
+
+async def _drain(queue: CriticQueue, workers: int, until_empty: bool):
+    pool = CriticWorkers(queue, AsyncCritic(queue.db), workers=workers,
+                         poll_interval_s=load_settings()['critic']['poll_interval_s'])
+    pool.start()
+    try:
+        while True:
+            await asyncio.sleep(2)
+            stats = pool.get_stats()
+            _print_stats(stats)
+            if until_empty and not stats['pending'] and not stats['running']:
+                break
+    finally:
+        await pool.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Watch or drain the critic work queue')
+    parser.add_argument('command', choices=['status', 'work'])
+    parser.add_argument('--db', default='data.db', help='Run database (default: data.db)')
+    parser.add_argument('--watch', type=float, metavar='SECONDS', help='status: repeat every SECONDS')
+    parser.add_argument('--workers', type=int, help='work: concurrent evaluations (default: critic.queue_workers)')
+    parser.add_argument('--until-empty', action='store_true', help='work: exit once the queue is empty')
+    args = parser.parse_args()
+
+    queue = open_queue(DatabaseManager(args.db))
+    if args.command == 'work':
+        asyncio.run(_drain(queue, args.workers or load_settings()['critic']['queue_workers'], args.until_empty))
+        return
+    while True:
+        _print_stats(queue.get_stats())
+        if not args.watch:
+            break
+        time.sleep(args.watch)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""
+Local pre-critic: scores an answer by its lexical overlap with the prompt's reference
+answer and decides whether the LLM critic needs to see it at all.
+
+Each reference is tokenised once, keeping its term counts and BM25 weights (IDF over all
+references). An answer is then compared in microseconds by two overlap measures,
+averaged into one similarity between 0 and 1:
+
+    bm25   - how much of the reference's weighted vocabulary the answer covers, with
+             BM25 term saturation and length normalisation
+    rouge1 - unigram overlap F1 between answer and reference
+
+The thresholds come from history. Past runs with a critic score are replayed through
+the scorer. The high threshold is the lowest similarity above which at least precision
+of the answers scored fine_score or better. The low threshold is the highest similarity
+below which at least precision scored broken_score or worse. Each side needs
+min_samples answers, or it stays off. Answers beyond a threshold get the mean critic
+score of their side without a critic call; everything in between, answers whose length
+is far from the reference's and prompts without a reference still go to the critic.
+Scores the pre-critic assigns are marked in their rationale and left out of later
+calibrations.
+
+    python -m critic.precritic  # calibrate on data.db and report coverage, agreement and speed
+"""
+
+import argparse
+import math
+import sqlite3
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from config.settings import load_settings
+from db.db import DatabaseManager
+from router.prompt_index import TOKEN_PATTERN
+
+# Start of every rationale the pre-critic writes, so calibration can skip its own scores
+RATIONALE_PREFIX = "Pre-critic:"
+
+
+def _terms(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall((text or "").lower())
+
+
+class _Reference:
+    """Term statistics of one reference answer"""
+    __slots__ = ("counts", "length", "weights", "max_bm25")
+
+    def __init__(self, text: str, idf: Dict[str, float], default_idf: float, k1: float):
+        terms = _terms(text)
+        self.counts = Counter(terms)
+        self.length = len(terms)
+        self.weights = {term: idf.get(term, default_idf) for term in self.counts}
+        # BM25 of an answer repeating every reference term without bound
+        self.max_bm25 = sum(self.weights.values()) * (k1 + 1)
+
+
+class LexicalPreCritic:
+    """BM25/ROUGE-1 overlap with reference answers, calibrated against past critic scores"""
+
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self, references: List[str], fine_score: float = 8, broken_score: float = 4,
+                 precision: float = 0.9, min_samples: int = 30, min_length_ratio: float = 0.2,
+                 max_length_ratio: float = 4.0):
+        self.fine_score = fine_score
+        self.broken_score = broken_score
+        self.precision = precision
+        self.min_samples = min_samples
+        self.min_length_ratio = min_length_ratio
+        self.max_length_ratio = max_length_ratio
+
+        documents = [set(_terms(reference)) for reference in references]
+        n = len(documents)
+        df = Counter(term for document in documents for term in document)
+        self.idf = {term: math.log(1 + (n - count + 0.5) / (count + 0.5)) for term, count in df.items()}
+        self.default_idf = math.log(1 + (n + 0.5) / 0.5)
+        lengths = [len(_terms(reference)) for reference in references]
+        self.avg_length = sum(lengths) / n if n and sum(lengths) else 1.0
+        self._references: Dict[str, _Reference] = {}
+        for reference in references:
+            self._reference(reference)
+
+        # Calibration: (threshold, local score, samples) per side, None while off
+        self.fine: Optional[Tuple[float, int, int]] = None
+        self.broken: Optional[Tuple[float, int, int]] = None
+
+        self._lock = threading.Lock()
+        self.checked = 0
+        self.passed = 0
+        self.failed = 0
+        self.total_us = 0.0
+
+    def _reference(self, text: str) -> _Reference:
+        reference = self._references.get(text)
+        if reference is None:
+            reference = _Reference(text, self.idf, self.default_idf, self.k1)
+            self._references[text] = reference
+        return reference
+
+    def similarity(self, answer: str, reference_answer: str) -> Tuple[Optional[float], float]:
+        """Overlap of answer with the reference (None without a reference) and their length ratio"""
+        reference = self._reference(reference_answer)
+        if not reference.length:
+            return None, 0.0
+        counts = Counter(_terms(answer))
+        length = sum(counts.values())
+        if not length:
+            return 0.0, 0.0
+        norm = self.k1 * (1 - self.b + self.b * length / self.avg_length)
+        bm25 = overlap = 0.0
+        for term, weight in reference.weights.items():
+            tf = counts.get(term)
+            if tf:
+                bm25 += weight * tf * (self.k1 + 1) / (tf + norm)
+                overlap += min(tf, reference.counts[term])
+        precision, recall = overlap / length, overlap / reference.length
+        rouge1 = 2 * precision * recall / (precision + recall) if overlap else 0.0
+        return (bm25 / reference.max_bm25 + rouge1) / 2, length / reference.length
+
+    def calibrate(self, samples: List[Tuple[float, float, float]]):
+        """Set both thresholds from (similarity, length ratio, critic score) of past answers"""
+        self.fine = self._threshold(
+            sorted((s for s in samples if self._length_ok(s[1])), key=lambda s: -s[0]),
+            lambda score: score >= self.fine_score
+        )
+        self.broken = self._threshold(sorted(samples, key=lambda s: s[0]),
+                                      lambda score: score <= self.broken_score)
+        if self.fine is not None and self.broken is not None and self.broken[0] >= self.fine[0]:
+            # The history does not separate fine from broken answers
+            self.fine = self.broken = None
+
+    def _threshold(self, ordered: List[Tuple[float, float, float]], agrees) -> Optional[Tuple[float, int, int]]:
+        """Widest prefix of ordered samples in which at least precision agree: (threshold, mean score, size)"""
+        best = None
+        agreeing = 0
+        total = 0.0
+        for size, (similarity, _, score) in enumerate(ordered, start=1):
+            agreeing += agrees(score)
+            total += score
+            if size >= self.min_samples and agreeing >= self.precision * size:
+                best = (similarity, round(total / size), size)
+        return best
+
+    def _length_ok(self, length_ratio: float) -> bool:
+        return self.min_length_ratio <= length_ratio <= self.max_length_ratio
+
+    def judge(self, answer: str, reference_answer: str) -> Optional[Tuple[int, str]]:
+        """Local score and rationale for a plainly fine or plainly broken answer; None when the critic is needed"""
+        start = time.perf_counter()
+        similarity, length_ratio = self.similarity(answer, reference_answer)
+        fine = (similarity is not None and self.fine is not None and similarity >= self.fine[0]
+                and self._length_ok(length_ratio))
+        broken = (not fine and similarity is not None and self.broken is not None
+                  and similarity <= self.broken[0])
+        elapsed_us = (time.perf_counter() - start) * 1e6
+        with self._lock:
+            self.checked += 1
+            self.total_us += elapsed_us
+            self.passed += fine
+            self.failed += broken
+        if not (fine or broken):
+            return None
+        threshold, score, samples = self.fine if fine else self.broken
+        return score, (f"{RATIONALE_PREFIX} lexical overlap {similarity:.2f} with the reference "
+                       f"(threshold {threshold:.2f}); {samples} past answers {'above' if fine else 'below'} "
+                       f"it averaged {score}/10")
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                "fine_threshold": self.fine[0] if self.fine else None,
+                "broken_threshold": self.broken[0] if self.broken else None,
+                "checked": self.checked,
+                "passed": self.passed,
+                "failed": self.failed,
+                "critic_calls_avoided": self.passed + self.failed,
+                "avg_us": round(self.total_us / self.checked, 1) if self.checked else None
+            }
+
+
+def critic_scored_runs(db: DatabaseManager) -> List[Tuple[str, str, int]]:
+    """(answer, reference, critic score) of stored answers the LLM critic scored successfully"""
+    with sqlite3.connect(db.db_path) as conn:
+        return conn.execute("""
+            SELECT r.answer, p.reference, r.critic_score
+            FROM runs r JOIN prompts p ON p.id = r.prompt_id
+            WHERE r.critic_score IS NOT NULL
+              AND COALESCE(r.critic_rationale, '') NOT LIKE ? || '%'
+              AND COALESCE(r.critic_rationale, '') NOT LIKE 'Evaluation failed%'
+        """, (RATIONALE_PREFIX,)).fetchall()
+
+
+def calibration_samples(db: DatabaseManager, precritic: LexicalPreCritic) -> List[Tuple[float, float, float]]:
+    """(similarity, length ratio, critic score) of stored answers the LLM critic scored"""
+    samples = []
+    for answer, reference, score in critic_scored_runs(db):
+        similarity, length_ratio = precritic.similarity(answer, reference)
+        if similarity is not None:
+            samples.append((similarity, length_ratio, score))
+    return samples
+
+
+def open_precritic(db: DatabaseManager) -> LexicalPreCritic:
+    """A pre-critic over db's reference answers, calibrated on its runs, from the precritic section of config/settings.yaml"""
+    config = load_settings()['precritic']
+    precritic = LexicalPreCritic([prompt['reference'] for prompt in db.get_prompts()], config['fine_score'],
+                                 config['broken_score'], config['precision'], config['min_samples'],
+                                 config['min_length_ratio'], config['max_length_ratio'])
+    precritic.calibrate(calibration_samples(db, precritic))
+    return precritic
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Calibrate the lexical pre-critic and report what it would decide')
+    parser.add_argument('--db', default='data.db', help='Run database (default: data.db)')
+    args = parser.parse_args()
+
+    db = DatabaseManager(args.db)
+    precritic = open_precritic(db)
+    samples = calibration_samples(db, precritic)
+    print(f"🧪 {len(samples)} critic-scored answers")
+    for name, side in (("fine", precritic.fine), ("broken", precritic.broken)):
+        if side is None:
+            print(f"   {name}: off (needs {precritic.min_samples} answers at {precritic.precision:.0%} agreement)")
+        else:
+            print(f"   {name}: overlap {'>=' if name == 'fine' else '<='} {side[0]:.3f}, "
+                  f"{side[2]} answers, local score {side[1]}")
+
+    errors = [abs(verdict[0] - score) for verdict, score in
+              ((precritic.judge(answer, reference), score) for answer, reference, score in critic_scored_runs(db))
+              if verdict is not None]
+    stats = precritic.get_stats()
+    if stats['checked']:
+        print(f"⚡ {stats['critic_calls_avoided']}/{stats['checked']} critic calls avoided "
+              f"({stats['passed']} fine, {stats['failed']} broken), {stats['avg_us']}µs per answer")
+    if errors:
+        print(f"🎯 Mean absolute difference from the critic's score on those: {sum(errors) / len(errors):.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from critic import critic_queue
+from critic.critic_queue import CriticQueue, CriticWorkers
+from db.db import DatabaseManager
+
+
+class Clock:
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+
+class ScriptedCritic:
+    """Stands in for AsyncCritic: returns the queued evaluations in order"""
+    config = {"timeout_s": 1, "retries": 0}
+
+    def __init__(self, *evaluations):
+        self.evaluations = list(evaluations)
+        self.calls = []
+
+    async def evaluate_response(self, answer, reference, prompt, timeout=None, retries=0):
+        self.calls.append(answer)
+        return self.evaluations.pop(0)
+
+
+class FeedbackRecorder:
+    def __init__(self):
+        self.feedback = []
+
+    def record_feedback(self, prompt, response, score):
+        self.feedback.append((prompt, response["model"], score))
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(critic_queue, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def db(tmp_path):
+    return DatabaseManager(str(tmp_path / "runs.db"))
+
+
+def stored_run(db: DatabaseManager) -> int:
+    return db.store_run_result("run-1", 1, "gpt-4o-mini", "Paris", 500.0, 20, 0.001)
+
+
+def run_row(db: DatabaseManager, rowid: int):
+    with sqlite3.connect(db.db_path) as conn:
+        return conn.execute("SELECT critic_score, critic_rationale, critic_seq FROM runs WHERE rowid = ?",
+                            (rowid,)).fetchone()
+
+
+def test_claims_oldest_pending_job_once(db, clock):
+    queue = CriticQueue(db)
+    first = queue.enqueue("Capital of France?", "Paris", "Paris")
+    second = queue.enqueue("Capital of Spain?", "Madrid", "Madrid")
+
+    assert [queue.claim()["id"], queue.claim()["id"]] == [first, second]
+    assert queue.claim() is None
+    assert queue.get_stats()["running"] == 2
+
+
+def test_expired_lease_is_reclaimed_with_another_attempt(db, clock):
+    queue = CriticQueue(db, lease_s=60)
+    job_id = queue.enqueue("Capital of France?", "Paris", "Paris")
+    assert queue.claim()["attempts"] == 1
+
+    clock.now += 59
+    assert queue.claim() is None
+    clock.now += 2
+    reclaimed = queue.claim()
+    assert (reclaimed["id"], reclaimed["attempts"]) == (job_id, 2)
+
+
+def test_completion_scores_the_run_row_once(db, clock):
+    queue = CriticQueue(db, lease_s=60)
+    rowid = stored_run(db)
+    queue.enqueue("Capital of France?", "Paris", "Paris", run_rowid=rowid)
+    stale = queue.claim()
+    clock.now += 61
+    current = queue.claim()
+
+    queue.complete(current, {"score": 9, "rationale": "Correct"})
+    queue.complete(stale, {"score": 3, "rationale": "Late duplicate"})  # its lease was taken over
+
+    assert run_row(db, rowid) == (9, "Correct", 1)
+    job = queue.get_job(current["id"])
+    assert (job["status"], job["critic_score"]) == ("done", 9)
+    assert not db.update_run_critic(rowid, 5, "Again")
+
+
+def test_failed_job_is_retried_until_max_attempts(db, clock):
+    queue = CriticQueue(db, max_attempts=2)
+    job_id = queue.enqueue("Capital of France?", "Paris", "Paris")
+
+    queue.fail(queue.claim(), "timeout")
+    assert queue.get_job(job_id)["status"] == "pending"
+    queue.fail(queue.claim(), "timeout again")
+    job = queue.get_job(job_id)
+    assert (job["status"], job["attempts"], job["error"]) == ("failed", 2, "timeout again")
+    assert queue.claim() is None
+    assert queue.unfinished([job_id]) == 0
+
+
+def test_released_job_keeps_its_attempts(db, clock):
+    queue = CriticQueue(db)
+    job_id = queue.enqueue("Capital of France?", "Paris", "Paris")
+    queue.release(queue.claim())
+
+    assert queue.get_job(job_id)["attempts"] == 0
+    assert queue.claim()["attempts"] == 1
+
+
+def test_enqueue_notifies_listeners(db):
+    queue = CriticQueue(db)
+    calls = []
+    listener = lambda: calls.append(1)
+    queue.on_enqueue(listener)
+    queue.enqueue("q", "a")
+    queue.remove_listener(listener)
+    queue.enqueue("q", "a")
+
+    assert calls == [1]
+
+
+def test_workers_score_rows_and_feed_back_to_the_router(db):
+    queue = CriticQueue(db, max_attempts=1)
+    critic = ScriptedCritic({"score": 8, "rationale": "Good"}, {"score": None, "rationale": None, "error": "timeout"})
+    router = FeedbackRecorder()
+    rowid = stored_run(db)
+
+    async def scenario():
+        workers = CriticWorkers(queue, critic, router, workers=1, poll_interval_s=0.05)
+        workers.start()
+        try:
+            scored = queue.enqueue("Capital of France?", "Paris", "Paris", run_rowid=rowid,
+                                   response={"model": "gpt-4o-mini", "answer_text": "Paris"})
+            errored = queue.enqueue("Capital of Spain?", "Madrid", "Madrid")
+            assert await workers.wait_for([scored, errored], timeout=5)
+        finally:
+            await workers.stop()
+        return workers, errored
+
+    workers, errored = asyncio.run(scenario())
+
+    assert run_row(db, rowid)[:2] == (8, "Good")
+    assert router.feedback == [("Capital of France?", "gpt-4o-mini", 8)]
+    assert (workers.evaluated, workers.failed) == (1, 1)
+    job = queue.get_job(errored)
+    assert (job["status"], job["error"]) == ("failed", "timeout")
+    assert queue.get_stats()["done"] == 1
+
+
+def test_worker_fails_job_whose_workers_kept_dying(db, clock):
+    queue = CriticQueue(db, lease_s=60, max_attempts=2)
+    job_id = queue.enqueue("Capital of France?", "Paris", "Paris")
+    for _ in range(2):
+        queue.claim()
+        clock.now += 61
+    job = queue.claim()
+    critic = ScriptedCritic()
+
+    asyncio.run(CriticWorkers(queue, critic, workers=1)._process(job))
+
+    assert critic.calls == []
+    assert queue.get_job(job_id)["status"] == "failed"
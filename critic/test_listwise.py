@@ -0,0 +1,129 @@
+import asyncio
+import json
+
+import pytest
+
+from critic.critic import AsyncCritic, Critic
+from critic.critic_cache import CriticCache, template_version
+from critic.precritic import RATIONALE_PREFIX, LexicalPreCritic
+from db.db import DatabaseManager
+
+PROMPT = "How should a B2B analytics startup go to market?"
+REFERENCE = ("Sell to enterprise customers through a direct sales team, backed by a partner channel "
+             "for mid-market accounts.")
+FINE = REFERENCE
+BROKEN = "Pick one ideal customer profile and grow revenue from referrals."
+CLOSE = "Start with enterprise customers and hire a small direct sales team before adding partners."
+LOOSE = "Run paid search ads for small businesses and measure conversion weekly."
+OTHER = "Bananas are a yellow fruit."
+
+
+def listwise_reply(*scores) -> str:
+    return json.dumps({"evaluations": [{"answer": number, "score": score, "rationale": f"Answer {number}"}
+                                       for number, score in enumerate(scores, start=1)]})
+
+
+def sent_answers(request: str) -> list:
+    return [answer for answer in (FINE, BROKEN, CLOSE, LOOSE, OTHER) if answer in request.split(REFERENCE, 1)[1]]
+
+
+class ScriptedCritic(Critic):
+    """A Critic whose calls return the scripted replies in order and record the request sent"""
+
+    def __init__(self, db, replies):
+        super().__init__(db)
+        self.replies = list(replies)
+        self.requests = []
+
+    def _complete(self, messages, timeout, retries, max_tokens=None, response_format=None):
+        self.requests.append(messages[-1]['content'])
+        return self.replies.pop(0), 1, None
+
+
+class ScriptedAsyncCritic(AsyncCritic):
+    def __init__(self, db, replies):
+        super().__init__(db)
+        self.replies = list(replies)
+        self.requests = []
+
+    async def _complete(self, messages, timeout, retries, max_tokens=None, response_format=None):
+        self.requests.append(messages[-1]['content'])
+        return self.replies.pop(0), 1, None
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    return DatabaseManager(str(tmp_path / "runs.db"))
+
+
+def equip(critic: Critic, db: DatabaseManager) -> Critic:
+    """Give critic a fresh cache and a pre-critic passing overlap >= 0.6 and failing overlap <= 0.02"""
+    critic.cache = CriticCache(db.db_path, template_version(critic))
+    critic.precritic = LexicalPreCritic([REFERENCE, "Price by seat with an annual discount."])
+    critic.precritic.fine = (0.6, 9, 40)
+    critic.precritic.broken = (0.02, 2, 40)
+    return critic
+
+
+def test_precritic_and_cache_leave_only_undecided_answers_for_the_critic(db):
+    critic = equip(ScriptedCritic(db, [listwise_reply(7, 4), "SCORE: 3\nRATIONALE: Off topic."]), db)
+
+    first = critic.evaluate_listwise([FINE, BROKEN, CLOSE, LOOSE, CLOSE], REFERENCE, PROMPT)
+
+    assert len(critic.requests) == 1
+    assert sent_answers(critic.requests[0]) == [CLOSE, LOOSE]
+    assert [result["score"] for result in first] == [9, 2, 7, 4, 7]
+    assert first[0]["precritic"] and first[1]["rationale"].startswith(RATIONALE_PREFIX)
+    assert first[2]["listwise"] and first[3]["listwise"]
+
+    second = critic.evaluate_listwise([CLOSE, OTHER, LOOSE, BROKEN], REFERENCE, PROMPT)
+
+    # The cached and pre-critic answers leave one, which is scored on its own
+    assert len(critic.requests) == 2
+    assert "MODEL'S ANSWER:" in critic.requests[1] and sent_answers(critic.requests[1]) == [OTHER]
+    assert [result["score"] for result in second] == [7, 3, 4, 2]
+    assert second[0]["cache_hit"] and second[2]["cache_hit"] and not second[1].get("cache_hit")
+
+    # Critic scores are cached for single evaluations too; pre-critic scores are not cached at all
+    assert critic.evaluate_response(OTHER, REFERENCE, PROMPT)["cache_hit"]
+    assert critic.cache.get_stats()["entries"] == 3
+    assert critic.precritic.get_stats()["critic_calls_avoided"] == 3  # cache hits never reach it
+
+
+def test_without_cache_the_precritic_still_applies(db):
+    critic = equip(ScriptedCritic(db, [listwise_reply(7, 4), listwise_reply(6, 5)]), db)
+
+    for _ in range(2):
+        critic.evaluate_listwise([FINE, CLOSE, LOOSE], REFERENCE, PROMPT, use_cache=False)
+
+    assert [sent_answers(request) for request in critic.requests] == [[CLOSE, LOOSE], [CLOSE, LOOSE]]
+    assert critic.cache.get_stats()["entries"] == 0
+
+
+def test_async_listwise_applies_precritic_and_cache(db):
+    critic = equip(ScriptedAsyncCritic(db, [listwise_reply(8, 5)]), db)
+
+    async def scenario():
+        first = await critic.evaluate_listwise([BROKEN, CLOSE, LOOSE], REFERENCE, PROMPT)
+        second = await critic.evaluate_listwise([FINE, LOOSE, CLOSE], REFERENCE, PROMPT)
+        return first, second
+
+    first, second = asyncio.run(scenario())
+
+    assert [sent_answers(request) for request in critic.requests] == [[CLOSE, LOOSE]]
+    assert [result["score"] for result in first] == [2, 8, 5]
+    assert [result["score"] for result in second] == [9, 5, 8]
+    assert second[1]["cache_hit"] and second[2]["cache_hit"]
+
+
+def test_editing_the_listwise_template_invalidates_cached_scores(db):
+    critic = equip(ScriptedCritic(db, [listwise_reply(7, 4)]), db)
+    critic.evaluate_listwise([CLOSE, LOOSE], REFERENCE, PROMPT)
+    assert critic.cache.get_stats()["entries"] == 2
+
+    edited = ScriptedCritic(db, [])
+    edited.listwise_template = critic.listwise_template + "\nBe strict."
+
+    assert template_version(edited) != template_version(critic)
+    assert CriticCache(db.db_path, template_version(edited)).invalidated == 2
@@ -0,0 +1,114 @@
+import pytest
+
+from critic.precritic import RATIONALE_PREFIX, LexicalPreCritic, critic_scored_runs, open_precritic
+from db.db import DatabaseManager
+
+REFERENCE = ("Sell to enterprise customers through a direct sales team, backed by a partner channel "
+             "for mid-market accounts.")
+OTHER_REFERENCE = "Price by seat with an annual discount for committed customers."
+PARTIAL = "Sell to enterprise customers with a direct sales team and grow from there."
+UNRELATED = "Bananas grow on tall plants in warm climates."
+
+
+def spread(low: float, high: float, n: int) -> list:
+    return [low + (high - low) * i / (n - 1) for i in range(n)]
+
+
+def history(fine: int = 40, middle: int = 40, broken: int = 40) -> list:
+    """(similarity, length ratio, critic score) samples: fine answers on top, broken at the bottom"""
+    return ([(s, 1.0, 9) for s in spread(0.70, 0.90, fine)] +
+            [(s, 1.0, 6) for s in spread(0.30, 0.50, middle)] +
+            [(s, 1.0, 2) for s in spread(0.00, 0.10, broken)])
+
+
+@pytest.fixture
+def precritic():
+    return LexicalPreCritic([REFERENCE, OTHER_REFERENCE], min_samples=30)
+
+
+def test_similarity_orders_answers_by_overlap_with_the_reference(precritic):
+    same, ratio = precritic.similarity(REFERENCE, REFERENCE)
+    partial, _ = precritic.similarity(PARTIAL, REFERENCE)
+    unrelated, _ = precritic.similarity(UNRELATED, REFERENCE)
+
+    assert 1.0 >= same > partial > unrelated == 0.0
+    assert ratio == 1.0
+    assert precritic.similarity(REFERENCE, "")[0] is None
+
+
+def test_calibration_finds_the_widest_agreeing_tails(precritic):
+    precritic.precision = 1.0
+    precritic.calibrate(history())
+
+    assert precritic.fine == (pytest.approx(0.70), 9, 40)
+    assert precritic.broken == (pytest.approx(0.10), 2, 40)
+
+
+def test_precision_below_one_lets_a_few_disagreeing_answers_in(precritic):
+    precritic.calibrate(history())
+
+    # 40 fine answers tolerate 4 others at 90% precision
+    threshold, score, samples = precritic.fine
+    assert samples == 44 and 0.30 < threshold < 0.70
+    assert score == round((40 * 9 + 4 * 6) / 44)
+
+
+def test_a_side_without_min_samples_stays_off(precritic):
+    precritic.calibrate(history(fine=10))
+
+    assert precritic.fine is None
+    assert precritic.broken is not None
+
+
+def test_history_that_does_not_separate_fine_from_broken_turns_both_off(precritic):
+    mixed = [(s, 1.0, 9 if i % 2 else 2) for i, s in enumerate(spread(0.0, 1.0, 100))]
+    precritic.precision = 0.5
+
+    precritic.calibrate(mixed)
+
+    assert precritic.fine is None and precritic.broken is None
+
+
+def test_answers_of_the_wrong_length_are_left_out_of_the_fine_side(precritic):
+    precritic.precision = 1.0
+    too_long = [(s, 6.0, 2) for s in spread(0.91, 0.99, 10)]
+
+    precritic.calibrate(history() + too_long)
+
+    assert precritic.fine == (pytest.approx(0.70), 9, 40)
+
+
+def test_judge_scores_plain_cases_locally_and_defers_the_rest(precritic):
+    precritic.fine = (0.6, 9, 40)
+    precritic.broken = (0.02, 2, 40)
+
+    fine_score, rationale = precritic.judge(REFERENCE, REFERENCE)
+    broken_score, _ = precritic.judge(UNRELATED, REFERENCE)
+
+    assert fine_score == 9 and rationale.startswith(RATIONALE_PREFIX)
+    assert broken_score == 2
+    assert precritic.judge(PARTIAL, REFERENCE) is None
+    # Far longer than the reference: the critic decides, however high the overlap
+    assert precritic.judge(" ".join([REFERENCE] * 5), REFERENCE) is None
+    assert precritic.judge(REFERENCE, "") is None
+
+    stats = precritic.get_stats()
+    assert (stats["checked"], stats["passed"], stats["failed"], stats["critic_calls_avoided"]) == (5, 1, 1, 2)
+
+
+def test_uncalibrated_precritic_sends_everything_to_the_critic(precritic):
+    assert precritic.judge(REFERENCE, REFERENCE) is None
+    assert precritic.judge(UNRELATED, REFERENCE) is None
+
+
+def test_calibration_skips_precritic_scores_and_failed_evaluations(tmp_path):
+    db = DatabaseManager(str(tmp_path / "runs.db"))
+    prompt = db.get_prompts()[0]
+    for rationale in ("Covers the reference.", f"{RATIONALE_PREFIX} lexical overlap 0.91",
+                      "Evaluation failed: timeout"):
+        db.store_run_result("run_1", prompt["id"], "gpt-4o", prompt["reference"], 800.0, 100, 0.01,
+                            critic_score=9, critic_rationale=rationale)
+    db.store_run_result("run_1", prompt["id"], "gpt-4o", "Unscored", 800.0, 100, 0.01)
+
+    assert critic_scored_runs(db) == [(prompt["reference"], prompt["reference"], 9)]
+    assert open_precritic(db).fine is None  # one sample is far below min_samples
@@ -1,25 +1,79 @@
 import sqlite3
 import json
 import os
+import time
 from datetime import datetime
-from typing import List, Dict, Optional, Tuple
+from typing import Iterator, List, Dict, Optional, Tuple
+from db.stats import ModelStatsSnapshot, LATENCY_RUNS_FILTER
+from db.sketch import LatencySketch
+
+# Columns added to runs after the original schema, applied to existing databases on startup
+RUNS_MIGRATIONS = [
+    ("hedge_role", "TEXT"),
+    ("hedge_outcome", "TEXT"),
+    ("deadline_ms", "REAL"),
+    ("deadline_met", "INTEGER"),
+    ("input_tokens", "INTEGER"),
+    ("output_tokens", "INTEGER"),
+    ("forecast_output_tokens", "INTEGER"),
+    ("forecast_cost", "REAL"),
+    ("cache_hit", "INTEGER"),
+    ("cache_similarity", "REAL"),
+    ("ttft_ms", "REAL"),
+    ("tokens_per_second", "REAL"),
+    ("batch_id", "TEXT"),
+    ("critic_seq", "INTEGER"),
+    ("cost_estimated", "INTEGER"),
+]
 
 class DatabaseManager:
     def __init__(self, db_path: str = "data.db"):
         self.db_path = db_path
+        self.stats = ModelStatsSnapshot.for_db(db_path)
         self.init_database()
         
     def init_database(self):
         """Initialize database with schema"""
         with sqlite3.connect(self.db_path) as conn:
+            # Bring older runs tables up to date before the schema creates indexes on new columns
+            self.migrate_runs_table(conn)
+            
             # Read and execute schema
             schema_path = os.path.join(os.path.dirname(__file__), 'schema.sql')
             with open(schema_path, 'r') as f:
                 schema = f.read()
             conn.executescript(schema)
+            self.migrate_sketch_table(conn)
             
             # Load prompts if they don't exist
             self.load_prompts()
+            
+            # Build the in-memory performance snapshot once per database file
+            if self.stats.last_sync == 0:
+                self.stats.rebuild(conn)
+                self.reconcile_model_performance(conn)
+                self.save_latency_sketches(conn)
+    
+    def migrate_runs_table(self, conn: sqlite3.Connection):
+        """Add any columns from RUNS_MIGRATIONS that an existing runs table is missing"""
+        cursor = conn.cursor()
+        cursor.execute("PRAGMA table_info(runs)")
+        existing = {row[1] for row in cursor.fetchall()}
+        if not existing:
+            return  # Fresh database, schema.sql creates the full table
+        
+        for column, column_type in RUNS_MIGRATIONS:
+            if column not in existing:
+                cursor.execute(f"ALTER TABLE runs ADD COLUMN {column} {column_type}")
+        conn.commit()
+    
+    def migrate_sketch_table(self, conn: sqlite3.Connection):
+        """Add through_rowid to sketch tables from before checkpoints; their sketches are rebuilt in full"""
+        cursor = conn.cursor()
+        cursor.execute("PRAGMA table_info(model_latency_sketches)")
+        if "through_rowid" not in {row[1] for row in cursor.fetchall()}:
+            cursor.execute("ALTER TABLE model_latency_sketches ADD COLUMN through_rowid INTEGER")
+            conn.commit()
     
     def load_prompts(self):
         """Load prompts from JSON file into database"""
@@ -55,37 +109,130 @@ class DatabaseManager:
     def store_run_result(self, run_id: str, prompt_id: int, model: str, 
                         answer: str, latency_ms: float, tokens: int, 
                         estimated_cost: float, critic_score: Optional[int] = None, 
-                        critic_rationale: Optional[str] = None):
-        """Store the result of a model run"""
+                        critic_rationale: Optional[str] = None,
+                        hedge_role: Optional[str] = None,
+                        hedge_outcome: Optional[str] = None,
+                        deadline_ms: Optional[float] = None,
+                        deadline_met: Optional[bool] = None,
+                        input_tokens: Optional[int] = None,
+                        output_tokens: Optional[int] = None,
+                        forecast_output_tokens: Optional[int] = None,
+                        forecast_cost: Optional[float] = None,
+                        cache_hit: Optional[bool] = None,
+                        cache_similarity: Optional[float] = None,
+                        ttft_ms: Optional[float] = None,
+                        tokens_per_second: Optional[float] = None,
+                        cost_estimated: Optional[bool] = None) -> int:
+        """Store the result of a model run and return its runs rowid"""
         with sqlite3.connect(self.db_path) as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 INSERT INTO runs (run_id, prompt_id, model, answer, latency_ms, 
-                                tokens, estimated_cost, critic_score, critic_rationale)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                                tokens, estimated_cost, critic_score, critic_rationale,
+                                hedge_role, hedge_outcome, deadline_ms, deadline_met,
+                                input_tokens, output_tokens, forecast_output_tokens, forecast_cost,
+                                cache_hit, cache_similarity, ttft_ms, tokens_per_second, cost_estimated)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             """, (run_id, prompt_id, model, answer, latency_ms, tokens, 
-                  estimated_cost, critic_score, critic_rationale))
+                  estimated_cost, critic_score, critic_rationale,
+                  hedge_role, hedge_outcome, deadline_ms, deadline_met,
+                  input_tokens, output_tokens, forecast_output_tokens, forecast_cost,
+                  cache_hit, cache_similarity, ttft_ms, tokens_per_second, cost_estimated))
+            rowid = cursor.lastrowid
+            conn.commit()
+            
+            # Fold the new row (and any written by other processes) into the snapshot
+            self.stats.sync(conn)
+            self.maybe_save_latency_sketches(conn)
+        return rowid
+    
+    def update_run_critic(self, rowid: int, critic_score: int, critic_rationale: str) -> bool:
+        """
+        Fill in the critic score of a stored run that was evaluated later (critic/critic_queue.py).
+        The score gets the next critic_seq, which is how every process's snapshot finds
+        scores landing on rows it has already read. False if the row is gone or scored.
+        """
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.execute("""
+                UPDATE runs
+                SET critic_score = ?, critic_rationale = ?,
+                    critic_seq = (SELECT COALESCE(MAX(critic_seq), 0) + 1 FROM runs)
+                WHERE rowid = ? AND critic_score IS NULL
+            """, (critic_score, critic_rationale, rowid))
             conn.commit()
+            self.stats.sync(conn)
+            return cursor.rowcount == 1
+    
+    def store_run_results(self, rows: List[Dict]):
+        """
+        Store many run results in one transaction. Each row maps runs columns (named
+        like the store_run_result parameters, plus batch_id) to values.
+        """
+        if not rows:
+            return
+        columns = sorted({column for row in rows for column in row})
+        with sqlite3.connect(self.db_path) as conn:
+            conn.executemany(
+                f"INSERT INTO runs ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                [tuple(row.get(column) for column in columns) for row in rows]
+            )
+            conn.commit()
+            
+            self.stats.sync(conn)
+            self.maybe_save_latency_sketches(conn)
+    
+    def store_hedge_attempts(self, run_id: str, prompt_id: int, response: Dict):
+        """
+        Store the other attempts of a hedged response so the extra cost is visible.
+        The returned response itself is stored by the caller together with its critic score.
+        """
+        for attempt in response.get('hedge_attempts', []):
+            self.store_run_result(
+                run_id=run_id,
+                prompt_id=prompt_id,
+                model=attempt['model'],
+                answer=attempt['answer_text'],
+                latency_ms=attempt['latency_ms'],
+                tokens=attempt['tokens'],
+                estimated_cost=attempt['estimated_cost'],
+                hedge_role=attempt['hedge_role'],
+                hedge_outcome=attempt['hedge_outcome'],
+                input_tokens=attempt.get('input_tokens'),
+                output_tokens=attempt.get('output_tokens'),
+                cost_estimated=attempt.get('cost_estimated')
+            )
     
     def get_model_performance(self, model: str) -> Dict:
-        """Get historical performance metrics for a model"""
+        """
+        Get historical performance metrics for a model from the in-memory snapshot,
+        including p50/p95/p99 latency from its sketch (None without history)
+        """
+        self.stats.maybe_sync(self.db_path)
+        performance = self.stats.get_performance(model)
+        for percentile in (50, 95, 99):
+            performance[f'p{percentile}_latency'] = self.stats.get_latency_quantile(model, percentile / 100)
+        return performance
+    
+    def query_model_performance(self, model: str) -> Dict:
+        """Get historical performance metrics for a model with a full scan of runs"""
         with sqlite3.connect(self.db_path) as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 SELECT AVG(critic_score) as avg_score, 
-                       AVG(latency_ms) as avg_latency,
-                       AVG(estimated_cost) as avg_cost,
+                       AVG(CASE WHEN batch_id IS NULL THEN latency_ms END) as avg_latency,
+                       AVG(CASE WHEN batch_id IS NULL THEN estimated_cost END) as avg_cost,
                        COUNT(*) as total_runs
                 FROM runs 
-                WHERE model = ? AND critic_score IS NOT NULL
+                WHERE model = ? AND critic_score IS NOT NULL AND COALESCE(cache_hit, 0) = 0
             """, (model,))
             
             row = cursor.fetchone()
             if row and row[0] is not None:
+                # Batched runs only count towards the score (see ModelStatsSnapshot)
                 return {
                     "avg_score": row[0],
-                    "avg_latency": row[1], 
-                    "avg_cost": row[2],
+                    "avg_latency": row[1] if row[1] is not None else 1000.0, 
+                    "avg_cost": row[2] if row[2] is not None else 0.01,
                     "total_runs": row[3]
                 }
             else:
@@ -96,6 +243,64 @@ class DatabaseManager:
                     "total_runs": 0
                 }
     
+    def get_latency_percentile(self, model: str, percentile: float) -> Optional[float]:
+        """
+        Get a latency percentile (0-1) over a model's successful runs from its sketch,
+        ignoring hedge attempts that were cancelled or failed
+        """
+        self.stats.maybe_sync(self.db_path)
+        return self.stats.get_latency_quantile(model, percentile)
+    
+    def get_latency_sketch(self, model: str) -> Optional[LatencySketch]:
+        """Get the persisted latency sketch for a model, as of the last checkpoint"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT sketch FROM model_latency_sketches WHERE model = ?", (model,))
+            row = cursor.fetchone()
+            return LatencySketch.from_json(row[0]) if row else None
+    
+    def merge_latency_sketch(self, model: str, sketch: LatencySketch,
+                             conn: Optional[sqlite3.Connection] = None):
+        """
+        Merge a sketch into the persisted one for a model. Worker processes can
+        use this to combine latency sketches they built independently.
+        """
+        if conn is None:
+            with sqlite3.connect(self.db_path) as own_conn:
+                self.merge_latency_sketch(model, sketch, own_conn)
+                own_conn.commit()
+            return
+        
+        cursor = conn.cursor()
+        cursor.execute("SELECT sketch FROM model_latency_sketches WHERE model = ?", (model,))
+        row = cursor.fetchone()
+        merged = LatencySketch.from_json(row[0]) if row else LatencySketch(sketch.relative_accuracy)
+        merged.merge(sketch)
+        cursor.execute("""
+            INSERT OR REPLACE INTO model_latency_sketches (model, sketch, total_count, last_updated)
+            VALUES (?, ?, ?, ?)
+        """, (model, merged.to_json(), merged.count, datetime.now()))
+    
+    def save_latency_sketches(self, conn: sqlite3.Connection):
+        """
+        Checkpoint the snapshot's sketches, with the runs rowid they cover, so the next
+        startup only streams in the latencies of later runs
+        """
+        sketches, through_rowid = self.stats.get_sketches()
+        cursor = conn.cursor()
+        for model, sketch in sketches.items():
+            cursor.execute("""
+                INSERT OR REPLACE INTO model_latency_sketches (model, sketch, total_count, last_updated, through_rowid)
+                VALUES (?, ?, ?, ?, ?)
+            """, (model, sketch.to_json(), sketch.count, datetime.now(), through_rowid))
+        conn.commit()
+        self.stats.last_sketch_save = time.time()
+    
+    def maybe_save_latency_sketches(self, conn: sqlite3.Connection):
+        """Checkpoint the sketches at most once per sketch_save_interval instead of on every insert"""
+        if time.time() - self.stats.last_sketch_save >= self.stats.sketch_save_interval:
+            self.save_latency_sketches(conn)
+    
     def get_all_runs(self, run_id: Optional[str] = None) -> List[Dict]:
         """Get all runs, optionally filtered by run_id"""
         with sqlite3.connect(self.db_path) as conn:
@@ -118,9 +323,62 @@ class DatabaseManager:
             rows = cursor.fetchall()
             return [dict(zip(columns, row)) for row in rows]
     
+    def iter_scored_runs(self) -> Iterator[Tuple[str, str, float, float, float]]:
+        """Stream (prompt, model, latency_ms, estimated_cost, critic_score) for every critic-scored run"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.execute(f"""
+                SELECT p.prompt, r.model, r.latency_ms, r.estimated_cost, r.critic_score
+                FROM runs r JOIN prompts p ON r.prompt_id = p.id
+                WHERE r.critic_score IS NOT NULL AND {LATENCY_RUNS_FILTER}
+                ORDER BY r.rowid
+            """)
+            yield from cursor
+
+    def iter_token_runs(self) -> Iterator[Tuple[str, str, int, Optional[int], Optional[int]]]:
+        """Stream (prompt, model, tokens, input_tokens, output_tokens) for every successful run"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.execute(f"""
+                SELECT p.prompt, r.model, r.tokens, r.input_tokens, r.output_tokens
+                FROM runs r JOIN prompts p ON r.prompt_id = p.id
+                WHERE {LATENCY_RUNS_FILTER}
+                ORDER BY r.rowid
+            """)
+            yield from cursor
+
+    def get_forecast_accuracy(self, run_id: Optional[str] = None) -> Dict[str, Dict]:
+        """
+        Per-model accuracy of pre-dispatch forecasts: mean absolute percentage error of
+        cost and output tokens, and the mean signed cost error (positive = underestimate)
+        """
+        with sqlite3.connect(self.db_path) as conn:
+            query = """
+                SELECT model,
+                       COUNT(*),
+                       AVG(ABS(estimated_cost - forecast_cost) / estimated_cost),
+                       AVG(ABS(output_tokens - forecast_output_tokens) * 1.0 / output_tokens),
+                       AVG(estimated_cost - forecast_cost)
+                FROM runs
+                WHERE forecast_cost IS NOT NULL AND estimated_cost > 0 AND output_tokens > 0
+            """
+            params = ()
+            if run_id:
+                query += " AND run_id = ?"
+                params = (run_id,)
+            cursor = conn.execute(query + " GROUP BY model", params)
+            return {
+                row[0]: {
+                    "runs": row[1],
+                    "cost_mape": row[2],
+                    "output_tokens_mape": row[3],
+                    "mean_cost_error": row[4]
+                }
+                for row in cursor
+            }
+
     def update_model_performance(self):
         """Update the model performance averages"""
         with sqlite3.connect(self.db_path) as conn:
+            self.stats.sync(conn)
             cursor = conn.cursor()
             
             # Get unique models
@@ -128,7 +386,7 @@ class DatabaseManager:
             models = [row[0] for row in cursor.fetchall()]
             
             for model in models:
-                perf = self.get_model_performance(model)
+                perf = self.stats.get_performance(model)
                 cursor.execute("""
                     INSERT OR REPLACE INTO model_performance 
                     (model, avg_score, avg_latency_ms, avg_cost, total_runs, last_updated)
@@ -136,4 +394,34 @@ class DatabaseManager:
                 """, (model, perf['avg_score'], perf['avg_latency'], 
                       perf['avg_cost'], perf['total_runs'], datetime.now()))
             
-            conn.commit() 
\ No newline at end of file
+            conn.commit()
+    
+    def reconcile_model_performance(self, conn: sqlite3.Connection) -> List[str]:
+        """
+        Compare the model_performance table with the snapshot rebuilt from runs
+        and rewrite any rows that have drifted. Returns the corrected models.
+        """
+        cursor = conn.cursor()
+        cursor.execute("SELECT model, avg_score, avg_latency_ms, avg_cost, total_runs FROM model_performance")
+        stored = {row[0]: row[1:] for row in cursor.fetchall()}
+        
+        drifted = []
+        for model in self.stats.models():
+            perf = self.stats.get_performance(model)
+            expected = (perf['avg_score'], perf['avg_latency'], perf['avg_cost'], perf['total_runs'])
+            row = stored.get(model)
+            if row is not None and row[3] == expected[3] and all(
+                abs((a or 0) - b) <= 1e-6 * max(1.0, abs(b)) for a, b in zip(row[:3], expected[:3])
+            ):
+                continue
+            drifted.append(model)
+            cursor.execute("""
+                INSERT OR REPLACE INTO model_performance 
+                (model, avg_score, avg_latency_ms, avg_cost, total_runs, last_updated)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (model, expected[0], expected[1], expected[2], expected[3], datetime.now()))
+        
+        if drifted:
+            conn.commit()
+            print(f"Reconciled model_performance for: {', '.join(drifted)}")
+        return drifted 
\ No newline at end of file
@@ -17,9 +17,26 @@ CREATE TABLE IF NOT EXISTS runs (
     critic_score INTEGER,
     critic_rationale TEXT,
     timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+    hedge_role TEXT,  -- 'primary' or 'hedge' when the request was hedged
+    hedge_outcome TEXT,  -- 'won', 'cancelled' or 'failed' when the request was hedged
+    deadline_ms REAL,  -- latency budget of the request, if any
+    deadline_met INTEGER,  -- 1 if the routed request finished within deadline_ms
+    input_tokens INTEGER,
+    output_tokens INTEGER,
+    forecast_output_tokens INTEGER,  -- output tokens forecast before the call (see router/forecaster.py)
+    forecast_cost REAL,  -- cost forecast before the call
+    cache_hit INTEGER,  -- 1 if the answer was served from the response cache
+    cache_similarity REAL,  -- similarity to the cached prompt (1.0 for an exact match)
+    ttft_ms REAL,  -- time to first token of a streamed answer
+    tokens_per_second REAL,  -- output tokens per second after the first token (streamed answers)
+    batch_id TEXT,  -- provider batch job that produced the answer (run/batch.py)
+    critic_seq INTEGER,  -- order in which scores from the critic queue landed (critic/critic_queue.py)
+    cost_estimated INTEGER,  -- 1 if estimated_cost is an estimate (a cancelled hedged attempt's prompt tokens)
     FOREIGN KEY (prompt_id) REFERENCES prompts (id)
 );
 
+CREATE INDEX IF NOT EXISTS idx_runs_critic_seq ON runs (critic_seq);
+
 -- Table for storing model performance averages
 CREATE TABLE IF NOT EXISTS model_performance (
     model TEXT PRIMARY KEY,
@@ -28,4 +45,55 @@ CREATE TABLE IF NOT EXISTS model_performance (
     avg_cost REAL DEFAULT 0.0,
     total_runs INTEGER DEFAULT 0,
     last_updated DATETIME DEFAULT CURRENT_TIMESTAMP
-); 
\ No newline at end of file
+); 
+
+-- Table for storing mergeable per-model latency sketches (see db/sketch.py)
+CREATE TABLE IF NOT EXISTS model_latency_sketches (
+    model TEXT PRIMARY KEY,
+    sketch TEXT NOT NULL,  -- LatencySketch serialised as JSON
+    total_count INTEGER DEFAULT 0,
+    last_updated DATETIME DEFAULT CURRENT_TIMESTAMP,
+    through_rowid INTEGER  -- highest runs rowid the sketch covers (see db/stats.py)
+);
+
+-- Disk tier of the exact-match response cache (see router/response_cache.py)
+CREATE TABLE IF NOT EXISTS response_cache (
+    key TEXT PRIMARY KEY,  -- sha256 of model, model version, system prompt, sampling settings and prompt
+    model TEXT NOT NULL,
+    response TEXT NOT NULL,  -- cached response fields as JSON
+    size_bytes INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+
+-- Memoised critic evaluations (see critic/critic_cache.py)
+CREATE TABLE IF NOT EXISTS critic_cache (
+    key TEXT PRIMARY KEY,  -- sha256 of critic model, template version, sampling settings, prompt, reference and answer
+    model TEXT NOT NULL,  -- critic model
+    template_version TEXT NOT NULL,
+    result TEXT NOT NULL,  -- score, rationale and raw evaluation as JSON
+    hits INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+
+-- Durable queue of critic evaluations deferred off the answer path (see critic/critic_queue.py)
+CREATE TABLE IF NOT EXISTS critic_queue (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_rowid INTEGER,  -- runs row that receives the score; NULL for answers that are not stored
+    prompt TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    reference TEXT NOT NULL,
+    response TEXT,  -- routed response fields for router feedback, as JSON
+    status TEXT NOT NULL DEFAULT 'pending',  -- 'pending', 'running', 'done' or 'failed'
+    attempts INTEGER NOT NULL DEFAULT 0,
+    enqueued_at REAL NOT NULL,
+    started_at REAL,
+    lease_until REAL,  -- a running job not finished by then is handed to another worker
+    finished_at REAL,
+    critic_score INTEGER,
+    critic_rationale TEXT,
+    error TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_critic_queue_status ON critic_queue (status, id);
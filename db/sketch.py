@@ -0,0 +1,127 @@
+import json
+import math
+from typing import Dict, Optional
+
+
+class LatencySketch:
+    """
+    DDSketch-style quantile sketch for latencies.
+
+    Values are counted in logarithmic buckets, so any quantile is returned within
+    relative_accuracy of the true value (1% by default) using a few hundred buckets
+    for latencies between 1ms and 10 minutes. Sketches with the same accuracy can be
+    merged exactly, which lets several worker processes combine what they have seen,
+    and they serialise to a small JSON document.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01, max_bins: int = 2048, min_value: float = 1e-3):
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+        self.min_value = min_value
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+
+        self.bins: Dict[int, int] = {}
+        self.zero_count = 0  # Values at or below min_value
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def _key(self, value: float) -> int:
+        return math.ceil(math.log(value) / self._log_gamma)
+
+    def _bucket_value(self, key: int) -> float:
+        # Midpoint (in relative terms) of the bucket (gamma^(key-1), gamma^key]
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def add(self, value: float, weight: int = 1):
+        """Add a value (e.g. a latency in milliseconds)"""
+        if value is None or weight <= 0:
+            return
+        if value <= self.min_value:
+            self.zero_count += weight
+        else:
+            key = self._key(value)
+            self.bins[key] = self.bins.get(key, 0) + weight
+            if len(self.bins) > self.max_bins:
+                self._collapse()
+
+        self.count += weight
+        self.sum += value * weight
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def _collapse(self):
+        """Fold the lowest buckets together to bound memory; only low quantiles lose accuracy"""
+        keys = sorted(self.bins)
+        while len(keys) > self.max_bins:
+            lowest = keys.pop(0)
+            self.bins[keys[0]] += self.bins.pop(lowest)
+
+    def merge(self, other: "LatencySketch"):
+        """Merge another sketch with the same relative accuracy into this one"""
+        if abs(other.relative_accuracy - self.relative_accuracy) > 1e-12:
+            raise ValueError("Cannot merge sketches with different relative accuracy")
+        for key, count in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + count
+        if len(self.bins) > self.max_bins:
+            self._collapse()
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate the q-quantile (0-1), or None if the sketch is empty"""
+        if self.count == 0:
+            return None
+        q = max(0.0, min(1.0, q))
+        rank = q * (self.count - 1)
+
+        if rank < self.zero_count:
+            return self.min
+        cumulative = self.zero_count
+        for key in sorted(self.bins):
+            cumulative += self.bins[key]
+            if cumulative > rank:
+                return max(self.min, min(self.max, self._bucket_value(key)))
+        return self.max
+
+    def mean(self) -> Optional[float]:
+        return self.sum / self.count if self.count else None
+
+    def copy(self) -> "LatencySketch":
+        return LatencySketch.from_dict(self.to_dict())
+
+    def to_dict(self) -> Dict:
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "max_bins": self.max_bins,
+            "min_value": self.min_value,
+            "bins": {str(key): count for key, count in self.bins.items()},
+            "zero_count": self.zero_count,
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "LatencySketch":
+        sketch = cls(data["relative_accuracy"], data.get("max_bins", 2048), data.get("min_value", 1e-3))
+        sketch.bins = {int(key): count for key, count in data["bins"].items()}
+        sketch.zero_count = data["zero_count"]
+        sketch.count = data["count"]
+        sketch.sum = data["sum"]
+        sketch.min = data["min"] if data["min"] is not None else math.inf
+        sketch.max = data["max"] if data["max"] is not None else -math.inf
+        return sketch
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, text: str) -> "LatencySketch":
+        return cls.from_dict(json.loads(text))
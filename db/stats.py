@@ -0,0 +1,242 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from db.sketch import LatencySketch
+
+# Returned for models that have no critic-scored runs yet
+DEFAULT_PERFORMANCE = {
+    "avg_score": 5.0,  # Default neutral score
+    "avg_latency": 1000.0,  # Default high latency
+    "avg_cost": 0.01,  # Default moderate cost
+    "total_runs": 0,
+    "avg_ttft": None  # No streamed runs yet
+}
+
+
+# Runs whose latency describes a real completion: successful, not a hedged attempt that lost,
+# not served from the response cache and not answered by a batch job (whose latency is the
+# job's turnaround)
+LATENCY_RUNS_FILTER = ("tokens > 0 AND (hedge_outcome IS NULL OR hedge_outcome = 'won') "
+                       "AND COALESCE(cache_hit, 0) = 0 AND batch_id IS NULL")
+
+def counts_for_latency(tokens: int, hedge_outcome: Optional[str], cache_hit: Optional[bool] = None,
+                       batch_id: Optional[str] = None) -> bool:
+    """Python twin of LATENCY_RUNS_FILTER"""
+    return tokens > 0 and hedge_outcome in (None, 'won') and not cache_hit and batch_id is None
+
+
+class ModelStatsSnapshot:
+    """
+    In-memory running sums of per-model performance.
+
+    Mirrors what DatabaseManager.get_model_performance used to compute with a
+    full AVG(...) scan: only runs with a critic score are counted, leaving out
+    answers served from the response cache (they cost nothing and take no time).
+    Answers from batch jobs count towards the average score only, as their latency is
+    the job's turnaround and their cost is discounted. The snapshot
+    remembers the highest runs.rowid it has folded in, so catching up with rows
+    written by this or any other process only reads the new rows. Scores that land
+    later on an existing row (critic/critic_queue.py) carry a critic_seq and are folded in by
+    that sequence instead, whether or not the row had been read before its score.
+    
+    Alongside the averages it keeps a LatencySketch per model over every successful
+    run (scored or not), so latency percentiles are also available in O(1), and the
+    average time to first token over every streamed run. The sketches are checkpointed
+    to model_latency_sketches with the rowid they cover (DatabaseManager.save_latency_sketches),
+    so a rebuild only streams the latencies of runs written after the checkpoint.
+    """
+
+    # One snapshot per database file, shared by every DatabaseManager using it
+    _registry: Dict[str, "ModelStatsSnapshot"] = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, sync_interval: float = 1.0, sketch_save_interval: float = 60.0):
+        self.sync_interval = sync_interval
+        self.sketch_save_interval = sketch_save_interval
+        self.last_rowid = 0
+        self.last_critic_seq = 0
+        self.last_sync = 0.0
+        self.last_sketch_save = 0.0
+        self._stats: Dict[str, Dict[str, float]] = {}
+        self._sketches: Dict[str, LatencySketch] = {}
+        self._ttft: Dict[str, List[float]] = {}  # model -> [ttft_ms sum, count]
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_db(cls, db_path: str) -> "ModelStatsSnapshot":
+        """Get the shared snapshot for a database file"""
+        key = os.path.abspath(db_path)
+        with cls._registry_lock:
+            if key not in cls._registry:
+                cls._registry[key] = cls()
+            return cls._registry[key]
+
+    def rebuild(self, conn: sqlite3.Connection):
+        """Rebuild all running sums from the runs table"""
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT model,
+                   SUM(critic_score),
+                   SUM(CASE WHEN batch_id IS NULL THEN latency_ms END),
+                   SUM(CASE WHEN batch_id IS NULL THEN estimated_cost END),
+                   COUNT(*), COUNT(CASE WHEN batch_id IS NULL THEN 1 END)
+            FROM runs
+            WHERE critic_score IS NOT NULL AND COALESCE(cache_hit, 0) = 0
+            GROUP BY model
+        """)
+        stats = {}
+        for model, score_sum, latency_sum, cost_sum, count, live_count in cursor.fetchall():
+            stats[model] = {
+                "score_sum": score_sum or 0.0,
+                "latency_sum": latency_sum or 0.0,
+                "cost_sum": cost_sum or 0.0,
+                "count": count,
+                "live_count": live_count
+            }
+        cursor.execute("SELECT COALESCE(MAX(rowid), 0), COALESCE(MAX(critic_seq), 0) FROM runs")
+        last_rowid, last_critic_seq = cursor.fetchone()
+
+        # Start from the checkpointed sketches and stream in the latencies of later runs. A
+        # checkpoint without a rowid, or past the end of runs, is not trusted: its model is rescanned.
+        sketches = {}
+        checkpoints = {}
+        cursor.execute("SELECT model, sketch, through_rowid FROM model_latency_sketches")
+        for model, sketch, through_rowid in cursor.fetchall():
+            checkpoints[model] = through_rowid if through_rowid and through_rowid <= last_rowid else 0
+            if checkpoints[model]:
+                sketches[model] = LatencySketch.from_json(sketch)
+        # Checkpoints are saved for every model at once, so a model without one had no latencies before them
+        start = min(checkpoints.values(), default=0)
+        cursor.execute(f"SELECT rowid, model, latency_ms FROM runs WHERE {LATENCY_RUNS_FILTER} "
+                       f"AND rowid > ? AND rowid <= ?", (start, last_rowid))
+        for rowid, model, latency_ms in cursor:
+            if rowid > checkpoints.get(model, start):
+                if model not in sketches:
+                    sketches[model] = LatencySketch()
+                sketches[model].add(latency_ms)
+
+        ttft = {}
+        cursor.execute("""
+            SELECT model, SUM(ttft_ms), COUNT(*)
+            FROM runs
+            WHERE ttft_ms IS NOT NULL AND rowid <= ?
+            GROUP BY model
+        """, (last_rowid,))
+        for model, ttft_sum, count in cursor.fetchall():
+            ttft[model] = [ttft_sum, count]
+
+        with self._lock:
+            self._stats = stats
+            self._sketches = sketches
+            self._ttft = ttft
+            self.last_rowid = last_rowid
+            self.last_critic_seq = last_critic_seq
+            self.last_sync = time.time()
+
+    def sync(self, conn: sqlite3.Connection):
+        """Fold in any runs rows written, and queued critic scores landed, since the last sync"""
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT rowid, model, latency_ms, estimated_cost, critic_score, tokens, hedge_outcome, cache_hit,
+                   ttft_ms, batch_id, critic_seq
+            FROM runs
+            WHERE rowid > ?
+            ORDER BY rowid
+        """, (self.last_rowid,))
+        rows = cursor.fetchall()
+        cursor.execute("""
+            SELECT critic_seq, model, latency_ms, estimated_cost, critic_score, cache_hit, batch_id
+            FROM runs
+            WHERE critic_seq > ?
+            ORDER BY critic_seq
+        """, (self.last_critic_seq,))
+        late_scores = cursor.fetchall()
+
+        with self._lock:
+            for (rowid, model, latency_ms, estimated_cost, critic_score, tokens, hedge_outcome, cache_hit,
+                 ttft_ms, batch_id, critic_seq) in rows:
+                if rowid <= self.last_rowid:
+                    continue
+                self.last_rowid = rowid
+                # Scores with a critic_seq are counted below, by sequence
+                if critic_score is not None and critic_seq is None and not cache_hit:
+                    self._add(model, latency_ms, estimated_cost, critic_score, batch_id is not None)
+                if counts_for_latency(tokens, hedge_outcome, cache_hit, batch_id):
+                    self._sketches.setdefault(model, LatencySketch()).add(latency_ms)
+                if ttft_ms is not None:
+                    ttft = self._ttft.setdefault(model, [0.0, 0])
+                    ttft[0] += ttft_ms
+                    ttft[1] += 1
+            for critic_seq, model, latency_ms, estimated_cost, critic_score, cache_hit, batch_id in late_scores:
+                if critic_seq <= self.last_critic_seq:
+                    continue
+                self.last_critic_seq = critic_seq
+                if not cache_hit:
+                    self._add(model, latency_ms, estimated_cost, critic_score, batch_id is not None)
+            self.last_sync = time.time()
+
+    def maybe_sync(self, db_path: str):
+        """Sync with the database at most once per sync_interval"""
+        if time.time() - self.last_sync < self.sync_interval:
+            return
+        with sqlite3.connect(db_path) as conn:
+            self.sync(conn)
+
+    def _add(self, model: str, latency_ms: float, estimated_cost: float, critic_score: float,
+             batched: bool = False):
+        stats = self._stats.setdefault(
+            model, {"score_sum": 0.0, "latency_sum": 0.0, "cost_sum": 0.0, "count": 0, "live_count": 0}
+        )
+        stats["score_sum"] += critic_score
+        stats["count"] += 1
+        if not batched:
+            stats["latency_sum"] += latency_ms
+            stats["cost_sum"] += estimated_cost
+            stats["live_count"] += 1
+
+    def get_performance(self, model: str) -> Dict:
+        """Get average performance for a model in O(1)"""
+        with self._lock:
+            stats = self._stats.get(model)
+            ttft = self._ttft.get(model)
+            avg_ttft = ttft[0] / ttft[1] if ttft else None
+            if not stats or stats["count"] == 0:
+                return {**DEFAULT_PERFORMANCE, "avg_ttft": avg_ttft}
+            count = stats["count"]
+            live_count = stats["live_count"]
+            return {
+                "avg_score": stats["score_sum"] / count,
+                "avg_latency": stats["latency_sum"] / live_count if live_count else DEFAULT_PERFORMANCE["avg_latency"],
+                "avg_cost": stats["cost_sum"] / live_count if live_count else DEFAULT_PERFORMANCE["avg_cost"],
+                "total_runs": count,
+                "avg_ttft": avg_ttft
+            }
+
+    def get_latency_quantile(self, model: str, q: float) -> Optional[float]:
+        """Estimate a latency quantile (0-1) for a model, or None without history"""
+        with self._lock:
+            sketch = self._sketches.get(model)
+            return sketch.quantile(q) if sketch else None
+
+    def get_sketch(self, model: str) -> Optional[LatencySketch]:
+        """Get a copy of a model's latency sketch"""
+        with self._lock:
+            sketch = self._sketches.get(model)
+            return sketch.copy() if sketch else None
+
+    def get_sketches(self) -> Tuple[Dict[str, LatencySketch], int]:
+        """Copies of every model's latency sketch and the runs rowid they cover up to"""
+        with self._lock:
+            return {model: sketch.copy() for model, sketch in self._sketches.items()}, self.last_rowid
+
+    def sketch_models(self) -> List[str]:
+        """Get models that have at least one latency sample"""
+        with self._lock:
+            return list(self._sketches.keys())
+
+    def models(self) -> List[str]:
+        """Get models that have at least one scored run"""
+        with self._lock:
+            return list(self._stats.keys())
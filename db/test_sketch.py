@@ -0,0 +1,99 @@
+import math
+import random
+
+import pytest
+
+from db.sketch import LatencySketch
+
+
+def exact_quantile(values, q):
+    """The value LatencySketch.quantile estimates: rank q * (n - 1) of the sorted values"""
+    ordered = sorted(values)
+    return ordered[math.floor(q * (len(ordered) - 1))]
+
+
+def latencies(seed, n):
+    rng = random.Random(seed)
+    return [rng.lognormvariate(math.log(800), 0.8) for _ in range(n)]
+
+
+@pytest.mark.parametrize("q", [0.0, 0.1, 0.5, 0.9, 0.95, 0.99, 1.0])
+def test_quantile_within_relative_accuracy(q):
+    values = latencies(1, 5000)
+    sketch = LatencySketch(relative_accuracy=0.01)
+    for value in values:
+        sketch.add(value)
+
+    exact = exact_quantile(values, q)
+    assert abs(sketch.quantile(q) - exact) <= 0.01 * exact
+
+
+@pytest.mark.parametrize("q", [0.5, 0.95, 0.99])
+def test_merged_sketch_quantile_within_relative_accuracy(q):
+    first, second = latencies(2, 3000), [value * 3 for value in latencies(3, 1000)]
+    merged = LatencySketch(relative_accuracy=0.02)
+    other = LatencySketch(relative_accuracy=0.02)
+    for value in first:
+        merged.add(value)
+    for value in second:
+        other.add(value)
+    merged.merge(other)
+
+    exact = exact_quantile(first + second, q)
+    assert merged.count == 4000
+    assert abs(merged.quantile(q) - exact) <= 0.02 * exact
+
+
+def test_merge_equals_sketch_of_all_values():
+    values = latencies(4, 2000)
+    whole, left, right = LatencySketch(), LatencySketch(), LatencySketch()
+    for index, value in enumerate(values):
+        whole.add(value)
+        (left if index % 2 else right).add(value)
+    left.merge(right)
+
+    assert left.bins == whole.bins
+    assert (left.min, left.max, left.count) == (whole.min, whole.max, whole.count)
+    assert left.sum == pytest.approx(whole.sum)
+
+
+def test_merge_rejects_different_accuracy():
+    with pytest.raises(ValueError):
+        LatencySketch(relative_accuracy=0.01).merge(LatencySketch(relative_accuracy=0.05))
+
+
+def test_empty_sketch_has_no_quantile_or_mean():
+    sketch = LatencySketch()
+    assert sketch.quantile(0.5) is None
+    assert sketch.mean() is None
+
+
+def test_values_at_or_below_min_value_count_as_zero():
+    sketch = LatencySketch(min_value=1.0)
+    for value in (0.0, 0.5, 1.0, 100.0):
+        sketch.add(value)
+
+    assert sketch.zero_count == 3
+    assert sketch.quantile(0.0) == 0.0
+    assert sketch.quantile(1.0) == pytest.approx(100.0, rel=0.01)
+
+
+def test_collapse_bounds_bins_and_keeps_high_quantiles():
+    values = [1.01 ** exponent for exponent in range(3000)]  # far more buckets than max_bins
+    sketch = LatencySketch(relative_accuracy=0.01, max_bins=100)
+    for value in values:
+        sketch.add(value)
+
+    assert len(sketch.bins) <= 100
+    exact = exact_quantile(values, 0.99)
+    assert abs(sketch.quantile(0.99) - exact) <= 0.01 * exact
+
+
+def test_json_round_trip_keeps_quantiles():
+    sketch = LatencySketch()
+    for value in latencies(5, 500):
+        sketch.add(value)
+    restored = LatencySketch.from_json(sketch.to_json())
+
+    assert restored.to_dict() == sketch.to_dict()
+    assert restored.quantile(0.95) == sketch.quantile(0.95)
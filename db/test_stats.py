@@ -0,0 +1,124 @@
+import sqlite3
+
+import pytest
+
+from db.db import DatabaseManager
+from db.stats import ModelStatsSnapshot
+
+
+@pytest.fixture
+def db(tmp_path):
+    return DatabaseManager(str(tmp_path / "runs.db"))
+
+
+def store(db: DatabaseManager, model: str, latency_ms: float, cost: float, score=None, **columns) -> int:
+    return db.store_run_result("run_1", 1, model, f"Answer from {model}", latency_ms, 100, cost,
+                               critic_score=score, critic_rationale="ok" if score is not None else None,
+                               **columns)
+
+
+def rebuilt(db: DatabaseManager) -> ModelStatsSnapshot:
+    """A snapshot built from scratch, as a new process would"""
+    snapshot = ModelStatsSnapshot()
+    with sqlite3.connect(db.db_path) as conn:
+        snapshot.rebuild(conn)
+    return snapshot
+
+
+def test_stored_runs_and_late_scores_reach_the_snapshot_without_a_rebuild(db):
+    store(db, "gpt-4o", 800.0, 0.010, score=8)
+    store(db, "gpt-4o", 1200.0, 0.020, score=6)
+
+    performance = db.get_model_performance("gpt-4o")
+    assert (performance["avg_score"], performance["avg_latency"], performance["total_runs"]) == (7.0, 1000.0, 2)
+    assert performance["avg_cost"] == pytest.approx(0.015)
+
+    # Unscored rows feed the latency sketch only, until the queued critic scores them
+    rowid = store(db, "gpt-4o", 400.0, 0.030)
+    assert db.get_model_performance("gpt-4o")["total_runs"] == 2
+    assert db.update_run_critic(rowid, 10, "Excellent")
+    assert not db.update_run_critic(rowid, 1, "Scored twice")
+
+    performance = db.get_model_performance("gpt-4o")
+    assert (performance["avg_score"], performance["avg_latency"], performance["total_runs"]) == (8.0, 800.0, 3)
+    assert performance["avg_cost"] == pytest.approx(0.02)
+    assert db.query_model_performance("gpt-4o") == {key: performance[key] for key in
+                                                    ("avg_score", "avg_latency", "avg_cost", "total_runs")}
+
+
+def test_cache_hits_and_cancelled_attempts_are_left_out(db):
+    store(db, "claude", 900.0, 0.010, score=8)
+    store(db, "claude", 5.0, 0.0, score=9, cache_hit=True)
+    store(db, "claude", 3000.0, 0.004, hedge_role="primary", hedge_outcome="cancelled")
+
+    performance = db.get_model_performance("claude")
+    assert (performance["avg_score"], performance["avg_latency"], performance["total_runs"]) == (8.0, 900.0, 1)
+    assert performance["p99_latency"] == pytest.approx(900.0, rel=0.02)
+
+
+def test_rebuild_matches_the_incrementally_kept_snapshot(db):
+    for i in range(20):
+        store(db, "mistral", 500.0 + 50 * i, 0.001 * i, score=1 + i % 10)
+    rowid = store(db, "mistral", 2000.0, 0.05)
+    db.update_run_critic(rowid, 4, "Thin")
+    store(db, "gpt-4o", 700.0, 0.02, score=7, ttft_ms=150.0, tokens_per_second=40.0)
+    store(db, "gpt-4o", 100.0, 0.0, score=9, cache_hit=True)
+
+    snapshot = rebuilt(db)
+
+    for model in ("mistral", "gpt-4o", "claude"):
+        incremental = db.get_model_performance(model)
+        from_scratch = snapshot.get_performance(model)
+        assert from_scratch == pytest.approx({key: incremental[key] for key in from_scratch})
+        for q in (0.5, 0.95, 0.99):
+            assert snapshot.get_latency_quantile(model, q) == db.stats.get_latency_quantile(model, q)
+    assert (snapshot.last_rowid, snapshot.last_critic_seq) == (db.stats.last_rowid, db.stats.last_critic_seq)
+
+
+def test_snapshot_catches_up_with_rows_written_by_another_process(db, tmp_path):
+    other_process = rebuilt(db)
+    store(db, "claude", 600.0, 0.01, score=5)
+    rowid = store(db, "claude", 800.0, 0.01)
+    db.update_run_critic(rowid, 9, "Great")
+
+    with sqlite3.connect(db.db_path) as conn:
+        other_process.sync(conn)
+
+    assert other_process.get_performance("claude") == db.stats.get_performance("claude")
+
+
+def test_inserts_leave_the_persisted_sketch_until_the_next_checkpoint(db):
+    store(db, "gpt-4o", 800.0, 0.01, score=8)
+    assert db.get_latency_sketch("gpt-4o") is None
+
+    db.stats.last_sketch_save = 0.0  # The checkpoint interval has passed
+    store(db, "gpt-4o", 900.0, 0.01, score=8)
+
+    assert db.get_latency_sketch("gpt-4o").count == 2
+
+
+def test_rebuild_starts_from_the_checkpoint_and_reads_only_later_runs(db):
+    for i in range(10):
+        store(db, "claude", 500.0 + 100 * i, 0.01, score=7)
+    with sqlite3.connect(db.db_path) as conn:
+        db.save_latency_sketches(conn)
+        # Runs the checkpoint covers are not read again: rewriting them leaves the sketch intact
+        conn.execute("UPDATE runs SET latency_ms = 1.0 WHERE model = 'claude'")
+    store(db, "claude", 5000.0, 0.01, score=7)
+    store(db, "mistral", 300.0, 0.01, score=7)
+
+    snapshot = rebuilt(db)
+
+    for model in ("claude", "mistral"):
+        assert snapshot.get_sketch(model).count == db.stats.get_sketch(model).count
+        for q in (0.5, 0.99):
+            assert snapshot.get_latency_quantile(model, q) == db.stats.get_latency_quantile(model, q)
+
+
+def test_checkpoint_without_a_rowid_is_rebuilt_from_runs(db):
+    store(db, "claude", 700.0, 0.01, score=7)
+    with sqlite3.connect(db.db_path) as conn:
+        conn.execute("INSERT OR REPLACE INTO model_latency_sketches (model, sketch) VALUES ('claude', ?)",
+                     (db.stats.get_sketch("claude").to_json(),))
+
+    assert rebuilt(db).get_sketch("claude").count == 1
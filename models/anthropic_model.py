@@ -1,87 +1,153 @@
-import os
 import time
+from contextlib import aclosing
 import anthropic
 from dotenv import load_dotenv
-from typing import Dict
+from typing import AsyncIterator, Dict, Iterator, Optional
+from models.base import ModelWrapper
+from models.http_pool import get_http_pool
+from models.provider_pool import get_provider_pool
 
 # Load environment variables
 load_dotenv()
 
-class AnthropicModel:
+class AnthropicModel(ModelWrapper):
+    provider_label = "Claude"
+
     def __init__(self):
-        self.client = anthropic.Anthropic(api_key=os.getenv('ANTHROPIC_API_KEY'))
+        self.pool = get_provider_pool("anthropic")
+        self.clients = {member.name: self._build_client(member) for member in self.pool.members}
         self.model_name = "claude-3-5-sonnet-20241022"
         # Anthropic pricing per 1K tokens
         self.input_price_per_1k = 0.003  # $0.003 per 1K input tokens
         self.output_price_per_1k = 0.015  # $0.015 per 1K output tokens
-        
-    def generate_response(self, prompt: str) -> Dict:
+
+    def _build_client(self, member):
+        # A member's rate governor retries 429s itself, after the provider's Retry-After
+        return anthropic.Anthropic(api_key=member.api_key, base_url=member.base_url,
+                                   max_retries=0 if member.governor else 2,
+                                   http_client=get_http_pool().client(member.host))
+
+    def _build_request(self, prompt: str) -> Dict:
+        return {
+            "model": self.model_name,
+            "max_tokens": self.max_tokens,
+            "temperature": self.temperature,
+            "system": self.system_prompt,
+            "messages": [
+                {"role": "user", "content": prompt}
+            ]
+        }
+
+    def _stream_event(self, event, state: Dict) -> Optional[str]:
+        """Fold one stream event's usage into state; the text it carries, if any"""
+        if event.type == "message_start":
+            state["input_tokens"] = event.message.usage.input_tokens
+        elif event.type == "message_delta":
+            state["output_tokens"] = event.usage.output_tokens
+        elif event.type == "content_block_delta":
+            return getattr(event.delta, "text", None)
+        return None
+
+    def _parse_response(self, response, latency_ms: float) -> Dict:
+        answer_text = response.content[0].text
+        return self._success_response(
+            answer_text,
+            latency_ms,
+            response.usage.input_tokens,
+            response.usage.output_tokens
+        )
+
+    def generate_response(self, prompt: str, timeout: Optional[float] = None) -> Dict:
         """Generate response from Anthropic Claude"""
+        return self._pooled_call(prompt, timeout or self.request_timeout_s, self._call)
+
+    def _call(self, member, prompt: str, timeout: float) -> Dict:
+        start_time = time.time()
+
+        try:
+            response = self.clients[member.name].messages.create(**self._build_request(prompt), timeout=timeout)
+
+            latency_ms = (time.time() - start_time) * 1000
+            return self._parse_response(response, latency_ms)
+
+        except Exception as e:
+            return self._exception_response(e, (time.time() - start_time) * 1000)
+
+    def generate_stream(self, prompt: str, timeout: Optional[float] = None) -> Iterator[Dict]:
+        """Stream a response from Anthropic Claude token by token"""
+        return self._pooled_stream(prompt, timeout or self.request_timeout_s, self._stream)
+
+    def _stream(self, member, prompt: str, timeout: float) -> Iterator[Dict]:
+        start_time = time.time()
+        first_token_time, parts, state = None, [], {}
+
+        try:
+            with self.clients[member.name].messages.create(**self._build_request(prompt),
+                                                           stream=True, timeout=timeout) as stream:
+                for event in stream:
+                    text = self._stream_event(event, state)
+                    if text:
+                        first_token_time = first_token_time or time.time()
+                        parts.append(text)
+                        yield self._token_event(text)
+
+            yield self._done_event(self._stream_response(
+                prompt, start_time, first_token_time, parts,
+                state.get("input_tokens"), state.get("output_tokens")
+            ))
+
+        except Exception as e:
+            yield self._done_event(self._exception_response(e, (time.time() - start_time) * 1000))
+
+class AsyncAnthropicModel(AnthropicModel):
+    """Asyncio-native Anthropic wrapper with the same response contract"""
+
+    def _build_client(self, member):
+        return anthropic.AsyncAnthropic(api_key=member.api_key, base_url=member.base_url,
+                                        max_retries=0 if member.governor else 2,
+                                        http_client=get_http_pool().async_client(member.host))
+
+    async def generate_response(self, prompt: str, timeout: Optional[float] = None) -> Dict:
+        """Generate response from Anthropic Claude without blocking the event loop"""
+        return await self._pooled_call_async(prompt, timeout or self.request_timeout_s, self._call)
+
+    async def _call(self, member, prompt: str, timeout: float) -> Dict:
+        start_time = time.time()
+
+        try:
+            response = await self.clients[member.name].messages.create(**self._build_request(prompt), timeout=timeout)
+
+            latency_ms = (time.time() - start_time) * 1000
+            return self._parse_response(response, latency_ms)
+
+        except Exception as e:
+            return self._exception_response(e, (time.time() - start_time) * 1000)
+
+    async def generate_stream(self, prompt: str, timeout: Optional[float] = None) -> AsyncIterator[Dict]:
+        """Stream a response from Anthropic Claude without blocking the event loop"""
+        async with aclosing(self._pooled_stream_async(prompt, timeout or self.request_timeout_s, self._stream)) as events:
+            async for event in events:
+                yield event
+
+    async def _stream(self, member, prompt: str, timeout: float) -> AsyncIterator[Dict]:
         start_time = time.time()
-        
+        first_token_time, parts, state = None, [], {}
+
         try:
-            response = self.client.messages.create(
-                model=self.model_name,
-                max_tokens=1500,
-                temperature=0.7,
-                system="You are a helpful assistant specializing in go-to-market strategy and business development. Provide comprehensive, actionable insights.",
-                messages=[
-                    {"role": "user", "content": prompt}
-                ]
-            )
-            
-            end_time = time.time()
-            latency_ms = (end_time - start_time) * 1000
-            
-            # Extract response data
-            answer_text = response.content[0].text
-            input_tokens = response.usage.input_tokens
-            output_tokens = response.usage.output_tokens
-            total_tokens = input_tokens + output_tokens
-            
-            # Validate response
-            if not answer_text or answer_text.strip() == "":
-                return {
-                    "answer_text": "Error generating response: Empty response from Claude",
-                    "latency_ms": latency_ms,
-                    "tokens": 0,
-                    "estimated_cost": 0.0,
-                    "input_tokens": 0,
-                    "output_tokens": 0,
-                    "error_type": "empty_response"
-                }
-            
-            # Calculate cost
-            input_cost = (input_tokens / 1000) * self.input_price_per_1k
-            output_cost = (output_tokens / 1000) * self.output_price_per_1k
-            estimated_cost = input_cost + output_cost
-            
-            return {
-                "answer_text": answer_text,
-                "latency_ms": latency_ms,
-                "tokens": total_tokens,
-                "estimated_cost": estimated_cost,
-                "input_tokens": input_tokens,
-                "output_tokens": output_tokens
-            }
-            
+            stream = await self.clients[member.name].messages.create(**self._build_request(prompt),
+                                                                     stream=True, timeout=timeout)
+            async with stream:
+                async for event in stream:
+                    text = self._stream_event(event, state)
+                    if text:
+                        first_token_time = first_token_time or time.time()
+                        parts.append(text)
+                        yield self._token_event(text)
+
+            yield self._done_event(self._stream_response(
+                prompt, start_time, first_token_time, parts,
+                state.get("input_tokens"), state.get("output_tokens")
+            ))
+
         except Exception as e:
-            error_type = "unknown_error"
-            if "rate limit" in str(e).lower():
-                error_type = "rate_limit"
-            elif "invalid api key" in str(e).lower() or "authentication" in str(e).lower():
-                error_type = "auth_error"
-            elif "timeout" in str(e).lower():
-                error_type = "timeout"
-            elif "connection" in str(e).lower():
-                error_type = "connection_error"
-            
-            return {
-                "answer_text": f"Error generating response: {str(e)}",
-                "latency_ms": (time.time() - start_time) * 1000,
-                "tokens": 0,
-                "estimated_cost": 0.0,
-                "input_tokens": 0,
-                "output_tokens": 0,
-                "error_type": error_type
-            } 
\ No newline at end of file
+            yield self._done_event(self._exception_response(e, (time.time() - start_time) * 1000))
@@ -0,0 +1,255 @@
+import time
+from contextlib import aclosing
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional
+
+# System prompt shared by every model wrapper
+SYSTEM_PROMPT = "You are a helpful assistant specializing in go-to-market strategy and business development. Provide comprehensive, actionable insights."
+
+
+class ModelWrapper:
+    """
+    Shared contract for model wrappers.
+
+    Every wrapper, sync or async, exposes generate_response(prompt, timeout=None) and returns a dict
+    with answer_text, latency_ms, tokens, estimated_cost, input_tokens and output_tokens.
+    Failures never raise: they return answer_text starting with
+    "Error generating response:", zero tokens and cost, and an error_type.
+
+    generate_stream(prompt, timeout=None) is the streaming variant (a generator, or an async
+    generator on async wrappers). It yields {"type": "token", "text": ...} events as the answer
+    arrives and ends with {"type": "done", "response": ...}, where the response follows the
+    same contract plus ttft_ms (time to first token) and tokens_per_second.
+
+    Each call goes to one member of the provider's pool of credential/endpoint pairs
+    (models/provider_pool.py), through that member's RateGovernor (models/rate_limiter.py)
+    when one is configured. Rate-limited calls are retried, on another member when the
+    pool has one, as long as the timeout allows, instead of surfacing as errors the router
+    falls back on.
+    """
+
+    model_name = ""
+    provider_label = ""
+    system_prompt = SYSTEM_PROMPT
+    temperature = 0.7
+    max_tokens = 1500
+    input_price_per_1k = 0.0
+    output_price_per_1k = 0.0
+    # Default per-call timeout; the router overrides it from config/settings.yaml
+    request_timeout_s = 60.0
+    # Shared ProviderPool whose members this wrapper keeps a client for
+    pool = None
+    # Attempts after the first for rate-limited calls
+    rate_limit_retries = 3
+
+    def _calculate_cost(self, input_tokens: int, output_tokens: int) -> float:
+        """Calculate cost from token counts and per-1K pricing"""
+        input_cost = (input_tokens / 1000) * self.input_price_per_1k
+        output_cost = (output_tokens / 1000) * self.output_price_per_1k
+        return input_cost + output_cost
+
+    def _success_response(self, answer_text: str, latency_ms: float,
+                          input_tokens: int, output_tokens: int) -> Dict:
+        """Build a successful response, or an error response if the answer is empty"""
+        if not answer_text or answer_text.strip() == "":
+            return self._error_response(
+                f"Empty response from {self.provider_label}", latency_ms, "empty_response"
+            )
+
+        return {
+            "answer_text": answer_text,
+            "latency_ms": latency_ms,
+            "tokens": input_tokens + output_tokens,
+            "estimated_cost": self._calculate_cost(input_tokens, output_tokens),
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens
+        }
+
+    def _stream_response(self, prompt: str, start_time: float, first_token_time: Optional[float],
+                         parts: List[str], input_tokens: Optional[int], output_tokens: Optional[int]) -> Dict:
+        """Build the final response of a completed stream, with its streaming timings"""
+        end_time = time.time()
+        answer_text = "".join(parts)
+        if input_tokens is None:
+            # Rough estimation when the stream carried no usage: ~4 characters per token
+            input_tokens = (len(self.system_prompt or "") + len(prompt)) // 4
+        if output_tokens is None:
+            output_tokens = len(answer_text) // 4
+        response = self._success_response(answer_text, (end_time - start_time) * 1000, input_tokens, output_tokens)
+        if first_token_time is not None and "error_type" not in response:
+            response["ttft_ms"] = (first_token_time - start_time) * 1000
+            generation_s = end_time - first_token_time
+            response["tokens_per_second"] = output_tokens / generation_s if generation_s > 0 else None
+        return response
+
+    @staticmethod
+    def _token_event(text: str) -> Dict:
+        return {"type": "token", "text": text}
+
+    @staticmethod
+    def _done_event(response: Dict) -> Dict:
+        return {"type": "done", "response": response}
+
+    def _error_response(self, message: str, latency_ms: float, error_type: str,
+                        retry_after_s: Optional[float] = None) -> Dict:
+        """Build an error response"""
+        response = {
+            "answer_text": f"Error generating response: {message}",
+            "latency_ms": latency_ms,
+            "tokens": 0,
+            "estimated_cost": 0.0,
+            "input_tokens": 0,
+            "output_tokens": 0,
+            "error_type": error_type
+        }
+        if retry_after_s is not None:
+            response["retry_after_s"] = retry_after_s
+        return response
+
+    def _exception_response(self, e: Exception, latency_ms: float) -> Dict:
+        """Error response for an SDK exception, with the Retry-After of a 429"""
+        response = getattr(e, "response", None)
+        headers = getattr(response, "headers", None)
+        if getattr(response, "status_code", None) == 429:
+            return self._error_response(str(e), latency_ms, "rate_limit", retry_after(headers))
+        return self._error_response(str(e), latency_ms, self._classify_error(e), retry_after(headers))
+
+    def _reserved_tokens(self, prompt: str) -> int:
+        """Tokens a provider counts against the per-minute quota when the call is sent"""
+        return (len(self.system_prompt or "") + len(prompt or "")) // 4 + self.max_tokens
+
+    def _throttled_response(self, start_time: float) -> Dict:
+        return self._error_response(
+            f"{self.provider_label} rate limit leaves no room for the call within its timeout",
+            (time.time() - start_time) * 1000, "rate_limit"
+        )
+
+    def _pooled_call(self, prompt: str, timeout: float, call: Callable[..., Dict]) -> Dict:
+        """Send call(member, prompt, timeout) to a pool member, retrying rate-limited attempts"""
+        start_time = time.time()
+        for _ in range(self.rate_limit_retries + 1):
+            member = self.pool.select()
+            permit = member.acquire(self._reserved_tokens(prompt), timeout - (time.time() - start_time))
+            if permit is None:
+                self.pool.release(member, None, None)
+                return self._throttled_response(start_time)
+            response = None
+            try:
+                response = call(member, prompt, timeout - (time.time() - start_time))
+            finally:
+                self.pool.release(member, permit, response)
+            response["pool_member"] = member.name
+            if response.get("error_type") != "rate_limit":
+                break
+        return response
+
+    async def _pooled_call_async(self, prompt: str, timeout: float, call: Callable[..., Awaitable[Dict]]) -> Dict:
+        """_pooled_call for coroutine calls"""
+        start_time = time.time()
+        for _ in range(self.rate_limit_retries + 1):
+            member = self.pool.select()
+            permit = await member.acquire_async(self._reserved_tokens(prompt), timeout - (time.time() - start_time))
+            if permit is None:
+                self.pool.release(member, None, None)
+                return self._throttled_response(start_time)
+            response = None
+            try:
+                response = await call(member, prompt, timeout - (time.time() - start_time))
+            finally:
+                self.pool.release(member, permit, response)
+            response["pool_member"] = member.name
+            if response.get("error_type") != "rate_limit":
+                break
+        return response
+
+    def _pooled_stream(self, prompt: str, timeout: float, stream: Callable[..., Iterator[Dict]]) -> Iterator[Dict]:
+        """
+        Relay the events of stream(member, prompt, timeout) from a pool member, retrying
+        attempts rate limited before their first token
+        """
+        start_time = time.time()
+        for _ in range(self.rate_limit_retries + 1):
+            member = self.pool.select()
+            permit = member.acquire(self._reserved_tokens(prompt), timeout - (time.time() - start_time))
+            if permit is None:
+                self.pool.release(member, None, None)
+                yield self._done_event(self._throttled_response(start_time))
+                return
+            response = None
+            streamed = False
+            try:
+                for event in stream(member, prompt, timeout - (time.time() - start_time)):
+                    if event["type"] == "done":
+                        response = event["response"]
+                    else:
+                        streamed = True
+                        yield event
+            finally:
+                self.pool.release(member, permit, response)
+            response["pool_member"] = member.name
+            if response.get("error_type") != "rate_limit" or streamed:
+                break
+        yield self._done_event(response)
+
+    async def _pooled_stream_async(self, prompt: str, timeout: float,
+                                   stream: Callable[..., AsyncIterator[Dict]]) -> AsyncIterator[Dict]:
+        """_pooled_stream for async generators"""
+        start_time = time.time()
+        for _ in range(self.rate_limit_retries + 1):
+            member = self.pool.select()
+            permit = await member.acquire_async(self._reserved_tokens(prompt), timeout - (time.time() - start_time))
+            if permit is None:
+                self.pool.release(member, None, None)
+                yield self._done_event(self._throttled_response(start_time))
+                return
+            response = None
+            streamed = False
+            try:
+                async with aclosing(stream(member, prompt, timeout - (time.time() - start_time))) as events:
+                    async for event in events:
+                        if event["type"] == "done":
+                            response = event["response"]
+                        else:
+                            streamed = True
+                            yield event
+            finally:
+                self.pool.release(member, permit, response)
+            response["pool_member"] = member.name
+            if response.get("error_type") != "rate_limit" or streamed:
+                break
+        yield self._done_event(response)
+
+    def _classify_error(self, e: Exception) -> str:
+        """Map an SDK exception to an error_type from its message"""
+        message = str(e).lower()
+        if "rate limit" in message:
+            return "rate_limit"
+        elif "invalid api key" in message or "authentication" in message:
+            return "auth_error"
+        elif "timeout" in message:
+            return "timeout"
+        elif "connection" in message:
+            return "connection_error"
+        return "unknown_error"
+
+
+def is_error_response(response: Dict) -> bool:
+    """Whether a response from a wrapper or the router is a failure rather than an answer"""
+    return (
+        response.get('answer_text', '').startswith('Error generating response:') or
+        response.get('tokens', 0) == 0 or
+        (response.get('estimated_cost', 0) == 0.0 and not response.get('cache_hit'))
+    )
+
+
+def retry_after(headers) -> Optional[float]:
+    """Seconds from a retry-after-ms or Retry-After (seconds) response header"""
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        pass  # HTTP-date form; the governor's backoff applies instead
+    return None
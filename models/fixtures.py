@@ -0,0 +1,310 @@
+"""
+Record/replay fixtures of provider traffic.
+
+In record mode every HTTP exchange of the model wrappers and the critic is appended to
+a gzipped JSON-lines file: the request's key (host, path and a hash of its canonical
+body), the response status, headers and raw body chunks, and when each chunk arrived.
+In replay mode the same requests are answered from that file without touching the
+network, with the recorded timings divided by speed (1 plays back at the original
+pace, 0 instantly). Requests seen several times in the recording (the same prompt run
+twice, retries) are replayed in recorded order; a request that was never recorded
+fails with a connection error, as an unreachable provider would.
+
+Recording sits on top of whatever transport the HTTP pool would have used (the
+network or the mock provider); replay replaces it.
+"""
+
+import asyncio
+import base64
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterator, List, Optional
+
+from models.http_pool import httpx
+
+MODES = ("live", "record", "replay")
+
+
+def request_key(request: httpx.Request) -> str:
+    """Host, path and a hash of the body, with JSON bodies compared by content"""
+    body = request.content
+    try:
+        body = json.dumps(json.loads(body), sort_keys=True).encode("utf-8")
+    except ValueError:
+        pass
+    digest = hashlib.sha256(body).hexdigest()[:32]
+    return f"{request.method} {request.url.host}{request.url.path} {digest}"
+
+
+def _encode(data: bytes) -> Dict:
+    try:
+        return {"text": data.decode("utf-8")}
+    except UnicodeDecodeError:
+        return {"b64": base64.b64encode(data).decode("ascii")}
+
+
+def _decode(chunk: Dict) -> bytes:
+    return chunk["text"].encode("utf-8") if "text" in chunk else base64.b64decode(chunk["b64"])
+
+
+class _Recording:
+    """One exchange being recorded: chunk delays are seconds since the previous event"""
+
+    def __init__(self, store: "FixtureStore", request: httpx.Request, start: float):
+        self.store = store
+        self.record = {"key": request_key(request), "url": str(request.url), "chunks": []}
+        self.last = start
+        self.saved = False
+
+    def _elapsed(self) -> float:
+        now = time.perf_counter()
+        elapsed, self.last = now - self.last, now
+        return round(elapsed, 4)
+
+    def response(self, response: httpx.Response):
+        self.record.update(status=response.status_code, headers=response.headers.multi_items(),
+                           wait_s=self._elapsed())
+
+    def chunk(self, data: bytes):
+        self.record["chunks"].append([self._elapsed(), _encode(data)])
+
+    def error(self, e: Exception):
+        self.record.setdefault("wait_s", self._elapsed())
+        self.record["error"] = [type(e).__name__, str(e)]
+        self.finish()
+
+    def finish(self):
+        """Save the exchange as far as the caller read it (SDKs stop reading streams at their end marker)"""
+        if not self.saved:
+            self.saved = True
+            self.store.save(self.record)
+
+
+class _RecordingStream(httpx.SyncByteStream):
+    def __init__(self, stream: httpx.SyncByteStream, recording: _Recording):
+        self.stream = stream
+        self.recording = recording
+
+    def __iter__(self):
+        try:
+            for data in self.stream:
+                self.recording.chunk(data)
+                yield data
+        except httpx.TransportError as e:
+            self.recording.error(e)
+            raise
+
+    def close(self):
+        self.recording.finish()
+        self.stream.close()
+
+
+class _AsyncRecordingStream(httpx.AsyncByteStream):
+    def __init__(self, stream: httpx.AsyncByteStream, recording: _Recording):
+        self.stream = stream
+        self.recording = recording
+
+    async def __aiter__(self):
+        try:
+            async for data in self.stream:
+                self.recording.chunk(data)
+                yield data
+        except httpx.TransportError as e:
+            self.recording.error(e)
+            raise
+
+    async def aclose(self):
+        self.recording.finish()
+        await self.stream.aclose()
+
+
+class RecordingTransport(httpx.BaseTransport):
+    """Passes requests to the wrapped transport and records each complete exchange"""
+
+    def __init__(self, store: "FixtureStore", transport: httpx.BaseTransport):
+        self.store = store
+        self.transport = transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        request.read()
+        recording = _Recording(self.store, request, time.perf_counter())
+        try:
+            response = self.transport.handle_request(request)
+        except httpx.TransportError as e:
+            recording.error(e)
+            raise
+        recording.response(response)
+        return httpx.Response(response.status_code, headers=response.headers,
+                              stream=_RecordingStream(response.stream, recording),
+                              extensions=response.extensions, request=request)
+
+    def close(self):
+        self.transport.close()
+
+
+class AsyncRecordingTransport(httpx.AsyncBaseTransport):
+    def __init__(self, store: "FixtureStore", transport: httpx.AsyncBaseTransport):
+        self.store = store
+        self.transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await request.aread()
+        recording = _Recording(self.store, request, time.perf_counter())
+        try:
+            response = await self.transport.handle_async_request(request)
+        except httpx.TransportError as e:
+            recording.error(e)
+            raise
+        recording.response(response)
+        return httpx.Response(response.status_code, headers=response.headers,
+                              stream=_AsyncRecordingStream(response.stream, recording),
+                              extensions=response.extensions, request=request)
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+def _replay_error(record: Dict, request: httpx.Request) -> Exception:
+    name, message = record["error"]
+    error_class = getattr(httpx, name, None)
+    if not (isinstance(error_class, type) and issubclass(error_class, httpx.TransportError)):
+        error_class = httpx.TransportError
+    return error_class(message, request=request)
+
+
+class ReplayTransport(httpx.BaseTransport):
+    """Answers requests from the recording at the recorded timings, scaled by the store's speed"""
+
+    def __init__(self, store: "FixtureStore"):
+        self.store = store
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        request.read()
+        record = self.store.lookup(request)
+        schedule = self.store.schedule(record)
+        time.sleep(max(0.0, next(schedule) - time.perf_counter()))
+        if "status" not in record:
+            raise _replay_error(record, request)
+
+        def body():
+            for due, (_, chunk) in zip(schedule, record["chunks"]):
+                time.sleep(max(0.0, due - time.perf_counter()))
+                yield _decode(chunk)
+            if "error" in record:
+                raise _replay_error(record, request)
+
+        return httpx.Response(record["status"], headers=record["headers"], content=body(), request=request)
+
+
+class AsyncReplayTransport(httpx.AsyncBaseTransport):
+    def __init__(self, store: "FixtureStore"):
+        self.store = store
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await request.aread()
+        record = self.store.lookup(request)
+        schedule = self.store.schedule(record)
+        await asyncio.sleep(max(0.0, next(schedule) - time.perf_counter()))
+        if "status" not in record:
+            raise _replay_error(record, request)
+
+        async def body():
+            for due, (_, chunk) in zip(schedule, record["chunks"]):
+                await asyncio.sleep(max(0.0, due - time.perf_counter()))
+                yield _decode(chunk)
+            if "error" in record:
+                raise _replay_error(record, request)
+
+        return httpx.Response(record["status"], headers=record["headers"], content=body(), request=request)
+
+
+class FixtureStore:
+    """
+    A fixture file in record or replay mode. wrap() and wrap_async() put the matching
+    transport around the one the HTTP pool built for a host.
+    """
+
+    def __init__(self, path: str, mode: str, speed: float = 1.0):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown fixture mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.speed = speed
+        self.recorded = 0
+        self.replayed = 0
+        self.misses = 0
+        self._records: Dict[str, List[Dict]] = {}
+        self._served: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        if mode == "replay":
+            self._load()
+        elif os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def _load(self):
+        with gzip.open(self.path, "rt", encoding="utf-8") as file:
+            for line in file:
+                record = json.loads(line)
+                self._records.setdefault(record["key"], []).append(record)
+
+    def save(self, record: Dict):
+        line = (json.dumps(record, separators=(",", ":")) + "\n").encode("utf-8")
+        with self._lock:
+            # One gzip member per exchange, so the file stays readable if the run is killed
+            with gzip.open(self.path, "ab") as file:
+                file.write(line)
+            self.recorded += 1
+
+    def lookup(self, request: httpx.Request) -> Dict:
+        """The next recorded exchange for a request, cycling when they run out"""
+        key = request_key(request)
+        with self._lock:
+            records = self._records.get(key)
+            if not records:
+                self.misses += 1
+                raise httpx.ConnectError(f"No recorded fixture for {request.method} {request.url}",
+                                         request=request)
+            served = self._served.get(key, 0)
+            self._served[key] = served + 1
+            self.replayed += 1
+            return records[served % len(records)]
+
+    def schedule(self, record: Dict) -> Iterator[float]:
+        """
+        perf_counter times at which the headers and then each chunk of a recorded exchange
+        are due, so replay keeps the recorded pace instead of accumulating sleep overshoot
+        """
+        due = time.perf_counter()
+        for delay in [record["wait_s"]] + [delay for delay, _ in record["chunks"]]:
+            due += delay / self.speed if self.speed > 0 else 0.0
+            yield due
+
+    def wrap(self, transport: httpx.BaseTransport) -> httpx.BaseTransport:
+        return RecordingTransport(self, transport) if self.mode == "record" else ReplayTransport(self)
+
+    def wrap_async(self, transport: httpx.AsyncBaseTransport) -> httpx.AsyncBaseTransport:
+        return AsyncRecordingTransport(self, transport) if self.mode == "record" else AsyncReplayTransport(self)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "path": self.path,
+                "recorded": self.recorded,
+                "replayed": self.replayed,
+                "misses": self.misses,
+                "exchanges": sum(len(records) for records in self._records.values())
+            }
+
+
+def open_fixtures(config: Dict) -> Optional[FixtureStore]:
+    """The fixture store of the fixtures section of config/settings.yaml; None when live"""
+    if config['mode'] not in MODES:
+        raise ValueError(f"Unknown fixture mode: {config['mode']}")
+    if config['mode'] == "live":
+        return None
+    return FixtureStore(config['path'], config['mode'], config['speed'])
@@ -0,0 +1,231 @@
+import asyncio
+import threading
+import time
+import weakref
+from typing import Dict, Optional
+
+from config.settings import load_settings
+
+# The openai and anthropic releases in requirements.txt ship on httpx2, an API-compatible
+# httpx fork, and only accept clients from that package
+import httpx2 as httpx
+
+try:
+    import h2  # noqa: F401 - optional, enables HTTP/2 in httpx
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+OPENAI_HOST = "api.openai.com"
+ANTHROPIC_HOST = "api.anthropic.com"
+MISTRAL_HOST = "api.mistral.ai"
+
+
+class _PoolStats:
+    """Counters for one host's connection pool"""
+
+    def __init__(self):
+        self.requests = 0
+        self.new_connections = 0
+        self.connect_ms = 0.0
+        self.wait_ms = 0.0
+        self.max_wait_ms = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, new_connection: bool, connect_ms: float, wait_ms: float):
+        with self._lock:
+            self.requests += 1
+            if new_connection:
+                self.new_connections += 1
+                self.connect_ms += connect_ms
+            self.wait_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "new_connections": self.new_connections,
+                "reuse_ratio": round(1 - self.new_connections / self.requests, 3) if self.requests else None,
+                "avg_connect_ms": round(self.connect_ms / self.new_connections, 1) if self.new_connections else None,
+                "avg_wait_ms": round(self.wait_ms / self.requests, 2) if self.requests else None,
+                "max_wait_ms": round(self.max_wait_ms, 2)
+            }
+
+
+class _RequestTrace:
+    """
+    httpcore trace callback for one request. A connect_tcp event means the request
+    opened a new connection; the time before its headers went out, minus any connect
+    and TLS time, is time spent waiting for a pooled connection.
+    """
+
+    def __init__(self, stats: _PoolStats):
+        self.stats = stats
+        self.start = time.perf_counter()
+        self.connect_started: Optional[float] = None
+        self.connected: Optional[float] = None
+        self.headers_sent: Optional[float] = None
+
+    def on_event(self, event_name: str, info: Dict):
+        now = time.perf_counter()
+        if event_name == "connection.connect_tcp.started":
+            self.connect_started = now
+        elif event_name in ("connection.connect_tcp.complete", "connection.start_tls.complete"):
+            self.connected = now
+        elif event_name.endswith("send_request_headers.started") and self.headers_sent is None:
+            self.headers_sent = now
+
+    async def on_event_async(self, event_name: str, info: Dict):
+        self.on_event(event_name, info)
+
+    def finish(self):
+        if self.headers_sent is None:
+            return  # Failed before the request went out
+        connect_ms = 0.0
+        if self.connect_started is not None:
+            connect_ms = ((self.connected or self.connect_started) - self.connect_started) * 1000
+        wait_ms = max((self.headers_sent - self.start) * 1000 - connect_ms, 0.0)
+        self.stats.record(self.connect_started is not None, connect_ms, wait_ms)
+
+
+class _TracedTransport(httpx.HTTPTransport):
+    def __init__(self, stats: _PoolStats, **kwargs):
+        super().__init__(**kwargs)
+        self.stats = stats
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        trace = _RequestTrace(self.stats)
+        request.extensions = {**request.extensions, "trace": trace.on_event}
+        try:
+            return super().handle_request(request)
+        finally:
+            trace.finish()
+
+
+class _TracedAsyncTransport(httpx.AsyncBaseTransport):
+    """
+    Async transport keeping one connection pool per event loop. Pooled connections
+    belong to the loop that opened them, and wrappers are built before any loop runs.
+    """
+
+    def __init__(self, stats: _PoolStats, **kwargs):
+        self.stats = stats
+        self.kwargs = kwargs
+        self._transports = weakref.WeakKeyDictionary()  # event loop -> AsyncHTTPTransport
+
+    def _transport(self) -> httpx.AsyncHTTPTransport:
+        loop = asyncio.get_running_loop()
+        transport = self._transports.get(loop)
+        if transport is None:
+            transport = httpx.AsyncHTTPTransport(**self.kwargs)
+            self._transports[loop] = transport
+        return transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        trace = _RequestTrace(self.stats)
+        request.extensions = {**request.extensions, "trace": trace.on_event_async}
+        try:
+            return await self._transport().handle_async_request(request)
+        finally:
+            trace.finish()
+
+    async def aclose(self):
+        transport = self._transports.pop(asyncio.get_running_loop(), None)
+        if transport is not None:
+            await transport.aclose()
+
+
+class HTTPPool:
+    """
+    Process-wide keep-alive HTTP clients, one sync and one async client per API host,
+    shared by every model wrapper and the critic. Each host has its own pool size,
+    HTTP/2 is used when the optional h2 package is installed, and pool statistics
+    (connection reuse ratio, time waiting for a connection) are kept per host.
+    With a mock provider, every client answers from it instead of the network; with a
+    fixture store, clients record their traffic to it or replay it.
+    """
+
+    def __init__(self, config: Dict, mock=None, fixtures=None):
+        self.config = config
+        self.mock = mock
+        self.fixtures = fixtures
+        self.http2 = bool(config['http2']) and HTTP2_AVAILABLE
+        self._clients: Dict[str, httpx.Client] = {}
+        self._async_clients: Dict[str, httpx.AsyncClient] = {}
+        self._stats: Dict[str, _PoolStats] = {}
+        self._lock = threading.Lock()
+
+    def _transport_kwargs(self, host: str) -> Dict:
+        max_connections = self.config['hosts'].get(host, self.config['max_connections'])
+        limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=min(self.config['max_keepalive_connections'], max_connections),
+            keepalive_expiry=self.config['keepalive_expiry_s']
+        )
+        return {"limits": limits, "http2": self.http2, "retries": self.config['connect_retries']}
+
+    def _host_stats(self, host: str) -> _PoolStats:
+        if host not in self._stats:
+            self._stats[host] = _PoolStats()
+        return self._stats[host]
+
+    def client(self, host: str) -> httpx.Client:
+        """The shared sync client for an API host"""
+        with self._lock:
+            if host not in self._clients:
+                if self.mock is not None:
+                    transport = self.mock.transport()
+                else:
+                    transport = _TracedTransport(self._host_stats(host), **self._transport_kwargs(host))
+                if self.fixtures is not None:
+                    transport = self.fixtures.wrap(transport)
+                self._clients[host] = httpx.Client(transport=transport, timeout=None)
+            return self._clients[host]
+
+    def async_client(self, host: str) -> httpx.AsyncClient:
+        """The shared async client for an API host"""
+        with self._lock:
+            if host not in self._async_clients:
+                if self.mock is not None:
+                    transport = self.mock.async_transport()
+                else:
+                    transport = _TracedAsyncTransport(self._host_stats(host), **self._transport_kwargs(host))
+                if self.fixtures is not None:
+                    transport = self.fixtures.wrap_async(transport)
+                self._async_clients[host] = httpx.AsyncClient(transport=transport, timeout=None)
+            return self._async_clients[host]
+
+    def use_fixtures(self, fixtures):
+        """Record to or replay from a fixture store; only clients created afterwards use it"""
+        with self._lock:
+            self.fixtures = fixtures
+
+    def get_stats(self) -> Dict[str, Dict]:
+        """Pool statistics per host"""
+        with self._lock:
+            hosts = dict(self._stats)
+        return {host: stats.snapshot() for host, stats in hosts.items()}
+
+
+_pool: Optional[HTTPPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_http_pool() -> HTTPPool:
+    """
+    The process-wide pool, configured from the http_pool section of config/settings.yaml
+    (answering from the mock provider when mock_provider.enabled is set, and recording or
+    replaying traffic as the fixtures section says)
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            settings = load_settings()
+            mock = None
+            if settings['mock_provider']['enabled']:
+                from models.mock_provider import MockProvider  # Imports this module's httpx
+                mock = MockProvider(settings['mock_provider'])
+            from models.fixtures import open_fixtures
+            _pool = HTTPPool(settings['http_pool'], mock, open_fixtures(settings['fixtures']))
+        return _pool
@@ -1,119 +1,195 @@
-import os
+import json
 import time
-import requests
+from contextlib import aclosing
 from dotenv import load_dotenv
-from typing import Dict
+from typing import AsyncIterator, Dict, Iterator, Optional
+from models.base import ModelWrapper, retry_after
+from models.http_pool import get_http_pool, httpx
+from models.provider_pool import get_provider_pool
 
 # Load environment variables
 load_dotenv()
 
-class MistralModel:
+class MistralModel(ModelWrapper):
+    provider_label = "Mistral"
+
     def __init__(self):
-        self.api_key = os.getenv('MISTRAL_API_KEY')
         self.model_name = "mistral-large-latest"
-        self.base_url = "https://api.mistral.ai/v1/chat/completions"
+        self.pool = get_provider_pool("mistral")
+        self.clients = {member.name: self._build_client(member) for member in self.pool.members}
         # Mistral pricing per 1K tokens (approximate)
         self.input_price_per_1k = 0.002  # $0.002 per 1K input tokens
         self.output_price_per_1k = 0.006  # $0.006 per 1K output tokens
-        
-    def generate_response(self, prompt: str) -> Dict:
+
+    def _build_client(self, member):
+        return get_http_pool().client(member.host)
+
+    def _build_headers(self, member) -> Dict:
+        return {
+            "Authorization": f"Bearer {member.api_key}",
+            "Content-Type": "application/json"
+        }
+
+    def _build_payload(self, prompt: str) -> Dict:
+        return {
+            "model": self.model_name,
+            "messages": [
+                {"role": "system", "content": self.system_prompt},
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens
+        }
+
+    def _stream_chunk(self, line: str, state: Dict) -> Optional[str]:
+        """Parse one server-sent event line into state; the text it carries, if any"""
+        if not line.startswith("data:"):
+            return None
+        data = line[len("data:"):].strip()
+        if not data or data == "[DONE]":
+            return None
+        chunk = json.loads(data)
+        if chunk.get('usage'):
+            state["input_tokens"] = chunk['usage']['prompt_tokens']
+            state["output_tokens"] = chunk['usage']['completion_tokens']
+        choices = chunk.get('choices') or [{}]
+        return choices[0].get('delta', {}).get('content')
+
+    def _parse_response(self, response_data: Dict, prompt: str, latency_ms: float) -> Dict:
+        answer_text = response_data['choices'][0]['message']['content']
+
+        # Estimate token usage (Mistral doesn't always return usage data)
+        if 'usage' in response_data:
+            input_tokens = response_data['usage']['prompt_tokens']
+            output_tokens = response_data['usage']['completion_tokens']
+        else:
+            # Rough estimation: ~4 characters per token
+            input_tokens = len(prompt) // 4
+            output_tokens = len(answer_text or "") // 4
+
+        return self._success_response(answer_text, latency_ms, input_tokens, output_tokens)
+
+    def _failure_response(self, e: Exception, latency_ms: float) -> Dict:
+        """Map an exception raised by an HTTP call to an error response"""
+        if isinstance(e, httpx.HTTPStatusError):
+            error_type = self._classify_status(e.response.status_code)
+            return self._error_response(str(e), latency_ms, error_type, retry_after(e.response.headers))
+        if isinstance(e, httpx.TimeoutException):
+            return self._error_response(str(e), latency_ms, "timeout")
+        if isinstance(e, httpx.RequestError):
+            return self._error_response(str(e), latency_ms, "connection_error")
+        return self._error_response(str(e), latency_ms, "unknown_error")
+
+    def _classify_status(self, status_code: int) -> str:
+        """Map an HTTP error status to an error_type"""
+        if status_code == 401:
+            return "auth_error"
+        elif status_code == 429:
+            return "rate_limit"
+        elif status_code >= 500:
+            return "server_error"
+        return "connection_error"
+
+    def generate_response(self, prompt: str, timeout: Optional[float] = None) -> Dict:
         """Generate response from Mistral"""
+        return self._pooled_call(prompt, timeout or self.request_timeout_s, self._call)
+
+    def _call(self, member, prompt: str, timeout: float) -> Dict:
+        start_time = time.time()
+
+        try:
+            response = self.clients[member.name].post(f"{member.base_url}/chat/completions",
+                                                      headers=self._build_headers(member),
+                                                      json=self._build_payload(prompt), timeout=timeout)
+            response.raise_for_status()
+
+            latency_ms = (time.time() - start_time) * 1000
+            return self._parse_response(response.json(), prompt, latency_ms)
+
+        except Exception as e:
+            return self._failure_response(e, (time.time() - start_time) * 1000)
+
+    def generate_stream(self, prompt: str, timeout: Optional[float] = None) -> Iterator[Dict]:
+        """Stream a response from Mistral token by token"""
+        return self._pooled_stream(prompt, timeout or self.request_timeout_s, self._stream)
+
+    def _stream(self, member, prompt: str, timeout: float) -> Iterator[Dict]:
         start_time = time.time()
-        
+        first_token_time, parts, state = None, [], {}
+
+        try:
+            with self.clients[member.name].stream("POST", f"{member.base_url}/chat/completions",
+                                                  headers=self._build_headers(member),
+                                                  json={**self._build_payload(prompt), "stream": True},
+                                                  timeout=timeout) as response:
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    text = self._stream_chunk(line, state)
+                    if text:
+                        first_token_time = first_token_time or time.time()
+                        parts.append(text)
+                        yield self._token_event(text)
+
+            yield self._done_event(self._stream_response(
+                prompt, start_time, first_token_time, parts,
+                state.get("input_tokens"), state.get("output_tokens")
+            ))
+
+        except Exception as e:
+            yield self._done_event(self._failure_response(e, (time.time() - start_time) * 1000))
+
+class AsyncMistralModel(MistralModel):
+    """Asyncio-native Mistral wrapper with the same response contract"""
+
+    def _build_client(self, member):
+        return get_http_pool().async_client(member.host)
+
+    async def generate_response(self, prompt: str, timeout: Optional[float] = None) -> Dict:
+        """Generate response from Mistral without blocking the event loop"""
+        return await self._pooled_call_async(prompt, timeout or self.request_timeout_s, self._call)
+
+    async def _call(self, member, prompt: str, timeout: float) -> Dict:
+        start_time = time.time()
+
         try:
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
-            
-            data = {
-                "model": self.model_name,
-                "messages": [
-                    {"role": "system", "content": "You are a helpful assistant specializing in go-to-market strategy and business development. Provide comprehensive, actionable insights."},
-                    {"role": "user", "content": prompt}
-                ],
-                "temperature": 0.7,
-                "max_tokens": 1500
-            }
-            
-            response = requests.post(self.base_url, headers=headers, json=data)
+            response = await self.clients[member.name].post(f"{member.base_url}/chat/completions",
+                                                            headers=self._build_headers(member),
+                                                            json=self._build_payload(prompt), timeout=timeout)
             response.raise_for_status()
-            
-            end_time = time.time()
-            latency_ms = (end_time - start_time) * 1000
-            
-            response_data = response.json()
-            
-            # Extract response data
-            answer_text = response_data['choices'][0]['message']['content']
-            
-            # Validate response
-            if not answer_text or answer_text.strip() == "":
-                return {
-                    "answer_text": "Error generating response: Empty response from Mistral",
-                    "latency_ms": latency_ms,
-                    "tokens": 0,
-                    "estimated_cost": 0.0,
-                    "input_tokens": 0,
-                    "output_tokens": 0,
-                    "error_type": "empty_response"
-                }
-            
-            # Estimate token usage (Mistral doesn't always return usage data)
-            if 'usage' in response_data:
-                input_tokens = response_data['usage']['prompt_tokens']
-                output_tokens = response_data['usage']['completion_tokens']
-                total_tokens = response_data['usage']['total_tokens']
-            else:
-                # Rough estimation: ~4 characters per token
-                input_tokens = len(prompt) // 4
-                output_tokens = len(answer_text) // 4
-                total_tokens = input_tokens + output_tokens
-            
-            # Calculate cost
-            input_cost = (input_tokens / 1000) * self.input_price_per_1k
-            output_cost = (output_tokens / 1000) * self.output_price_per_1k
-            estimated_cost = input_cost + output_cost
-            
-            return {
-                "answer_text": answer_text,
-                "latency_ms": latency_ms,
-                "tokens": total_tokens,
-                "estimated_cost": estimated_cost,
-                "input_tokens": input_tokens,
-                "output_tokens": output_tokens
-            }
-            
-        except requests.exceptions.RequestException as e:
-            error_type = "connection_error"
-            if hasattr(e, 'response') and e.response is not None:
-                if e.response.status_code == 401:
-                    error_type = "auth_error"
-                elif e.response.status_code == 429:
-                    error_type = "rate_limit"
-                elif e.response.status_code >= 500:
-                    error_type = "server_error"
-            
-            return {
-                "answer_text": f"Error generating response: {str(e)}",
-                "latency_ms": (time.time() - start_time) * 1000,
-                "tokens": 0,
-                "estimated_cost": 0.0,
-                "input_tokens": 0,
-                "output_tokens": 0,
-                "error_type": error_type
-            }
+
+            latency_ms = (time.time() - start_time) * 1000
+            return self._parse_response(response.json(), prompt, latency_ms)
+
+        except Exception as e:
+            return self._failure_response(e, (time.time() - start_time) * 1000)
+
+    async def generate_stream(self, prompt: str, timeout: Optional[float] = None) -> AsyncIterator[Dict]:
+        """Stream a response from Mistral without blocking the event loop"""
+        async with aclosing(self._pooled_stream_async(prompt, timeout or self.request_timeout_s, self._stream)) as events:
+            async for event in events:
+                yield event
+
+    async def _stream(self, member, prompt: str, timeout: float) -> AsyncIterator[Dict]:
+        start_time = time.time()
+        first_token_time, parts, state = None, [], {}
+
+        try:
+            async with self.clients[member.name].stream("POST", f"{member.base_url}/chat/completions",
+                                                        headers=self._build_headers(member),
+                                                        json={**self._build_payload(prompt), "stream": True},
+                                                        timeout=timeout) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    text = self._stream_chunk(line, state)
+                    if text:
+                        first_token_time = first_token_time or time.time()
+                        parts.append(text)
+                        yield self._token_event(text)
+
+            yield self._done_event(self._stream_response(
+                prompt, start_time, first_token_time, parts,
+                state.get("input_tokens"), state.get("output_tokens")
+            ))
+
         except Exception as e:
-            error_type = "unknown_error"
-            if "timeout" in str(e).lower():
-                error_type = "timeout"
-            
-            return {
-                "answer_text": f"Error generating response: {str(e)}",
-                "latency_ms": (time.time() - start_time) * 1000,
-                "tokens": 0,
-                "estimated_cost": 0.0,
-                "input_tokens": 0,
-                "output_tokens": 0,
-                "error_type": error_type
-            } 
\ No newline at end of file
+            yield self._done_event(self._failure_response(e, (time.time() - start_time) * 1000))
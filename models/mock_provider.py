@@ -0,0 +1,328 @@
+"""
+Deterministic stand-in for the OpenAI, Anthropic and Mistral chat APIs, for load tests
+and benchmarks without API keys or spend.
+
+MockProvider answers chat requests in each provider's response shape (streamed or not),
+with latency, answer length, 500s and 429s sampled per model from the mock_provider
+section of config/settings.yaml. Critic requests (those asking for a SCORE) get a score
+drawn from the distribution configured for the model whose answer is being judged;
+listwise critic requests get a JSON list with one such score per answer.
+Sampling is seeded by the request itself and how often it has been seen, so the same
+seed and workload give the same answers, latencies and errors on every run.
+
+In process: set mock_provider.enabled and every wrapper and the critic talk to
+MockTransport / MockAsyncTransport through the shared HTTP pool. As a server:
+
+    python -m models.mock_provider --port 8080
+    # provider_pools.providers in config/settings.yaml:
+    #   openai:    [{name: mock, base_url: "http://127.0.0.1:8080/v1"}]
+    #   anthropic: [{name: mock, base_url: "http://127.0.0.1:8080"}]
+    #   mistral:   [{name: mock, base_url: "http://127.0.0.1:8080/v1"}]
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from config.settings import load_settings
+from models.http_pool import httpx
+
+WORDS = ("customers", "pricing", "channel", "launch", "segment", "pipeline", "retention",
+         "positioning", "partners", "onboarding", "revenue", "market", "trial", "enterprise",
+         "messaging", "conversion", "demand", "sales", "growth", "feedback")
+
+_ANSWERED_BY = re.compile(r"Mock answer from ([\w.\-]+):")
+_LISTWISE_ANSWERS = re.compile(r"MODEL ANSWER (\d+):\s*(?:Mock answer from ([\w.\-]+):)?")
+
+
+def _tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _sse(payload: Dict, event: Optional[str] = None) -> bytes:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(payload)}\n\n".encode("utf-8")
+
+
+class MockReply:
+    """
+    One mocked HTTP response: status, headers and body chunks, each sent after its
+    delay in seconds (a non-streamed reply is a single chunk)
+    """
+
+    def __init__(self, status: int, headers: Dict[str, str], chunks: List[Tuple[float, bytes]]):
+        self.status = status
+        self.headers = headers
+        self.chunks = chunks
+
+
+class MockProvider:
+    """Samples replies to chat requests from per-model latency, length, error and score settings"""
+
+    def __init__(self, config: Dict):
+        self.seed = config['seed']
+        self.time_scale = config['time_scale']
+        self.default = config['default']
+        self.models = config['models']
+        self._attempts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def transport(self) -> "MockTransport":
+        return MockTransport(self)
+
+    def async_transport(self) -> "MockAsyncTransport":
+        return MockAsyncTransport(self)
+
+    def profile(self, model: str) -> Dict:
+        return {**self.default, **self.models.get(model, {})}
+
+    def _rng(self, body: Dict) -> random.Random:
+        """Generator for one request, seeded by its content and how often it was sent before"""
+        key = hashlib.sha256(json.dumps(body, sort_keys=True).encode("utf-8")).hexdigest()
+        with self._lock:
+            attempt = self._attempts.get(key, 0)
+            self._attempts[key] = attempt + 1
+        return random.Random(f"{self.seed}:{key}:{attempt}")
+
+    def _lognormal(self, rng: random.Random, median: float, sigma: float) -> float:
+        return median * math.exp(sigma * rng.gauss(0, 1))
+
+    def _error(self, anthropic: bool, status: int, message: str) -> bytes:
+        if anthropic:
+            kind = "rate_limit_error" if status == 429 else "api_error"
+            return json.dumps({"type": "error", "error": {"type": kind, "message": message}}).encode("utf-8")
+        kind = "rate_limit_exceeded" if status == 429 else "server_error"
+        return json.dumps({"error": {"message": message, "type": kind, "code": kind}}).encode("utf-8")
+
+    def _score(self, rng: random.Random, answered_by: str) -> int:
+        mean, sd = self.profile(answered_by)['score']
+        return min(10, max(1, round(rng.gauss(mean, sd))))
+
+    def _answer(self, rng: random.Random, model: str, prompt: str, profile: Dict, max_tokens: int) -> str:
+        """Critic requests get SCORE/RATIONALE (or listwise JSON); anything else gets filler text of sampled length"""
+        if '"evaluations"' in prompt:
+            evaluations = [
+                {"answer": int(number), "score": self._score(rng, answered_by or model),
+                 "rationale": "Mock evaluation of the answer against the reference."}
+                for number, answered_by in _LISTWISE_ANSWERS.findall(prompt)
+            ]
+            return json.dumps({"evaluations": evaluations})
+        if "SCORE:" in prompt:
+            answered_by = _ANSWERED_BY.search(prompt)
+            score = self._score(rng, answered_by.group(1) if answered_by else model)
+            return f"SCORE: {score}\nRATIONALE: Mock evaluation of the answer against the reference."
+        length = round(self._lognormal(rng, profile['output_tokens'], profile['tokens_sigma']))
+        length = min(max(1, length), max_tokens)
+        return f"Mock answer from {model}: " + " ".join(rng.choice(WORDS) for _ in range(length))
+
+    def reply(self, path: str, body: Dict) -> MockReply:
+        """The reply to a POST of body to path (/v1/chat/completions or /v1/messages)"""
+        anthropic = path.rstrip("/").endswith("/messages")
+        if not anthropic and not path.rstrip("/").endswith("/chat/completions"):
+            return MockReply(404, {}, [(0.0, self._error(False, 404, f"No mock route for {path}"))])
+
+        model = body.get("model", "")
+        profile = self.profile(model)
+        rng = self._rng(body)
+        outcome = rng.random()
+        if outcome < profile['rate_limit_rate'] + profile['error_rate']:
+            status = 429 if outcome < profile['rate_limit_rate'] else 500
+            headers = {"retry-after": str(profile['retry_after_s'])} if status == 429 else {}
+            delay = profile['error_latency_ms'] / 1000 * self.time_scale
+            return MockReply(status, headers, [(delay, self._error(anthropic, status, f"Mock {status} error"))])
+
+        messages = body.get("messages", [])
+        prompt = "\n".join([body.get("system") or ""] +
+                           [m["content"] for m in messages if isinstance(m.get("content"), str)])
+        text = self._answer(rng, model, prompt, profile, body.get("max_tokens") or 4096)
+        usage = (_tokens(prompt), len(text.split()))  # A filler word per output token
+        latency = self._lognormal(rng, profile['latency_ms'], profile['latency_sigma']) / 1000 * self.time_scale
+        if not body.get("stream"):
+            payload = self._anthropic_message(model, text, usage) if anthropic else self._chat_completion(model, text, usage)
+            return MockReply(200, {"content-type": "application/json"}, [(latency, json.dumps(payload).encode("utf-8"))])
+
+        # The first token arrives after ttft, the rest evenly over the remaining latency
+        ttft = min(self._lognormal(rng, profile['ttft_ms'], profile['latency_sigma']) / 1000 * self.time_scale, latency)
+        pieces = [word + " " for word in text.split(" ")]
+        pieces[-1] = pieces[-1][:-1]
+        gap = (latency - ttft) / max(len(pieces) - 1, 1)
+        delays = [ttft] + [gap] * (len(pieces) - 1)
+        events = self._anthropic_events(model, pieces, usage) if anthropic else self._chat_chunks(model, pieces, usage)
+        # Envelope events (message_start, usage, [DONE]) ride along with the nearest piece
+        chunks = [(delay, b"".join(group)) for delay, group in zip(delays, events)]
+        return MockReply(200, {"content-type": "text/event-stream"}, chunks)
+
+    def _chat_completion(self, model: str, text: str, usage: Tuple[int, int]) -> Dict:
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": usage[0], "completion_tokens": usage[1], "total_tokens": sum(usage)}
+        }
+
+    def _chat_chunks(self, model: str, pieces: List[str], usage: Tuple[int, int]) -> List[List[bytes]]:
+        """OpenAI/Mistral stream: one chunk per piece, then a usage chunk and [DONE]"""
+        base = {"id": f"chatcmpl-{uuid.uuid4().hex[:12]}", "object": "chat.completion.chunk",
+                "created": int(time.time()), "model": model}
+        events = []
+        for i, piece in enumerate(pieces):
+            delta = {"role": "assistant", "content": piece} if i == 0 else {"content": piece}
+            finish_reason = "stop" if i == len(pieces) - 1 else None
+            events.append([_sse({**base, "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]})])
+        events[-1].append(_sse({**base, "choices": [], "usage": {
+            "prompt_tokens": usage[0], "completion_tokens": usage[1], "total_tokens": sum(usage)}}))
+        events[-1].append(b"data: [DONE]\n\n")
+        return events
+
+    def _anthropic_message(self, model: str, text: str, usage: Tuple[int, int]) -> Dict:
+        return {
+            "id": f"msg_{uuid.uuid4().hex[:24]}",
+            "type": "message",
+            "role": "assistant",
+            "model": model,
+            "content": [{"type": "text", "text": text}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": {"input_tokens": usage[0], "output_tokens": usage[1]}
+        }
+
+    def _anthropic_events(self, model: str, pieces: List[str], usage: Tuple[int, int]) -> List[List[bytes]]:
+        """Anthropic stream: message and block start, one delta per piece, then the closing events"""
+        message = {**self._anthropic_message(model, "", (usage[0], 1)), "content": [], "stop_reason": None}
+        events = [[_sse({"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": piece}},
+                        "content_block_delta")] for piece in pieces]
+        events[0][:0] = [
+            _sse({"type": "message_start", "message": message}, "message_start"),
+            _sse({"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}},
+                 "content_block_start")
+        ]
+        events[-1] += [
+            _sse({"type": "content_block_stop", "index": 0}, "content_block_stop"),
+            _sse({"type": "message_delta", "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                  "usage": {"output_tokens": usage[1]}}, "message_delta"),
+            _sse({"type": "message_stop"}, "message_stop")
+        ]
+        return events
+
+
+def _read_timeout(request: httpx.Request) -> Optional[float]:
+    return (request.extensions.get("timeout") or {}).get("read")
+
+
+class MockTransport(httpx.BaseTransport):
+    """Sync httpx transport answering from a MockProvider, sleeping out the sampled latency"""
+
+    def __init__(self, provider: MockProvider):
+        self.provider = provider
+
+    def _wait(self, delay: float, request: httpx.Request):
+        timeout = _read_timeout(request)
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            raise httpx.ReadTimeout("Mock provider read timed out", request=request)
+        time.sleep(delay)
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        reply = self.provider.reply(request.url.path, json.loads(request.read() or b"{}"))
+        (first_delay, first), rest = reply.chunks[0], reply.chunks[1:]
+        self._wait(first_delay, request)
+
+        def body() -> Iterator[bytes]:
+            yield first
+            for delay, data in rest:
+                self._wait(delay, request)
+                yield data
+
+        return httpx.Response(reply.status, headers=reply.headers, content=body(), request=request)
+
+
+class MockAsyncTransport(httpx.AsyncBaseTransport):
+    """MockTransport for async clients: sleeps without blocking the event loop"""
+
+    def __init__(self, provider: MockProvider):
+        self.provider = provider
+
+    async def _wait(self, delay: float, request: httpx.Request):
+        timeout = _read_timeout(request)
+        if timeout is not None and delay > timeout:
+            await asyncio.sleep(timeout)
+            raise httpx.ReadTimeout("Mock provider read timed out", request=request)
+        await asyncio.sleep(delay)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        reply = self.provider.reply(request.url.path, json.loads(await request.aread() or b"{}"))
+        (first_delay, first), rest = reply.chunks[0], reply.chunks[1:]
+        await self._wait(first_delay, request)
+
+        async def body() -> AsyncIterator[bytes]:
+            yield first
+            for delay, data in rest:
+                await self._wait(delay, request)
+                yield data
+
+        return httpx.Response(reply.status, headers=reply.headers, content=body(), request=request)
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    provider: MockProvider = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        reply = self.provider.reply(self.path.split("?")[0], json.loads(body or b"{}"))
+        streamed = len(reply.chunks) > 1 or reply.headers.get("content-type") == "text/event-stream"
+        time.sleep(reply.chunks[0][0])
+        self.send_response(reply.status)
+        headers = {"content-type": "application/json", **reply.headers}
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if not streamed:
+            self.send_header("Content-Length", str(len(reply.chunks[0][1])))
+            self.end_headers()
+            self.wfile.write(reply.chunks[0][1])
+            return
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for i, (delay, data) in enumerate(reply.chunks):
+            if i:
+                time.sleep(delay)
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local mock of the OpenAI, Anthropic and Mistral chat APIs')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--seed', type=int, help='Override mock_provider.seed')
+    parser.add_argument('--time-scale', type=float, help='Override mock_provider.time_scale')
+    args = parser.parse_args()
+
+    config = load_settings()['mock_provider']
+    if args.seed is not None:
+        config['seed'] = args.seed
+    if args.time_scale is not None:
+        config['time_scale'] = args.time_scale
+    MockHandler.provider = MockProvider(config)
+    server = ThreadingHTTPServer((args.host, args.port), MockHandler)
+    print(f"🧪 Mock provider server on http://{args.host}:{args.port} (seed {config['seed']})")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
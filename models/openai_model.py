@@ -1,87 +1,152 @@
-import os
 import time
-from openai import OpenAI
+from contextlib import aclosing
+from openai import OpenAI, AsyncOpenAI
 from dotenv import load_dotenv
-from typing import Dict
+from typing import AsyncIterator, Dict, Iterator, List, Optional
+from models.base import ModelWrapper
+from models.http_pool import get_http_pool
+from models.provider_pool import get_provider_pool
 
 # Load environment variables
 load_dotenv()
 
-class OpenAIModel:
+class OpenAIModel(ModelWrapper):
+    provider_label = "OpenAI"
+
     def __init__(self):
-        self.client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+        self.pool = get_provider_pool("openai")
+        self.clients = {member.name: self._build_client(member) for member in self.pool.members}
         self.model_name = "gpt-4o"
         # OpenAI pricing per 1K tokens (as of latest pricing)
         self.input_price_per_1k = 0.005  # $0.005 per 1K input tokens
         self.output_price_per_1k = 0.015  # $0.015 per 1K output tokens
-        
-    def generate_response(self, prompt: str) -> Dict:
+
+    def _build_client(self, member):
+        # A member's rate governor retries 429s itself, after the provider's Retry-After
+        return OpenAI(api_key=member.api_key, base_url=member.base_url,
+                      max_retries=0 if member.governor else 2,
+                      http_client=get_http_pool().client(member.host))
+
+    def _build_messages(self, prompt: str) -> List[Dict]:
+        return [
+            {"role": "system", "content": self.system_prompt},
+            {"role": "user", "content": prompt}
+        ]
+
+    def _build_request(self, prompt: str, timeout: float, stream: bool = False) -> Dict:
+        request = {
+            "model": self.model_name,
+            "messages": self._build_messages(prompt),
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens,
+            "timeout": timeout
+        }
+        if stream:
+            # The final chunk carries token usage
+            request.update(stream=True, stream_options={"include_usage": True})
+        return request
+
+    def _parse_response(self, response, latency_ms: float) -> Dict:
+        answer_text = response.choices[0].message.content
+        return self._success_response(
+            answer_text,
+            latency_ms,
+            response.usage.prompt_tokens,
+            response.usage.completion_tokens
+        )
+
+    def generate_response(self, prompt: str, timeout: Optional[float] = None) -> Dict:
         """Generate response from OpenAI GPT-4o"""
+        return self._pooled_call(prompt, timeout or self.request_timeout_s, self._call)
+
+    def _call(self, member, prompt: str, timeout: float) -> Dict:
+        start_time = time.time()
+
+        try:
+            response = self.clients[member.name].chat.completions.create(**self._build_request(prompt, timeout))
+
+            latency_ms = (time.time() - start_time) * 1000
+            return self._parse_response(response, latency_ms)
+
+        except Exception as e:
+            return self._exception_response(e, (time.time() - start_time) * 1000)
+
+    def generate_stream(self, prompt: str, timeout: Optional[float] = None) -> Iterator[Dict]:
+        """Stream a response from OpenAI GPT-4o token by token"""
+        return self._pooled_stream(prompt, timeout or self.request_timeout_s, self._stream)
+
+    def _stream(self, member, prompt: str, timeout: float) -> Iterator[Dict]:
+        start_time = time.time()
+        first_token_time, parts, usage = None, [], None
+
+        try:
+            stream = self.clients[member.name].chat.completions.create(**self._build_request(prompt, timeout, True))
+            with stream:
+                for chunk in stream:
+                    usage = chunk.usage or usage
+                    text = chunk.choices[0].delta.content if chunk.choices else None
+                    if text:
+                        first_token_time = first_token_time or time.time()
+                        parts.append(text)
+                        yield self._token_event(text)
+
+            yield self._done_event(self._stream_response(
+                prompt, start_time, first_token_time, parts,
+                usage.prompt_tokens if usage else None, usage.completion_tokens if usage else None
+            ))
+
+        except Exception as e:
+            yield self._done_event(self._exception_response(e, (time.time() - start_time) * 1000))
+
+class AsyncOpenAIModel(OpenAIModel):
+    """Asyncio-native OpenAI wrapper with the same response contract"""
+
+    def _build_client(self, member):
+        return AsyncOpenAI(api_key=member.api_key, base_url=member.base_url,
+                           max_retries=0 if member.governor else 2,
+                           http_client=get_http_pool().async_client(member.host))
+
+    async def generate_response(self, prompt: str, timeout: Optional[float] = None) -> Dict:
+        """Generate response from OpenAI GPT-4o without blocking the event loop"""
+        return await self._pooled_call_async(prompt, timeout or self.request_timeout_s, self._call)
+
+    async def _call(self, member, prompt: str, timeout: float) -> Dict:
+        start_time = time.time()
+
+        try:
+            response = await self.clients[member.name].chat.completions.create(**self._build_request(prompt, timeout))
+
+            latency_ms = (time.time() - start_time) * 1000
+            return self._parse_response(response, latency_ms)
+
+        except Exception as e:
+            return self._exception_response(e, (time.time() - start_time) * 1000)
+
+    async def generate_stream(self, prompt: str, timeout: Optional[float] = None) -> AsyncIterator[Dict]:
+        """Stream a response from OpenAI GPT-4o without blocking the event loop"""
+        async with aclosing(self._pooled_stream_async(prompt, timeout or self.request_timeout_s, self._stream)) as events:
+            async for event in events:
+                yield event
+
+    async def _stream(self, member, prompt: str, timeout: float) -> AsyncIterator[Dict]:
         start_time = time.time()
-        
+        first_token_time, parts, usage = None, [], None
+
         try:
-            response = self.client.chat.completions.create(
-                model=self.model_name,
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant specializing in go-to-market strategy and business development. Provide comprehensive, actionable insights."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7,
-                max_tokens=1500
-            )
-            
-            end_time = time.time()
-            latency_ms = (end_time - start_time) * 1000
-            
-            # Extract response data
-            answer_text = response.choices[0].message.content
-            input_tokens = response.usage.prompt_tokens
-            output_tokens = response.usage.completion_tokens
-            total_tokens = response.usage.total_tokens
-            
-            # Validate response
-            if not answer_text or answer_text.strip() == "":
-                return {
-                    "answer_text": "Error generating response: Empty response from OpenAI",
-                    "latency_ms": latency_ms,
-                    "tokens": 0,
-                    "estimated_cost": 0.0,
-                    "input_tokens": 0,
-                    "output_tokens": 0,
-                    "error_type": "empty_response"
-                }
-            
-            # Calculate cost
-            input_cost = (input_tokens / 1000) * self.input_price_per_1k
-            output_cost = (output_tokens / 1000) * self.output_price_per_1k
-            estimated_cost = input_cost + output_cost
-            
-            return {
-                "answer_text": answer_text,
-                "latency_ms": latency_ms,
-                "tokens": total_tokens,
-                "estimated_cost": estimated_cost,
-                "input_tokens": input_tokens,
-                "output_tokens": output_tokens
-            }
-            
+            stream = await self.clients[member.name].chat.completions.create(**self._build_request(prompt, timeout, True))
+            async with stream:
+                async for chunk in stream:
+                    usage = chunk.usage or usage
+                    text = chunk.choices[0].delta.content if chunk.choices else None
+                    if text:
+                        first_token_time = first_token_time or time.time()
+                        parts.append(text)
+                        yield self._token_event(text)
+
+            yield self._done_event(self._stream_response(
+                prompt, start_time, first_token_time, parts,
+                usage.prompt_tokens if usage else None, usage.completion_tokens if usage else None
+            ))
+
         except Exception as e:
-            error_type = "unknown_error"
-            if "rate limit" in str(e).lower():
-                error_type = "rate_limit"
-            elif "invalid api key" in str(e).lower() or "authentication" in str(e).lower():
-                error_type = "auth_error"
-            elif "timeout" in str(e).lower():
-                error_type = "timeout"
-            elif "connection" in str(e).lower():
-                error_type = "connection_error"
-            
-            return {
-                "answer_text": f"Error generating response: {str(e)}",
-                "latency_ms": (time.time() - start_time) * 1000,
-                "tokens": 0,
-                "estimated_cost": 0.0,
-                "input_tokens": 0,
-                "output_tokens": 0,
-                "error_type": error_type
-            } 
\ No newline at end of file
+            yield self._done_event(self._exception_response(e, (time.time() - start_time) * 1000))
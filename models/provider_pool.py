@@ -0,0 +1,215 @@
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+from config.settings import load_settings
+from models.http_pool import OPENAI_HOST, ANTHROPIC_HOST, MISTRAL_HOST
+from models.rate_limiter import Permit, RateGovernor, get_governor
+
+# Environment variable prefix, API host and default base URL per provider
+PROVIDERS = {
+    "openai": ("OPENAI", OPENAI_HOST, None),
+    "anthropic": ("ANTHROPIC", ANTHROPIC_HOST, None),
+    "mistral": ("MISTRAL", MISTRAL_HOST, f"https://{MISTRAL_HOST}/v1"),
+}
+
+
+class PoolMember:
+    """
+    One credential/endpoint pair of a provider pool, with its own rate governor,
+    health and statistics. A member is unhealthy for cooldown_s after failure_threshold
+    consecutive failed calls; rate-limited calls are the governor's concern, not failures.
+    """
+
+    def __init__(self, name: str, host: str, api_key: Optional[str], base_url: Optional[str],
+                 weight: float, governor: Optional[RateGovernor], failure_threshold: int, cooldown_s: float):
+        self.name = name
+        self.host = host
+        self.api_key = api_key
+        self.base_url = base_url
+        self.weight = weight
+        self.governor = governor
+        self.failure_threshold = failure_threshold
+        self.cooldown_s = cooldown_s
+
+        self.in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self.latency_ms = 0.0
+        self.consecutive_failures = 0
+        self.unhealthy_until = 0.0
+        self.current_weight = 0.0  # smooth weighted round-robin state
+
+    def is_healthy(self, now: float) -> bool:
+        return now >= self.unhealthy_until
+
+    def is_paused(self) -> bool:
+        return self.governor is not None and self.governor.paused_for() > 0
+
+    def acquire(self, tokens: int, timeout: Optional[float] = None) -> Optional[Permit]:
+        """Admission from this member's rate governor (immediate without one); None on timeout"""
+        if self.governor is None:
+            return Permit(tokens, 0.0)
+        return self.governor.acquire(tokens, timeout)
+
+    async def acquire_async(self, tokens: int, timeout: Optional[float] = None) -> Optional[Permit]:
+        if self.governor is None:
+            return Permit(tokens, 0.0)
+        return await self.governor.acquire_async(tokens, timeout)
+
+    def _release_permit(self, permit: Permit, response: Optional[Dict]):
+        if self.governor is None:
+            return
+        if response is None:
+            self.governor.release(permit)  # Cancelled; the provider may still bill the reservation
+            return
+        error_type = response.get("error_type")
+        rate_limited = error_type == "rate_limit"
+        if not error_type:
+            used_tokens = response["tokens"]
+        else:
+            used_tokens = 0 if rate_limited else None  # Unknown for failed calls: keep the reservation
+        self.governor.release(
+            permit,
+            used_tokens=used_tokens,
+            latency_ms=None if error_type else response["latency_ms"],
+            rate_limited=rate_limited,
+            retry_after_s=response.get("retry_after_s") if rate_limited else None
+        )
+
+    def record(self, response: Optional[Dict]):
+        self.in_flight -= 1
+        if response is None:
+            return
+        self.requests += 1
+        error_type = response.get("error_type")
+        if error_type == "rate_limit":
+            self.rate_limited += 1
+        elif error_type:
+            self.errors += 1
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= self.failure_threshold:
+                self.unhealthy_until = time.time() + self.cooldown_s
+        else:
+            self.consecutive_failures = 0
+            self.latency_ms += response["latency_ms"]
+
+    def get_stats(self) -> Dict:
+        successes = self.requests - self.errors - self.rate_limited
+        return {
+            "host": self.host,
+            "weight": self.weight,
+            "healthy": self.is_healthy(time.time()),
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "errors": self.errors,
+            "rate_limited": self.rate_limited,
+            "avg_latency_ms": round(self.latency_ms / successes, 1) if successes else None,
+            "rate_governor": self.governor.get_stats() if self.governor is not None else None
+        }
+
+
+class ProviderPool:
+    """
+    The credential/endpoint pairs behind one provider, shared by its sync and async
+    wrappers and (for OpenAI) the critic. select() picks the member for the next call:
+
+    least_loaded         - fewest calls in flight relative to weight
+    weighted_round_robin - smooth weighted round-robin, so a weight 2 member gets two
+                           calls for every one of a weight 1 member, interleaved
+
+    Unhealthy members and members paused after a 429 are skipped while any other member
+    is available; if none is, the one that becomes available first is used.
+    """
+
+    def __init__(self, provider: str, members: List[PoolMember], strategy: str = "least_loaded"):
+        if strategy not in ("least_loaded", "weighted_round_robin"):
+            raise ValueError(f"Unknown pool strategy: {strategy}")
+        self.provider = provider
+        self.members = members
+        self.strategy = strategy
+        self._lock = threading.Lock()
+
+    def select(self) -> PoolMember:
+        """Choose a member and count the call as in flight on it; pass the result to release()"""
+        with self._lock:
+            now = time.time()
+            candidates = [m for m in self.members if m.is_healthy(now) and not m.is_paused()]
+            if not candidates:
+                candidates = [min(self.members, key=lambda m: m.unhealthy_until)]
+            if self.strategy == "least_loaded":
+                member = min(candidates, key=lambda m: (m.in_flight / m.weight, m.requests / m.weight))
+            else:
+                total = sum(m.weight for m in candidates)
+                for m in candidates:
+                    m.current_weight += m.weight
+                member = max(candidates, key=lambda m: m.current_weight)
+                member.current_weight -= total
+            member.in_flight += 1
+            return member
+
+    def release(self, member: PoolMember, permit: Optional[Permit], response: Optional[Dict]):
+        """
+        End a call started by select(): return its permit, if one was granted, and record
+        the response (a wrapper response dict; None if the call was cancelled or never sent)
+        """
+        if permit is not None:
+            member._release_permit(permit, response)
+        with self._lock:
+            member.record(response)
+
+    def get_stats(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {member.name: member.get_stats() for member in self.members}
+
+
+def _member_configs(provider: str, configured: Optional[List[Dict]]) -> List[Dict]:
+    """Members from settings, else one per key in <PROVIDER>_API_KEYS, else <PROVIDER>_API_KEY"""
+    prefix = PROVIDERS[provider][0]
+    if configured:
+        return [{**member, "api_key": os.getenv(member.get("api_key_env", f"{prefix}_API_KEY"))}
+                for member in configured]
+    keys = [key.strip() for key in os.getenv(f"{prefix}_API_KEYS", "").split(",") if key.strip()]
+    return [{"api_key": key} for key in keys] or [{"api_key": os.getenv(f"{prefix}_API_KEY")}]
+
+
+def build_pool(provider: str, config: Dict, default_api_key: Optional[str] = None) -> ProviderPool:
+    """A provider's pool; default_api_key stands in for keys missing from the environment"""
+    _, default_host, default_base_url = PROVIDERS[provider]
+    members = []
+    for i, member in enumerate(_member_configs(provider, config['providers'].get(provider))):
+        name = member.get("name", f"{provider}#{i}")
+        base_url = member.get("base_url", default_base_url)
+        host = urlparse(base_url).hostname if base_url else default_host
+        limits = {k: member[k] for k in ("requests_per_minute", "tokens_per_minute", "max_concurrency")
+                  if k in member}
+        members.append(PoolMember(
+            name, host, member["api_key"] or default_api_key, base_url, float(member.get("weight", 1)),
+            get_governor(host, name, limits), config['failure_threshold'], config['cooldown_s']
+        ))
+    return ProviderPool(provider, members, config['strategy'])
+
+
+_pools: Dict[str, ProviderPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_provider_pool(provider: str) -> ProviderPool:
+    """The process-wide pool for a provider, configured from provider_pools in config/settings.yaml"""
+    with _pools_lock:
+        if provider not in _pools:
+            settings = load_settings()
+            # The mock provider accepts any key, so load tests run without real ones
+            default_api_key = "mock" if settings['mock_provider']['enabled'] else None
+            _pools[provider] = build_pool(provider, settings['provider_pools'], default_api_key)
+        return _pools[provider]
+
+
+def get_pool_stats() -> Dict[str, Dict]:
+    """Per-member statistics of every pool in use"""
+    with _pools_lock:
+        pools = dict(_pools)
+    return {provider: pool.get_stats() for provider, pool in pools.items()}
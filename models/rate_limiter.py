@@ -0,0 +1,237 @@
+import asyncio
+import threading
+import time
+from typing import Dict, Optional
+
+from config.settings import load_settings
+
+
+class _TokenBucket:
+    """Refills at rate_per_minute, holding at most one minute of capacity"""
+
+    def __init__(self, rate_per_minute: float):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(rate_per_minute)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until amount is available (amounts above capacity only wait for a full bucket)"""
+        self._refill(now)
+        needed = min(amount, self.capacity) - self.level
+        return needed / self.rate if needed > 0 else 0.0
+
+    def take(self, amount: float):
+        self.level -= amount
+
+    def give_back(self, amount: float):
+        self.level = min(self.capacity, self.level + amount)
+
+
+class Permit:
+    """One admitted request; hand it back to RateGovernor.release when the call ends"""
+
+    __slots__ = ("reserved_tokens", "waited_ms")
+
+    def __init__(self, reserved_tokens: int, waited_ms: float):
+        self.reserved_tokens = reserved_tokens
+        self.waited_ms = waited_ms
+
+
+def _shortest(*waits: Optional[float]) -> Optional[float]:
+    waits = [wait for wait in waits if wait is not None]
+    return min(waits) if waits else None
+
+
+class RateGovernor:
+    """
+    Client-side admission control for one provider, shared by every wrapper and critic
+    calling it, so the process stays just under the provider's quota instead of
+    discovering it through 429s.
+
+    A request is admitted when
+    - no pause from an earlier 429 is in force (its Retry-After, or default_retry_after_s),
+    - a requests-per-minute and a tokens-per-minute bucket both have room (tokens are
+      reserved up front for the prompt plus max_tokens, as providers count them, and
+      the unused part is returned when the call finishes), and
+    - fewer calls are in flight than the concurrency limit.
+
+    The concurrency limit adapts by AIMD: it grows by 1/limit per successful call and is
+    multiplied by backoff on a 429, or when recent latency rises above latency_tolerance
+    times its long-run average (the provider queueing our calls). Decreases happen at most
+    once per round trip, so one burst of 429s only halves the limit once.
+    """
+
+    def __init__(self, provider: str, requests_per_minute: float, tokens_per_minute: float,
+                 max_concurrency: int = 8, min_concurrency: int = 1, backoff: float = 0.5,
+                 latency_tolerance: float = 2.0, default_retry_after_s: float = 1.0):
+        self.provider = provider
+        self.requests = _TokenBucket(requests_per_minute)
+        self.tokens = _TokenBucket(tokens_per_minute)
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self.default_retry_after_s = default_retry_after_s
+
+        self.limit = float(max_concurrency)
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.last_decrease = 0.0
+        self.latency_fast: Optional[float] = None  # EMA over the last few calls
+        self.latency_slow: Optional[float] = None  # EMA over the last ~50 calls
+
+        self.admitted = 0
+        self.throttled = 0
+        self.rate_limited = 0
+        self.wait_ms = 0.0
+        self._lock = threading.Lock()
+        self._released = threading.Condition(self._lock)
+        self._async_waiters = []  # (event loop, future) of async callers waiting for a release
+
+    def _try_admit(self, tokens: int) -> Optional[float]:
+        """Admit under the lock and return 0, or return seconds to wait (None: until a release)"""
+        now = time.monotonic()
+        if now < self.paused_until:
+            return self.paused_until - now
+        if self.in_flight >= max(int(self.limit), self.min_concurrency):
+            return None
+        wait = max(self.requests.wait_time(1, now), self.tokens.wait_time(tokens, now))
+        if wait > 0:
+            return wait
+        self.requests.take(1)
+        self.tokens.take(tokens)
+        self.in_flight += 1
+        self.admitted += 1
+        return 0.0
+
+    def _finish_wait(self, start: float, waited: bool) -> float:
+        waited_ms = (time.monotonic() - start) * 1000
+        if waited:
+            self.throttled += 1
+            self.wait_ms += waited_ms
+        return waited_ms
+
+    def acquire(self, tokens: int, timeout: Optional[float] = None) -> Optional[Permit]:
+        """Block until the request may be sent; None if that would take longer than timeout"""
+        start = time.monotonic()
+        waited = False
+        with self._lock:
+            while True:
+                wait = self._try_admit(tokens)
+                if wait == 0:
+                    return Permit(tokens, self._finish_wait(start, waited))
+                waited = True
+                remaining = None if timeout is None else timeout - (time.monotonic() - start)
+                if remaining is not None and (remaining <= 0 or (wait is not None and wait > remaining)):
+                    self._finish_wait(start, waited)
+                    return None
+                self._released.wait(_shortest(wait, remaining))
+
+    async def acquire_async(self, tokens: int, timeout: Optional[float] = None) -> Optional[Permit]:
+        """acquire() for coroutines: waits without blocking the event loop"""
+        start = time.monotonic()
+        waited = False
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._lock:
+                wait = self._try_admit(tokens)
+                if wait == 0:
+                    return Permit(tokens, self._finish_wait(start, waited))
+                waited = True
+                remaining = None if timeout is None else timeout - (time.monotonic() - start)
+                if remaining is not None and (remaining <= 0 or (wait is not None and wait > remaining)):
+                    self._finish_wait(start, waited)
+                    return None
+                released = loop.create_future()
+                self._async_waiters.append((loop, released))
+            try:
+                await asyncio.wait_for(released, _shortest(wait, remaining))
+            except asyncio.TimeoutError:
+                pass
+
+    def paused_for(self) -> float:
+        """Seconds left of the pause after a 429"""
+        return max(0.0, self.paused_until - time.monotonic())
+
+    def _wake_waiters(self):
+        self._released.notify_all()
+        waiters, self._async_waiters = self._async_waiters, []
+        for loop, future in waiters:
+            if not future.done():
+                loop.call_soon_threadsafe(lambda f=future: f.done() or f.set_result(None))
+
+    def _decrease(self, now: float):
+        round_trip_s = (self.latency_slow or 1000.0) / 1000
+        if now - self.last_decrease >= round_trip_s:
+            self.limit = max(float(self.min_concurrency), self.limit * self.backoff)
+            self.last_decrease = now
+
+    def release(self, permit: Permit, used_tokens: Optional[int] = None, latency_ms: Optional[float] = None,
+                rate_limited: bool = False, retry_after_s: Optional[float] = None):
+        """
+        Return a permit when its call ends, with the tokens it actually used, its latency
+        (successful calls) or whether the provider rate limited it and for how long
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.in_flight -= 1
+            if used_tokens is not None and used_tokens < permit.reserved_tokens:
+                self.tokens.give_back(permit.reserved_tokens - used_tokens)
+
+            if rate_limited:
+                self.rate_limited += 1
+                self._decrease(now)
+                pause = retry_after_s if retry_after_s is not None else self.default_retry_after_s
+                self.paused_until = max(self.paused_until, now + pause)
+            elif latency_ms is not None:
+                if self.latency_slow is None:
+                    self.latency_fast = self.latency_slow = latency_ms
+                else:
+                    self.latency_fast += 0.3 * (latency_ms - self.latency_fast)
+                    self.latency_slow += 0.02 * (latency_ms - self.latency_slow)
+                if self.latency_fast > self.latency_tolerance * self.latency_slow:
+                    self._decrease(now)
+                else:
+                    self.limit = min(float(self.max_concurrency), self.limit + 1 / self.limit)
+            self._wake_waiters()
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                "concurrency_limit": round(self.limit, 2),
+                "in_flight": self.in_flight,
+                "admitted": self.admitted,
+                "throttled": self.throttled,
+                "avg_throttle_wait_ms": round(self.wait_ms / self.throttled, 1) if self.throttled else None,
+                "rate_limited": self.rate_limited,
+                "paused_for_s": round(max(0.0, self.paused_until - time.monotonic()), 1)
+            }
+
+
+_governors: Dict[str, Optional[RateGovernor]] = {}
+_governors_lock = threading.Lock()
+
+
+def get_governor(host: str, name: Optional[str] = None, overrides: Optional[Dict] = None) -> Optional[RateGovernor]:
+    """
+    The process-wide governor for one credential (name, by default the host itself) at an
+    API host, with the host's limits from the rate_limits section of config/settings.yaml
+    updated by overrides; None when rate limiting is disabled or no limits are known
+    """
+    name = name or host
+    with _governors_lock:
+        if name not in _governors:
+            config = load_settings()['rate_limits']
+            limits = {**config['hosts'].get(host, {}), **(overrides or {})}
+            _governors[name] = RateGovernor(
+                name, limits['requests_per_minute'], limits['tokens_per_minute'],
+                limits.get('max_concurrency', config['max_concurrency']), config['min_concurrency'],
+                config['backoff'], config['latency_tolerance'], config['default_retry_after_s']
+            ) if config['enabled'] and 'requests_per_minute' in limits and 'tokens_per_minute' in limits else None
+        return _governors[name]
+
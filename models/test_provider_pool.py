@@ -0,0 +1,139 @@
+import pytest
+
+from models import provider_pool
+from models.provider_pool import PoolMember, ProviderPool, build_pool
+
+OK = {"latency_ms": 200.0, "tokens": 100}
+SERVER_ERROR = {"error_type": "server_error"}
+RATE_LIMITED = {"error_type": "rate_limit", "retry_after_s": 1.0}
+
+
+class Clock:
+    def __init__(self, now: float = 1_000.0):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(provider_pool, "time", clock)
+    return clock
+
+
+def member(name: str, weight: float = 1.0) -> PoolMember:
+    return PoolMember(name, "api.example.com", f"key-{name}", None, weight, None,
+                      failure_threshold=2, cooldown_s=30)
+
+
+def call(pool: ProviderPool, response=OK) -> str:
+    chosen = pool.select()
+    pool.release(chosen, None, response)
+    return chosen.name
+
+
+def answer(pool: ProviderPool, chosen: PoolMember, response):
+    """A call on a given member, as if select() had picked it"""
+    chosen.in_flight += 1
+    pool.release(chosen, None, response)
+
+
+def test_least_loaded_prefers_the_member_with_fewer_calls_in_flight(clock):
+    pool = ProviderPool("openai", [member("a"), member("b")])
+
+    first = pool.select()
+    second = pool.select()
+    assert {first.name, second.name} == {"a", "b"}
+
+    pool.release(first, None, OK)
+    assert pool.select() is first
+
+
+def test_least_loaded_scales_load_by_weight(clock):
+    pool = ProviderPool("openai", [member("a", weight=2.0), member("b")])
+
+    chosen = [pool.select().name for _ in range(3)]
+
+    assert sorted(chosen) == ["a", "a", "b"]
+
+
+def test_weighted_round_robin_interleaves_in_proportion_to_weight(clock):
+    pool = ProviderPool("openai", [member("a", weight=2.0), member("b")], "weighted_round_robin")
+
+    assert [call(pool) for _ in range(6)] == ["a", "b", "a", "a", "b", "a"]
+
+
+def test_unknown_strategy_is_rejected():
+    with pytest.raises(ValueError):
+        ProviderPool("openai", [member("a")], "random")
+
+
+def test_failing_member_is_skipped_until_its_cooldown_ends(clock):
+    a, b = member("a"), member("b")
+    pool = ProviderPool("openai", [a, b], "weighted_round_robin")
+
+    for _ in range(2):
+        answer(pool, a, SERVER_ERROR)
+
+    assert not pool.get_stats()["a"]["healthy"]
+    assert [call(pool) for _ in range(3)] == ["b", "b", "b"]
+
+    clock.now += 30
+    assert "a" in [call(pool) for _ in range(2)]
+
+
+def test_a_success_resets_the_failure_count(clock):
+    a = member("a")
+    pool = ProviderPool("openai", [a, member("b")])
+
+    for response in (SERVER_ERROR, OK, SERVER_ERROR):
+        answer(pool, a, response)
+
+    assert a.is_healthy(clock.now)
+    assert pool.get_stats()["a"]["errors"] == 2
+
+
+def test_rate_limits_are_not_failures(clock):
+    a = member("a")
+    pool = ProviderPool("openai", [a])
+
+    for _ in range(5):
+        call(pool, RATE_LIMITED)
+
+    stats = pool.get_stats()["a"]
+    assert stats["healthy"]
+    assert (stats["requests"], stats["errors"], stats["rate_limited"]) == (5, 0, 5)
+    assert stats["avg_latency_ms"] is None
+
+
+def test_when_every_member_is_unhealthy_the_first_to_recover_is_used(clock):
+    a, b = member("a"), member("b")
+    pool = ProviderPool("openai", [a, b])
+    for m, failed_at in ((a, 1_000.0), (b, 990.0)):
+        clock.now = failed_at
+        for _ in range(2):
+            answer(pool, m, SERVER_ERROR)
+    clock.now = 1_005.0
+
+    assert pool.select() is b
+
+
+def test_cancelled_calls_are_not_counted(clock):
+    pool = ProviderPool("openai", [member("a")])
+
+    call(pool, None)
+
+    assert pool.get_stats()["a"]["requests"] == 0
+    assert pool.get_stats()["a"]["in_flight"] == 0
+
+
+def test_members_come_from_comma_separated_keys(monkeypatch):
+    monkeypatch.setenv("MISTRAL_API_KEYS", "first, second,")
+    config = {"strategy": "least_loaded", "failure_threshold": 3, "cooldown_s": 30, "providers": {}}
+
+    pool = build_pool("mistral", config)
+
+    assert [(m.name, m.api_key) for m in pool.members] == [("mistral#0", "first"), ("mistral#1", "second")]
+    assert all(m.base_url == "https://api.mistral.ai/v1" for m in pool.members)
@@ -0,0 +1,127 @@
+import asyncio
+
+import pytest
+
+from models import rate_limiter
+from models.rate_limiter import RateGovernor
+
+
+class Clock:
+    def __init__(self, now: float = 1_000.0):
+        self.now = now
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limiter, "time", clock)
+    return clock
+
+
+def governor(**kwargs) -> RateGovernor:
+    limits = {"requests_per_minute": 6000, "tokens_per_minute": 1_000_000, "max_concurrency": 8, **kwargs}
+    return RateGovernor("test", **limits)
+
+
+def test_rate_limit_halves_concurrency_and_pauses(clock):
+    limiter = governor()
+    limiter.release(limiter.acquire(100), rate_limited=True, retry_after_s=2.0)
+
+    assert limiter.limit == 4
+    assert limiter.paused_for() == 2.0
+    assert limiter.acquire(100, timeout=1.0) is None
+    clock.now += 2.0
+    assert limiter.acquire(100, timeout=0) is not None
+
+
+def test_burst_of_rate_limits_decreases_once_per_round_trip(clock):
+    limiter = governor()
+    limiter.release(limiter.acquire(100), latency_ms=500)  # round trip estimate 0.5s
+    limiter.limit = 8.0
+    permits = [limiter.acquire(100) for _ in range(3)]
+    clock.now += 1.0
+    for permit in permits:
+        limiter.release(permit, rate_limited=True, retry_after_s=0)
+    assert limiter.limit == 4
+
+    clock.now += 0.5
+    limiter.release(limiter.acquire(100), rate_limited=True, retry_after_s=0)
+    assert limiter.limit == 2
+    assert limiter.get_stats()["rate_limited"] == 4
+
+
+def test_success_grows_limit_additively_up_to_max(clock):
+    limiter = governor(max_concurrency=5)
+    limiter.limit = 4.0
+    limiter.release(limiter.acquire(100), latency_ms=500)
+    assert limiter.limit == pytest.approx(4.25)
+
+    for _ in range(20):
+        limiter.release(limiter.acquire(100), latency_ms=500)
+    assert limiter.limit == 5
+
+
+def test_latency_rise_counts_as_congestion(clock):
+    limiter = governor()
+    for _ in range(10):
+        limiter.release(limiter.acquire(100), latency_ms=500)
+    clock.now += 10
+
+    limiter.release(limiter.acquire(100), latency_ms=5000)
+    assert limiter.limit == 4
+
+
+def test_limit_never_drops_below_min_concurrency(clock):
+    limiter = governor(min_concurrency=2)
+    for _ in range(5):
+        clock.now += 10
+        limiter.release(limiter.acquire(100), rate_limited=True, retry_after_s=0)
+
+    assert limiter.limit == 2
+
+
+def test_in_flight_calls_are_capped_by_the_limit(clock):
+    limiter = governor(max_concurrency=2)
+    first, second = limiter.acquire(100), limiter.acquire(100)
+    assert limiter.acquire(100, timeout=0) is None
+
+    limiter.release(first, latency_ms=500)
+    assert limiter.acquire(100, timeout=0) is not None
+    assert limiter.get_stats()["in_flight"] == 2
+
+
+def test_unused_tokens_are_returned(clock):
+    limiter = governor(tokens_per_minute=1000)
+    permit = limiter.acquire(800)
+    assert limiter.acquire(800, timeout=0) is None
+
+    limiter.release(permit, used_tokens=100, latency_ms=500)
+    assert limiter.acquire(800, timeout=0) is not None
+
+
+def test_request_bucket_refills_over_time(clock):
+    limiter = governor(requests_per_minute=2)
+    for _ in range(2):
+        limiter.release(limiter.acquire(1), latency_ms=100)
+    assert limiter.acquire(1, timeout=0) is None
+
+    clock.now += 30
+    assert limiter.acquire(1, timeout=0) is not None
+
+
+def test_async_waiter_is_woken_by_a_release(clock):
+    limiter = governor(max_concurrency=1)
+    held = limiter.acquire(100)
+
+    async def scenario():
+        waiter = asyncio.create_task(limiter.acquire_async(100))
+        await asyncio.sleep(0.01)
+        assert not waiter.done()
+        limiter.release(held, latency_ms=500)
+        return await asyncio.wait_for(waiter, 1)
+
+    assert asyncio.run(scenario()) is not None
+    assert limiter.get_stats()["throttled"] == 1
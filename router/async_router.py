@@ -0,0 +1,190 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import time
+from contextlib import aclosing
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from models.openai_model import AsyncOpenAIModel
+from models.anthropic_model import AsyncAnthropicModel
+from models.mistral_model import AsyncMistralModel
+from models.base import is_error_response
+from router.router import LLMRouter
+
+class AsyncLLMRouter(LLMRouter):
+    """
+    Asyncio-native router with the same ranking, fallback and hedging semantics as
+    LLMRouter. Model calls are awaited instead of blocking, so one process can keep
+    many completions in flight, and a lost hedged attempt is actually cancelled.
+    The planning steps that read or write SQLite (ranking on the run history, the
+    response cache) run in the default thread pool, off the event loop.
+    """
+    
+    def _build_executor(self) -> None:
+        """Calls are tasks on the event loop, so there is no thread pool to hold them"""
+        return None
+    
+    def _build_models(self) -> Dict:
+        """Create the async model wrappers keyed by routing name"""
+        return {
+            'gpt-4o': AsyncOpenAIModel(),
+            'claude': AsyncAnthropicModel(),
+            'mistral': AsyncMistralModel()
+        }
+    
+    async def _call_model(self, model_name: str, prompt: str, check_breaker: bool = True,
+                          timeout: Optional[float] = None) -> Dict:
+        """Call a single model, tag the response with its name and track its health"""
+        if check_breaker:
+            rejection = self._breaker_rejection(model_name)
+            if rejection is not None:
+                return rejection
+        
+        model = self.models[model_name]
+        try:
+            if timeout is not None:
+                response = await model.generate_response(prompt, timeout=timeout)
+            else:
+                response = await model.generate_response(prompt)
+        except asyncio.CancelledError:
+            self.breakers[model_name].record_cancelled()
+            raise
+        return self._finish_call(model_name, response)
+    
+    async def _call_within_deadline(self, model_name: str, prompt: str, deadline: Optional[float],
+                                    check_breaker: bool = True) -> Dict:
+        """Call a model, cancelling the call when the deadline (an absolute time.time() value) passes"""
+        if deadline is None:
+            return await self._call_model(model_name, prompt, check_breaker)
+        
+        start_time = time.time()
+        remaining = deadline - start_time
+        if remaining <= 0:
+            return self._deadline_response(model_name, 0.0)
+        
+        try:
+            return await asyncio.wait_for(
+                self._call_model(model_name, prompt, check_breaker, remaining), timeout=remaining
+            )
+        except asyncio.TimeoutError:
+            return self._deadline_response(model_name, (time.time() - start_time) * 1000)
+    
+    async def _generate_hedged(self, prompt: str, ranked_models: List[Tuple[str, float]],
+                               deadline: Optional[float] = None) -> Tuple[Optional[Dict], List[Dict]]:
+        """
+        Race the top two ranked models like LLMRouter._generate_hedged, but cancel the
+        losing task instead of abandoning it
+        """
+        primary, hedge, delay = await asyncio.to_thread(self._hedge_plan, ranked_models, deadline)
+        start_times = {primary: time.time()}
+        tasks = {asyncio.create_task(self._call_model(primary, prompt, True,
+                                                      self._remaining(deadline))): (primary, 'primary')}
+        done, _ = await asyncio.wait(tasks, timeout=self._wait_timeout(deadline, delay))
+        
+        primary_ok = any(not is_error_response(t.result()) for t in done)
+        if not primary_ok and self._remaining(deadline) != 0.0:
+            print(f"→ No valid answer from {primary} yet, starting hedge {hedge}")
+            start_times[hedge] = time.time()
+            tasks[asyncio.create_task(self._call_model(hedge, prompt, True,
+                                                       self._remaining(deadline)))] = (hedge, 'hedge')
+        
+        attempts = []
+        winner = None
+        pending = set(tasks)
+        while pending and winner is None:
+            done, pending = await asyncio.wait(pending, timeout=self._wait_timeout(deadline),
+                                               return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                print("⏱ Latency budget exhausted while waiting for hedged attempts")
+                break
+            for task in done:
+                response = task.result()
+                winner = self._settle_hedged_attempt(response, tasks[task][1], winner)
+                attempts.append(response)
+        
+        for task in pending:
+            model_name, role = tasks[task]
+            task.cancel()
+            elapsed_ms = (time.time() - start_times[model_name]) * 1000
+            attempts.append(self._cancelled_attempt(model_name, prompt, role, elapsed_ms))
+        
+        if winner is not None:
+            print(f"✓ Hedged request won by {winner['hedge_role']} model: {winner['model']}")
+        return winner, attempts
+    
+    async def generate_response(self, prompt: str, model_name: str = None, hedge: Optional[bool] = None,
+                                deadline_ms: Optional[float] = None, max_cost: Optional[float] = None,
+                                use_cache: Optional[bool] = None) -> Dict:
+        """
+        Generate response using specified model or best model with fallback to second-best.
+        Hedging, deadline_ms, max_cost and use_cache behave as in LLMRouter.generate_response.
+        """
+        start_time = time.time()
+        forecasts = self.forecast_costs(prompt)
+        deadline = start_time + deadline_ms / 1000 if deadline_ms is not None else None
+        response = await self._generate(prompt, model_name, hedge, deadline, max_cost,
+                                        self._cache_enabled(use_cache))
+        self._record_forecast(prompt, response, forecasts)
+        await asyncio.to_thread(self._store_in_cache, prompt, response)
+        if deadline_ms is not None:
+            self._mark_deadline(response, deadline_ms, start_time)
+        return response
+    
+    async def _generate(self, prompt: str, model_name: Optional[str], hedge: Optional[bool],
+                        deadline: Optional[float], max_cost: Optional[float] = None,
+                        use_cache: bool = False) -> Dict:
+        """LLMRouter._generate with the model calls awaited"""
+        candidates, response = await asyncio.to_thread(self._plan_route, prompt, model_name, max_cost,
+                                                       use_cache, deadline)
+        if response is not None:
+            return response
+        
+        hedge_attempts = []
+        if self._should_hedge(hedge, model_name, candidates):
+            winner, hedge_attempts = await self._generate_hedged(prompt, candidates, deadline)
+            response, candidates = self._after_hedge(winner, hedge_attempts, candidates)
+            if response is not None:
+                return response
+        
+        for i, (name, score) in enumerate(candidates):
+            print(f"Trying model {i+1}/{len(candidates)}: {name}")
+            response = await self._call_within_deadline(
+                name, prompt, self._attempt_deadline(deadline, i == len(candidates) - 1),
+                check_breaker=model_name is None
+            )
+            if self._fallback_done(response, i, len(candidates), deadline, hedge_attempts):
+                break
+        return response
+    
+    async def generate_stream(self, prompt: str, model_name: str = None, use_cache: Optional[bool] = None,
+                              max_cost: Optional[float] = None) -> AsyncIterator[Dict]:
+        """Stream the answer as in LLMRouter.generate_stream, without blocking the event loop"""
+        forecasts = self.forecast_costs(prompt)
+        candidates, response = await asyncio.to_thread(self._stream_plan, prompt, model_name, max_cost,
+                                                       self._cache_enabled(use_cache))
+        if response is not None:
+            for event in await asyncio.to_thread(self._stream_early, prompt, response, forecasts):
+                yield event
+            return
+        
+        for i, name in enumerate(candidates):
+            response = self._breaker_rejection(name) if model_name is None else None
+            streamed = False
+            if response is None:
+                async with aclosing(self.models[name].generate_stream(prompt)) as events:
+                    try:
+                        async for event in events:
+                            if event['type'] == 'done':
+                                response = event['response']
+                            else:
+                                streamed = True
+                                yield event
+                    except (GeneratorExit, asyncio.CancelledError):
+                        self.breakers[name].record_cancelled()
+                        raise
+                self._finish_call(name, response)
+            if self._stream_fallback_done(response, streamed, i, len(candidates)):
+                break
+        
+        yield await asyncio.to_thread(self._stream_done, prompt, response, forecasts)
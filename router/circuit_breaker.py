@@ -0,0 +1,150 @@
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+
+class CircuitBreaker:
+    """
+    Health state for one provider.
+
+    closed    - requests flow; failures are counted over a sliding window
+    open      - the provider is failing; requests are rejected until cooldown_s has passed
+    half_open - after the cooldown, a limited number of probe requests are let through;
+                a successful probe closes the circuit, a failed one opens it again
+
+    The circuit opens after failure_threshold consecutive failures, or when the error
+    rate over the last window_size calls reaches error_rate_threshold (once at least
+    min_calls have been seen).
+
+    Rate limits are not failures. A rate-limited call reaches the breaker only after the
+    provider pool's retries ran out, and the rate governor (models/rate_limiter.py) already
+    pauses and backs off for it; counting it here as well would open healthy providers
+    under quota pressure. record_rate_limited counts it apart and frees a probe slot.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, error_rate_threshold: float = 0.5,
+                 window_size: int = 20, min_calls: int = 10, cooldown_s: float = 30.0,
+                 half_open_max_calls: int = 1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.error_rate_threshold = error_rate_threshold
+        self.min_calls = min_calls
+        self.cooldown_s = cooldown_s
+        self.half_open_max_calls = half_open_max_calls
+
+        self.state = self.CLOSED
+        self.window = deque(maxlen=window_size)  # True for success, False for failure
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.half_open_in_flight = 0
+        self.last_error_type: Optional[str] = None
+        self.total_successes = 0
+        self.total_failures = 0
+        self.total_rate_limited = 0
+        self.total_rejected = 0
+        self._lock = threading.Lock()
+
+    def _cooldown_elapsed(self) -> bool:
+        return self.opened_at is not None and time.time() - self.opened_at >= self.cooldown_s
+
+    def is_available(self) -> bool:
+        """Whether a request would currently be let through (does not reserve a probe)"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                return self._cooldown_elapsed()
+            return self.half_open_in_flight < self.half_open_max_calls
+
+    def allow_request(self) -> bool:
+        """Reserve the right to call the provider; False means the call should be skipped"""
+        with self._lock:
+            if self.state == self.OPEN and self._cooldown_elapsed():
+                self.state = self.HALF_OPEN
+                self.half_open_in_flight = 0
+                print(f"Circuit for {self.name} is half-open, sending a probe request")
+
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN and self.half_open_in_flight < self.half_open_max_calls:
+                self.half_open_in_flight += 1
+                return True
+
+            self.total_rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.total_successes += 1
+            self.consecutive_failures = 0
+            self.window.append(True)
+            if self.state == self.HALF_OPEN:
+                print(f"Circuit for {self.name} closed after a successful probe")
+                self.state = self.CLOSED
+                self.window.clear()
+                self.opened_at = None
+                self.half_open_in_flight = 0
+
+    def record_failure(self, error_type: Optional[str] = None):
+        with self._lock:
+            self.total_failures += 1
+            self.consecutive_failures += 1
+            self.last_error_type = error_type
+            self.window.append(False)
+
+            if self.state == self.HALF_OPEN:
+                self._open("probe request failed")
+                return
+
+            failures = self.window.count(False)
+            error_rate = failures / len(self.window)
+            if self.consecutive_failures >= self.failure_threshold:
+                self._open(f"{self.consecutive_failures} consecutive failures")
+            elif len(self.window) >= self.min_calls and error_rate >= self.error_rate_threshold:
+                self._open(f"error rate {error_rate:.0%} over the last {len(self.window)} calls")
+
+    def record_rate_limited(self):
+        """A call turned away for quota: neither a success nor a failure"""
+        with self._lock:
+            self.total_rate_limited += 1
+            self.last_error_type = "rate_limit"
+            if self.state == self.HALF_OPEN and self.half_open_in_flight > 0:
+                self.half_open_in_flight -= 1  # The probe proved nothing, let another one through
+
+    def record_cancelled(self):
+        """Release a probe slot for a call that was cancelled before it finished"""
+        with self._lock:
+            if self.state == self.HALF_OPEN and self.half_open_in_flight > 0:
+                self.half_open_in_flight -= 1
+
+    def _open(self, reason: str):
+        if self.state != self.OPEN:
+            print(f"⚡ Circuit for {self.name} opened: {reason}")
+        self.state = self.OPEN
+        self.opened_at = time.time()
+        self.half_open_in_flight = 0
+
+    def get_state(self) -> Dict:
+        """Snapshot of the breaker for health reporting"""
+        with self._lock:
+            state = self.state
+            if state == self.OPEN and self._cooldown_elapsed():
+                state = self.HALF_OPEN  # The next request will probe
+            window_failures = self.window.count(False)
+            return {
+                "state": state,
+                "error_rate": round(window_failures / len(self.window), 3) if self.window else 0.0,
+                "window_calls": len(self.window),
+                "consecutive_failures": self.consecutive_failures,
+                "last_error_type": self.last_error_type,
+                "open_for_s": round(time.time() - self.opened_at, 1) if self.opened_at else None,
+                "total_successes": self.total_successes,
+                "total_failures": self.total_failures,
+                "total_rate_limited": self.total_rate_limited,
+                "total_rejected": self.total_rejected
+            }
@@ -0,0 +1,121 @@
+import math
+import threading
+from typing import Dict, Optional
+
+# Rough characters per token, used until a model has history
+DEFAULT_CHARS_PER_TOKEN = 4.0
+
+
+class _OnlineRegression:
+    """Least-squares fit of y on x, updated in O(1) per observation"""
+
+    __slots__ = ("count", "mean_x", "mean_y", "m2_x", "m2_y", "c_xy")
+
+    def __init__(self):
+        self.count = 0
+        self.mean_x = 0.0
+        self.mean_y = 0.0
+        self.m2_x = 0.0
+        self.m2_y = 0.0
+        self.c_xy = 0.0
+
+    def add(self, x: float, y: float):
+        self.count += 1
+        dx = x - self.mean_x
+        self.mean_x += dx / self.count
+        dy = y - self.mean_y
+        self.mean_y += dy / self.count
+        self.m2_x += dx * (x - self.mean_x)
+        self.m2_y += dy * (y - self.mean_y)
+        self.c_xy += dx * (y - self.mean_y)
+
+    def predict(self, x: float) -> float:
+        """Fitted y at x; the mean of y while x has no spread yet"""
+        if self.count < 2 or self.m2_x <= 1e-9:
+            return self.mean_y
+        slope = self.c_xy / self.m2_x
+        return self.mean_y + slope * (x - self.mean_x)
+
+    def residual_std(self) -> float:
+        if self.count < 3:
+            return math.sqrt(self.m2_y / self.count) if self.count else 0.0
+        slope_term = self.c_xy ** 2 / self.m2_x if self.m2_x > 1e-9 else 0.0
+        return math.sqrt(max(self.m2_y - slope_term, 0.0) / (self.count - 2))
+
+
+class CostForecaster:
+    """
+    Per-model forecast of input tokens, output tokens and dollar cost before a call.
+
+    Input tokens come from the prompt length and the characters per token seen for the
+    model; output tokens from a running linear regression of output on input tokens,
+    clipped to the model's max_tokens. Cost applies the wrapper's per-1K pricing.
+    Every completed call is fed back through observe(), so forecasts track the data.
+    """
+
+    def __init__(self, min_runs: int = 3, default_output_tokens: int = 500):
+        self.min_runs = min_runs
+        self.default_output_tokens = default_output_tokens
+        self.chars = {}  # model -> [prompt characters, input tokens] over calls with usage data
+        self.output_tokens: Dict[str, _OnlineRegression] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _prompt_chars(wrapper, prompt: str) -> int:
+        return len(wrapper.system_prompt or "") + len(prompt or "")
+
+    def observe(self, model: str, wrapper, prompt: str, input_tokens: int, output_tokens: int):
+        """Learn from one completed call"""
+        if input_tokens <= 0:
+            return
+        with self._lock:
+            totals = self.chars.setdefault(model, [0, 0])
+            totals[0] += self._prompt_chars(wrapper, prompt)
+            totals[1] += input_tokens
+        self.observe_output(model, input_tokens, output_tokens)
+
+    def observe_output(self, model: str, input_tokens: float, output_tokens: int):
+        """Learn only the output-token relation, e.g. from rows where input tokens were estimated"""
+        with self._lock:
+            self.output_tokens.setdefault(model, _OnlineRegression()).add(input_tokens, output_tokens)
+
+    def has_history(self, model: str) -> bool:
+        regression = self.output_tokens.get(model)
+        return regression is not None and regression.count >= self.min_runs
+
+    def forecast(self, model: str, wrapper, prompt: str) -> Dict:
+        """Forecast input_tokens, output_tokens and cost of sending prompt to model"""
+        with self._lock:
+            chars, tokens = self.chars.get(model, (0, 0))
+            chars_per_token = chars / tokens if tokens else DEFAULT_CHARS_PER_TOKEN
+            input_tokens = max(1, round(self._prompt_chars(wrapper, prompt) / chars_per_token))
+
+            regression = self.output_tokens.get(model)
+            if regression is not None and regression.count:
+                output_tokens = regression.predict(input_tokens)
+                output_std = regression.residual_std()
+            else:
+                output_tokens = self.default_output_tokens
+                output_std = None
+        output_tokens = int(round(min(max(output_tokens, 1), wrapper.max_tokens)))
+
+        return {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "output_tokens_std": output_std,
+            "cost": wrapper._calculate_cost(input_tokens, output_tokens),
+            "runs": regression.count if regression is not None else 0
+        }
+
+    def get_state(self, model: str) -> Optional[Dict]:
+        with self._lock:
+            regression = self.output_tokens.get(model)
+            if regression is None:
+                return None
+            chars, tokens = self.chars.get(model, (0, 0))
+            return {
+                "runs": regression.count,
+                "chars_per_token": round(chars / tokens, 2) if tokens else None,
+                "mean_output_tokens": round(regression.mean_y, 1),
+                "output_tokens_std": round(regression.residual_std(), 1)
+            }
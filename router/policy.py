@@ -0,0 +1,207 @@
+import math
+import random
+import threading
+from typing import Dict, Optional
+from router.scorer import Scorer
+
+
+class RoutingPolicy:
+    """
+    Decides how models are ranked for a prompt and learns from critic feedback.
+
+    rank() receives the historical performance of every model (as returned by
+    DatabaseManager.get_model_performance, plus the 'scoring_latency', 'scoring_cost',
+    'scoring_quality' and 'scoring_ttft' the router derived for this prompt) and
+    returns a score per model, higher is better. update() is called once per critic score and must be
+    cheap: it runs on the request path.
+    """
+
+    name = "base"
+
+    def rank(self, prompt: str, performance: Dict[str, Dict]) -> Dict[str, float]:
+        raise NotImplementedError
+
+    def update(self, prompt: str, model: str, latency_ms: float, cost: float, critic_score: float):
+        """Learn from one scored answer; stateless policies ignore it"""
+        pass
+
+    def get_state(self) -> Dict:
+        """Summary of the policy's learned state for reporting"""
+        return {"policy": self.name}
+
+
+class ScorerPolicy(RoutingPolicy):
+    """The weighted scorer: rank on historical performance, learn only via --rerun"""
+
+    name = "scorer"
+
+    def __init__(self, scorer: Scorer):
+        self.scorer = scorer
+
+    def rank(self, prompt: str, performance: Dict[str, Dict]) -> Dict[str, float]:
+        return {
+            model: self.scorer.calculate_score(
+                latency_ms=perf['scoring_latency'],
+                cost=perf['scoring_cost'],
+                quality_score=perf['scoring_quality'],
+                ttft_ms=perf.get('scoring_ttft')
+            )
+            for model, perf in performance.items()
+        }
+
+
+def prompt_context(prompt: str) -> str:
+    """Coarse context for the bandit: prompt length bucket"""
+    length = len(prompt or "")
+    if length < 200:
+        return "short"
+    if length < 800:
+        return "medium"
+    return "long"
+
+
+class _RewardStats:
+    """Running mean and variance of rewards (Welford), updated in O(1)"""
+
+    __slots__ = ("count", "mean", "m2")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, reward: float):
+        self.count += 1
+        delta = reward - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (reward - self.mean)
+
+    def variance(self, default: float) -> float:
+        return self.m2 / (self.count - 1) if self.count > 1 else default
+
+
+class BanditPolicy(RoutingPolicy):
+    """
+    Contextual bandit over models. The reward of an answer is the weighted scorer
+    applied to its own latency, cost and critic score, so config/weights.yaml still
+    defines what a good answer is. Reward statistics are kept per (prompt context, model)
+    and shrunk towards a prior while the context has few samples. The prior is the reward
+    the scorer predicts for this prompt from the router's performance figures, so the
+    prompt-index quality prediction and the forecast cost steer the bandit; without
+    history for the model it falls back to the model's global reward statistics.
+    """
+
+    def __init__(self, scorer: Scorer, prior_strength: float = 5.0, prior_mean: float = 0.5,
+                 prior_variance: float = 0.04):
+        self.scorer = scorer
+        self.prior_strength = prior_strength
+        self.prior_mean = prior_mean
+        self.prior_variance = prior_variance
+        self.global_stats: Dict[str, _RewardStats] = {}
+        self.context_stats: Dict[tuple, _RewardStats] = {}
+        self._lock = threading.Lock()
+
+    def reward(self, latency_ms: float, cost: float, critic_score: float) -> float:
+        return self.scorer.calculate_score(latency_ms=latency_ms, cost=cost, quality_score=critic_score)
+
+    def update(self, prompt: str, model: str, latency_ms: float, cost: float, critic_score: float):
+        reward = self.reward(latency_ms, cost, critic_score)
+        with self._lock:
+            self.global_stats.setdefault(model, _RewardStats()).add(reward)
+            self.context_stats.setdefault((prompt_context(prompt), model), _RewardStats()).add(reward)
+
+    def predicted_reward(self, performance: Dict) -> Optional[float]:
+        """The reward the scorer expects for this prompt, or None while the model has no scored runs"""
+        if not performance.get('total_runs'):
+            return None
+        return self.scorer.calculate_score(latency_ms=performance['scoring_latency'],
+                                           cost=performance['scoring_cost'],
+                                           quality_score=performance['scoring_quality'])
+
+    def _posterior(self, prompt: str, model: str, predicted: Optional[float] = None):
+        """
+        Posterior mean, variance and sample count of a model's reward in this context,
+        with predicted (see predicted_reward) as the prior mean when given
+        """
+        global_stats = self.global_stats.get(model)
+        if global_stats and global_stats.count:
+            prior_mean = global_stats.mean
+            noise_variance = global_stats.variance(self.prior_variance)
+        else:
+            prior_mean = self.prior_mean
+            noise_variance = self.prior_variance
+        if predicted is not None:
+            prior_mean = predicted
+
+        stats = self.context_stats.get((prompt_context(prompt), model))
+        count = stats.count if stats else 0
+        observed_mean = stats.mean if stats else prior_mean
+        weight = count + self.prior_strength
+        mean = (observed_mean * count + prior_mean * self.prior_strength) / weight
+        return mean, max(noise_variance, 1e-6) / weight, count
+
+    def get_state(self) -> Dict:
+        with self._lock:
+            return {
+                "policy": self.name,
+                "models": {
+                    model: {"runs": stats.count, "mean_reward": round(stats.mean, 4)}
+                    for model, stats in self.global_stats.items()
+                },
+                "contexts": {
+                    f"{context}/{model}": {"runs": stats.count, "mean_reward": round(stats.mean, 4)}
+                    for (context, model), stats in self.context_stats.items()
+                }
+            }
+
+
+class ThompsonSamplingPolicy(BanditPolicy):
+    """Rank by a reward drawn from each model's Gaussian posterior"""
+
+    name = "thompson"
+
+    def __init__(self, scorer: Scorer, seed: Optional[int] = None, **kwargs):
+        super().__init__(scorer, **kwargs)
+        self._random = random.Random(seed)
+
+    def rank(self, prompt: str, performance: Dict[str, Dict]) -> Dict[str, float]:
+        scores = {}
+        with self._lock:
+            for model, perf in performance.items():
+                mean, variance, _ = self._posterior(prompt, model, self.predicted_reward(perf))
+                scores[model] = self._random.gauss(mean, math.sqrt(variance))
+        return scores
+
+
+class UCBPolicy(BanditPolicy):
+    """Rank by an upper confidence bound on each model's reward"""
+
+    name = "ucb"
+
+    def __init__(self, scorer: Scorer, exploration: float = 1.0, **kwargs):
+        super().__init__(scorer, **kwargs)
+        self.exploration = exploration
+
+    def rank(self, prompt: str, performance: Dict[str, Dict]) -> Dict[str, float]:
+        scores = {}
+        with self._lock:
+            context = prompt_context(prompt)
+            total = sum(s.count for (c, _), s in self.context_stats.items() if c == context)
+            for model, perf in performance.items():
+                mean, variance, count = self._posterior(prompt, model, self.predicted_reward(perf))
+                bonus = self.exploration * math.sqrt(2 * math.log(total + 2) / (count + 1))
+                scores[model] = mean + bonus * math.sqrt(variance * (count + self.prior_strength))
+        return scores
+
+
+def build_policy(config: Dict, scorer: Scorer) -> RoutingPolicy:
+    """Create the routing policy named in config/settings.yaml"""
+    name = config.get('policy', 'scorer')
+    if name == 'scorer':
+        return ScorerPolicy(scorer)
+    if name == 'thompson':
+        return ThompsonSamplingPolicy(scorer, prior_strength=config.get('prior_strength', 5.0))
+    if name == 'ucb':
+        return UCBPolicy(scorer, exploration=config.get('exploration', 1.0),
+                         prior_strength=config.get('prior_strength', 5.0))
+    raise ValueError(f"Unknown routing policy: {name}")
@@ -0,0 +1,169 @@
+import math
+import re
+import threading
+import zlib
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+
+def hashed_features(text: str, n_features: int) -> Dict[int, int]:
+    """Term counts of hashed word unigrams and bigrams (crc32, so stable across processes)"""
+    words = TOKEN_PATTERN.findall((text or "").lower())
+    grams = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    counts: Dict[int, int] = {}
+    for gram in grams:
+        feature = zlib.crc32(gram.encode("utf-8")) % n_features
+        counts[feature] = counts.get(feature, 0) + 1
+    return counts
+
+
+class PromptIndex:
+    """
+    In-memory nearest-neighbour index over past prompts, used to predict each model's
+    critic score for a new prompt from how it scored on similar ones.
+
+    Prompts are hashed word unigram/bigram vectors with sublinear term frequency. Similarity
+    is the cosine between an indexed prompt's vector and the query's TF-IDF vector, so it
+    stays in 0-1 as min_similarity expects (idf changes with every insert, so indexed
+    vectors are kept without it). It is computed through an inverted index: only postings of
+    the query's terms are visited, and terms in more than max_df of the prompts (or more
+    than max_postings of them) are skipped as uninformative. Postings are append-only
+    arrays, so inserts are incremental and queries read them through numpy without copying.
+    """
+
+    def __init__(self, n_features: int = 2 ** 20, max_df: float = 0.5, max_postings: int = 1000):
+        self.n_features = n_features
+        self.max_df = max_df
+        self.max_postings = max_postings
+
+        self.prompt_ids: Dict[str, int] = {}  # prompt text -> doc id
+        self.postings_docs: Dict[int, array] = {}  # feature -> doc ids
+        self.postings_weights: Dict[int, array] = {}  # feature -> normalised tf weights
+        # doc id -> model -> [sum of critic scores, count]
+        self.scores: List[Dict[str, List[float]]] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.scores)
+
+    def _insert(self, prompt: str) -> int:
+        doc_id = len(self.scores)
+        counts = hashed_features(prompt, self.n_features)
+        weights = {f: 1 + math.log(c) for f, c in counts.items()}
+        norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+        for feature, weight in weights.items():
+            if feature not in self.postings_docs:
+                self.postings_docs[feature] = array('i')
+                self.postings_weights[feature] = array('f')
+            self.postings_docs[feature].append(doc_id)
+            self.postings_weights[feature].append(weight / norm)
+        self.prompt_ids[prompt] = doc_id
+        self.scores.append({})
+        return doc_id
+
+    def add(self, prompt: str, model: Optional[str] = None, critic_score: Optional[float] = None) -> int:
+        """Index a prompt if it is new, and record a model's critic score for it"""
+        with self._lock:
+            doc_id = self.prompt_ids.get(prompt)
+            if doc_id is None:
+                doc_id = self._insert(prompt)
+            if model is not None and critic_score is not None:
+                entry = self.scores[doc_id].setdefault(model, [0.0, 0])
+                entry[0] += critic_score
+                entry[1] += 1
+            return doc_id
+
+    def search(self, prompt: str, k: int = 10) -> List[Tuple[int, float]]:
+        """The k most similar indexed prompts as (doc id, similarity), most similar first"""
+        with self._lock:
+            n_docs = len(self.scores)
+            if n_docs == 0:
+                return []
+
+            df_limit = min(self.max_df * n_docs, self.max_postings)
+            query = hashed_features(prompt, self.n_features)
+            doc_parts, weight_parts = [], []
+            query_norm = 0.0
+            for feature, count in query.items():
+                docs = self.postings_docs.get(feature)
+                if docs is None:
+                    continue
+                df = len(docs)
+                if df > df_limit and n_docs > 1:
+                    continue
+                idf = math.log((1 + n_docs) / (1 + df)) + 1
+                query_weight = (1 + math.log(count)) * idf
+                query_norm += query_weight * query_weight
+                doc_parts.append(np.frombuffer(docs, dtype=np.int32))
+                weight_parts.append(np.frombuffer(self.postings_weights[feature], dtype=np.float32)
+                                    * query_weight)
+            if not doc_parts:
+                return []
+
+            sims = np.bincount(np.concatenate(doc_parts), weights=np.concatenate(weight_parts),
+                               minlength=n_docs)
+            # Release the views before an insert can grow the postings arrays
+            del doc_parts, weight_parts
+
+        # Rank only the prompts sharing a term with the query; scale to cosine at the end
+        candidates = np.flatnonzero(sims > 0)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-sims[candidates], k)[:k]]
+        order = candidates[np.argsort(-sims[candidates])]
+        scale = 1 / math.sqrt(query_norm)
+        return [(int(doc_id), float(sims[doc_id]) * scale) for doc_id in order]
+
+    def predict_scores(self, prompt: str, k: int = 10, min_similarity: float = 0.0) -> Dict[str, Tuple[float, float]]:
+        """
+        Predicted critic score per model from the k nearest scored prompts, as
+        (similarity-weighted mean score, total similarity of the neighbours used)
+        """
+        totals: Dict[str, List[float]] = {}
+        for doc_id, similarity in self.search(prompt, k):
+            if similarity < min_similarity:
+                break
+            for model, (score_sum, count) in self.scores[doc_id].items():
+                entry = totals.setdefault(model, [0.0, 0.0])
+                entry[0] += similarity * score_sum / count
+                entry[1] += similarity
+        return {model: (weighted / support, support) for model, (weighted, support) in totals.items()}
+
+
+def _benchmark(n_prompts: int = 100_000, n_queries: int = 1000):
+    """Build an index of synthetic prompts and time inserts and lookups"""
+    import random
+    import time
+
+    rng = random.Random(0)
+    vocabulary = [f"word{i}" for i in range(20_000)]
+    # Zipf-like word frequencies, roughly like natural language
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+
+    def make_prompt():
+        return " ".join(rng.choices(vocabulary, weights, k=rng.randint(8, 40)))
+
+    prompts = [make_prompt() for _ in range(n_prompts)]
+    index = PromptIndex()
+    start = time.perf_counter()
+    for i, prompt in enumerate(prompts):
+        index.add(prompt, "model-a", float(i % 10))
+    build_s = time.perf_counter() - start
+
+    queries = [make_prompt() for _ in range(n_queries)]
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        index.predict_scores(query, k=10)
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    print(f"Indexed {n_prompts} prompts in {build_s:.1f}s ({build_s / n_prompts * 1e6:.0f}us per insert)")
+    print(f"Query latency over {n_queries} queries: p50={latencies[len(latencies) // 2]:.3f}ms "
+          f"p99={latencies[int(len(latencies) * 0.99)]:.3f}ms")
+
+
+if __name__ == "__main__":
+    _benchmark()
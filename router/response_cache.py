@@ -0,0 +1,150 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+# Fields of a model response worth replaying; routing metadata is added per request
+CACHED_FIELDS = ("answer_text", "latency_ms", "tokens", "estimated_cost", "input_tokens", "output_tokens")
+
+
+def cache_key(model_name: str, wrapper, prompt: str) -> str:
+    """Content address of a completion: everything that changes what the provider would return"""
+    material = json.dumps([
+        model_name,
+        wrapper.model_name,
+        wrapper.system_prompt,
+        wrapper.temperature,
+        wrapper.max_tokens,
+        prompt
+    ], separators=(",", ":"))
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Exact-match cache of model completions, in two tiers.
+
+    memory - LRU of the most recently used entries in this process
+    disk   - the response_cache table of the runs database, shared by every process
+             and kept across runs; evicted by least recent access once it grows
+             past max_disk_mb
+
+    Entries older than ttl_s are ignored and removed when found.
+    """
+
+    def __init__(self, db_path: str, memory_entries: int = 256, max_disk_mb: float = 50.0,
+                 ttl_s: float = 7 * 24 * 3600):
+        self.db_path = db_path
+        self.memory_entries = memory_entries
+        self.max_disk_bytes = int(max_disk_mb * 1024 * 1024)
+        self.ttl_s = ttl_s
+
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (created_at, response)
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _expired(self, created_at: float) -> bool:
+        return time.time() - created_at > self.ttl_s
+
+    def _remember(self, key: str, created_at: float, response: Dict):
+        self._memory[key] = (created_at, response)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Cached response for a key, or None"""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if not self._expired(entry[0]):
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return dict(entry[1])
+                del self._memory[key]
+
+        with sqlite3.connect(self.db_path) as conn:
+            row = conn.execute("SELECT response, created_at FROM response_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                with self._lock:
+                    self.misses += 1
+                return None
+            if self._expired(row[1]):
+                conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+                conn.commit()
+                with self._lock:
+                    self.misses += 1
+                return None
+            conn.execute("UPDATE response_cache SET last_access = ? WHERE key = ?", (time.time(), key))
+            conn.commit()
+
+        response = json.loads(row[0])
+        with self._lock:
+            self._remember(key, row[1], response)
+            self.disk_hits += 1
+        return dict(response)
+
+    def put(self, key: str, model: str, response: Dict):
+        """Store a successful response under key in both tiers"""
+        entry = {field: response.get(field) for field in CACHED_FIELDS}
+        payload = json.dumps(entry)
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, entry)
+
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("""
+                INSERT OR REPLACE INTO response_cache (key, model, response, size_bytes, created_at, last_access)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (key, model, payload, len(payload), now, now))
+            self._evict(conn)
+            conn.commit()
+
+    def _evict(self, conn: sqlite3.Connection):
+        """Drop expired entries, then least recently used ones until under max_disk_bytes"""
+        cursor = conn.execute("DELETE FROM response_cache WHERE created_at < ?", (time.time() - self.ttl_s,))
+        evicted = cursor.rowcount
+        total = conn.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM response_cache").fetchone()[0]
+        if total > self.max_disk_bytes:
+            for key, size in conn.execute(
+                "SELECT key, size_bytes FROM response_cache ORDER BY last_access"
+            ).fetchall():
+                if total <= self.max_disk_bytes:
+                    break
+                conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+                total -= size
+                evicted += 1
+        if evicted:
+            with self._lock:
+                self.evictions += evicted
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("DELETE FROM response_cache")
+            conn.commit()
+
+    def get_stats(self) -> Dict:
+        with sqlite3.connect(self.db_path) as conn:
+            entries, size = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM response_cache"
+            ).fetchone()
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_entries": len(self._memory),
+                "disk_entries": entries,
+                "disk_bytes": size,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_ratio": round((self.memory_hits + self.disk_hits) / lookups, 3) if lookups else None,
+                "evictions": self.evictions
+            }
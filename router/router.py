@@ -2,58 +2,152 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from typing import Dict, List, Tuple
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from typing import Dict, Iterator, List, Optional, Tuple
 from models.openai_model import OpenAIModel
 from models.anthropic_model import AnthropicModel  
 from models.mistral_model import MistralModel
+from models.base import is_error_response
 from router.scorer import Scorer
+from router.circuit_breaker import CircuitBreaker
+from router.policy import build_policy, BanditPolicy
+from router.prompt_index import PromptIndex
+from router.forecaster import CostForecaster
+from router.response_cache import ResponseCache, cache_key
+from router.similarity_cache import SimilarityCache
 from db.db import DatabaseManager
+from config.settings import load_settings
+
+class CallSettlement:
+    """
+    Decides once who accounts for a call run on the router's thread pool: the call itself,
+    with its outcome, or the caller that stopped waiting for it, as cancelled. A thread
+    cannot be interrupted, so an abandoned call runs on until the provider answers or its
+    timeout fires, and must then not be counted a second time.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._settled = False
+    
+    def claim(self) -> bool:
+        """True for the first claimant only"""
+        with self._lock:
+            if self._settled:
+                return False
+            self._settled = True
+            return True
 
 class LLMRouter:
     def __init__(self):
-        self.models = {
+        self.models = self._build_models()
+        self.scorer = Scorer()
+        self.db = DatabaseManager()
+        self.settings = load_settings()
+        self.policy = build_policy(self.settings['routing'], self.scorer)
+        self.prompt_index = PromptIndex() if self.settings['prompt_index']['enabled'] else None
+        forecast_config = self.settings['forecasting']
+        self.forecaster = CostForecaster(forecast_config['min_runs'], forecast_config['default_output_tokens'])
+        cache_config = self.settings['response_cache']
+        self.response_cache = ResponseCache(self.db.db_path, cache_config['memory_entries'],
+                                            cache_config['max_disk_mb'], cache_config['ttl_s'])
+        similarity_config = self.settings['similarity_cache']
+        self.similarity_cache = SimilarityCache(
+            similarity_config['threshold'], similarity_config['num_perm'], similarity_config['bands'],
+            similarity_config['max_entries']
+        ) if similarity_config['enabled'] else None
+        self._warm_start()
+        breaker_config = {k: v for k, v in self.settings['circuit_breaker'].items()
+                          if k not in ('enabled', 'skip_open')}
+        self.breakers = {name: CircuitBreaker(name, **breaker_config) for name in self.models}
+        for model in self.models.values():
+            model.request_timeout_s = self.settings['deadlines']['request_timeout_s']
+        self._executor = self._build_executor()
+    
+    def _build_models(self) -> Dict:
+        """Create the model wrappers keyed by routing name"""
+        return {
             'gpt-4o': OpenAIModel(),
             'claude': AnthropicModel(),
             'mistral': MistralModel()
         }
-        self.scorer = Scorer()
-        self.db = DatabaseManager()
+    
+    def _build_executor(self) -> Optional[ThreadPoolExecutor]:
+        """
+        Shared pool for hedged and deadline-bound calls; an abandoned call keeps its thread
+        until the SDK call returns or hits its own timeout
+        """
+        return ThreadPoolExecutor(max_workers=16, thread_name_prefix="router")
     
     def get_ranked_models(self, prompt: str) -> List[Tuple[str, float]]:
         """
         Determine the ranked list of models for a given prompt based on historical performance
         Returns a list of (model_name, score) tuples sorted by score (highest first)
         """
-        model_scores = {}
+        performances = {}
+        latency_percentile = self.settings['scoring']['latency_percentile']
+        predictions = self._predict_quality(prompt)
+        forecasts = self.forecast_costs(prompt)
         
         for model_name in self.models.keys():
             # Get historical performance
             performance = self.db.get_model_performance(model_name)
             
-            # Calculate score using current performance metrics
-            score = self.scorer.calculate_score(
-                latency_ms=performance['avg_latency'],
-                cost=performance['avg_cost'],
-                quality_score=performance['avg_score']
-            )
+            # Score on a latency percentile from the model's sketch when configured
+            performance['scoring_latency'] = performance['avg_latency']
+            if latency_percentile is not None:
+                percentile_latency = self.db.get_latency_percentile(model_name, latency_percentile / 100)
+                if percentile_latency is not None:
+                    performance['scoring_latency'] = percentile_latency
+            
+            # Time to first token of streamed answers, when the model has any
+            performance['scoring_ttft'] = performance['avg_ttft']
+            
+            # Blend in the critic score predicted from similar past prompts
+            performance['scoring_quality'] = performance['avg_score']
+            performance['predicted_score'] = None
+            if model_name in predictions:
+                predicted, support = predictions[model_name]
+                shrinkage = self.settings['prompt_index']['shrinkage']
+                performance['predicted_score'] = predicted
+                performance['scoring_quality'] = (
+                    (predicted * support + performance['avg_score'] * shrinkage) / (support + shrinkage)
+                )
             
-            model_scores[model_name] = {
-                'score': score,
-                'performance': performance
-            }
+            # Score on the forecast cost of this prompt once the model has enough history
+            performance['forecast_cost'] = forecasts[model_name]['cost']
+            performance['scoring_cost'] = performance['avg_cost']
+            if self.settings['forecasting']['enabled'] and self.forecaster.has_history(model_name):
+                performance['scoring_cost'] = performance['forecast_cost']
+            performances[model_name] = performance
+        
+        # The routing policy turns performance (and its own learned state) into scores
+        scores = self.policy.rank(prompt, performances)
+        model_scores = {
+            model_name: {'score': scores[model_name], 'performance': performances[model_name]}
+            for model_name in performances
+        }
         
         # Sort models by score (highest first)
         ranked_models = sorted(model_scores.keys(), key=lambda k: model_scores[k]['score'], reverse=True)
+        ranked_models = self._apply_circuit_breakers(ranked_models)
         
-        print(f"Model scores for prompt selection:")
+        print(f"Model scores for prompt selection ({self.policy.name} policy):")
         for model in ranked_models:
             data = model_scores[model]
             perf = data['performance']
+            predicted = '' if perf['predicted_score'] is None else f"predicted={perf['predicted_score']:.1f}, "
             print(f"  {model}: score={data['score']:.3f} "
-                  f"(quality={perf['avg_score']:.1f}, "
+                  f"(quality={perf['avg_score']:.1f}, {predicted}"
                   f"latency={perf['avg_latency']:.0f}ms, "
+                  f"p95={perf['p95_latency'] or 0:.0f}ms, "
                   f"cost=${perf['avg_cost']:.4f}, "
-                  f"runs={perf['total_runs']})")
+                  f"forecast=${perf['forecast_cost']:.4f}, "
+                  f"runs={perf['total_runs']})"
+                  f"{'' if self.breakers[model].is_available() else ' [circuit open]'}")
         
         return [(model, model_scores[model]['score']) for model in ranked_models]
     
@@ -67,63 +161,629 @@ class LLMRouter:
         print(f"Selected model: {best_model}")
         return best_model
     
-    def _is_error_response(self, response: Dict) -> bool:
-        """Check if a response indicates an error"""
-        return (
-            response.get('answer_text', '').startswith('Error generating response:') or
-            response.get('tokens', 0) == 0 or
-            response.get('estimated_cost', 0) == 0.0
-        )
+    def _apply_circuit_breakers(self, ranked_models: List[str]) -> List[str]:
+        """
+        Move models whose circuit is open to the end of the ranking, or drop them when
+        skip_open is set. If every circuit is open the ranking is left unchanged.
+        """
+        config = self.settings['circuit_breaker']
+        if not config['enabled']:
+            return ranked_models
+        
+        available = [m for m in ranked_models if self.breakers[m].is_available()]
+        if not available or len(available) == len(ranked_models):
+            return ranked_models
+        if config['skip_open']:
+            return available
+        return available + [m for m in ranked_models if m not in available]
+    
+    def _breaker_rejection(self, model_name: str) -> Optional[Dict]:
+        """Return an error response without calling the model if its circuit is open"""
+        if not self.settings['circuit_breaker']['enabled'] or self.breakers[model_name].allow_request():
+            return None
+        return {
+            "model": model_name,
+            "answer_text": f"Error generating response: circuit open for {model_name}",
+            "latency_ms": 0.0,
+            "tokens": 0,
+            "estimated_cost": 0.0,
+            "input_tokens": 0,
+            "output_tokens": 0,
+            "error_type": "circuit_open"
+        }
+    
+    def _record_outcome(self, model_name: str, response: Dict):
+        """Feed a finished call into the model's circuit breaker (rate limits are not failures)"""
+        if response.get('error_type') == 'rate_limit':
+            self.breakers[model_name].record_rate_limited()
+        elif is_error_response(response):
+            self.breakers[model_name].record_failure(response.get('error_type'))
+        else:
+            self.breakers[model_name].record_success()
+    
+    def _call_model(self, model_name: str, prompt: str, check_breaker: bool = True,
+                    timeout: Optional[float] = None, settlement: Optional[CallSettlement] = None) -> Dict:
+        """
+        Call a single model, tag the response with its name and track its health. With a
+        settlement, the outcome is not recorded if the caller has abandoned the call.
+        """
+        if check_breaker:
+            rejection = self._breaker_rejection(model_name)
+            if rejection is not None:
+                return rejection
+        
+        model = self.models[model_name]
+        if timeout is not None:
+            response = model.generate_response(prompt, timeout=timeout)
+        else:
+            response = model.generate_response(prompt)
+        if settlement is not None and not settlement.claim():
+            response['model'] = model_name
+            print(f"↳ Abandoned call to {model_name} finished after "
+                  f"{response.get('latency_ms', 0):.0f}ms, cost ${response.get('estimated_cost', 0):.4f}")
+            return response
+        return self._finish_call(model_name, response)
+    
+    def _abandon(self, model_name: str, settlement: CallSettlement):
+        """Stop waiting for a call on the thread pool, counting it as cancelled unless it already finished"""
+        if settlement.claim():
+            self.breakers[model_name].record_cancelled()
+    
+    def _finish_call(self, model_name: str, response: Dict) -> Dict:
+        """Tag a model's response with its routing name and feed it to the circuit breaker"""
+        response['model'] = model_name
+        self._record_outcome(model_name, response)
+        return response
+    
+    def _call_within_deadline(self, model_name: str, prompt: str, deadline: Optional[float],
+                              check_breaker: bool = True) -> Dict:
+        """
+        Call a model, giving up when the deadline (an absolute time.time() value) passes.
+        The provider call itself gets the remaining budget as its timeout, which ends an
+        abandoned call's thread soon after; it is counted once, as cancelled.
+        """
+        if deadline is None:
+            return self._call_model(model_name, prompt, check_breaker)
+        
+        start_time = time.time()
+        remaining = deadline - start_time
+        if remaining <= 0:
+            return self._deadline_response(model_name, 0.0)
+        
+        settlement = CallSettlement()
+        future = self._executor.submit(self._call_model, model_name, prompt, check_breaker, remaining, settlement)
+        try:
+            return future.result(timeout=remaining)
+        except FuturesTimeoutError:
+            future.cancel()
+            self._abandon(model_name, settlement)
+            return self._deadline_response(model_name, (time.time() - start_time) * 1000)
+    
+    def _attempt_deadline(self, deadline: Optional[float], is_last: bool) -> Optional[float]:
+        """
+        Deadline for one attempt: the last candidate may use the whole remaining budget,
+        earlier ones only attempt_fraction of it so a fallback still has time to answer
+        """
+        if deadline is None or is_last:
+            return deadline
+        remaining = deadline - time.time()
+        return time.time() + max(0.0, remaining) * self.settings['deadlines']['attempt_fraction']
+    
+    def _deadline_response(self, model_name: str, latency_ms: float) -> Dict:
+        """Error response for a call abandoned because the latency budget ran out"""
+        return {
+            "model": model_name,
+            "answer_text": f"Error generating response: latency budget exhausted waiting for {model_name}",
+            "latency_ms": latency_ms,
+            "tokens": 0,
+            "estimated_cost": 0.0,
+            "input_tokens": 0,
+            "output_tokens": 0,
+            "error_type": "deadline_exceeded"
+        }
+    
+    def _filter_by_deadline(self, ranked_models: List[Tuple[str, float]], budget_ms: float) -> List[Tuple[str, float]]:
+        """
+        Drop models whose historical latency percentile (p95 by default) cannot meet the budget.
+        If no model can, keep only the one with the lowest percentile latency.
+        """
+        percentile = self.settings['deadlines']['percentile'] / 100
+        feasible = []
+        latencies = {}
+        for model_name, score in ranked_models:
+            latency = self.db.get_latency_percentile(model_name, percentile)
+            latencies[model_name] = latency if latency is not None else 0.0
+            if latency is None or latency <= budget_ms:
+                feasible.append((model_name, score))
+            else:
+                print(f"Skipping {model_name}: p{percentile * 100:.0f} latency {latency:.0f}ms "
+                      f"exceeds the {budget_ms:.0f}ms budget")
+        
+        if not feasible:
+            fastest = min(ranked_models, key=lambda item: latencies[item[0]])
+            print(f"No model fits the budget, trying the fastest: {fastest[0]}")
+            return [fastest]
+        return feasible
+    
+    def forecast_costs(self, prompt: str) -> Dict[str, Dict]:
+        """Forecast tokens and cost of sending the prompt to each model"""
+        return {name: self.forecaster.forecast(name, model, prompt) for name, model in self.models.items()}
+    
+    def _filter_by_cost(self, prompt: str, ranked_models: List[Tuple[str, float]],
+                        max_cost: float) -> List[Tuple[str, float]]:
+        """Drop models whose forecast cost for this prompt is above max_cost"""
+        forecasts = self.forecast_costs(prompt)
+        affordable = []
+        for model_name, score in ranked_models:
+            if forecasts[model_name]['cost'] <= max_cost:
+                affordable.append((model_name, score))
+            else:
+                print(f"Skipping {model_name}: forecast cost ${forecasts[model_name]['cost']:.4f} "
+                      f"exceeds the ${max_cost:.4f} budget")
+        return affordable
+    
+    def _budget_response(self, model_name: Optional[str], max_cost: float) -> Dict:
+        """Error response for a request that no model can serve within its cost budget"""
+        return {
+            "model": model_name or "none",
+            "answer_text": f"Error generating response: no model fits the ${max_cost:.4f} cost budget",
+            "latency_ms": 0.0,
+            "tokens": 0,
+            "estimated_cost": 0.0,
+            "input_tokens": 0,
+            "output_tokens": 0,
+            "error_type": "over_budget"
+        }
+    
+    def _record_forecast(self, prompt: str, response: Dict, forecasts: Dict[str, Dict]):
+        """
+        Attach the pre-dispatch forecast to the response, log its error and learn from the
+        actual token counts
+        """
+        forecast = forecasts.get(response.get('model'))
+        if forecast is None:
+            return
+        response['forecast_output_tokens'] = forecast['output_tokens']
+        response['forecast_cost'] = forecast['cost']
+        if is_error_response(response) or response.get('cache_hit'):
+            return
+        
+        model_name = response['model']
+        actual_cost = response['estimated_cost']
+        print(f"🔮 Forecast for {model_name}: ${forecast['cost']:.4f} / {forecast['output_tokens']} output tokens, "
+              f"actual ${actual_cost:.4f} / {response.get('output_tokens', 0)} "
+              f"({(actual_cost - forecast['cost']) / actual_cost:+.0%} cost error)")
+        self.forecaster.observe(model_name, self.models[model_name], prompt,
+                                response.get('input_tokens', 0), response.get('output_tokens', 0))
+    
+    def _cache_enabled(self, use_cache: Optional[bool]) -> bool:
+        return self.settings['response_cache']['enabled'] if use_cache is None else use_cache
+    
+    def _cached_response(self, model_name: str, prompt: str) -> Optional[Dict]:
+        """
+        A cached completion by model_name of this prompt, or else of a near-duplicate
+        of it, marked as a cache hit; None if neither cache has one
+        """
+        start_time = time.time()
+        match = {"similarity": 1.0, "exact": True}
+        cached = self.response_cache.get(cache_key(model_name, self.models[model_name], prompt))
+        if cached is None and self.similarity_cache is not None:
+            cached, match = self.similarity_cache.lookup(model_name, prompt) or (None, None)
+        if cached is None:
+            return None
+        if 'matched_entry_id' in match:
+            print(f"💾 Near-duplicate cache hit for {model_name}: similarity {match['similarity']:.2f} "
+                  f"to cached prompt #{match['matched_entry_id']}, saved ${cached['estimated_cost']:.4f}")
+        else:
+            print(f"💾 Cache hit for {model_name}, saved ${cached['estimated_cost']:.4f}")
+        cached.update({
+            "model": model_name,
+            "latency_ms": (time.time() - start_time) * 1000,
+            "estimated_cost": 0.0,
+            "cached_cost": cached['estimated_cost'],
+            "cache_hit": True,
+            "cache_similarity": match['similarity'],
+            "cache_match": match
+        })
+        return cached
+    
+    def _store_in_cache(self, prompt: str, response: Dict):
+        """Cache a fresh successful completion"""
+        if response.get('cache_hit') or is_error_response(response):
+            return
+        model_name = response['model']
+        self.response_cache.put(cache_key(model_name, self.models[model_name], prompt), model_name, response)
+        if self.similarity_cache is not None:
+            self.similarity_cache.add(model_name, prompt, response)
+    
+    def _mark_deadline(self, response: Dict, deadline_ms: float, start_time: float) -> Dict:
+        """Record the budget and whether the whole routed request finished within it"""
+        elapsed_ms = (time.time() - start_time) * 1000
+        response['deadline_ms'] = deadline_ms
+        response['deadline_met'] = elapsed_ms <= deadline_ms and not is_error_response(response)
+        if not response['deadline_met']:
+            print(f"⏱ Deadline of {deadline_ms:.0f}ms missed (elapsed {elapsed_ms:.0f}ms)")
+        return response
+    
+    def get_health(self) -> Dict:
+        """Circuit breaker state for every model"""
+        return {name: breaker.get_state() for name, breaker in self.breakers.items()}
+    
+    def get_hedge_delay_ms(self, model_name: str) -> float:
+        """
+        Delay before hedging a request to model_name, either a fixed number of
+        milliseconds or a historical latency percentile such as "p90"
+        """
+        config = self.settings['hedging']
+        delay = config['delay']
+        
+        if isinstance(delay, str) and delay.lower().startswith('p'):
+            percentile = float(delay[1:]) / 100
+            delay_ms = self.db.get_latency_percentile(model_name, percentile)
+            if delay_ms is None:
+                delay_ms = config['default_delay_ms']
+        else:
+            delay_ms = float(delay)
+        
+        return max(config['min_delay_ms'], delay_ms)
+    
+    def _cancelled_attempt(self, model_name: str, prompt: str, role: str, elapsed_ms: float) -> Dict:
+        """
+        Describe an attempt that lost the race. Its usage is unknown, so the cost covers the
+        prompt tokens only, estimated at ~4 characters per token, and is flagged as an
+        estimate. An abandoned sync call is billed in full when it finishes, so for
+        LLMRouter this is a lower bound; AsyncLLMRouter really cancels the request.
+        """
+        model = self.models[model_name]
+        input_tokens = len(prompt) // 4
+        return {
+            "model": model_name,
+            "answer_text": "Cancelled: another hedged attempt answered first",
+            "latency_ms": elapsed_ms,
+            "tokens": 0,
+            "estimated_cost": (input_tokens / 1000) * getattr(model, 'input_price_per_1k', 0.0),
+            "input_tokens": input_tokens,
+            "hedge_role": role,
+            "hedge_outcome": "cancelled",
+            "cost_estimated": True
+        }
+    
+    def _hedge_plan(self, ranked_models: List[Tuple[str, float]],
+                    deadline: Optional[float]) -> Tuple[str, str, float]:
+        """The primary and hedge model of a hedged request and the hedge delay in seconds"""
+        primary, hedge = ranked_models[0][0], ranked_models[1][0]
+        delay_ms = self.get_hedge_delay_ms(primary)
+        if deadline is not None:
+            # Leave the hedge enough of the budget to answer
+            budget_ms = (deadline - time.time()) * 1000
+            delay_ms = min(delay_ms, budget_ms * (1 - self.settings['deadlines']['attempt_fraction']))
+        print(f"Hedging {primary} with {hedge} after {delay_ms:.0f}ms")
+        return primary, hedge, delay_ms / 1000
     
-    def generate_response(self, prompt: str, model_name: str = None) -> Dict:
+    @staticmethod
+    def _remaining(deadline: Optional[float]) -> Optional[float]:
+        """Seconds left before deadline, None without one"""
+        return None if deadline is None else max(0.0, deadline - time.time())
+    
+    def _wait_timeout(self, deadline: Optional[float], limit: Optional[float] = None) -> Optional[float]:
+        """How long to wait for an attempt: limit, capped by the time left before deadline"""
+        budget = self._remaining(deadline)
+        if budget is None:
+            return limit
+        return budget if limit is None else min(limit, budget)
+    
+    def _settle_hedged_attempt(self, response: Dict, role: str, winner: Optional[Dict]) -> Optional[Dict]:
+        """Tag a finished hedged attempt and return the winner so far (the first valid answer)"""
+        response['hedge_role'] = role
+        if winner is None and not is_error_response(response):
+            response['hedge_outcome'] = 'won'
+            return response
+        response['hedge_outcome'] = 'failed'
+        print(f"✗ Hedged attempt {response['model']} failed: {response.get('answer_text', 'Unknown error')}")
+        return winner
+    
+    def _generate_hedged(self, prompt: str, ranked_models: List[Tuple[str, float]],
+                         deadline: Optional[float] = None) -> Tuple[Optional[Dict], List[Dict]]:
         """
-        Generate response using specified model or best model with fallback to second-best
+        Race the top two ranked models: start the primary, start the secondary if the primary
+        has not answered after the hedge delay (or has already failed), and return the first
+        valid answer (None if both failed or the deadline passed) together with every attempt made.
+        """
+        primary, hedge, delay = self._hedge_plan(ranked_models, deadline)
+        start_times = {primary: time.time()}
+        settlements = {primary: CallSettlement()}
+        futures = {self._executor.submit(self._call_model, primary, prompt, True, self._remaining(deadline),
+                                         settlements[primary]): (primary, 'primary')}
+        done, _ = wait(futures, timeout=self._wait_timeout(deadline, delay))
+        
+        primary_ok = any(not is_error_response(f.result()) for f in done)
+        if not primary_ok and self._remaining(deadline) != 0.0:
+            print(f"→ No valid answer from {primary} yet, starting hedge {hedge}")
+            start_times[hedge] = time.time()
+            settlements[hedge] = CallSettlement()
+            futures[self._executor.submit(self._call_model, hedge, prompt, True, self._remaining(deadline),
+                                          settlements[hedge])] = (hedge, 'hedge')
+        
+        attempts = []
+        winner = None
+        pending = set(futures)
+        while pending and winner is None:
+            done, pending = wait(pending, timeout=self._wait_timeout(deadline), return_when=FIRST_COMPLETED)
+            if not done:
+                print("⏱ Latency budget exhausted while waiting for hedged attempts")
+                break
+            for future in done:
+                response = future.result()
+                winner = self._settle_hedged_attempt(response, futures[future][1], winner)
+                attempts.append(response)
+        
+        for future in pending:
+            model_name, role = futures[future]
+            # The thread cannot be stopped: it runs on until the provider answers or times out,
+            # and then leaves the circuit breaker alone
+            future.cancel()
+            self._abandon(model_name, settlements[model_name])
+            elapsed_ms = (time.time() - start_times[model_name]) * 1000
+            attempts.append(self._cancelled_attempt(model_name, prompt, role, elapsed_ms))
+        
+        if winner is not None:
+            print(f"✓ Hedged request won by {winner['hedge_role']} model: {winner['model']}")
+        return winner, attempts
+    
+    def _after_hedge(self, winner: Optional[Dict], attempts: List[Dict],
+                     ranked_models: List[Tuple[str, float]]) -> Tuple[Optional[Dict], List[Tuple[str, float]]]:
+        """
+        The response to return after a hedged race (the winner, or the last error when no
+        model is left), else None and the models to fall back to
+        """
+        if winner is not None:
+            return self._attach_hedge_attempts(winner, attempts), []
+        if len(ranked_models) == 2:
+            print("⚠ Both hedged attempts failed, returning last error response")
+            return self._attach_hedge_attempts(attempts[-1], attempts), []
+        print("→ Both hedged attempts failed, falling back to remaining models...")
+        return None, ranked_models[2:]
+    
+    def _attach_hedge_attempts(self, response: Dict, attempts: List[Dict]) -> Dict:
+        """List the other hedged attempts on the final response so callers can store them in runs"""
+        response['hedge_attempts'] = [
+            {**{key: attempt[key] for key in ('model', 'answer_text', 'latency_ms', 'tokens',
+                                              'estimated_cost', 'hedge_role', 'hedge_outcome')},
+             **{key: attempt.get(key) for key in ('input_tokens', 'output_tokens', 'cost_estimated')}}
+            for attempt in attempts if attempt is not response
+        ]
+        return response
+    
+    def generate_response(self, prompt: str, model_name: str = None, hedge: Optional[bool] = None,
+                          deadline_ms: Optional[float] = None, max_cost: Optional[float] = None,
+                          use_cache: Optional[bool] = None) -> Dict:
+        """
+        Generate response using specified model or best model with fallback to second-best.
+        With hedging (hedge=True, or enabled in config/settings.yaml) the top two models race.
+        With a deadline_ms latency budget, models that historically cannot meet it are skipped
+        and calls are abandoned in favour of the next model once the budget runs out.
+        With max_cost, models whose forecast cost for the prompt is above it are skipped.
+        A cached completion from the chosen model is returned without calling it, unless
+        use_cache=False (the fresh answer is still cached).
+        """
+        start_time = time.time()
+        forecasts = self.forecast_costs(prompt)
+        deadline = start_time + deadline_ms / 1000 if deadline_ms is not None else None
+        response = self._generate(prompt, model_name, hedge, deadline, max_cost, self._cache_enabled(use_cache))
+        self._record_forecast(prompt, response, forecasts)
+        self._store_in_cache(prompt, response)
+        if deadline_ms is not None:
+            self._mark_deadline(response, deadline_ms, start_time)
+        return response
+    
+    def _generate(self, prompt: str, model_name: Optional[str], hedge: Optional[bool],
+                  deadline: Optional[float], max_cost: Optional[float] = None,
+                  use_cache: bool = False) -> Dict:
+        candidates, response = self._plan_route(prompt, model_name, max_cost, use_cache, deadline)
+        if response is not None:
+            return response
+        
+        hedge_attempts = []
+        if self._should_hedge(hedge, model_name, candidates):
+            winner, hedge_attempts = self._generate_hedged(prompt, candidates, deadline)
+            response, candidates = self._after_hedge(winner, hedge_attempts, candidates)
+            if response is not None:
+                return response
+        
+        # Try models in order of preference
+        for i, (name, score) in enumerate(candidates):
+            print(f"Trying model {i+1}/{len(candidates)}: {name}")
+            # A requested model is called even when its circuit is open
+            response = self._call_within_deadline(
+                name, prompt, self._attempt_deadline(deadline, i == len(candidates) - 1),
+                check_breaker=model_name is None
+            )
+            if self._fallback_done(response, i, len(candidates), deadline, hedge_attempts):
+                break
+        return response
+    
+    def _plan_route(self, prompt: str, model_name: Optional[str], max_cost: Optional[float],
+                    use_cache: bool, deadline: Optional[float] = None) -> Tuple[List[Tuple[str, float]], Optional[Dict]]:
+        """
+        Ranked models to try (only model_name if given), filtered by forecast cost and, with
+        a deadline, by latency percentile, or else a cached or over-budget response to
+        return instead of calling any. Shared by every sync, async and streaming path.
         """
         if model_name is not None:
             # If a specific model is requested, try only that model
             if model_name not in self.models:
                 raise ValueError(f"Unknown model: {model_name}")
-            
-            model = self.models[model_name]
-            response = model.generate_response(prompt)
-            response['model'] = model_name
-            return response
+            cached = self._cached_response(model_name, prompt) if use_cache else None
+            if cached is not None:
+                return [], cached
+            if max_cost is not None and not self._filter_by_cost(prompt, [(model_name, 0.0)], max_cost):
+                return [], self._budget_response(model_name, max_cost)
+            return [(model_name, 0.0)], None
         
         # Get ranked list of models
         ranked_models = self.get_ranked_models(prompt)
+        if max_cost is not None:
+            ranked_models = self._filter_by_cost(prompt, ranked_models, max_cost)
+            if not ranked_models:
+                return [], self._budget_response(None, max_cost)
+        if deadline is not None:
+            ranked_models = self._filter_by_deadline(ranked_models, (deadline - time.time()) * 1000)
         
-        # Try models in order of preference
-        for i, (model_name, score) in enumerate(ranked_models):
-            print(f"Trying model {i+1}/{len(ranked_models)}: {model_name}")
-            
-            model = self.models[model_name]
-            response = model.generate_response(prompt)
-            response['model'] = model_name
-            
-            # Check if response is valid (not an error)
-            if not self._is_error_response(response):
-                if i > 0:  # If we used a fallback model
-                    print(f"✓ Successfully used fallback model: {model_name}")
-                else:
-                    print(f"✓ Successfully used primary model: {model_name}")
-                return response
+        # The chosen model has answered this exact prompt before
+        cached = self._cached_response(ranked_models[0][0], prompt) if use_cache else None
+        if cached is not None:
+            return [], cached
+        return ranked_models, None
+    
+    def _should_hedge(self, hedge: Optional[bool], model_name: Optional[str],
+                      candidates: List[Tuple[str, float]]) -> bool:
+        """Race the top two candidates? Never for a requested model"""
+        if hedge is None:
+            hedge = self.settings['hedging']['enabled']
+        return bool(hedge) and model_name is None and len(candidates) > 1
+    
+    def _fallback_done(self, response: Dict, index: int, count: int, deadline: Optional[float],
+                       hedge_attempts: List[Dict]) -> bool:
+        """
+        Settle attempt index of count in the fallback loop: True when response is the one
+        to return (a valid answer, the last model's error, or an error once the budget ran out)
+        """
+        if hedge_attempts:
+            self._attach_hedge_attempts(response, hedge_attempts)
+        model_name = response['model']
+        
+        # Check if response is valid (not an error)
+        if not is_error_response(response):
+            if index > 0:  # If we used a fallback model
+                print(f"✓ Successfully used fallback model: {model_name}")
             else:
-                print(f"✗ Model {model_name} failed: {response.get('answer_text', 'Unknown error')}")
-                
-                # If this was the last model, return the error response
-                if i == len(ranked_models) - 1:
-                    print("⚠ All models failed, returning last error response")
-                    return response
-                else:
-                    print(f"→ Falling back to next model...")
-        
-        # This should never be reached, but just in case
-        return response
+                print(f"✓ Successfully used primary model: {model_name}")
+            return True
+        
+        print(f"✗ Model {model_name} failed: {response.get('answer_text', 'Unknown error')}")
+        # If this was the last model, return the error response
+        if index == count - 1:
+            print("⚠ All models failed, returning last error response")
+            return True
+        if deadline is not None and time.time() >= deadline:
+            print("⚠ Latency budget exhausted, returning last error response")
+            return True
+        print(f"→ Falling back to next model...")
+        return False
+
+    def _stream_plan(self, prompt: str, model_name: Optional[str], max_cost: Optional[float],
+                     use_cache: bool) -> Tuple[List[str], Optional[Dict]]:
+        """
+        Models to stream from, in order of preference, or a cached or over-budget
+        response to return instead of calling any
+        """
+        candidates, response = self._plan_route(prompt, model_name, max_cost, use_cache)
+        return [name for name, _ in candidates], response
+    
+    def _stream_early(self, prompt: str, response: Dict, forecasts: Dict[str, Dict]) -> List[Dict]:
+        """Events for a stream answered without calling a model (a cache hit is one token)"""
+        events = [] if is_error_response(response) else [{"type": "token", "text": response['answer_text']}]
+        return events + [self._stream_done(prompt, response, forecasts)]
+    
+    def _stream_fallback_done(self, response: Dict, streamed: bool, index: int, count: int) -> bool:
+        """Stop at a valid answer, or at an error once tokens have reached the client"""
+        if not is_error_response(response) or streamed:
+            return True
+        print(f"✗ Model {response['model']} failed: {response.get('answer_text', 'Unknown error')}")
+        if index < count - 1:
+            print(f"→ Falling back to next model...")
+        return False
+    
+    def _stream_done(self, prompt: str, response: Dict, forecasts: Dict[str, Dict]) -> Dict:
+        """Final event of a routed stream, once its response has been recorded and cached"""
+        self._record_forecast(prompt, response, forecasts)
+        self._store_in_cache(prompt, response)
+        return {"type": "done", "response": response}
+    
+    def generate_stream(self, prompt: str, model_name: str = None, use_cache: Optional[bool] = None,
+                        max_cost: Optional[float] = None) -> Iterator[Dict]:
+        """
+        Stream the answer of the best model (or model_name) as {"type": "token", "text": ...}
+        events, ending with {"type": "done", "response": ...} where the response is as from
+        generate_response, plus ttft_ms and tokens_per_second. A model that fails before its
+        first token falls back to the next one; after that the error ends the stream.
+        A cached completion is sent as a single token. Hedging and deadlines do not apply.
+        """
+        forecasts = self.forecast_costs(prompt)
+        candidates, response = self._stream_plan(prompt, model_name, max_cost, self._cache_enabled(use_cache))
+        if response is not None:
+            yield from self._stream_early(prompt, response, forecasts)
+            return
+        
+        for i, name in enumerate(candidates):
+            response = self._breaker_rejection(name) if model_name is None else None
+            streamed = False
+            if response is None:
+                try:
+                    for event in self.models[name].generate_stream(prompt):
+                        if event['type'] == 'done':
+                            response = event['response']
+                        else:
+                            streamed = True
+                            yield event
+                except GeneratorExit:
+                    self.breakers[name].record_cancelled()
+                    raise
+                self._finish_call(name, response)
+            if self._stream_fallback_done(response, streamed, i, len(candidates)):
+                break
+        
+        yield self._stream_done(prompt, response, forecasts)
 
     def get_available_models(self) -> List[str]:
         """Get list of available model names"""
         return list(self.models.keys())
     
+    def _warm_start(self):
+        """
+        Replay history once, at startup: token counts into the cost forecaster, and
+        critic-scored runs into a bandit policy and the prompt index
+        """
+        for prompt, model, tokens, input_tokens, output_tokens in self.db.iter_token_runs():
+            if model not in self.models:
+                continue
+            if input_tokens is None:
+                # Older rows only have the total: split it with the estimated input tokens
+                estimated_input = self.forecaster.forecast(model, self.models[model], prompt)['input_tokens']
+                self.forecaster.observe_output(model, estimated_input, max(tokens - estimated_input, 0))
+            else:
+                self.forecaster.observe(model, self.models[model], prompt, input_tokens, output_tokens)
+        
+        learns_policy = isinstance(self.policy, BanditPolicy)
+        if not learns_policy and self.prompt_index is None:
+            return
+        for prompt, model, latency_ms, cost, critic_score in self.db.iter_scored_runs():
+            if learns_policy:
+                self.policy.update(prompt, model, latency_ms, cost, critic_score)
+            if self.prompt_index is not None:
+                self.prompt_index.add(prompt, model, critic_score)
+    
+    def _predict_quality(self, prompt: str) -> Dict[str, Tuple[float, float]]:
+        """Per-model (predicted critic score, neighbour support) from similar past prompts"""
+        if self.prompt_index is None:
+            return {}
+        config = self.settings['prompt_index']
+        return self.prompt_index.predict_scores(prompt, k=config['k'], min_similarity=config['min_similarity'])
+    
+    def record_feedback(self, prompt: str, response: Dict, critic_score: Optional[float]):
+        """
+        Feed the critic score of a routed response back into the routing policy and the
+        prompt index. Error responses and unscored responses are ignored, and answers from
+        batch jobs only reach the prompt index (their latency is the job's turnaround).
+        """
+        if critic_score is None or is_error_response(response) or response.get('cache_hit'):
+            return
+        if response.get('batch_id') is None:
+            self.policy.update(prompt, response['model'], response['latency_ms'],
+                               response['estimated_cost'], critic_score)
+        if self.prompt_index is not None:
+            self.prompt_index.add(prompt, response['model'], critic_score)
+    
     def update_learning_weights(self):
         """
         Update scoring weights based on historical performance
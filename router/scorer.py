@@ -1,6 +1,6 @@
 import os
 import yaml
-from typing import Dict
+from typing import Dict, Optional
 
 class Scorer:
     def __init__(self, weights_path: str = "config/weights.yaml"):
@@ -15,18 +15,22 @@ class Scorer:
                 return {
                     'latency': weights.get('latency', 0.4),
                     'cost': weights.get('cost', 0.2), 
-                    'quality': weights.get('quality', 0.4)
+                    'quality': weights.get('quality', 0.4),
+                    'ttft': weights.get('ttft', 0.0)
                 }
         except Exception as e:
             print(f"Error loading weights: {e}. Using defaults.")
-            return {'latency': 0.4, 'cost': 0.2, 'quality': 0.4}
+            return {'latency': 0.4, 'cost': 0.2, 'quality': 0.4, 'ttft': 0.0}
     
-    def calculate_score(self, latency_ms: float, cost: float, quality_score: float) -> float:
+    def calculate_score(self, latency_ms: float, cost: float, quality_score: float,
+                        ttft_ms: Optional[float] = None) -> float:
         """
         Calculate weighted score for a model based on:
         - latency_ms: response time in milliseconds (lower is better)
         - cost: estimated cost in dollars (lower is better) 
         - quality_score: critic score 1-10 (higher is better)
+        - ttft_ms: time to first token of streamed answers (lower is better);
+          models without streamed runs are scored on latency_ms instead
         
         Returns a score where higher is better
         """
@@ -40,11 +44,15 @@ class Scorer:
         # Normalize quality (scale 1-10 to 0-1)
         quality_normalized = max(0, (quality_score - 1) / 9)
         
+        # Normalize time to first token like latency
+        ttft_score = max(0, 1 / (1 + (latency_ms if ttft_ms is None else ttft_ms) / 1000))
+        
         # Calculate weighted score
         total_score = (
             self.weights['latency'] * latency_score +
             self.weights['cost'] * cost_score +
-            self.weights['quality'] * quality_normalized
+            self.weights['quality'] * quality_normalized +
+            self.weights.get('ttft', 0.0) * ttft_score
         )
         
         return total_score
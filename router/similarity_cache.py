@@ -0,0 +1,227 @@
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from router.response_cache import CACHED_FIELDS
+
+NORMALISE_PATTERN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+# splitmix64 finalizer constants; uint64 arithmetic wraps, which the mixing relies on
+_MIX1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX2 = np.uint64(0x94D049BB133111EB)
+
+
+def _mix(values: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer: scatters nearby inputs across the whole uint64 range"""
+    values = (values ^ (values >> np.uint64(30))) * _MIX1
+    values = (values ^ (values >> np.uint64(27))) * _MIX2
+    return values ^ (values >> np.uint64(31))
+
+
+def normalise(prompt: str) -> List[str]:
+    """Lowercased words of a prompt, ignoring whitespace and punctuation"""
+    return NORMALISE_PATTERN.findall((prompt or "").lower())
+
+
+def shingles(words: List[str]) -> np.ndarray:
+    """crc32 hashes of the word bigrams (the single word of a one-word prompt)"""
+    grams = [f"{a} {b}" for a, b in zip(words, words[1:])] or words[:1]
+    return np.unique(np.array([zlib.crc32(g.encode("utf-8")) for g in grams], dtype=np.uint64))
+
+
+class _Entry:
+    __slots__ = ("entry_id", "model", "prompt", "signature", "bands", "response")
+
+    def __init__(self, entry_id: int, model: str, prompt: str, signature: np.ndarray,
+                 bands: List[tuple], response: Dict):
+        self.entry_id = entry_id
+        self.model = model
+        self.prompt = prompt
+        self.signature = signature
+        self.bands = bands
+        self.response = response
+
+
+class SimilarityCache:
+    """
+    Near-duplicate cache of model completions: serves a stored answer to prompts that
+    differ from an earlier one only in whitespace, casing, punctuation or a few words.
+
+    Prompts are normalised to lowercase words and fingerprinted with a MinHash signature
+    over their word bigrams; the share of equal signature slots estimates the Jaccard
+    similarity of two prompts. Signatures are split into LSH bands, so a lookup only
+    compares against entries sharing a band with the query instead of the whole corpus.
+    An answer is served when the estimated similarity reaches threshold, and every match
+    reports its similarity and the id and text of the prompt it matched.
+
+    Entries live in memory only, at most max_entries of them, least recently used evicted first.
+    """
+
+    def __init__(self, threshold: float = 0.9, num_perm: int = 128, bands: int = 16,
+                 max_entries: int = 10000, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.max_entries = max_entries
+
+        rng = np.random.default_rng(seed)
+        # One random seed per permutation; each permutation mixes shingle XOR seed
+        self._seeds = rng.integers(0, np.iinfo(np.uint64).max, size=num_perm, dtype=np.uint64, endpoint=True)
+
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._buckets: Dict[tuple, set] = {}  # (model, band, band hash) -> entry ids
+        self._exact: Dict[tuple, int] = {}  # (model, normalised prompt) -> entry id
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def signature(self, words: List[str]) -> np.ndarray:
+        values = shingles(words)
+        if len(values) == 0:
+            return np.zeros(self.num_perm, dtype=np.uint32)
+        hashed = _mix(values[:, None] ^ self._seeds[None, :])
+        return hashed.min(axis=0).astype(np.uint32)
+
+    def _band_keys(self, model: str, signature: np.ndarray) -> List[tuple]:
+        return [(model, band, signature[band * self.rows:(band + 1) * self.rows].tobytes())
+                for band in range(self.bands)]
+
+    def _touch(self, entry_id: int, similarity: float) -> Tuple[Dict, Dict]:
+        entry = self._entries[entry_id]
+        self._entries.move_to_end(entry_id)
+        self.hits += 1
+        match = {
+            "similarity": round(similarity, 3),
+            "matched_entry_id": entry.entry_id,
+            "matched_prompt": entry.prompt,
+            "threshold": self.threshold
+        }
+        return dict(entry.response), match
+
+    def lookup(self, model: str, prompt: str) -> Optional[Tuple[Dict, Dict]]:
+        """
+        The cached response of model to the most similar stored prompt, with an explanation
+        of the match, or None if no stored prompt reaches the threshold
+        """
+        words = normalise(prompt)
+        normalised = " ".join(words)
+        with self._lock:
+            entry_id = self._exact.get((model, normalised))
+            if entry_id is not None:
+                return self._touch(entry_id, 1.0)
+
+        signature = self.signature(words)
+        keys = self._band_keys(model, signature)
+        with self._lock:
+            candidates = set()
+            for key in keys:
+                candidates.update(self._buckets.get(key, ()))
+            if candidates:
+                ids = list(candidates)
+                matrix = np.stack([self._entries[i].signature for i in ids])
+                similarities = (matrix == signature).mean(axis=1)
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    return self._touch(ids[best], float(similarities[best]))
+            self.misses += 1
+            return None
+
+    def add(self, model: str, prompt: str, response: Dict) -> int:
+        """Store model's response to prompt, evicting the least recently used entries over max_entries"""
+        words = normalise(prompt)
+        normalised = " ".join(words)
+        signature = self.signature(words)
+        keys = self._band_keys(model, signature)
+        stored = {field: response.get(field) for field in CACHED_FIELDS}
+        with self._lock:
+            previous = self._exact.get((model, normalised))
+            if previous is not None:
+                self._remove(previous)
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = _Entry(entry_id, model, prompt, signature, keys, stored)
+            self._exact[(model, normalised)] = entry_id
+            for key in keys:
+                self._buckets.setdefault(key, set()).add(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+            return entry_id
+
+    def _remove(self, entry_id: int):
+        entry = self._entries.pop(entry_id)
+        for key in entry.bands:
+            bucket = self._buckets.get(key)
+            bucket.discard(entry_id)
+            if not bucket:
+                del self._buckets[key]
+        self._exact.pop((entry.model, " ".join(normalise(entry.prompt))), None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "buckets": len(self._buckets),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+                "evictions": self.evictions,
+                "threshold": self.threshold
+            }
+
+
+def _benchmark(corpus_sizes=(1_000, 10_000, 100_000), n_queries: int = 1000):
+    """Time lookups of near-duplicate and unrelated prompts against growing corpora"""
+    import random
+    import time
+
+    rng = random.Random(0)
+    vocabulary = [f"word{i}" for i in range(20_000)]
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+
+    def make_prompt():
+        return " ".join(rng.choices(vocabulary, weights, k=rng.randint(20, 60)))
+
+    def perturb(prompt):
+        words = prompt.split()
+        words[rng.randrange(len(words))] = rng.choice(vocabulary)
+        return "  ".join(words).upper()
+
+    response = {"answer_text": "answer", "latency_ms": 1000.0, "tokens": 500, "estimated_cost": 0.01}
+    for size in corpus_sizes:
+        cache = SimilarityCache(max_entries=size)
+        prompts = [make_prompt() for _ in range(size)]
+        start = time.perf_counter()
+        for prompt in prompts:
+            cache.add("model-a", prompt, response)
+        build_s = time.perf_counter() - start
+
+        queries = [perturb(rng.choice(prompts)) for _ in range(n_queries // 2)]
+        queries += [make_prompt() for _ in range(n_queries - len(queries))]
+        latencies = []
+        for query in queries:
+            start = time.perf_counter()
+            cache.lookup("model-a", query)
+            latencies.append((time.perf_counter() - start) * 1000)
+        latencies.sort()
+        stats = cache.get_stats()
+        print(f"{size:>7} prompts: insert {build_s / size * 1e6:.0f}us, lookup "
+              f"p50={latencies[len(latencies) // 2]:.3f}ms p99={latencies[int(len(latencies) * 0.99)]:.3f}ms, "
+              f"hits {stats['hits']}/{n_queries} (half the queries are near-duplicates)")
+
+
+if __name__ == "__main__":
+    _benchmark()
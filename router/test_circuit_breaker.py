@@ -0,0 +1,125 @@
+import pytest
+
+from router import circuit_breaker
+from router.circuit_breaker import CircuitBreaker
+
+
+class Clock:
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(circuit_breaker, "time", clock)
+    return clock
+
+
+def opened(clock, **kwargs) -> CircuitBreaker:
+    breaker = CircuitBreaker("gpt", failure_threshold=3, cooldown_s=30, **kwargs)
+    for _ in range(3):
+        assert breaker.allow_request()
+        breaker.record_failure("server_error")
+    return breaker
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = opened(clock)
+
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.is_available()
+    assert not breaker.allow_request()
+    state = breaker.get_state()
+    assert (state["total_rejected"], state["last_error_type"]) == (1, "server_error")
+
+
+def test_success_resets_the_consecutive_count(clock):
+    breaker = CircuitBreaker("gpt", failure_threshold=3, min_calls=100)
+    for _ in range(5):
+        breaker.record_failure("timeout")
+        breaker.record_failure("timeout")
+        breaker.record_success()
+
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_opens_on_error_rate_once_min_calls_seen(clock):
+    breaker = CircuitBreaker("gpt", failure_threshold=100, error_rate_threshold=0.5, window_size=10, min_calls=6)
+    for _ in range(2):
+        breaker.record_success()
+        breaker.record_failure("server_error")
+    assert breaker.state == CircuitBreaker.CLOSED  # 50% over 4 calls, below min_calls
+
+    breaker.record_success()
+    breaker.record_failure("server_error")
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_goes_half_open_after_cooldown_with_one_probe(clock):
+    breaker = opened(clock)
+    clock.now += 29
+    assert not breaker.allow_request()
+
+    clock.now += 1
+    assert breaker.is_available()
+    assert breaker.get_state()["state"] == CircuitBreaker.HALF_OPEN
+    assert breaker.allow_request()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow_request()  # the probe slot is taken
+
+
+def test_successful_probe_closes_the_circuit(clock):
+    breaker = opened(clock)
+    clock.now += 30
+    breaker.allow_request()
+    breaker.record_success()
+
+    state = breaker.get_state()
+    assert (state["state"], state["window_calls"], state["open_for_s"]) == (CircuitBreaker.CLOSED, 0, None)
+    assert breaker.allow_request()
+
+
+def test_failed_probe_reopens_for_another_cooldown(clock):
+    breaker = opened(clock)
+    clock.now += 30
+    breaker.allow_request()
+    breaker.record_failure("timeout")
+
+    assert breaker.state == CircuitBreaker.OPEN
+    clock.now += 29
+    assert not breaker.is_available()
+    clock.now += 1
+    assert breaker.allow_request()
+
+
+def test_cancelled_probe_frees_its_slot(clock):
+    breaker = opened(clock)
+    clock.now += 30
+    assert breaker.allow_request()
+    breaker.record_cancelled()
+
+    assert breaker.allow_request()
+
+
+def test_rate_limits_do_not_open_the_circuit(clock):
+    breaker = CircuitBreaker("gpt", failure_threshold=3, min_calls=3)
+    for _ in range(10):
+        breaker.record_rate_limited()
+
+    state = breaker.get_state()
+    assert state["state"] == CircuitBreaker.CLOSED
+    assert (state["window_calls"], state["total_failures"], state["total_rate_limited"]) == (0, 0, 10)
+
+
+def test_rate_limited_probe_frees_its_slot(clock):
+    breaker = opened(clock)
+    clock.now += 30
+    assert breaker.allow_request()
+    breaker.record_rate_limited()
+
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow_request()
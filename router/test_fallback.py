@@ -13,8 +13,9 @@ from router.router import LLMRouter
 from models.openai_model import OpenAIModel
 from models.anthropic_model import AnthropicModel
 from models.mistral_model import MistralModel
+from models.base import ModelWrapper
 
-class MockFailingModel:
+class MockFailingModel(ModelWrapper):
     """Mock model that always fails for testing"""
     def __init__(self, model_name: str):
         self.model_name = model_name
@@ -30,7 +31,7 @@ class MockFailingModel:
             "error_type": "test_failure"
         }
 
-class MockSuccessModel:
+class MockSuccessModel(ModelWrapper):
     """Mock model that always succeeds for testing"""
     def __init__(self, model_name: str):
         self.model_name = model_name
@@ -0,0 +1,148 @@
+import sqlite3
+import time
+
+import pytest
+
+from db.db import DatabaseManager
+from models.base import ModelWrapper
+from router.router import LLMRouter
+
+PROMPT = "What are the key considerations for customer segmentation?"
+RANKING = [("gpt-4o", 0.9), ("claude", 0.8), ("mistral", 0.7)]
+
+
+class TimedModel(ModelWrapper):
+    """Answers, or fails, after a fixed delay; a timeout shorter than the delay ends the call with an error"""
+    input_price_per_1k = 0.01
+    output_price_per_1k = 0.03
+
+    def __init__(self, model_name: str, delay_s: float, fail: bool = False):
+        self.model_name = model_name
+        self.delay_s = delay_s
+        self.fail = fail
+        self.started = []
+        self.finished = 0
+
+    def generate_response(self, prompt: str, timeout=None):
+        self.started.append(time.time())
+        timed_out = timeout is not None and timeout < self.delay_s
+        time.sleep(timeout if timed_out else self.delay_s)
+        self.finished += 1
+        if timed_out:
+            return self._error_response(f"{self.model_name} timed out", timeout * 1000, "timeout")
+        if self.fail:
+            return self._error_response(f"{self.model_name} is down", self.delay_s * 1000, "server_error")
+        return self._success_response(f"Answer from {self.model_name}", self.delay_s * 1000, 40, 60)
+
+
+@pytest.fixture
+def router(tmp_path, monkeypatch):
+    # LLMRouter keeps its run database in the working directory
+    monkeypatch.chdir(tmp_path)
+    for variable in ("OPENAI_API_KEY", "ANTHROPIC_API_KEY", "MISTRAL_API_KEY"):
+        monkeypatch.setenv(variable, "test-key")
+    router = LLMRouter()
+    router.settings['response_cache']['enabled'] = False
+    router.settings['hedging'].update(delay=100, min_delay_ms=0)
+    router.get_ranked_models = lambda prompt: list(RANKING)
+    return router
+
+
+def use_models(router: LLMRouter, **models) -> dict:
+    router.models = {name: models.get(name.replace("-", "_"), TimedModel(name, 0.01))
+                     for name, _ in RANKING}
+    return router.models
+
+
+def wait_until_finished(*models, timeout: float = 2.0):
+    deadline = time.time() + timeout
+    while any(model.finished < len(model.started) for model in models) and time.time() < deadline:
+        time.sleep(0.01)
+
+
+def test_hedge_starts_after_the_delay_and_the_first_valid_answer_wins(router):
+    models = use_models(router, gpt_4o=TimedModel("gpt-4o", 0.5), claude=TimedModel("claude", 0.05))
+
+    response = router.generate_response(PROMPT, hedge=True)
+
+    hedge_started = models["claude"].started[0] - models["gpt-4o"].started[0]
+    assert 0.1 <= hedge_started < 0.3
+    assert response["model"] == "claude" and response["hedge_role"] == "hedge"
+    assert response["hedge_outcome"] == "won"
+    [loser] = response["hedge_attempts"]
+    assert loser["model"] == "gpt-4o" and loser["hedge_outcome"] == "cancelled"
+    assert loser["cost_estimated"] and loser["estimated_cost"] > 0
+    assert models["mistral"].started == []
+
+
+def test_primary_answering_within_the_delay_is_not_hedged(router):
+    models = use_models(router, gpt_4o=TimedModel("gpt-4o", 0.01))
+
+    response = router.generate_response(PROMPT, hedge=True)
+
+    assert response["model"] == "gpt-4o" and response["hedge_attempts"] == []
+    assert models["claude"].started == []
+
+
+def test_failed_primary_starts_the_hedge_without_waiting(router):
+    router.settings['hedging']['delay'] = 1000
+    models = use_models(router, gpt_4o=TimedModel("gpt-4o", 0.01, fail=True))
+
+    response = router.generate_response(PROMPT, hedge=True)
+
+    assert models["claude"].started[0] - models["gpt-4o"].started[0] < 0.5
+    assert response["model"] == "claude"
+    assert [attempt["hedge_outcome"] for attempt in response["hedge_attempts"]] == ["failed"]
+
+
+def test_abandoned_loser_is_counted_once_as_cancelled(router):
+    models = use_models(router, gpt_4o=TimedModel("gpt-4o", 0.3), claude=TimedModel("claude", 0.01))
+
+    router.generate_response(PROMPT, hedge=True)
+    wait_until_finished(models["gpt-4o"])
+
+    primary = router.breakers["gpt-4o"].get_state()
+    assert primary["total_successes"] == 0 and primary["total_failures"] == 0
+    assert router.breakers["claude"].get_state()["total_successes"] == 1
+
+
+def test_both_attempts_are_stored(router, tmp_path):
+    use_models(router, gpt_4o=TimedModel("gpt-4o", 0.5), claude=TimedModel("claude", 0.05))
+    db = DatabaseManager(str(tmp_path / "runs.db"))
+
+    response = router.generate_response(PROMPT, hedge=True)
+    db.store_run_result("run_1", 1, response["model"], response["answer_text"], response["latency_ms"],
+                        response["tokens"], response["estimated_cost"], hedge_role=response["hedge_role"],
+                        hedge_outcome=response["hedge_outcome"])
+    db.store_hedge_attempts("run_1", 1, response)
+
+    with sqlite3.connect(db.db_path) as conn:
+        rows = conn.execute("SELECT model, hedge_role, hedge_outcome, cost_estimated, input_tokens "
+                            "FROM runs ORDER BY rowid").fetchall()
+    assert rows == [("claude", "hedge", "won", None, None),
+                    ("gpt-4o", "primary", "cancelled", 1, len(PROMPT) // 4)]
+
+
+def test_deadline_abandons_a_slow_model_and_falls_back(router):
+    models = use_models(router, gpt_4o=TimedModel("gpt-4o", 1.0), claude=TimedModel("claude", 0.01))
+
+    response = router.generate_response(PROMPT, deadline_ms=500)
+
+    # The first attempt gets attempt_fraction of the budget, leaving the rest to the fallback
+    assert models["claude"].started[0] - models["gpt-4o"].started[0] == pytest.approx(0.3, abs=0.1)
+    assert response["model"] == "claude"
+    assert response["deadline_met"] is True
+    wait_until_finished(models["gpt-4o"])
+    assert router.breakers["gpt-4o"].get_state()["total_failures"] == 0
+
+
+def test_deadline_missed_when_every_model_is_too_slow(router):
+    use_models(router, gpt_4o=TimedModel("gpt-4o", 1.0), claude=TimedModel("claude", 1.0),
+               mistral=TimedModel("mistral", 1.0))
+
+    start = time.time()
+    response = router.generate_response(PROMPT, deadline_ms=300)
+
+    assert time.time() - start < 0.6
+    assert response["error_type"] in ("deadline_exceeded", "timeout")
+    assert response["deadline_met"] is False
@@ -0,0 +1,113 @@
+import pytest
+
+from router.policy import ScorerPolicy, ThompsonSamplingPolicy, UCBPolicy, build_policy, prompt_context
+from router.scorer import Scorer
+
+SHORT = "Name three pricing models for SaaS."
+LONG = "Draft a go-to-market plan for a developer tools startup entering Europe. " * 12
+
+UNSEEN = {"total_runs": 0}
+
+
+def seen(quality: float, latency_ms: float = 1000.0, cost: float = 0.01) -> dict:
+    """Performance of a model with history, as LLMRouter.get_ranked_models passes it"""
+    return {"total_runs": 10, "scoring_quality": quality, "scoring_latency": latency_ms, "scoring_cost": cost,
+            "scoring_ttft": None}
+
+
+@pytest.fixture
+def scorer(tmp_path):
+    weights = tmp_path / "weights.yaml"
+    weights.write_text("latency: 0.4\ncost: 0.2\nquality: 0.4\nttft: 0.0\n")
+    return Scorer(str(weights))
+
+
+def best(scores: dict) -> str:
+    return max(scores, key=scores.get)
+
+
+def test_prompt_context_buckets_by_length():
+    assert [prompt_context(p) for p in ("", "x" * 199, "x" * 200, "x" * 800)] == ["short", "short", "medium", "long"]
+
+
+def test_updates_move_the_ranking_towards_the_better_model(scorer):
+    policy = UCBPolicy(scorer, exploration=0.0)
+    performance = {"gpt-4o": UNSEEN, "mistral": UNSEEN}
+    assert policy.rank(SHORT, performance)["gpt-4o"] == policy.rank(SHORT, performance)["mistral"]
+
+    for _ in range(10):
+        policy.update(SHORT, "gpt-4o", 800.0, 0.01, 9)
+        policy.update(SHORT, "mistral", 2500.0, 0.01, 3)
+
+    assert best(policy.rank(SHORT, performance)) == "gpt-4o"
+    state = policy.get_state()
+    assert state["models"]["gpt-4o"]["runs"] == 10
+    assert state["contexts"]["short/mistral"]["runs"] == 10
+
+
+def test_rewards_are_kept_per_prompt_context(scorer):
+    policy = UCBPolicy(scorer, exploration=0.0, prior_strength=1.0)
+    for _ in range(20):
+        policy.update(SHORT, "gpt-4o", 800.0, 0.01, 9)
+        policy.update(SHORT, "mistral", 800.0, 0.01, 4)
+        policy.update(LONG, "gpt-4o", 800.0, 0.01, 4)
+        policy.update(LONG, "mistral", 800.0, 0.01, 9)
+    performance = {"gpt-4o": UNSEEN, "mistral": UNSEEN}
+
+    assert best(policy.rank(SHORT, performance)) == "gpt-4o"
+    assert best(policy.rank(LONG, performance)) == "mistral"
+
+
+def test_prompt_prediction_is_the_prior_of_an_unexplored_context(scorer):
+    policy = UCBPolicy(scorer, exploration=0.0)
+    # Equal rewards so far; the prompt index predicts mistral answers this prompt better
+    for _ in range(10):
+        policy.update(SHORT, "gpt-4o", 1000.0, 0.01, 7)
+        policy.update(SHORT, "mistral", 1000.0, 0.01, 7)
+
+    scores = policy.rank(LONG, {"gpt-4o": seen(quality=5), "mistral": seen(quality=9)})
+
+    assert best(scores) == "mistral"
+    assert scores["mistral"] == pytest.approx(policy.predicted_reward(seen(quality=9)))
+
+
+def test_observed_rewards_outweigh_the_prediction_as_runs_accumulate(scorer):
+    policy = UCBPolicy(scorer, exploration=0.0)
+    for _ in range(50):
+        policy.update(SHORT, "gpt-4o", 1000.0, 0.01, 9)
+        policy.update(SHORT, "mistral", 1000.0, 0.01, 3)
+
+    assert best(policy.rank(SHORT, {"gpt-4o": seen(quality=5), "mistral": seen(quality=9)})) == "gpt-4o"
+
+
+def test_ucb_explores_the_less_tried_model(scorer):
+    policy = UCBPolicy(scorer, exploration=1.0)
+    for _ in range(20):
+        policy.update(SHORT, "gpt-4o", 1000.0, 0.01, 7)
+    policy.update(SHORT, "mistral", 1000.0, 0.01, 7)
+
+    assert best(policy.rank(SHORT, {"gpt-4o": UNSEEN, "mistral": UNSEEN})) == "mistral"
+
+
+def test_thompson_sampling_is_reproducible_and_favours_the_better_model(scorer):
+    policies = [ThompsonSamplingPolicy(scorer, seed=7) for _ in range(2)]
+    for policy in policies:
+        for _ in range(30):
+            policy.update(SHORT, "gpt-4o", 800.0, 0.01, 9)
+            policy.update(SHORT, "mistral", 3000.0, 0.05, 2)
+    performance = {"gpt-4o": UNSEEN, "mistral": UNSEEN}
+
+    draws = [[policy.rank(SHORT, performance) for _ in range(50)] for policy in policies]
+
+    assert draws[0] == draws[1]
+    assert sum(best(scores) == "gpt-4o" for scores in draws[0]) >= 45
+
+
+def test_build_policy_reads_the_routing_settings(scorer):
+    assert isinstance(build_policy({}, scorer), ScorerPolicy)
+    thompson = build_policy({"policy": "thompson", "prior_strength": 2.0}, scorer)
+    assert isinstance(thompson, ThompsonSamplingPolicy) and thompson.prior_strength == 2.0
+    ucb = build_policy({"policy": "ucb", "exploration": 0.5}, scorer)
+    assert isinstance(ucb, UCBPolicy) and ucb.exploration == 0.5
+    with pytest.raises(ValueError):
+        build_policy({"policy": "epsilon_greedy"}, scorer)
@@ -0,0 +1,71 @@
+import pytest
+
+from router.prompt_index import PromptIndex
+
+PRICING = "How should a SaaS startup price its analytics product for enterprise customers?"
+PRICING_VARIANT = "How should a SaaS startup price an analytics product for enterprise buyers?"
+HIRING = "When should a seed stage company hire its first sales representative?"
+CHANNELS = "Which partner channels work best for selling developer tools in Europe?"
+
+
+@pytest.fixture
+def index():
+    index = PromptIndex(n_features=2 ** 16)
+    for prompt in (PRICING, HIRING, CHANNELS):
+        index.add(prompt)
+    return index
+
+
+def test_nearest_neighbour_is_the_closest_prompt(index):
+    results = index.search(PRICING_VARIANT, k=3)
+
+    assert results[0][0] == index.prompt_ids[PRICING]
+    assert results[0][1] > 0.5
+    assert all(similarity < results[0][1] for _, similarity in results[1:])
+
+
+def test_similarities_are_cosines_and_an_indexed_prompt_is_its_own_nearest(index):
+    for prompt in (PRICING, HIRING, CHANNELS):
+        results = index.search(prompt, k=3)
+        assert results[0][0] == index.prompt_ids[prompt]
+        assert 0.8 < results[0][1] <= 1.0
+        assert all(0.0 < similarity <= 1.0 for _, similarity in results)
+
+
+def test_prompt_sharing_no_terms_has_no_neighbours(index):
+    assert index.search("zebra xylophone quartz", k=5) == []
+
+
+def test_k_limits_the_results(index):
+    assert len(index.search("How should a company sell to enterprise customers in Europe?", k=2)) == 2
+
+
+def test_adding_a_prompt_twice_keeps_one_entry_and_accumulates_scores(index):
+    index.add(PRICING, "gpt-4o", 8)
+    index.add(PRICING, "gpt-4o", 6)
+
+    assert len(index) == 3
+    assert index.scores[index.prompt_ids[PRICING]]["gpt-4o"] == [14.0, 2]
+
+
+def test_predicted_scores_weight_neighbours_by_similarity(index):
+    index.add(PRICING, "gpt-4o", 9)
+    index.add(PRICING, "claude", 5)
+    index.add(HIRING, "gpt-4o", 3)
+
+    predictions = index.predict_scores(PRICING_VARIANT, k=3)
+    neighbours = dict(index.search(PRICING_VARIANT, k=3))
+    pricing, hiring = neighbours[index.prompt_ids[PRICING]], neighbours.get(index.prompt_ids[HIRING], 0.0)
+
+    assert predictions["claude"] == pytest.approx((5.0, pricing))
+    assert predictions["gpt-4o"] == pytest.approx(((9 * pricing + 3 * hiring) / (pricing + hiring),
+                                                   pricing + hiring))
+
+
+def test_neighbours_below_min_similarity_are_ignored(index):
+    index.add(PRICING, "gpt-4o", 9)
+    index.add(HIRING, "gpt-4o", 3)
+
+    predictions = index.predict_scores(PRICING_VARIANT, k=3, min_similarity=0.5)
+
+    assert predictions["gpt-4o"][0] == pytest.approx(9.0)
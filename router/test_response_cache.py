@@ -0,0 +1,129 @@
+import sqlite3
+
+import pytest
+
+from db.db import DatabaseManager
+from router import response_cache
+from router.response_cache import ResponseCache
+
+
+class Clock:
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(response_cache, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return DatabaseManager(str(tmp_path / "runs.db")).db_path
+
+
+def response(text: str) -> dict:
+    return {"answer_text": text, "latency_ms": 120.0, "tokens": 42, "estimated_cost": 0.001,
+            "input_tokens": 30, "output_tokens": 12, "model": "ignored"}
+
+
+def disk_keys(db_path: str) -> set:
+    with sqlite3.connect(db_path) as conn:
+        return {row[0] for row in conn.execute("SELECT key FROM response_cache")}
+
+
+def test_hit_from_memory_then_from_disk_in_a_new_process(db_path, clock):
+    cache = ResponseCache(db_path)
+    cache.put("k", "gpt", response("hello"))
+
+    assert cache.get("k")["answer_text"] == "hello"
+    assert "model" not in cache.get("k")  # only CACHED_FIELDS are kept
+
+    fresh = ResponseCache(db_path)
+    assert fresh.get("k")["answer_text"] == "hello"
+    assert fresh.get("k")["answer_text"] == "hello"
+    stats = fresh.get_stats()
+    assert (stats["disk_hits"], stats["memory_hits"], stats["misses"]) == (1, 1, 0)
+
+
+def test_returned_responses_are_copies(db_path, clock):
+    cache = ResponseCache(db_path)
+    cache.put("k", "gpt", response("hello"))
+    cache.get("k")["answer_text"] = "changed"
+
+    assert cache.get("k")["answer_text"] == "hello"
+
+
+def test_expired_entry_is_a_miss_and_evicted(db_path, clock):
+    cache = ResponseCache(db_path, ttl_s=60)
+    cache.put("k", "gpt", response("hello"))
+    clock.now += 61
+
+    assert cache.get("k") is None
+    assert "k" not in disk_keys(db_path)
+    assert cache.get_stats()["memory_entries"] == 0
+    assert cache.get_stats()["misses"] == 1
+
+
+def test_expired_disk_entry_is_evicted_on_lookup(db_path, clock):
+    ResponseCache(db_path, ttl_s=60).put("k", "gpt", response("hello"))
+    clock.now += 61
+
+    assert ResponseCache(db_path, ttl_s=60).get("k") is None
+    assert "k" not in disk_keys(db_path)
+
+
+def test_put_drops_expired_entries(db_path, clock):
+    cache = ResponseCache(db_path, ttl_s=60)
+    cache.put("old", "gpt", response("old"))
+    clock.now += 61
+    cache.put("new", "gpt", response("new"))
+
+    assert disk_keys(db_path) == {"new"}
+    assert cache.get_stats()["evictions"] == 1
+
+
+def test_memory_tier_keeps_most_recently_used(db_path, clock):
+    cache = ResponseCache(db_path, memory_entries=2)
+    cache.put("a", "gpt", response("a"))
+    cache.put("b", "gpt", response("b"))
+    cache.get("a")
+    cache.put("c", "gpt", response("c"))  # pushes out b, the least recently used
+
+    assert list(cache._memory) == ["a", "c"]
+    cache.get("b")
+    assert cache.get_stats()["disk_hits"] == 1
+
+
+def test_disk_tier_evicts_least_recently_used_past_size_limit(db_path, clock):
+    entry_bytes = len(response_cache.json.dumps(
+        {field: response("x" * 100).get(field) for field in response_cache.CACHED_FIELDS}
+    ))
+    cache = ResponseCache(db_path, max_disk_mb=2.5 * entry_bytes / (1024 * 1024))
+    for key in ("a", "b"):
+        cache.put(key, "gpt", response("x" * 100))
+        clock.now += 1
+    ResponseCache(db_path).get("a")  # a is now more recent than b
+    clock.now += 1
+    cache.put("c", "gpt", response("x" * 100))
+
+    assert disk_keys(db_path) == {"a", "c"}
+    assert cache.get_stats()["disk_bytes"] <= cache.max_disk_bytes
+
+
+def test_hit_ratio_and_clear(db_path, clock):
+    cache = ResponseCache(db_path)
+    assert cache.get_stats()["hit_ratio"] is None
+    cache.put("k", "gpt", response("hello"))
+    cache.get("k")
+    cache.get("missing")
+
+    assert cache.get_stats()["hit_ratio"] == 0.5
+    cache.clear()
+    assert cache.get("k") is None
+    assert cache.get_stats()["disk_entries"] == 0
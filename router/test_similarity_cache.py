@@ -0,0 +1,112 @@
+import numpy as np
+import pytest
+
+from router.similarity_cache import SimilarityCache, normalise, shingles
+
+RESPONSE = {"answer_text": "cached answer", "latency_ms": 900.0, "tokens": 120, "estimated_cost": 0.002}
+
+
+def words(start: int, count: int = 40) -> list:
+    return [f"w{i}" for i in range(start, start + count)]
+
+
+def jaccard(a: list, b: list) -> float:
+    x, y = set(shingles(a).tolist()), set(shingles(b).tolist())
+    return len(x & y) / len(x | y)
+
+
+def test_normalisation_makes_formatting_differences_exact_hits():
+    cache = SimilarityCache()
+    cache.add("gpt", "What is the capital of France?", RESPONSE)
+
+    response, match = cache.lookup("gpt", "  what IS the capital   of france ")
+    assert response["answer_text"] == "cached answer"
+    assert match["similarity"] == 1.0
+    assert match["matched_prompt"] == "What is the capital of France?"
+
+
+def test_near_duplicate_prompt_is_served():
+    stored = words(0)
+    query = list(stored)
+    query[20] = "changed"
+    cache = SimilarityCache(threshold=0.8)
+    entry_id = cache.add("gpt", " ".join(stored), RESPONSE)
+
+    hit = cache.lookup("gpt", " ".join(query))
+    assert hit is not None
+    assert hit[1]["matched_entry_id"] == entry_id
+    assert abs(hit[1]["similarity"] - jaccard(stored, query)) <= 0.1
+
+
+def test_minhash_estimates_jaccard_similarity():
+    cache = SimilarityCache(num_perm=256, bands=32)
+    base = words(0)
+    for shared in (10, 25, 35):
+        other = base[:shared] + words(1000, 40 - shared)
+        estimate = (cache.signature(base) == cache.signature(other)).mean()
+        assert abs(estimate - jaccard(base, other)) <= 0.1
+
+
+def test_similar_prompt_below_threshold_is_a_miss():
+    stored = words(0)
+    query = stored[:30] + words(1000, 10)  # about 0.6 Jaccard
+    cache = SimilarityCache(threshold=0.9)
+    cache.add("gpt", " ".join(stored), RESPONSE)
+
+    assert cache.lookup("gpt", " ".join(query)) is None
+    assert cache.get_stats()["misses"] == 1
+
+
+def test_lsh_bands_skip_dissimilar_prompts_entirely():
+    # 16 bands of 8 rows only put prompts above roughly (1/16) ** (1/8) ~ 0.7 Jaccard in a shared bucket,
+    # so a 0.3-similar prompt is never compared, however low the threshold
+    stored = words(0)
+    query = stored[:18] + words(1000, 22)
+    assert jaccard(stored, query) < 0.35
+    cache = SimilarityCache(threshold=0.0, num_perm=128, bands=16)
+    cache.add("gpt", " ".join(stored), RESPONSE)
+
+    assert cache.lookup("gpt", " ".join(query)) is None
+
+
+def test_unrelated_prompt_and_other_model_miss():
+    cache = SimilarityCache(threshold=0.5)
+    cache.add("gpt", " ".join(words(0)), RESPONSE)
+
+    assert cache.lookup("gpt", " ".join(words(500))) is None
+    assert cache.lookup("claude", " ".join(words(0))) is None
+    assert cache.get_stats()["hit_ratio"] == 0.0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = SimilarityCache(max_entries=2)
+    first, second, third = (" ".join(words(start)) for start in (0, 100, 200))
+    cache.add("gpt", first, RESPONSE)
+    cache.add("gpt", second, RESPONSE)
+    cache.lookup("gpt", first)
+    cache.add("gpt", third, RESPONSE)
+
+    assert len(cache) == 2
+    assert cache.lookup("gpt", second) is None
+    assert cache.lookup("gpt", first) is not None
+    assert cache.get_stats()["evictions"] == 1
+
+
+def test_adding_the_same_prompt_replaces_the_entry():
+    cache = SimilarityCache()
+    cache.add("gpt", "Explain recursion.", RESPONSE)
+    cache.add("gpt", "explain recursion", {**RESPONSE, "answer_text": "newer answer"})
+
+    assert len(cache) == 1
+    assert cache.lookup("gpt", "Explain recursion")[0]["answer_text"] == "newer answer"
+
+
+def test_bands_must_divide_signature():
+    with pytest.raises(ValueError):
+        SimilarityCache(num_perm=100, bands=16)
+
+
+def test_empty_prompt_has_a_stable_signature():
+    cache = SimilarityCache()
+    assert normalise("?!") == []
+    assert np.array_equal(cache.signature([]), np.zeros(cache.num_perm, dtype=np.uint32))
@@ -0,0 +1,138 @@
+import asyncio
+import importlib
+
+import pytest
+
+from router.singleflight import SingleFlight
+
+
+class FakeRouter:
+    """Answers after a pause long enough for concurrent requests to overlap"""
+
+    def __init__(self):
+        self.generations = 0
+        self.feedback = []
+
+    async def generate_response(self, prompt, model_name=None, **kwargs):
+        self.generations += 1
+        await asyncio.sleep(0.05)
+        return {"model": "gpt-4o", "answer_text": f"Answer to {prompt}", "latency_ms": 50.0, "tokens": 10,
+                "estimated_cost": 0.001}
+
+    def record_feedback(self, prompt, response, critic_score):
+        self.feedback.append(critic_score)
+
+
+class FakeCritic:
+    def __init__(self):
+        self.evaluations = 0
+
+    async def evaluate_response(self, model_answer, reference_answer, prompt, use_cache=None):
+        self.evaluations += 1
+        return {"score": 8, "rationale": "Covers the reference."}
+
+
+def test_concurrent_calls_share_one_execution():
+    flights = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.02)
+        return {"answer": 42}
+
+    async def scenario():
+        return await asyncio.gather(flights.do("key", work), flights.do("key", work), flights.do("other", work))
+
+    (first, shared_first), (second, shared_second), (_, shared_other) = asyncio.run(scenario())
+
+    assert len(calls) == 2
+    assert first is second and not shared_first and shared_second and not shared_other
+    assert flights.get_stats() == {"in_flight": 0, "executed": 2, "coalesced": 1}
+
+
+def test_exception_reaches_every_waiter_and_is_not_cached():
+    flights = SingleFlight()
+    calls = []
+
+    async def failing():
+        calls.append(1)
+        await asyncio.sleep(0.02)
+        raise RuntimeError("provider down")
+
+    async def succeeding():
+        calls.append(1)
+        return "ok"
+
+    async def scenario():
+        results = await asyncio.gather(flights.do("key", failing), flights.do("key", failing),
+                                       return_exceptions=True)
+        # The failure was not kept: the next call with the key runs its work again
+        return results, await flights.do("key", succeeding)
+
+    results, after = asyncio.run(scenario())
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert len(calls) == 2
+    assert after == ("ok", False)
+
+
+def test_a_cancelled_waiter_does_not_cancel_the_shared_work():
+    flights = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def scenario():
+        leaver = asyncio.ensure_future(flights.do("key", work))
+        stayer = asyncio.ensure_future(flights.do("key", work))
+        await asyncio.sleep(0.01)
+        leaver.cancel()
+        return await stayer
+
+    assert asyncio.run(scenario()) == ("done", True)
+
+
+@pytest.fixture
+def server(monkeypatch, tmp_path):
+    # api_server opens data.db in the working directory when imported
+    monkeypatch.chdir(tmp_path)
+    for variable in ("OPENAI_API_KEY", "ANTHROPIC_API_KEY", "MISTRAL_API_KEY"):
+        monkeypatch.setenv(variable, "test-key")
+    api_server = importlib.import_module("api_server")
+    monkeypatch.setattr(api_server, "router", FakeRouter())
+    monkeypatch.setattr(api_server, "critic", FakeCritic())
+    monkeypatch.setattr(api_server, "critic_workers", None)
+    monkeypatch.setattr(api_server, "flights", SingleFlight())
+    monkeypatch.setattr(api_server, "calls_saved", {"generations": 0, "critic_evaluations": 0})
+    return api_server
+
+
+def test_identical_api_requests_share_one_generation_and_evaluation(server):
+    async def scenario():
+        request = server.PromptRequest(prompt_text="How do we price  a SaaS product?")
+        same_request = server.PromptRequest(prompt_text="How do we price a SaaS product? ")
+        return await asyncio.gather(server.route_prompt(request), server.route_prompt(same_request))
+
+    first, second = asyncio.run(scenario())
+
+    assert first == second
+    assert server.router.generations == 1
+    assert server.critic.evaluations == 1
+    assert server.router.feedback == [8]
+    assert server.calls_saved == {"generations": 1, "critic_evaluations": 1}
+
+
+def test_different_options_are_not_coalesced(server):
+    async def scenario():
+        return await asyncio.gather(
+            server.route_prompt(server.PromptRequest(prompt_text="Plan a launch")),
+            server.route_prompt(server.PromptRequest(prompt_text="Plan a launch", skip_critic=True))
+        )
+
+    asyncio.run(scenario())
+
+    assert server.router.generations == 2
+    assert server.critic.evaluations == 1
+    assert server.calls_saved == {"generations": 0, "critic_evaluations": 0}
@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+"""
+Batch mode for full evaluation runs.
+
+Instead of one synchronous call per prompt (and another per critic evaluation), a run
+is submitted as asynchronous provider batch jobs - one per model for the generations,
+then one for the critic - polled until they finish, and bulk-inserted into runs.
+Batched requests are billed at a discount (batch.discount in config/settings.yaml)
+and are limited by batch quotas instead of the per-minute rate limits, at the price of
+finishing minutes to hours later. run/batch_server.py is a local stand-in for the
+provider batch endpoints.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import json
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from openai.types.chat import ChatCompletion
+from config.settings import load_settings
+from models.base import is_error_response
+
+# Results of a finished job: custom_id -> (provider result, None) or (None, error message)
+BatchResults = Dict[str, Tuple[Optional[Any], Optional[str]]]
+
+
+class OpenAIBatchAPI:
+    """OpenAI Batch API: an uploaded JSONL file of chat completion requests per job"""
+
+    endpoint = "/v1/chat/completions"
+
+    def __init__(self, client, completion_window: str = "24h"):
+        self.client = client
+        self.completion_window = completion_window
+
+    @staticmethod
+    def build_request(model, prompt: str) -> Dict:
+        return {
+            "model": model.model_name,
+            "messages": model._build_messages(prompt),
+            "temperature": model.temperature,
+            "max_tokens": model.max_tokens
+        }
+
+    async def submit(self, model_name: str, requests: Dict[str, Dict]) -> str:
+        lines = [json.dumps({"custom_id": custom_id, "method": "POST", "url": self.endpoint, "body": body})
+                 for custom_id, body in requests.items()]
+        batch_file = await self.client.files.create(file=("batch.jsonl", "\n".join(lines).encode("utf-8")),
+                                                    purpose="batch")
+        batch = await self.client.batches.create(input_file_id=batch_file.id, endpoint=self.endpoint,
+                                                 completion_window=self.completion_window)
+        return batch.id
+
+    async def is_finished(self, batch_id: str) -> bool:
+        batch = await self.client.batches.retrieve(batch_id)
+        return batch.status in ("completed", "failed", "expired", "cancelled")
+
+    async def cancel(self, batch_id: str):
+        await self.client.batches.cancel(batch_id)
+
+    async def results(self, batch_id: str) -> BatchResults:
+        batch = await self.client.batches.retrieve(batch_id)
+        results = {}
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            content = await self.client.files.content(file_id)
+            for line in content.text.splitlines():
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                response = entry.get("response") or {}
+                if response.get("status_code") == 200:
+                    results[entry["custom_id"]] = (response["body"], None)
+                else:
+                    error = entry.get("error") or (response.get("body") or {}).get("error") or {}
+                    results[entry["custom_id"]] = (None, error.get("message", f"status {response.get('status_code')}"))
+        return results
+
+    @staticmethod
+    def answer_text(body: Dict) -> str:
+        return body["choices"][0]["message"]["content"]
+
+    @staticmethod
+    def to_response(model, prompt: str, body: Dict, latency_ms: float) -> Dict:
+        return model._parse_response(ChatCompletion.model_validate(body), latency_ms)
+
+
+class AnthropicBatchAPI:
+    """Anthropic Message Batches API: requests are sent inline, results fetched as JSONL"""
+
+    def __init__(self, client, completion_window: str = "24h"):
+        self.client = client
+
+    @staticmethod
+    def build_request(model, prompt: str) -> Dict:
+        return model._build_request(prompt)
+
+    async def submit(self, model_name: str, requests: Dict[str, Dict]) -> str:
+        batch = await self.client.messages.batches.create(
+            requests=[{"custom_id": custom_id, "params": params} for custom_id, params in requests.items()]
+        )
+        return batch.id
+
+    async def is_finished(self, batch_id: str) -> bool:
+        batch = await self.client.messages.batches.retrieve(batch_id)
+        return batch.processing_status == "ended"
+
+    async def cancel(self, batch_id: str):
+        await self.client.messages.batches.cancel(batch_id)
+
+    async def results(self, batch_id: str) -> BatchResults:
+        results = {}
+        async for entry in await self.client.messages.batches.results(batch_id):
+            if entry.result.type == "succeeded":
+                results[entry.custom_id] = (entry.result.message, None)
+            elif entry.result.type == "errored":
+                results[entry.custom_id] = (None, entry.result.error.error.message)
+            else:
+                results[entry.custom_id] = (None, f"batch request {entry.result.type}")
+        return results
+
+    @staticmethod
+    def to_response(model, prompt: str, message, latency_ms: float) -> Dict:
+        return model._parse_response(message, latency_ms)
+
+
+class MistralBatchAPI:
+    """Mistral batch jobs: an uploaded JSONL file per job, results as an output file"""
+
+    endpoint = "/v1/chat/completions"
+
+    def __init__(self, client, base_url: str, api_key: Optional[str]):
+        self.client = client
+        self.base_url = base_url
+        self.headers = {"Authorization": f"Bearer {api_key}"}
+
+    @staticmethod
+    def build_request(model, prompt: str) -> Dict:
+        return model._build_payload(prompt)
+
+    async def _request(self, method: str, path: str, **kwargs):
+        response = await self.client.request(method, f"{self.base_url}{path}", headers=self.headers, **kwargs)
+        response.raise_for_status()
+        return response
+
+    async def submit(self, model_name: str, requests: Dict[str, Dict]) -> str:
+        lines = [json.dumps({"custom_id": custom_id, "body": body}) for custom_id, body in requests.items()]
+        upload = await self._request("POST", "/files", data={"purpose": "batch"},
+                                     files={"file": ("batch.jsonl", "\n".join(lines).encode("utf-8"))})
+        job = await self._request("POST", "/batch/jobs", json={
+            "input_files": [upload.json()["id"]],
+            "model": model_name,
+            "endpoint": self.endpoint
+        })
+        return job.json()["id"]
+
+    async def _job(self, batch_id: str) -> Dict:
+        return (await self._request("GET", f"/batch/jobs/{batch_id}")).json()
+
+    async def is_finished(self, batch_id: str) -> bool:
+        return (await self._job(batch_id))["status"] not in ("QUEUED", "RUNNING", "CANCELLATION_REQUESTED")
+
+    async def cancel(self, batch_id: str):
+        await self._request("POST", f"/batch/jobs/{batch_id}/cancel")
+
+    async def results(self, batch_id: str) -> BatchResults:
+        job = await self._job(batch_id)
+        results = {}
+        for file_id in (job.get("output_file"), job.get("error_file")):
+            if not file_id:
+                continue
+            content = await self._request("GET", f"/files/{file_id}/content")
+            for line in content.text.splitlines():
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                response = entry.get("response") or {}
+                if response.get("status_code") == 200:
+                    results[entry["custom_id"]] = (response["body"], None)
+                else:
+                    error = entry.get("error") or {}
+                    results[entry["custom_id"]] = (None, error.get("message", f"status {response.get('status_code')}"))
+        return results
+
+    @staticmethod
+    def to_response(model, prompt: str, body: Dict, latency_ms: float) -> Dict:
+        return model._parse_response(body, prompt, latency_ms)
+
+
+def batch_api(provider: str, client, member, completion_window: str = "24h"):
+    """Batch API adapter for a provider pool member and its SDK or HTTP client"""
+    if provider == "openai":
+        return OpenAIBatchAPI(client, completion_window)
+    if provider == "anthropic":
+        return AnthropicBatchAPI(client, completion_window)
+    if provider == "mistral":
+        return MistralBatchAPI(client, member.base_url, member.api_key)
+    raise ValueError(f"No batch API for provider: {provider}")
+
+
+class BatchRun:
+    """
+    One evaluation run through provider batch APIs.
+
+    Prompts are routed as usual (forced model, or the top ranked model within the cost
+    budget) and answered from the response cache when possible. The rest are grouped per
+    model into one job each; once they finish, successful answers go to the critic as a
+    single OpenAI batch job. Every job is polled every poll_interval_s and cancelled after
+    max_wait_s. Each run's latency_ms is its job's turnaround, so batched runs carry a
+    batch_id and are kept out of latency statistics.
+    """
+
+    def __init__(self, router, critic, db, config: Optional[Dict] = None):
+        self.router = router
+        self.critic = critic
+        self.db = db
+        self.config = config or load_settings()['batch']
+
+    def _open(self, model) -> Tuple[Any, Any]:
+        """Batch API adapter on a pool member of a model wrapper (or the critic)"""
+        member = model.pool.select()
+        model.pool.release(member, None, None)  # Batch jobs are not governed by per-minute limits
+        api = batch_api(model.pool.provider, model.clients[member.name], member, self.config['completion_window'])
+        return api, member
+
+    async def _run_job(self, label: str, api, model_name: str, requests: Dict[str, Dict]) -> Tuple[str, BatchResults, float]:
+        """Submit a job, wait for it to finish (cancelling it after max_wait_s) and fetch its results"""
+        start_time = time.time()
+        batch_id = await api.submit(model_name, requests)
+        print(f"📦 Submitted batch {batch_id} for {label}: {len(requests)} requests")
+        cancelled = False
+        while not await api.is_finished(batch_id):
+            if not cancelled and time.time() - start_time > self.config['max_wait_s']:
+                print(f"⌛ Batch {batch_id} for {label} still running after {self.config['max_wait_s']}s, cancelling")
+                await api.cancel(batch_id)
+                cancelled = True
+            await asyncio.sleep(self.config['poll_interval_s'])
+        results = await api.results(batch_id)
+        turnaround_ms = (time.time() - start_time) * 1000
+        print(f"✅ Batch {batch_id} for {label} finished in {turnaround_ms / 1000:.0f}s: "
+              f"{sum(1 for result, _ in results.values() if result is not None)}/{len(requests)} succeeded")
+        return batch_id, results, turnaround_ms
+
+    def _plan(self, prompt_data: Dict, model_name: Optional[str], use_cache: bool, budget) -> Optional[Dict]:
+        """Choose the model for one prompt and reserve its discounted forecast cost"""
+        prompt_text = prompt_data['prompt']
+        forecasts = self.router.forecast_costs(prompt_text)
+        if model_name is None:
+            ranked_models = self.router.get_ranked_models(prompt_text)
+            if budget is not None:
+                max_cost = budget.remaining() / self.config['discount']
+                ranked_models = self.router._filter_by_cost(prompt_text, ranked_models, max_cost) or ranked_models
+            model_name = ranked_models[0][0]
+
+        reservation = forecasts[model_name]['cost'] * self.config['discount']
+        if budget is not None and budget.reserve([reservation]) is None:
+            print(f"💸 Skipping prompt {prompt_data['id']}: forecast ${reservation:.4f} exceeds "
+                  f"the remaining budget ${max(budget.remaining(), 0):.4f}")
+            return None
+
+        cached = self.router._cached_response(model_name, prompt_text) if use_cache else None
+        return {"prompt": prompt_data, "model": model_name, "forecasts": forecasts,
+                "reservation": reservation, "response": cached}
+
+    async def _generate(self, plans: List[Dict]):
+        """Answer the uncached plans with one batch job per model"""
+        by_model: Dict[str, List[Dict]] = {}
+        for plan in plans:
+            if plan['response'] is None:
+                by_model.setdefault(plan['model'], []).append(plan)
+
+        async def run_model(model_name: str, model_plans: List[Dict]):
+            model = self.router.models[model_name]
+            api, _ = self._open(model)
+            requests = {f"prompt-{plan['prompt']['id']}": api.build_request(model, plan['prompt']['prompt'])
+                        for plan in model_plans}
+            try:
+                batch_id, results, turnaround_ms = await self._run_job(model_name, api, model.model_name, requests)
+            except Exception as e:
+                print(f"❌ Batch for {model_name} failed: {e}")
+                batch_id, results, turnaround_ms = None, {}, 0.0
+            for plan in model_plans:
+                prompt_text = plan['prompt']['prompt']
+                result, error = results.get(f"prompt-{plan['prompt']['id']}", (None, "no result from batch job"))
+                if result is not None:
+                    response = api.to_response(model, prompt_text, result, turnaround_ms)
+                else:
+                    response = model._error_response(error, turnaround_ms, "batch_error")
+                response['model'] = model_name
+                response['batch_id'] = batch_id
+                plan['response'] = response
+
+        await asyncio.gather(*(run_model(name, model_plans) for name, model_plans in by_model.items()))
+
+        for plan in plans:
+            response = plan['response']
+            self.router._record_forecast(plan['prompt']['prompt'], response, plan['forecasts'])
+            self.router._store_in_cache(plan['prompt']['prompt'], response)
+            if response.get('batch_id') is not None:
+                # Batched requests are billed at a discount
+                response['estimated_cost'] *= self.config['discount']
+                if response.get('forecast_cost') is not None:
+                    response['forecast_cost'] *= self.config['discount']
+
+    async def _evaluate(self, plans: List[Dict], use_cache: bool) -> Dict[int, Dict]:
+        """
+        Critic evaluations of the successful answers, as one batch job for those neither in the
+        critic cache nor decided by the pre-critic; prompt id -> evaluation
+        """
+        evaluations, cache_keys, to_evaluate = {}, {}, []
+        for plan in plans:
+            if is_error_response(plan['response']):
+                continue
+            prompt = plan['prompt']
+            key, cached = self.critic.cached_evaluation(plan['response']['answer_text'], prompt['reference'],
+                                                        prompt['prompt'], use_cache)
+            if cached is None:
+                cached = self.critic.precritic_evaluation(plan['response']['answer_text'], prompt['reference'])
+            if cached is not None:
+                evaluations[prompt['id']] = cached
+            else:
+                cache_keys[prompt['id']] = key
+                to_evaluate.append(plan)
+        if not to_evaluate:
+            return evaluations
+        api, _ = self._open(self.critic)
+        requests = {
+            f"critic-{plan['prompt']['id']}": self.critic._build_request(self.critic._build_messages(
+                plan['response']['answer_text'], plan['prompt']['reference'], plan['prompt']['prompt']
+            ))
+            for plan in to_evaluate
+        }
+        try:
+            _, results, turnaround_ms = await self._run_job("critic", api, self.critic.model_name, requests)
+        except Exception as e:
+            print(f"❌ Critic batch failed: {e}")
+            results, turnaround_ms = {}, 0.0
+
+        for plan in to_evaluate:
+            result, error = results.get(f"critic-{plan['prompt']['id']}", (None, "no result from batch job"))
+            if result is not None:
+                evaluations[plan['prompt']['id']] = self.critic._build_result(api.answer_text(result), turnaround_ms)
+                self.critic.cache_evaluation(cache_keys[plan['prompt']['id']], evaluations[plan['prompt']['id']])
+            else:
+                evaluations[plan['prompt']['id']] = self.critic._error_result(Exception(error))
+        return evaluations
+
+    async def run(self, prompts: List[Dict], run_id: str, model_name: Optional[str] = None,
+                  skip_critic: bool = False, use_cache: Optional[bool] = None, budget=None) -> List[Dict]:
+        """Generate, evaluate and store answers for the prompts; returns per-prompt results like run.py"""
+        use_cache = self.router._cache_enabled(use_cache)
+        plans = [plan for plan in (self._plan(p, model_name, use_cache, budget) for p in prompts) if plan is not None]
+        if not plans:
+            return []
+
+        await self._generate(plans)
+        if budget is not None:
+            for plan in plans:
+                budget.settle(plan['reservation'], plan['response']['estimated_cost'])
+        evaluations = {} if skip_critic else await self._evaluate(plans, use_cache)
+
+        rows = []
+        results = []
+        for plan in plans:
+            prompt_id = plan['prompt']['id']
+            response = plan['response']
+            evaluation = evaluations.get(prompt_id)
+            critic_score = evaluation['score'] if evaluation else None
+            if evaluation:
+                self.router.record_feedback(plan['prompt']['prompt'], response, critic_score)
+            rows.append({
+                "run_id": run_id,
+                "prompt_id": prompt_id,
+                "model": response['model'],
+                "answer": response['answer_text'],
+                "latency_ms": response['latency_ms'],
+                "tokens": response['tokens'],
+                "estimated_cost": response['estimated_cost'],
+                "critic_score": critic_score,
+                "critic_rationale": evaluation['rationale'] if evaluation else None,
+                "input_tokens": response.get('input_tokens'),
+                "output_tokens": response.get('output_tokens'),
+                "forecast_output_tokens": response.get('forecast_output_tokens'),
+                "forecast_cost": response.get('forecast_cost'),
+                "cache_hit": response.get('cache_hit'),
+                "cache_similarity": response.get('cache_similarity'),
+                "batch_id": response.get('batch_id')
+            })
+            results.append({
+                'prompt_id': prompt_id,
+                'model': response['model'],
+                'latency_ms': response['latency_ms'],
+                'cost': response['estimated_cost'],
+                'tokens': response['tokens'],
+                'critic_score': critic_score,
+                'deadline_met': None,
+                'cache_hit': response.get('cache_hit', False),
+                'cached_cost': response.get('cached_cost', 0.0),
+                'prompt': plan['prompt']['prompt']
+            })
+
+        self.db.store_run_results(rows)
+        print(f"🗃️  Stored {len(rows)} batched results")
+        return results
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the provider batch APIs used by run/batch.py.
+
+Serves the OpenAI Batch API (/v1/files, /v1/batches), Anthropic Message Batches
+(/v1/messages/batches) and Mistral batch jobs (/v1/files, /v1/batch/jobs) from memory.
+A job finishes --delay seconds after it was created; every request in it succeeds
+with a canned answer (critic requests get a SCORE/RATIONALE reply), except those
+whose prompt contains --fail-marker. Point provider_pools at it to try batch mode
+without spending anything:
+
+    python run/batch_server.py --port 8090
+    # provider_pools.providers in config/settings.yaml:
+    #   openai:    [{name: local, base_url: "http://127.0.0.1:8090/v1"}]
+    #   anthropic: [{name: local, base_url: "http://127.0.0.1:8090"}]
+    #   mistral:   [{name: local, base_url: "http://127.0.0.1:8090/v1"}]
+"""
+
+import argparse
+import json
+import threading
+import time
+import uuid
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+
+def _tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _prompt_text(messages: List[Dict]) -> str:
+    return "\n".join(m["content"] for m in messages if isinstance(m.get("content"), str))
+
+
+class BatchStore:
+    """Uploaded files and batch jobs of every provider, completed on read once their delay has passed"""
+
+    def __init__(self, delay_s: float, fail_marker: str):
+        self.delay_s = delay_s
+        self.fail_marker = fail_marker
+        self.files: Dict[str, bytes] = {}
+        self.jobs: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def add_file(self, content: bytes) -> str:
+        file_id = f"file-{uuid.uuid4().hex[:12]}"
+        with self._lock:
+            self.files[file_id] = content
+        return file_id
+
+    def _answer(self, body: Dict) -> Tuple[Optional[str], int, int]:
+        """Canned answer text (None to fail the request) and token counts for one request"""
+        prompt = _prompt_text(body.get("messages", []))
+        if body.get("system"):
+            prompt = f"{body['system']}\n{prompt}"
+        if self.fail_marker and self.fail_marker in prompt:
+            return None, _tokens(prompt), 0
+        if "SCORE:" in prompt:
+            text = "SCORE: 7\nRATIONALE: Stand-in evaluation from the local batch server."
+        else:
+            question = prompt.splitlines()[-1][:200] if prompt else ""
+            text = f"Stand-in answer from {body.get('model')} to: {question}"
+        return text, _tokens(prompt), _tokens(text)
+
+    def create_job(self, provider: str, requests: List[Tuple[str, Dict]], info: Dict) -> Dict:
+        job = {"id": f"batch_{uuid.uuid4().hex[:12]}", "provider": provider, "requests": requests,
+               "created_at": int(time.time()), "cancelled": False, "results": None, **info}
+        with self._lock:
+            self.jobs[job["id"]] = job
+        return job
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is not None and job["results"] is None and (
+                job["cancelled"] or time.time() - job["created_at"] >= self.delay_s
+            ):
+                job["results"] = [(custom_id, body, None if job["cancelled"] else self._answer(body))
+                                  for custom_id, body in job["requests"]]
+                job["ended_at"] = int(time.time())
+            return job
+
+    def cancel_job(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is not None:
+                job["cancelled"] = True
+        return self.get_job(job_id)
+
+
+class BatchHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    store: BatchStore = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, payload, content_type: str = "application/json"):
+        body = payload if isinstance(payload, bytes) else json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _not_found(self):
+        self._send(404, {"error": {"type": "not_found_error", "message": f"No route for {self.path}"}})
+
+    def _body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def _upload(self) -> Tuple[bytes, Dict[str, str]]:
+        """The file and form fields of a multipart upload"""
+        header = f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode("utf-8")
+        message = BytesParser(policy=HTTP).parsebytes(header + self._body())
+        content, fields = b"", {}
+        for part in message.iter_parts():
+            if part.get_filename():
+                content = part.get_payload(decode=True)
+            else:
+                fields[part.get_param("name", header="content-disposition")] = part.get_content().strip()
+        return content, fields
+
+    def do_POST(self):
+        path = urlparse(self.path).path.rstrip("/")
+        parts = path.split("/")
+        if path == "/v1/files":
+            content, fields = self._upload()
+            file_id = self.store.add_file(content)
+            self._send(200, {"id": file_id, "object": "file", "bytes": len(content), "created_at": int(time.time()),
+                             "filename": "batch.jsonl", "purpose": fields.get("purpose", "batch"),
+                             "status": "processed"})
+        elif path == "/v1/batches":
+            request = json.loads(self._body())
+            lines = self.store.files.get(request["input_file_id"], b"").decode("utf-8").splitlines()
+            entries = [json.loads(line) for line in lines if line.strip()]
+            job = self.store.create_job("openai", [(e["custom_id"], e["body"]) for e in entries],
+                                        {"endpoint": request["endpoint"], "input_file_id": request["input_file_id"],
+                                         "completion_window": request.get("completion_window", "24h")})
+            self._send(200, self._openai_batch(job))
+        elif path == "/v1/messages/batches":
+            request = json.loads(self._body())
+            job = self.store.create_job("anthropic", [(r["custom_id"], r["params"]) for r in request["requests"]], {})
+            self._send(200, self._anthropic_batch(job))
+        elif path == "/v1/batch/jobs":
+            request = json.loads(self._body())
+            entries = []
+            for file_id in request["input_files"]:
+                lines = self.store.files.get(file_id, b"").decode("utf-8").splitlines()
+                entries += [json.loads(line) for line in lines if line.strip()]
+            job = self.store.create_job("mistral", [(e["custom_id"], {"model": request["model"], **e["body"]})
+                                                    for e in entries], {"model": request["model"]})
+            self._send(200, self._mistral_job(job))
+        elif parts[-1] == "cancel" and path.startswith(("/v1/batches/", "/v1/batch/jobs/", "/v1/messages/batches/")):
+            self._body()
+            job = self.store.cancel_job(parts[-2])
+            if job is None:
+                return self._not_found()
+            render = {"openai": self._openai_batch, "anthropic": self._anthropic_batch, "mistral": self._mistral_job}
+            self._send(200, render[job["provider"]](job))
+        else:
+            self._body()
+            self._not_found()
+
+    def do_GET(self):
+        path = urlparse(self.path).path.rstrip("/")
+        parts = path.split("/")
+        if len(parts) == 5 and path.startswith("/v1/files/") and parts[-1] == "content":
+            content = self.store.files.get(parts[-2])
+            if content is None:
+                return self._not_found()
+            self._send(200, content, "application/octet-stream")
+        elif len(parts) == 4 and path.startswith("/v1/batches/"):
+            job = self.store.get_job(parts[-1])
+            if job is None:
+                return self._not_found()
+            self._send(200, self._openai_batch(job))
+        elif len(parts) == 5 and path.startswith("/v1/batch/jobs/"):
+            job = self.store.get_job(parts[-1])
+            if job is None:
+                return self._not_found()
+            self._send(200, self._mistral_job(job))
+        elif len(parts) == 5 and path.startswith("/v1/messages/batches/"):
+            job = self.store.get_job(parts[-1])
+            if job is None:
+                return self._not_found()
+            self._send(200, self._anthropic_batch(job))
+        elif len(parts) == 6 and path.startswith("/v1/messages/batches/") and parts[-1] == "results":
+            job = self.store.get_job(parts[-2])
+            if job is None or job["results"] is None:
+                return self._not_found()
+            lines = [json.dumps({"custom_id": custom_id, "result": self._anthropic_result(body, answer)})
+                     for custom_id, body, answer in job["results"]]
+            self._send(200, "\n".join(lines).encode("utf-8"), "application/binary")
+        else:
+            self._not_found()
+
+    # OpenAI and Mistral: results as output and error files of JSONL lines
+
+    def _output_files(self, job: Dict) -> Tuple[Optional[str], Optional[str]]:
+        if job["results"] is None:
+            return None, None
+        if "output_file" not in job:
+            output, errors = [], []
+            for custom_id, body, answer in job["results"]:
+                line = {"id": f"req_{uuid.uuid4().hex[:12]}", "custom_id": custom_id}
+                if answer is None or answer[0] is None:
+                    message = "Request cancelled" if answer is None else "Stand-in failure"
+                    errors.append({**line, "response": {"status_code": 500, "body": {"error": {"message": message}}},
+                                   "error": {"code": "server_error", "message": message}})
+                    continue
+                text, input_tokens, output_tokens = answer
+                output.append({**line, "error": None, "response": {"status_code": 200, "body": {
+                    "id": f"chatcmpl-{uuid.uuid4().hex[:12]}", "object": "chat.completion",
+                    "created": int(time.time()), "model": body.get("model"),
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": text},
+                                 "finish_reason": "stop", "logprobs": None}],
+                    "usage": {"prompt_tokens": input_tokens, "completion_tokens": output_tokens,
+                              "total_tokens": input_tokens + output_tokens}
+                }}})
+            job["output_file"] = self.store.add_file("\n".join(map(json.dumps, output)).encode()) if output else None
+            job["error_file"] = self.store.add_file("\n".join(map(json.dumps, errors)).encode()) if errors else None
+        return job["output_file"], job["error_file"]
+
+    def _counts(self, job: Dict) -> Tuple[int, int, int]:
+        total = len(job["requests"])
+        if job["results"] is None:
+            return total, 0, 0
+        failed = sum(1 for _, _, answer in job["results"] if answer is None or answer[0] is None)
+        return total, total - failed, failed
+
+    def _openai_batch(self, job: Dict) -> Dict:
+        output_file, error_file = self._output_files(job)
+        total, completed, failed = self._counts(job)
+        if job["results"] is None:
+            status = "cancelling" if job["cancelled"] else "in_progress"
+        else:
+            status = "cancelled" if job["cancelled"] else "completed"
+        return {"id": job["id"], "object": "batch", "endpoint": job["endpoint"], "errors": None,
+                "input_file_id": job["input_file_id"], "completion_window": job["completion_window"],
+                "status": status, "output_file_id": output_file, "error_file_id": error_file,
+                "created_at": job["created_at"], "completed_at": job.get("ended_at"),
+                "request_counts": {"total": total, "completed": completed, "failed": failed}}
+
+    def _mistral_job(self, job: Dict) -> Dict:
+        output_file, error_file = self._output_files(job)
+        total, completed, failed = self._counts(job)
+        if job["results"] is None:
+            status = "CANCELLATION_REQUESTED" if job["cancelled"] else "RUNNING"
+        else:
+            status = "CANCELLED" if job["cancelled"] else "SUCCESS"
+        return {"id": job["id"], "object": "batch", "model": job["model"], "endpoint": "/v1/chat/completions",
+                "status": status, "output_file": output_file, "error_file": error_file,
+                "created_at": job["created_at"], "total_requests": total,
+                "succeeded_requests": completed, "failed_requests": failed}
+
+    # Anthropic: results fetched from results_url
+
+    def _anthropic_batch(self, job: Dict) -> Dict:
+        total, succeeded, failed = self._counts(job)
+        ended = job["results"] is not None
+        canceled = failed if ended and job["cancelled"] else 0
+        host = self.headers.get("Host", "127.0.0.1")
+        return {"id": job["id"], "type": "message_batch",
+                "processing_status": "ended" if ended else ("canceling" if job["cancelled"] else "in_progress"),
+                "request_counts": {"processing": 0 if ended else total, "succeeded": succeeded,
+                                   "errored": failed - canceled, "canceled": canceled, "expired": 0},
+                "created_at": _iso(job["created_at"]), "expires_at": _iso(job["created_at"] + 86400),
+                "ended_at": _iso(job["ended_at"]) if ended else None, "archived_at": None,
+                "cancel_initiated_at": _iso(job["created_at"]) if job["cancelled"] else None,
+                "results_url": f"http://{host}/v1/messages/batches/{job['id']}/results" if ended else None}
+
+    def _anthropic_result(self, body: Dict, answer) -> Dict:
+        if answer is None:
+            return {"type": "canceled"}
+        text, input_tokens, output_tokens = answer
+        if text is None:
+            return {"type": "errored", "error": {"type": "error",
+                                                 "error": {"type": "api_error", "message": "Stand-in failure"}}}
+        return {"type": "succeeded", "message": {
+            "id": f"msg_{uuid.uuid4().hex[:12]}", "type": "message", "role": "assistant", "model": body.get("model"),
+            "content": [{"type": "text", "text": text}], "stop_reason": "end_turn", "stop_sequence": None,
+            "usage": {"input_tokens": input_tokens, "output_tokens": output_tokens}
+        }}
+
+
+def _iso(timestamp: float) -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(timestamp))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-in for the OpenAI, Anthropic and Mistral batch APIs')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8090)
+    parser.add_argument('--delay', type=float, default=2.0,
+                        help='Seconds before a submitted job finishes (default: 2)')
+    parser.add_argument('--fail-marker', default='[fail]',
+                        help='Requests whose prompt contains this text fail (default: [fail])')
+    args = parser.parse_args()
+
+    BatchHandler.store = BatchStore(args.delay, args.fail_marker)
+    server = ThreadingHTTPServer((args.host, args.port), BatchHandler)
+    print(f"📦 Stand-in batch server on http://{args.host}:{args.port} (jobs finish after {args.delay:.0f}s)")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
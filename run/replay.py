@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Offline replay of routing decisions over logged runs.
+
+Streams the runs table and the run CSVs under runs/, builds a prompt x model
+outcome matrix, and reports the counterfactual cost, latency and quality the
+router would have produced under candidate scoring weights - without calling
+any model.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import csv
+import glob
+import sqlite3
+import time
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+from db.db import DatabaseManager
+from db.stats import LATENCY_RUNS_FILTER
+from router.scorer import Scorer
+
+# Rows with no tokens are provider errors and say nothing about the model's answers
+REPLAY_QUERY = f"""
+    SELECT run_id, prompt_id, model, latency_ms, tokens, estimated_cost, critic_score, timestamp
+    FROM runs
+    WHERE {LATENCY_RUNS_FILTER}
+"""
+
+
+class ReplaySimulator:
+    """
+    Counterfactual evaluation of weighted-scorer routing on logged outcomes.
+
+    Each candidate weight vector ranks the models on their historical averages, the
+    way LLMRouter does. For every logged prompt the simulator takes the highest ranked
+    model whose result for that prompt was logged, and uses that result as the outcome.
+    Coverage is the share of prompts where this was the top ranked model itself, i.e.
+    where the replay needed no substitute.
+    """
+
+    def __init__(self, db_path: Optional[str] = "data.db", runs_dir: Optional[str] = "runs",
+                 latency_percentile: Optional[float] = None):
+        self.db_path = db_path
+        self.runs_dir = runs_dir
+        self.latency_percentile = latency_percentile
+
+        self.models: List[str] = []
+        self.prompt_ids: List[int] = []
+        # prompt x model matrices of mean outcomes (NaN where nothing was logged)
+        self.latency = np.empty((0, 0))
+        self.cost = np.empty((0, 0))
+        self.quality = np.empty((0, 0))
+        self.observed = np.empty((0, 0), dtype=bool)
+        # Per-model features the scorer sees: scoring latency, mean cost, mean critic score
+        self.model_latency = np.empty(0)
+        self.model_cost = np.empty(0)
+        self.model_quality = np.empty(0)
+        self.rows_loaded = 0
+
+    def _iter_db_rows(self) -> Iterator[Dict]:
+        if not self.db_path or not os.path.exists(self.db_path):
+            return
+        # Brings a runs table from an older version up to date before it is queried
+        db = DatabaseManager(self.db_path)
+        with sqlite3.connect(db.db_path) as conn:
+            conn.row_factory = sqlite3.Row
+            try:
+                cursor = conn.execute(REPLAY_QUERY)
+            except sqlite3.OperationalError as e:
+                if "no such table" in str(e):
+                    return  # No runs table yet
+                raise
+            for row in cursor:
+                yield dict(row)
+
+    def _iter_csv_rows(self) -> Iterator[Dict]:
+        if not self.runs_dir or not os.path.isdir(self.runs_dir):
+            return
+        pattern = os.path.join(self.runs_dir, "**", "*.csv")
+        for path in sorted(glob.glob(pattern, recursive=True)):
+            with open(path, newline='', encoding='utf-8') as f:
+                reader = csv.DictReader(f)
+                if not {'prompt_id', 'model', 'latency_ms', 'estimated_cost'} <= set(reader.fieldnames or []):
+                    continue
+                for row in reader:
+                    yield row
+
+    def load(self) -> "ReplaySimulator":
+        """Stream every logged run into per prompt x model sums"""
+        sums: Dict[tuple, List[float]] = {}  # (prompt_id, model) -> [n, latency, cost, n_scored, score]
+        latencies: Dict[str, List[float]] = {}
+        seen = set()
+
+        for source in (self._iter_db_rows(), self._iter_csv_rows()):
+            for row in source:
+                try:
+                    prompt_id = int(row['prompt_id'])
+                    tokens = int(float(row.get('tokens') or 0))
+                    latency_ms = float(row['latency_ms'])
+                    cost = float(row['estimated_cost'])
+                except (TypeError, ValueError):
+                    continue
+                if tokens <= 0:
+                    continue
+
+                # The same run can be in the database and in an exported CSV
+                key = (row.get('run_id'), prompt_id, row['model'], row.get('timestamp'))
+                if key in seen:
+                    continue
+                seen.add(key)
+
+                cell = sums.setdefault((prompt_id, row['model']), [0, 0.0, 0.0, 0, 0.0])
+                cell[0] += 1
+                cell[1] += latency_ms
+                cell[2] += cost
+                if row.get('critic_score') not in (None, ''):
+                    cell[3] += 1
+                    cell[4] += float(row['critic_score'])
+                latencies.setdefault(row['model'], []).append(latency_ms)
+                self.rows_loaded += 1
+
+        self.models = sorted({model for _, model in sums})
+        self.prompt_ids = sorted({prompt_id for prompt_id, _ in sums})
+        model_index = {m: i for i, m in enumerate(self.models)}
+        prompt_index = {p: i for i, p in enumerate(self.prompt_ids)}
+
+        shape = (len(self.prompt_ids), len(self.models))
+        counts = np.zeros(shape)
+        scored = np.zeros(shape)
+        latency_sum = np.zeros(shape)
+        cost_sum = np.zeros(shape)
+        score_sum = np.zeros(shape)
+        for (prompt_id, model), (n, latency, cost, n_scored, score) in sums.items():
+            i, j = prompt_index[prompt_id], model_index[model]
+            counts[i, j], latency_sum[i, j], cost_sum[i, j] = n, latency, cost
+            scored[i, j], score_sum[i, j] = n_scored, score
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self.latency = latency_sum / counts
+            self.cost = cost_sum / counts
+            self.quality = score_sum / scored
+            self.observed = counts > 0
+
+            # Model-level features, mirroring DatabaseManager.get_model_performance
+            self.model_cost = cost_sum.sum(axis=0) / counts.sum(axis=0)
+            self.model_quality = score_sum.sum(axis=0) / scored.sum(axis=0)
+            if self.latency_percentile is None:
+                self.model_latency = latency_sum.sum(axis=0) / counts.sum(axis=0)
+            else:
+                self.model_latency = np.array([
+                    np.percentile(latencies[m], self.latency_percentile) for m in self.models
+                ])
+        # Models with no critic scores get the router's neutral default
+        self.model_quality = np.where(np.isnan(self.model_quality), 5.0, self.model_quality)
+        return self
+
+    def model_features(self) -> np.ndarray:
+        """models x 3 matrix of normalised (latency, cost, quality) scores, as in Scorer.calculate_score"""
+        return np.column_stack([
+            np.maximum(0, 1 / (1 + self.model_latency / 1000)),
+            np.maximum(0, 1 / (1 + self.model_cost * 100)),
+            np.maximum(0, (self.model_quality - 1) / 9)
+        ])
+
+    def evaluate(self, weights: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Replay every prompt under each row of weights (K x 3: latency, cost, quality).
+        Returns arrays of length K: mean cost, latency and quality of the chosen
+        answers, coverage, and the index of the top ranked model.
+        """
+        weights = np.atleast_2d(np.asarray(weights, dtype=float))
+        scores = weights @ self.model_features().T  # K x models
+        rankings = np.argsort(-scores, axis=1, kind='stable')
+
+        # Only a handful of distinct rankings exist (models! at most), so each is replayed once
+        unique_rankings, inverse = np.unique(rankings, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        prompts = np.arange(len(self.prompt_ids))
+        outcomes = np.zeros((len(unique_rankings), 4))
+        for r, ranking in enumerate(unique_rankings):
+            # First model in ranking order with a logged result for each prompt
+            observed = self.observed[:, ranking]
+            has_any = observed.any(axis=1)
+            chosen = ranking[observed.argmax(axis=1)][has_any]
+            rows = prompts[has_any]
+            outcomes[r] = [
+                np.mean(self.cost[rows, chosen]),
+                np.mean(self.latency[rows, chosen]),
+                np.nanmean(self.quality[rows, chosen]) if np.any(~np.isnan(self.quality[rows, chosen])) else np.nan,
+                np.mean(self.observed[rows, ranking[0]])
+            ]
+
+        selected = outcomes[inverse]
+        return {
+            'cost': selected[:, 0],
+            'latency': selected[:, 1],
+            'quality': selected[:, 2],
+            'coverage': selected[:, 3],
+            'top_model': rankings[:, 0]
+        }
+
+    def logged_baseline(self) -> Dict[str, float]:
+        """Mean outcome of everything that was actually logged"""
+        mask = self.observed
+        return {
+            'cost': float(np.mean(self.cost[mask])),
+            'latency': float(np.mean(self.latency[mask])),
+            'quality': float(np.nanmean(self.quality[mask])) if np.any(~np.isnan(self.quality[mask])) else float('nan')
+        }
+
+
+def weight_grid(steps: int) -> np.ndarray:
+    """All (latency, cost, quality) weights on the simplex with the given number of steps per axis"""
+    values = np.linspace(0, 1, steps)
+    latency, cost = np.meshgrid(values, values, indexing='ij')
+    latency, cost = latency.ravel(), cost.ravel()
+    keep = latency + cost <= 1 + 1e-9
+    latency, cost = latency[keep], cost[keep]
+    return np.column_stack([latency, cost, np.clip(1 - latency - cost, 0, 1)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay logged runs under candidate scoring weights')
+    parser.add_argument('--db', default='data.db', help='SQLite database with the runs table')
+    parser.add_argument('--runs-dir', default='runs', help='Directory of exported run CSVs')
+    parser.add_argument('--steps', type=int, default=101,
+                       help='Grid steps per weight axis (101 gives 5151 combinations)')
+    parser.add_argument('--latency-percentile', type=float, default=None,
+                       help='Score on this latency percentile instead of the mean')
+    parser.add_argument('--sort', choices=['quality', 'cost', 'latency'], default='quality',
+                       help='Metric to rank weight combinations by')
+    parser.add_argument('--top', type=int, default=10, help='Number of combinations to show')
+    parser.add_argument('--output', help='Save every evaluated combination to this CSV')
+    args = parser.parse_args()
+
+    start = time.time()
+    simulator = ReplaySimulator(args.db, args.runs_dir, args.latency_percentile).load()
+    if not simulator.models:
+        print("❌ No logged runs to replay!")
+        return
+    load_s = time.time() - start
+    print(f"📂 Loaded {simulator.rows_loaded} runs: {len(simulator.prompt_ids)} prompts x "
+          f"{len(simulator.models)} models ({simulator.observed.mean():.0%} of cells logged) in {load_s:.2f}s")
+
+    current = np.array([[Scorer().get_weights()[k] for k in ('latency', 'cost', 'quality')]])
+    grid = np.vstack([current, weight_grid(args.steps)])
+
+    start = time.time()
+    results = simulator.evaluate(grid)
+    eval_s = time.time() - start
+    print(f"⚡ Replayed {len(grid)} weight combinations in {eval_s:.3f}s")
+
+    baseline = simulator.logged_baseline()
+    print(f"\n📊 Logged runs: quality={baseline['quality']:.2f}, "
+          f"latency={baseline['latency']:.0f}ms, cost=${baseline['cost']:.4f}")
+    print(f"📊 Current weights {tuple(round(float(w), 2) for w in current[0])}: "
+          f"top={simulator.models[results['top_model'][0]]}, quality={results['quality'][0]:.2f}, "
+          f"latency={results['latency'][0]:.0f}ms, cost=${results['cost'][0]:.4f}, "
+          f"coverage={results['coverage'][0]:.0%}")
+
+    if args.sort == 'quality':
+        order = np.lexsort((results['cost'], -np.nan_to_num(results['quality'], nan=-np.inf)))
+    else:
+        order = np.argsort(results[args.sort], kind='stable')
+    print(f"\n🏆 Best {args.top} by {args.sort}:")
+    for i in order[:args.top]:
+        latency_w, cost_w, quality_w = grid[i]
+        print(f"  latency={latency_w:.2f} cost={cost_w:.2f} quality={quality_w:.2f} -> "
+              f"top={simulator.models[results['top_model'][i]]}, quality={results['quality'][i]:.2f}, "
+              f"latency={results['latency'][i]:.0f}ms, cost=${results['cost'][i]:.4f}, "
+              f"coverage={results['coverage'][i]:.0%}")
+
+    if args.output:
+        with open(args.output, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['latency_weight', 'cost_weight', 'quality_weight', 'top_model',
+                             'quality', 'latency_ms', 'cost', 'coverage'])
+            for i in range(len(grid)):
+                writer.writerow([*np.round(grid[i], 4), simulator.models[results['top_model'][i]],
+                                 results['quality'][i], results['latency'][i], results['cost'][i],
+                                 results['coverage'][i]])
+        print(f"📁 All combinations saved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,17 +3,25 @@
 import sys
 import os
 import argparse
+import asyncio
+import threading
 import uuid
 from datetime import datetime
+from typing import List, Optional
 from tqdm import tqdm
 
 # Add project root to path
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, project_root)
 
-from router.router import LLMRouter
-from critic.critic import Critic
+from router.async_router import AsyncLLMRouter
+from critic.critic import AsyncCritic
+from critic.critic_queue import CriticQueue, CriticWorkers, open_queue
+from config.settings import load_settings
 from db.db import DatabaseManager
+from models.http_pool import get_http_pool
+from models.fixtures import FixtureStore
+from models.provider_pool import get_pool_stats
 
 # Import summary using absolute path to avoid circular import
 summary_module_path = os.path.join(project_root, 'run', 'summary.py')
@@ -22,6 +30,239 @@ spec = importlib.util.spec_from_file_location("summary", summary_module_path)
 summary_module = importlib.util.module_from_spec(spec)
 spec.loader.exec_module(summary_module)
 SummaryGenerator = summary_module.SummaryGenerator
+batch_spec = importlib.util.spec_from_file_location("batch", os.path.join(project_root, 'run', 'batch.py'))
+batch_module = importlib.util.module_from_spec(batch_spec)
+batch_spec.loader.exec_module(batch_module)
+BatchRun = batch_module.BatchRun
+
+class RunBudget:
+    """
+    Dollar budget for a run. Before dispatch each prompt reserves a cost ceiling, which is
+    also the max_cost the router gets, so prompts in flight together stay within the budget
+    as far as the cost forecasts hold. The actual cost replaces the reservation afterwards.
+    """
+    
+    def __init__(self, limit: float):
+        self.limit = limit
+        self.spent = 0.0
+        self.reserved = 0.0
+        self.in_flight = 0
+        self.skipped = 0
+        self._lock = threading.Lock()
+        self._waiters: List[asyncio.Future] = []  # prompts waiting for reservations to settle
+    
+    def remaining(self) -> float:
+        with self._lock:
+            return self.limit - self.spent - self.reserved
+    
+    def _take(self, costs: List[float], calls: int) -> Optional[float]:
+        fitting = [cost for cost in costs if cost * calls <= self.limit - self.spent - self.reserved]
+        if not fitting:
+            self.skipped += 1
+            return None
+        ceiling = max(fitting)
+        self.reserved += ceiling * calls
+        self.in_flight += 1
+        return ceiling
+    
+    def reserve(self, costs: List[float], calls: int = 1) -> Optional[float]:
+        """
+        Reserve calls times the dearest of costs (forecasts of the models the prompt may use)
+        that still fits, and return it as the prompt's ceiling; None, counted as skipped,
+        when not even the cheapest fits
+        """
+        with self._lock:
+            return self._take(costs, calls)
+    
+    async def reserve_when_free(self, costs: List[float], calls: int = 1) -> Optional[float]:
+        """reserve(), but waiting for prompts in flight to settle when only their reservations are in the way"""
+        while True:
+            with self._lock:
+                cheapest = min(costs) * calls
+                if not (self.in_flight and self.limit - self.spent - self.reserved < cheapest <= self.limit - self.spent):
+                    return self._take(costs, calls)
+                settled = asyncio.get_running_loop().create_future()
+                self._waiters.append(settled)
+            await settled
+    
+    def settle(self, reservation: float, cost: float):
+        """Replace a prompt's reservation with what it actually cost"""
+        with self._lock:
+            self.in_flight -= 1
+            self.reserved = self.reserved - reservation if self.in_flight else 0.0  # no float residue
+            self.spent += cost
+            waiters, self._waiters = self._waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+async def process_prompt(prompt_data: dict, router: AsyncLLMRouter, critic: AsyncCritic,
+                         db: DatabaseManager, run_id: str, args,
+                         budget: Optional[RunBudget] = None,
+                         critic_queue: Optional[CriticQueue] = None) -> Optional[dict]:
+    """Generate, evaluate and store the answer for one prompt (with a queue, evaluation is deferred)"""
+    prompt_id = prompt_data['id']
+    prompt_text = prompt_data['prompt']
+    reference_answer = prompt_data['reference']
+    
+    print(f"\n📋 Prompt {prompt_id}: {prompt_text[:100]}...")
+    
+    try:
+        # Route to best model or use forced model
+        model_name = args.model if args.model else None
+        
+        # Reserve this prompt's share of the run budget; the router only uses models forecast
+        # to cost no more than the reserved ceiling
+        max_cost = None
+        reservation = 0.0
+        if budget is not None:
+            forecasts = router.forecast_costs(prompt_text)
+            costs = [forecasts[model_name]['cost']] if model_name else [f['cost'] for f in forecasts.values()]
+            # A hedged request can pay for two models
+            hedged = not args.stream and not model_name and (args.hedge or router.settings['hedging']['enabled'])
+            calls = 2 if hedged else 1
+            max_cost = await budget.reserve_when_free(costs, calls)
+            if max_cost is None:
+                print(f"💸 Skipping prompt {prompt_id}: forecast ${min(costs) * calls:.4f} exceeds "
+                      f"the remaining budget ${max(budget.remaining(), 0):.4f}")
+                return None
+            reservation = max_cost * calls
+        
+        # Generate response
+        print(f"🤖 Generating response...")
+        cost = 0.0
+        try:
+            if args.stream:
+                async for event in router.generate_stream(prompt_text, model_name, max_cost=max_cost,
+                                                          use_cache=False if args.no_cache else None):
+                    if event['type'] == 'done':
+                        response = event['response']
+            else:
+                response = await router.generate_response(prompt_text, model_name, hedge=args.hedge or None,
+                                                          deadline_ms=args.deadline_ms, max_cost=max_cost,
+                                                          use_cache=False if args.no_cache else None)
+            cost = response['estimated_cost'] + sum(
+                attempt['estimated_cost'] for attempt in response.get('hedge_attempts', [])
+            )
+        finally:
+            if budget is not None:
+                budget.settle(reservation, cost)
+        
+        print(f"✅ Response generated using {response['model']} "
+              f"(latency: {response['latency_ms']:.0f}ms, "
+              f"cost: ${response['estimated_cost']:.4f}, "
+              f"tokens: {response['tokens']})")
+        if response.get('ttft_ms') is not None:
+            print(f"⚡ First token after {response['ttft_ms']:.0f}ms, "
+                  f"{response.get('tokens_per_second') or 0:.1f} tokens/s")
+        
+        # Evaluate response with critic (unless skipped)
+        critic_score = None
+        critic_rationale = None
+        
+        if not args.skip_critic and critic_queue is None:
+            print("🎯 Evaluating response with critic...")
+            evaluation = await critic.evaluate_response(
+                response['answer_text'],
+                reference_answer,
+                prompt_text,
+                use_cache=False if args.no_cache else None
+            )
+            critic_score = evaluation['score']
+            critic_rationale = evaluation['rationale']
+            print(f"📊 Critic score: {critic_score}/10 - {critic_rationale[:100]}...")
+            router.record_feedback(prompt_text, response, critic_score)
+        
+        # Store results in database (off the event loop, like every SQLite write here)
+        rowid = await asyncio.to_thread(
+            db.store_run_result,
+            run_id=run_id,
+            prompt_id=prompt_id,
+            model=response['model'],
+            answer=response['answer_text'],
+            latency_ms=response['latency_ms'],
+            tokens=response['tokens'],
+            estimated_cost=response['estimated_cost'],
+            critic_score=critic_score,
+            critic_rationale=critic_rationale,
+            hedge_role=response.get('hedge_role'),
+            hedge_outcome=response.get('hedge_outcome'),
+            deadline_ms=response.get('deadline_ms'),
+            deadline_met=response.get('deadline_met'),
+            input_tokens=response.get('input_tokens'),
+            output_tokens=response.get('output_tokens'),
+            forecast_output_tokens=response.get('forecast_output_tokens'),
+            forecast_cost=response.get('forecast_cost'),
+            cache_hit=response.get('cache_hit'),
+            cache_similarity=response.get('cache_similarity'),
+            ttft_ms=response.get('ttft_ms'),
+            tokens_per_second=response.get('tokens_per_second')
+        )
+        await asyncio.to_thread(db.store_hedge_attempts, run_id, prompt_id, response)
+        
+        # The background workers write the score to the stored row
+        critic_job_id = None
+        if not args.skip_critic and critic_queue is not None:
+            critic_job_id = await asyncio.to_thread(critic_queue.enqueue, prompt_text, response['answer_text'],
+                                                    reference_answer, rowid, response)
+            print(f"🎯 Queued for critic evaluation (job {critic_job_id})")
+        
+        # Store for summary
+        return {
+            'prompt_id': prompt_id,
+            'model': response['model'],
+            'latency_ms': response['latency_ms'],
+            'cost': response['estimated_cost'],
+            'tokens': response['tokens'],
+            'critic_score': critic_score,
+            'critic_job_id': critic_job_id,
+            'deadline_met': response.get('deadline_met'),
+            'cache_hit': response.get('cache_hit', False),
+            'cached_cost': response.get('cached_cost', 0.0),
+            'prompt': prompt_text
+        }
+        
+    except Exception as e:
+        print(f"❌ Error processing prompt {prompt_id}: {e}")
+        return None
+
+async def process_prompts(prompts_to_run: List[dict], router: AsyncLLMRouter, critic: AsyncCritic,
+                          db: DatabaseManager, run_id: str, args,
+                          budget: Optional[RunBudget] = None) -> List[dict]:
+    """
+    Process all prompts with bounded concurrency, returning results in prompt order.
+    With --defer-critic, evaluations run on background workers alongside generation
+    and are waited for at the end.
+    """
+    semaphore = asyncio.Semaphore(max(1, args.concurrency))
+    progress = tqdm(total=len(prompts_to_run), desc="Processing prompts")
+    critic_queue = workers = None
+    if args.defer_critic and not args.skip_critic:
+        config = load_settings()['critic']
+        critic_queue = open_queue(db)
+        workers = CriticWorkers(critic_queue, critic, router, config['queue_workers'], config['poll_interval_s'])
+        workers.start()
+    
+    async def bounded(prompt_data):
+        async with semaphore:
+            result = await process_prompt(prompt_data, router, critic, db, run_id, args, budget, critic_queue)
+            progress.update(1)
+            return result
+    
+    try:
+        results = [r for r in await asyncio.gather(*(bounded(p) for p in prompts_to_run)) if r is not None]
+        progress.close()
+        if workers is not None:
+            job_ids = [r['critic_job_id'] for r in results if r['critic_job_id'] is not None]
+            print(f"\n🎯 Waiting for {critic_queue.unfinished(job_ids)} queued critic evaluations...")
+            await workers.wait_for(job_ids)
+            for result in results:
+                if result['critic_job_id'] is not None:
+                    result['critic_score'] = critic_queue.get_job(result['critic_job_id'])['critic_score']
+    finally:
+        if workers is not None:
+            await workers.stop()
+    return results
 
 def main():
     parser = argparse.ArgumentParser(description='Meta-Agent LLM Router with Self-Learning Feedback Loop')
@@ -33,14 +274,42 @@ def main():
                        help='Run specific prompt IDs only (e.g., --prompts 1 2 3)')
     parser.add_argument('--skip-critic', action='store_true',
                        help='Skip critic evaluation to save time/cost')
+    parser.add_argument('--defer-critic', action='store_true',
+                       help='Evaluate answers on background critic workers instead of after each answer')
+    parser.add_argument('--concurrency', type=int, default=4,
+                       help='Number of prompts processed concurrently (default: 4)')
+    parser.add_argument('--deadline-ms', type=float,
+                       help='Latency budget per prompt in milliseconds')
+    parser.add_argument('--hedge', action='store_true',
+                       help='Race the top two ranked models to cut tail latency (see config/settings.yaml)')
+    parser.add_argument('--budget', type=float,
+                       help='Dollar budget for the run; prompts whose forecast cost does not fit are skipped')
+    parser.add_argument('--no-cache', action='store_true',
+                       help='Call the models and the critic even when a cached completion or evaluation exists')
+    parser.add_argument('--stream', action='store_true',
+                       help='Stream answers to record time to first token (--hedge and --deadline-ms are ignored)')
+    parser.add_argument('--batch', action='store_true',
+                       help='Submit generations and critic evaluations as provider batch jobs: '
+                            'cheaper, but finishes minutes to hours later (see config/settings.yaml)')
+    fixtures = parser.add_mutually_exclusive_group()
+    fixtures.add_argument('--record', metavar='PATH',
+                          help='Record all provider traffic of the run to a fixture file')
+    fixtures.add_argument('--replay', metavar='PATH',
+                          help='Answer provider calls from a recorded fixture file instead of the APIs')
+    parser.add_argument('--replay-speed', type=float, default=1.0,
+                        help='Replay pace: 1 keeps the recorded timings, 10 is ten times faster, 0 instant')
     
     args = parser.parse_args()
     
     # Initialize components
     print("🚀 Initializing Meta-Agent LLM Router...")
-    router = LLMRouter()
-    critic = Critic()
+    if args.record or args.replay:
+        # Before the wrappers are built, so their clients pick the fixture store up
+        get_http_pool().use_fixtures(FixtureStore(args.record or args.replay,
+                                                  'record' if args.record else 'replay', args.replay_speed))
+    router = AsyncLLMRouter()
     db = DatabaseManager()
+    critic = AsyncCritic(db)
     
     # Generate unique run ID
     run_id = f"run_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
@@ -51,6 +320,8 @@ def main():
         print("🧠 Applying learning from previous runs...")
         router.update_learning_weights()
         print(f"Current weights: {router.scorer.get_weights()}")
+    if router.policy.name != 'scorer':
+        print(f"🎰 Routing policy: {router.policy.name} (learns from every critic score)")
     
     # Get prompts to process
     all_prompts = db.get_prompts()
@@ -65,72 +336,18 @@ def main():
         print("❌ No prompts to process!")
         return
     
-    # Process each prompt
-    results = []
-    print(f"\n🔄 Processing prompts...")
-    
-    for prompt_data in tqdm(prompts_to_run, desc="Processing prompts"):
-        prompt_id = prompt_data['id']
-        prompt_text = prompt_data['prompt']
-        reference_answer = prompt_data['reference']
-        
-        print(f"\n📋 Prompt {prompt_id}: {prompt_text[:100]}...")
-        
-        try:
-            # Route to best model or use forced model
-            model_name = args.model if args.model else None
-            
-            # Generate response
-            print(f"🤖 Generating response...")
-            response = router.generate_response(prompt_text, model_name)
-            
-            print(f"✅ Response generated using {response['model']} "
-                  f"(latency: {response['latency_ms']:.0f}ms, "
-                  f"cost: ${response['estimated_cost']:.4f}, "
-                  f"tokens: {response['tokens']})")
-            
-            # Evaluate response with critic (unless skipped)
-            critic_score = None
-            critic_rationale = None
-            
-            if not args.skip_critic:
-                print("🎯 Evaluating response with critic...")
-                evaluation = critic.evaluate_response(
-                    response['answer_text'],
-                    reference_answer,
-                    prompt_text
-                )
-                critic_score = evaluation['score']
-                critic_rationale = evaluation['rationale']
-                print(f"📊 Critic score: {critic_score}/10 - {critic_rationale[:100]}...")
-            
-            # Store results in database
-            db.store_run_result(
-                run_id=run_id,
-                prompt_id=prompt_id,
-                model=response['model'],
-                answer=response['answer_text'],
-                latency_ms=response['latency_ms'],
-                tokens=response['tokens'],
-                estimated_cost=response['estimated_cost'],
-                critic_score=critic_score,
-                critic_rationale=critic_rationale
-            )
-            
-            # Store for summary
-            results.append({
-                'prompt_id': prompt_id,
-                'model': response['model'],
-                'latency_ms': response['latency_ms'],
-                'cost': response['estimated_cost'],
-                'tokens': response['tokens'],
-                'critic_score': critic_score,
-                'prompt': prompt_text
-            })
-            
-        except Exception as e:
-            print(f"❌ Error processing prompt {prompt_id}: {e}")
-            continue
+    budget = RunBudget(args.budget) if args.budget is not None else None
+    if args.batch:
+        # Submit the whole run as batch jobs and wait for them
+        print(f"\n📦 Processing prompts as provider batch jobs...")
+        results = asyncio.run(BatchRun(router, critic, db).run(
+            prompts_to_run, run_id, args.model, args.skip_critic, use_cache=False if args.no_cache else None,
+            budget=budget
+        ))
+    else:
+        # Process prompts concurrently, at most args.concurrency in flight
+        print(f"\n🔄 Processing prompts (concurrency: {args.concurrency})...")
+        results = asyncio.run(process_prompts(prompts_to_run, router, critic, db, run_id, args, budget))
     
     # Update model performance stats
     print("\n📈 Updating model performance statistics...")
@@ -144,11 +361,63 @@ def main():
     
     # Print final stats
     total_cost = sum(r['cost'] for r in results)
+    hedge_cost = sum(run['estimated_cost'] for run in db.get_all_runs(run_id)
+                     if run.get('hedge_outcome') in ('cancelled', 'failed'))
     scores_with_values = [r['critic_score'] for r in results if r['critic_score'] is not None]
     avg_score = sum(scores_with_values) / len(scores_with_values) if scores_with_values else 0
     
     print(f"\n🎉 Run completed!")
     print(f"💰 Total cost: ${total_cost:.4f}")
+    if hedge_cost:
+        print(f"🏁 Extra cost of lost hedged attempts: ${hedge_cost:.4f}")
+    if args.deadline_ms is not None:
+        met = sum(1 for r in results if r['deadline_met'])
+        print(f"⏱  Deadlines met: {met}/{len(results)} (budget {args.deadline_ms:.0f}ms)")
+    cache_hits = [r for r in results if r['cache_hit']]
+    if cache_hits:
+        print(f"💾 Response cache: {len(cache_hits)}/{len(results)} hits, "
+              f"${sum(r['cached_cost'] for r in cache_hits):.4f} saved")
+    if critic.cache is not None:
+        stats = critic.cache.get_stats()
+        if stats['hits'] + stats['misses']:
+            print(f"🧮 Critic cache: {stats['hits']}/{stats['hits'] + stats['misses']} evaluations reused "
+                  f"(hit ratio {stats['hit_ratio']:.0%}, {stats['entries']} entries)")
+    if critic.precritic is not None:
+        stats = critic.precritic.get_stats()
+        if stats['checked']:
+            print(f"⚡ Pre-critic: {stats['critic_calls_avoided']}/{stats['checked']} critic calls avoided "
+                  f"({stats['passed']} fine, {stats['failed']} broken, avg {stats['avg_us']}µs per answer)")
+    if budget is not None:
+        print(f"💸 Budget: ${budget.spent:.4f} of ${budget.limit:.4f} spent, {budget.skipped} prompts skipped")
+    for model, accuracy in db.get_forecast_accuracy(run_id).items():
+        print(f"🔮 {model} forecast error: cost {accuracy['cost_mape']:.0%}, "
+              f"output tokens {accuracy['output_tokens_mape']:.0%} over {accuracy['runs']} runs")
+    if args.defer_critic and not args.skip_critic and not args.batch:
+        stats = open_queue(db).get_stats()
+        print(f"🎯 Critic queue: {stats['done']} done, {stats['failed']} failed in total"
+              + (f", avg lag {stats['avg_lag_s']}s (max {stats['max_lag_s']}s)" if stats['avg_lag_s'] is not None else ""))
+    fixture_store = get_http_pool().fixtures
+    if fixture_store is not None:
+        stats = fixture_store.get_stats()
+        if stats['mode'] == 'record':
+            print(f"🎞️  Recorded {stats['recorded']} provider exchanges to {stats['path']}")
+        else:
+            print(f"🎞️  Replayed {stats['replayed']} provider exchanges from {stats['path']} "
+                  f"({stats['misses']} requests not in the recording)")
+    for host, stats in get_http_pool().get_stats().items():
+        if stats['requests']:
+            print(f"🔌 {host}: {stats['requests']} requests, {stats['new_connections']} new connections "
+                  f"(reuse {stats['reuse_ratio']:.0%}, avg pool wait {stats['avg_wait_ms']:.1f}ms)")
+    for provider, members in get_pool_stats().items():
+        for name, stats in members.items():
+            governor = stats['rate_governor']
+            if len(members) > 1 and stats['requests']:
+                print(f"🔑 {name}: {stats['requests']} requests, {stats['errors']} errors"
+                      f"{'' if stats['healthy'] else ' (out of rotation)'}")
+            if governor and (governor['throttled'] or governor['rate_limited']):
+                print(f"🚦 {name}: {governor['throttled']} calls held back by the rate governor "
+                      f"(avg {governor['avg_throttle_wait_ms']:.0f}ms), {governor['rate_limited']} rate limited "
+                      f"by the provider, concurrency limit now {governor['concurrency_limit']}")
     if scores_with_values:
         print(f"📊 Average critic score: {avg_score:.1f}/10")
     else:
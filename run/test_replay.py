@@ -0,0 +1,59 @@
+import sqlite3
+
+import pytest
+
+from run import replay
+from run.replay import ReplaySimulator
+
+# The runs table as the first release created it, before any migration
+LEGACY_SCHEMA = """
+CREATE TABLE prompts (id INTEGER PRIMARY KEY, prompt TEXT NOT NULL, reference TEXT NOT NULL);
+CREATE TABLE runs (
+    run_id TEXT NOT NULL,
+    prompt_id INTEGER NOT NULL,
+    model TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    latency_ms REAL NOT NULL,
+    tokens INTEGER NOT NULL,
+    estimated_cost REAL NOT NULL,
+    critic_score INTEGER,
+    critic_rationale TEXT,
+    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+
+@pytest.fixture
+def legacy_db(tmp_path):
+    path = str(tmp_path / "legacy.db")
+    with sqlite3.connect(path) as conn:
+        conn.executescript(LEGACY_SCHEMA)
+        conn.execute("INSERT INTO prompts VALUES (1, 'Prompt', 'Reference')")
+        conn.executemany(
+            "INSERT INTO runs (run_id, prompt_id, model, answer, latency_ms, tokens, estimated_cost, critic_score) "
+            "VALUES (?, 1, ?, 'answer', ?, ?, ?, ?)",
+            [("r1", "gpt-4o", 1200.0, 300, 0.01, 8), ("r1", "mistral", 600.0, 250, 0.002, 6),
+             ("r2", "mistral", 0.0, 0, 0.0, None)]
+        )
+    return path
+
+
+def test_legacy_runs_table_is_migrated_and_replayed(legacy_db):
+    simulator = ReplaySimulator(legacy_db, runs_dir=None).load()
+
+    assert simulator.rows_loaded == 2  # the zero-token error row is left out
+    assert simulator.models == ["gpt-4o", "mistral"]
+
+
+def test_other_database_errors_are_not_mistaken_for_an_empty_database(legacy_db, monkeypatch):
+    monkeypatch.setattr(replay, "REPLAY_QUERY", "SELECT no_such_column FROM runs")
+
+    with pytest.raises(sqlite3.OperationalError, match="no such column"):
+        ReplaySimulator(legacy_db, runs_dir=None).load()
+
+
+def test_missing_database_replays_nothing(tmp_path):
+    simulator = ReplaySimulator(str(tmp_path / "absent.db"), runs_dir=None).load()
+
+    assert simulator.rows_loaded == 0
+    assert not (tmp_path / "absent.db").exists()
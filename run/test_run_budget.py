@@ -0,0 +1,60 @@
+import asyncio
+
+from run.run import RunBudget
+
+
+def test_reserves_dearest_fitting_forecast_and_skips_when_nothing_fits():
+    budget = RunBudget(0.010)
+
+    assert budget.reserve([0.002, 0.004, 0.009]) == 0.009
+    assert budget.reserve([0.002, 0.004]) is None
+    assert budget.skipped == 1
+    budget.settle(0.009, 0.007)
+    assert budget.reserve([0.002, 0.004]) == 0.002
+    assert (budget.spent, budget.reserved) == (0.007, 0.002)
+
+
+def test_hedged_reservation_covers_both_calls():
+    budget = RunBudget(0.010)
+
+    assert budget.reserve([0.003, 0.006], calls=2) == 0.003
+    assert budget.remaining() == 0.004
+
+
+def test_concurrent_prompts_stay_within_the_budget():
+    budget = RunBudget(0.010)
+    costs = [0.001, 0.002, 0.003]
+
+    async def prompt():
+        ceiling = await budget.reserve_when_free(costs)
+        if ceiling is None:
+            return None
+        await asyncio.sleep(0.001)
+        budget.settle(ceiling, ceiling)  # the routed model cost what its forecast said
+        return ceiling
+
+    async def run():
+        return await asyncio.gather(*(prompt() for _ in range(20)))
+
+    ceilings = asyncio.run(run())
+
+    assert budget.spent <= budget.limit + 1e-12
+    assert budget.reserved == 0 and budget.in_flight == 0
+    assert budget.skipped == ceilings.count(None) > 0
+    # Prompts only skipped once the spend itself left no room, not while others were in flight
+    assert budget.limit - budget.spent < min(costs)
+
+
+def test_waiting_prompt_is_skipped_if_the_settled_cost_leaves_no_room():
+    budget = RunBudget(0.010)
+
+    async def run():
+        first = budget.reserve([0.008])
+        waiting = asyncio.create_task(budget.reserve_when_free([0.004]))
+        await asyncio.sleep(0)
+        assert not waiting.done()
+        budget.settle(first, 0.008)
+        return await waiting
+
+    assert asyncio.run(run()) is None
+    assert budget.skipped == 1